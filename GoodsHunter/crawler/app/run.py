@@ -2,6 +2,7 @@
 import argparse
 import asyncio
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
 
@@ -18,14 +19,22 @@ if str(_project_root) not in sys.path:
 from core.registry import ProfileRegistry
 from core.types import Profile
 from fetch.playwright_fetcher import PlaywrightFetcher
+from fetch.page_cache import CachingFetcher, open_page_cache, prepare_replay
 from extract.engine import ExtractEngine
 from storage.output.fileWriter import FileWriter
+from storage.output.writer import JSONLWriter
 
 
 async def process_urls(
     urls: List[str],
     profiles_path: str,
     output_path: Optional[str] = None,
+    jsonl_compress: Optional[str] = None,
+    jsonl_rotate_mb: Optional[float] = None,
+    jsonl_rotate_seconds: Optional[float] = None,
+    shard_format: Optional[str] = None,
+    record_cache: Optional[str] = None,
+    fetcher=None,
 ):
     """
     处理URL列表
@@ -34,12 +43,31 @@ async def process_urls(
         urls: URL列表
         profiles_path: profiles.yaml路径
         output_path: 输出JSONL文件路径（可选，如果为None则不保存JSONL，只保存图片和文本文件）
+        jsonl_compress: JSONL压缩方式（None / gzip / zstd）
+        jsonl_rotate_mb: JSONL按大小轮转的阈值（MB）
+        jsonl_rotate_seconds: JSONL按时间轮转的阈值（秒）
+        shard_format: 图片/文本分片格式（tar / zip），为None时每个 item 单独保存文件
+        record_cache: 页面缓存路径（本地目录 / minio://...），抓取到的页面同时写入缓存
+        fetcher: 抓取器，默认 PlaywrightFetcher（回放时传入 ReplayFetcher）
     """
     # 初始化组件
     registry = ProfileRegistry(profiles_path)
-    fetcher = PlaywrightFetcher()
+    if fetcher is None:
+        fetcher = PlaywrightFetcher()
+    if record_cache:
+        fetcher = CachingFetcher(fetcher, open_page_cache(record_cache))
     engine = ExtractEngine()
 
+    # JSONL写入器：整个运行期间持有一个带缓冲的文件句柄
+    jsonl_writer = None
+    if output_path:
+        jsonl_writer = JSONLWriter(
+            output_path,
+            compression=jsonl_compress,
+            max_bytes=int(jsonl_rotate_mb * 1024 * 1024) if jsonl_rotate_mb else None,
+            max_seconds=jsonl_rotate_seconds
+        )
+
     try:
         await fetcher.start()
 
@@ -65,7 +93,8 @@ async def process_urls(
                 stats = FileWriter.save_record(
                     record=record,
                     site=profile.site,
-                    output_path=output_path
+                    jsonl_writer=jsonl_writer,
+                    shard_format=shard_format
                 )
 
                 # 显示提取结果
@@ -98,6 +127,8 @@ async def process_urls(
 
     finally:
         await fetcher.stop()
+        if jsonl_writer:
+            jsonl_writer.close()
 
 
 def load_urls_from_file(file_path: str) -> List[str]:
@@ -130,7 +161,8 @@ def main():
     parser.add_argument(
         "--urls",
         type=str,
-        required=True,
+        required=False,
+        default=None,
         help="URL文件路径（每行一个URL）或单个URL",
     )
     parser.add_argument(
@@ -146,16 +178,86 @@ def main():
         default="profiles",
         help="Profile配置文件路径或目录（默认: profiles，会自动加载目录下所有yaml文件）",
     )
+    parser.add_argument(
+        "--jsonl-compress",
+        choices=["gzip", "zstd"],
+        default=None,
+        help="JSONL输出压缩方式（默认不压缩；zstd 需要安装 zstandard）",
+    )
+    parser.add_argument(
+        "--jsonl-rotate-mb",
+        type=float,
+        default=None,
+        help="JSONL单个文件达到该大小（MB，未压缩）后轮转（默认不轮转）",
+    )
+    parser.add_argument(
+        "--jsonl-rotate-seconds",
+        type=float,
+        default=None,
+        help="JSONL单个文件写入超过该时间（秒）后轮转（默认不轮转）",
+    )
+    parser.add_argument(
+        "--shard",
+        choices=["tar", "zip"],
+        default=None,
+        help="每页的图片和文本写入一个 tar/zip 分片文件（默认每个 item 单独保存文件）",
+    )
+    parser.add_argument(
+        "--record-cache",
+        type=str,
+        default=None,
+        help="把抓取到的页面（HTML + 图片资源）写入页面缓存：本地目录，或 minio:// / minio://{bucket}/{前缀}",
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help="从页面缓存回放（不启动浏览器）；不指定 --urls 时回放缓存中的全部 URL",
+    )
+    parser.add_argument(
+        "--replay-history",
+        action="store_true",
+        help="按抓取时间回放全部快照（默认每个 URL 只回放最新的快照）",
+    )
+    parser.add_argument(
+        "--replay-since",
+        type=datetime.fromisoformat,
+        default=None,
+        help="回放的抓取时间下限（ISO 格式，仅 --replay-history）",
+    )
+    parser.add_argument(
+        "--replay-until",
+        type=datetime.fromisoformat,
+        default=None,
+        help="回放的抓取时间上限（ISO 格式，不含）",
+    )
 
     args = parser.parse_args()
 
     # 加载URLs
-    urls_path = Path(args.urls)
-    if urls_path.exists():
-        urls = load_urls_from_file(args.urls)
-    else:
-        # 假设是单个URL
-        urls = [args.urls]
+    if not args.urls and not args.replay:
+        parser.error("需要指定 --urls（回放模式 --replay 下可省略，表示缓存中的全部 URL）")
+
+    urls = None
+    if args.urls:
+        urls_path = Path(args.urls)
+        if urls_path.exists():
+            urls = load_urls_from_file(args.urls)
+        else:
+            # 假设是单个URL
+            urls = [args.urls]
+
+    # 回放模式：从页面缓存读取页面，不启动浏览器
+    fetcher = None
+    if args.replay:
+        fetcher, urls = prepare_replay(
+            args.replay,
+            urls=urls,
+            history=args.replay_history,
+            since=args.replay_since,
+            until=args.replay_until
+        )
+        print(f"从页面缓存回放: {args.replay}")
 
     if not urls:
         print("错误: 没有找到有效的URL")
@@ -164,7 +266,17 @@ def main():
     print(f"找到 {len(urls)} 个URL")
 
     # 运行异步处理
-    asyncio.run(process_urls(urls, args.profiles, args.out))
+    asyncio.run(process_urls(
+        urls,
+        args.profiles,
+        args.out,
+        jsonl_compress=args.jsonl_compress,
+        jsonl_rotate_mb=args.jsonl_rotate_mb,
+        jsonl_rotate_seconds=args.jsonl_rotate_seconds,
+        shard_format=args.shard,
+        record_cache=args.record_cache,
+        fetcher=fetcher
+    ))
 
     if args.out:
         print(f"完成！结果已保存到: {args.out}")
@@ -2,6 +2,8 @@
 import argparse
 import asyncio
 import sys
+from datetime import datetime
+from contextlib import nullcontext
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
@@ -23,9 +25,32 @@ load_dotenv(_project_root / ".env")
 from core.registry import ProfileRegistry
 from core.types import Profile
 from fetch.playwright_fetcher import PlaywrightFetcher
+from fetch.page_cache import CachingFetcher, open_page_cache, prepare_replay
 from extract.engine import ExtractEngine
 from storage.output.fileWriter import FileWriter
+from storage.output.writer import JSONLWriter
 from storage.output.db_writer import DBWriter
+from storage.output.write_behind import WriteBehindDBWriter, DroppedRecordsError
+from storage.crawl_run import CrawlRunRecorder
+from storage.notify import CRAWLER_LOG_CHANNEL
+
+
+# 未指定 --db-dead-letter 时的死信目录（每次运行一个文件，只在有记录最终写入失败时创建）
+DEFAULT_DEAD_LETTER_DIR = _project_root / "storage" / "file_storage" / "dead_letter"
+
+
+def default_dead_letter_path(started_at: Optional[datetime] = None) -> str:
+    """
+    默认死信文件路径：{DEFAULT_DEAD_LETTER_DIR}/db_{YYYYMMDD-HHMMSS}.jsonl
+
+    Args:
+        started_at: 运行开始时间，默认当前时间
+
+    Returns:
+        死信 JSONL 文件路径
+    """
+    started_at = started_at or datetime.now()
+    return str(DEFAULT_DEAD_LETTER_DIR / f"db_{started_at.strftime('%Y%m%d-%H%M%S')}.jsonl")
 
 
 async def process_urls(
@@ -33,27 +58,93 @@ async def process_urls(
     profiles_path: str,
     output_path: Optional[str] = None,
     use_db: bool = True,
+    db_queue_size: int = 100,
+    db_batch_size: int = 20,
+    db_flush_interval: float = 1.0,
+    db_dead_letter: Optional[str] = None,
+    compact_sightings: bool = False,
+    inline_items: bool = False,
+    notify: bool = False,
+    jsonl_compress: Optional[str] = None,
+    jsonl_rotate_mb: Optional[float] = None,
+    jsonl_rotate_seconds: Optional[float] = None,
+    shard_format: Optional[str] = None,
+    record_cache: Optional[str] = None,
+    fetcher=None,
 ):
     """
     处理URL列表（支持数据库存储）
     
+    数据库写入采用写后（write-behind）方式：抓取循环只把 record 放入有界队列，
+    后台任务按批次写入 Postgres，抓取不会被数据库提交阻塞。
+    启用数据库时每次运行记录一行 crawl_run（计数和 fetch/extract/file/image/db 各阶段耗时），
+    其 id 作为 crawler_log.run_id 写入。
+    
     Args:
         urls: URL列表
         profiles_path: profiles.yaml路径
         output_path: 输出JSONL文件路径（可选）
         use_db: 是否写入数据库（默认True）
+        db_queue_size: 写入队列容量（record 数），满时抓取等待（背压）
+        db_batch_size: 每批写入的 record 数
+        db_flush_interval: 批次最长等待时间（秒）
+        db_dead_letter: 写入最终失败时的死信 JSONL 文件路径，默认 default_dead_letter_path()
+        compact_sightings: 精简模式，内容未变化的商品只刷新最后发现时间，不写完整日志行
+        inline_items: inline 模式，写入日志行的同一事务中直接同步 crawler_item（见 DBWriter）
+        notify: 写入 crawler_log 后发送 NOTIFY crawler_log_inserted（item_extract --listen 立即同步）
+        jsonl_compress: JSONL压缩方式（None / gzip / zstd）
+        jsonl_rotate_mb: JSONL按大小轮转的阈值（MB）
+        jsonl_rotate_seconds: JSONL按时间轮转的阈值（秒）
+        shard_format: 图片/文本分片格式（tar / zip），为None时每个 item 单独保存文件
+        record_cache: 页面缓存路径（本地目录 / minio://...），抓取到的页面同时写入缓存
+        fetcher: 抓取器，默认 PlaywrightFetcher（回放时传入 ReplayFetcher）
+
+    Raises:
+        DroppedRecordsError: 有记录写入数据库失败且未能保存到死信文件
     """
     # 初始化组件
     registry = ProfileRegistry(profiles_path)
-    fetcher = PlaywrightFetcher()
+    if fetcher is None:
+        fetcher = PlaywrightFetcher()
+    if record_cache:
+        fetcher = CachingFetcher(fetcher, open_page_cache(record_cache))
     engine = ExtractEngine()
-    
+
+    # JSONL写入器：整个运行期间持有一个带缓冲的文件句柄
+    jsonl_writer = None
+    if output_path:
+        jsonl_writer = JSONLWriter(
+            output_path,
+            compression=jsonl_compress,
+            max_bytes=int(jsonl_rotate_mb * 1024 * 1024) if jsonl_rotate_mb else None,
+            max_seconds=jsonl_rotate_seconds
+        )
+
     # 初始化数据库写入器（如果启用）
     db_writer = None
+    write_behind = None
+    run_recorder = None
+    run_id = -1
+    run_error = None
+    dropped_error = None
     if use_db:
         try:
-            db_writer = DBWriter()
+            db_writer = DBWriter(
+                compact_sightings=compact_sightings,
+                inline_items=inline_items,
+                notify_channel=CRAWLER_LOG_CHANNEL if notify else None
+            )
             print("[DBWriter] 数据库写入器已初始化")
+            write_behind = WriteBehindDBWriter(
+                db_writer,
+                max_queue_size=db_queue_size,
+                batch_size=db_batch_size,
+                flush_interval=db_flush_interval,
+                dead_letter_path=db_dead_letter or default_dead_letter_path()
+            )
+            run_recorder = CrawlRunRecorder(database_url=db_writer.database_url)
+            run_id = run_recorder.start(urls_planned=len(urls))
+            run_recorder.attach_writer_stats(db_writer.stats)
         except Exception as e:
             print(f"[DBWriter] 警告: 数据库写入器初始化失败: {e}")
             print("[DBWriter] 将继续运行，但不写入数据库")
@@ -61,42 +152,45 @@ async def process_urls(
 
     try:
         await fetcher.start()
+        if write_behind:
+            await write_behind.start()
 
         for url in urls:
             print(f"处理: {url}")
 
+            timing = run_recorder.page(url) if run_recorder else None
+
             # 匹配Profile
             profile = registry.match_profile(url)
             if not profile:
                 print(f"  警告: 未找到匹配的Profile，跳过")
+                if run_recorder:
+                    run_recorder.finish_page(timing, "skipped")
                 continue
 
             print(f"  使用Profile: {profile.name}")
 
             try:
                 # 抓取页面
-                page = await fetcher.fetch(url, profile.fetch)
+                with _stage(timing, "fetch"):
+                    page = await fetcher.fetch(url, profile.fetch)
 
                 # 抽取字段
-                record = engine.extract(page, profile)
+                with _stage(timing, "extract"):
+                    record = engine.extract(page, profile)
 
                 # 保存记录（包括JSONL、图片和文本文件）
-                stats = FileWriter.save_record(
-                    record=record,
-                    site=profile.site,
-                    output_path=output_path
-                )
-
-                # 写入数据库（如果启用）
-                if use_db and db_writer:
-                    try:
-                        db_count = db_writer.write_record(
-                            record=record,
-                            site=profile.site
-                        )
-                        print(f"  [DBWriter] 已写入 {db_count} 条记录到数据库")
-                    except Exception as e:
-                        print(f"  [DBWriter] 写入数据库失败: {e}")
+                with _stage(timing, "file"):
+                    stats = FileWriter.save_record(
+                        record=record,
+                        site=profile.site,
+                        jsonl_writer=jsonl_writer,
+                        shard_format=shard_format
+                    )
+
+                # 写入数据库（如果启用）：放入写后队列，队列满时等待
+                if use_db and write_behind:
+                    await write_behind.put(record, site=profile.site, run_id=run_id)
 
                 # 显示提取结果
                 if "items" in record.data:
@@ -122,14 +216,44 @@ async def process_urls(
                     for error in record.errors:
                         print(f"    - {error.field}: {error.error}")
 
+                if run_recorder:
+                    items_count = len(record.data.get("items") or []) if "items" in record.data else 1
+                    run_recorder.finish_page(timing, "succeeded", items=items_count)
+
             except Exception as e:
                 print(f"  错误: {e}")
+                if run_recorder:
+                    run_recorder.finish_page(timing, "failed")
                 continue
 
+    except BaseException as e:
+        run_error = repr(e)
+        raise
     finally:
         await fetcher.stop()
+        # 先排空写后队列，保证已抓取的记录全部写入，再关闭连接池
+        if write_behind:
+            try:
+                await write_behind.close()
+            except DroppedRecordsError as e:
+                # 先完成运行记录和资源释放，最后再抛出
+                dropped_error = e
+                run_error = run_error or repr(e)
+        # 写后队列排空后再结束运行记录，image / db 阶段的统计才完整
+        if run_recorder:
+            run_recorder.finish(error=run_error)
         if db_writer:
             db_writer.close()
+        if jsonl_writer:
+            jsonl_writer.close()
+
+    if dropped_error:
+        raise dropped_error
+
+
+def _stage(timing, name: str):
+    """页面阶段计时（未启用运行台账时不计时）"""
+    return timing.stage(name) if timing else nullcontext()
 
 
 def load_urls_from_file(file_path: str) -> List[str]:
@@ -201,7 +325,8 @@ def main():
     parser.add_argument(
         "--urls",
         type=str,
-        required=True,
+        required=False,
+        default=None,
         help="URL文件路径（支持 YAML 格式或文本格式，每行一个URL）或单个URL",
     )
     parser.add_argument(
@@ -222,6 +347,98 @@ def main():
         action="store_true",
         help="禁用数据库写入",
     )
+    parser.add_argument(
+        "--db-queue-size",
+        type=int,
+        default=100,
+        help="数据库写入队列容量（record 数），满时抓取等待（默认: 100）",
+    )
+    parser.add_argument(
+        "--db-batch-size",
+        type=int,
+        default=20,
+        help="每批写入数据库的 record 数（默认: 20）",
+    )
+    parser.add_argument(
+        "--db-flush-interval",
+        type=float,
+        default=1.0,
+        help="批次最长等待时间，秒（默认: 1.0）",
+    )
+    parser.add_argument(
+        "--db-dead-letter",
+        type=str,
+        default=None,
+        help="数据库写入最终失败时保存记录的 JSONL 文件路径（默认 storage/file_storage/dead_letter/db_{时间}.jsonl）",
+    )
+    parser.add_argument(
+        "--compact-sightings",
+        action="store_true",
+        help="精简模式：内容未变化（raw_hash 相同）的商品只刷新最后发现时间，不写入完整的 crawler_log 行",
+    )
+    parser.add_argument(
+        "--inline-items",
+        action="store_true",
+        help="inline 模式：写入 crawler_log 的同一事务中直接更新 crawler_item，不等待 item_extract 同步循环",
+    )
+    parser.add_argument(
+        "--notify",
+        action="store_true",
+        help="写入 crawler_log 后发送 NOTIFY crawler_log_inserted，item_extract --listen 收到后立即同步（默认不通知）",
+    )
+    parser.add_argument(
+        "--jsonl-compress",
+        choices=["gzip", "zstd"],
+        default=None,
+        help="JSONL输出压缩方式（默认不压缩；zstd 需要安装 zstandard）",
+    )
+    parser.add_argument(
+        "--jsonl-rotate-mb",
+        type=float,
+        default=None,
+        help="JSONL单个文件达到该大小（MB，未压缩）后轮转（默认不轮转）",
+    )
+    parser.add_argument(
+        "--jsonl-rotate-seconds",
+        type=float,
+        default=None,
+        help="JSONL单个文件写入超过该时间（秒）后轮转（默认不轮转）",
+    )
+    parser.add_argument(
+        "--shard",
+        choices=["tar", "zip"],
+        default=None,
+        help="每页的图片和文本写入一个 tar/zip 分片文件（默认每个 item 单独保存文件）",
+    )
+    parser.add_argument(
+        "--record-cache",
+        type=str,
+        default=None,
+        help="把抓取到的页面（HTML + 图片资源）写入页面缓存：本地目录，或 minio:// / minio://{bucket}/{前缀}",
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        help="从页面缓存回放（不启动浏览器）；不指定 --urls 时回放缓存中的全部 URL",
+    )
+    parser.add_argument(
+        "--replay-history",
+        action="store_true",
+        help="按抓取时间回放全部快照（默认每个 URL 只回放最新的快照）",
+    )
+    parser.add_argument(
+        "--replay-since",
+        type=datetime.fromisoformat,
+        default=None,
+        help="回放的抓取时间下限（ISO 格式，仅 --replay-history）",
+    )
+    parser.add_argument(
+        "--replay-until",
+        type=datetime.fromisoformat,
+        default=None,
+        help="回放的抓取时间上限（ISO 格式，不含）",
+    )
 
     args = parser.parse_args()
 
@@ -233,12 +450,29 @@ def main():
     profiles_path_str = str(profiles_path.resolve())
 
     # 加载URLs
-    urls_path = Path(args.urls)
-    if urls_path.exists():
-        urls = load_urls_from_file(args.urls)
-    else:
-        # 假设是单个URL
-        urls = [args.urls]
+    if not args.urls and not args.replay:
+        parser.error("需要指定 --urls（回放模式 --replay 下可省略，表示缓存中的全部 URL）")
+
+    urls = None
+    if args.urls:
+        urls_path = Path(args.urls)
+        if urls_path.exists():
+            urls = load_urls_from_file(args.urls)
+        else:
+            # 假设是单个URL
+            urls = [args.urls]
+
+    # 回放模式：从页面缓存读取页面，不启动浏览器
+    fetcher = None
+    if args.replay:
+        fetcher, urls = prepare_replay(
+            args.replay,
+            urls=urls,
+            history=args.replay_history,
+            since=args.replay_since,
+            until=args.replay_until
+        )
+        print(f"从页面缓存回放: {args.replay}")
 
     if not urls:
         print("错误: 没有找到有效的URL")
@@ -248,12 +482,29 @@ def main():
     print(f"使用profiles路径: {profiles_path_str}")
 
     # 运行异步处理
-    asyncio.run(process_urls(
-        urls, 
-        profiles_path_str, 
-        args.out,
-        use_db=not args.no_db
-    ))
+    try:
+        asyncio.run(process_urls(
+            urls, 
+            profiles_path_str, 
+            args.out,
+            use_db=not args.no_db,
+            db_queue_size=args.db_queue_size,
+            db_batch_size=args.db_batch_size,
+            db_flush_interval=args.db_flush_interval,
+            db_dead_letter=args.db_dead_letter,
+            compact_sightings=args.compact_sightings,
+            inline_items=args.inline_items,
+            notify=args.notify,
+            jsonl_compress=args.jsonl_compress,
+            jsonl_rotate_mb=args.jsonl_rotate_mb,
+            jsonl_rotate_seconds=args.jsonl_rotate_seconds,
+            shard_format=args.shard,
+            record_cache=args.record_cache,
+            fetcher=fetcher
+        ))
+    except DroppedRecordsError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
 
     if args.out:
         print(f"完成！结果已保存到: {args.out}")
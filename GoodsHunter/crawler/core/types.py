@@ -1,5 +1,6 @@
 """核心类型定义"""
 from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 from enum import Enum
 
@@ -117,6 +118,7 @@ class Page:
     html: str
     status_code: int = 200
     resources: Optional[Dict[str, bytes]] = None  # 已加载的资源，key为URL，value为资源内容
+    fetched_at: Optional[datetime] = None  # 抓取时间（页面缓存记录/回放时设置）
 
 
 @dataclass
@@ -134,4 +136,5 @@ class Record:
     data: Dict[str, Any] = field(default_factory=dict)
     errors: List[FieldError] = field(default_factory=list)
     status_code: int = 200
+    fetched_at: Optional[datetime] = None  # 页面抓取时间，设置时 DBWriter 以此作为 crawl_time / dt
 
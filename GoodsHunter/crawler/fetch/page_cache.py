@@ -0,0 +1,448 @@
+"""页面缓存：记录抓取到的 Page（HTML + 捕获的图片资源），离线回放重新抽取
+
+存储布局（本地目录或 MinIO bucket 中相同的 key）：
+- blobs/{sha256[0:2]}/{sha256}[.gz]：内容寻址的数据块（HTML gzip 压缩，图片原样保存），
+  同一张图片/同一份 HTML 只保存一次
+- pages/{sha256(url)[0:16]}/{抓取时间 YYYYMMDDTHHMMSSffffff}.json：一次抓取的快照
+  （url、抓取时间、状态码、HTML 和各资源对应的 blob）
+
+缓存路径写法（--record-cache / --replay）：
+- 本地目录，例如 data/page_cache
+- minio://（使用 MINIO_PAGE_CACHE_BUCKET，默认 goodshunter-page-cache）或 minio://{bucket}/{前缀}
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Sequence
+
+from core.types import Page, FetchConfig
+
+try:
+    from storage.minio_client import MinIOClient
+except ImportError:
+    MinIOClient = None
+
+
+PAGE_CACHE_BUCKET = os.getenv("MINIO_PAGE_CACHE_BUCKET", "goodshunter-page-cache")
+
+# 快照文件名中的时间格式（UTC）
+_SNAPSHOT_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+class PageNotCached(KeyError):
+    """回放时缓存中没有该 URL 的快照"""
+
+
+def url_key(url: str) -> str:
+    """URL 对应的快照目录名（sha256 前 16 位）"""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class SnapshotRef:
+    """快照引用（key 中已包含抓取时间，列出快照时无需读取内容）"""
+    key: str
+    fetched_at: datetime
+
+
+def _parse_snapshot_key(key: str) -> Optional[SnapshotRef]:
+    """从快照 key 解析抓取时间，不是快照的 key 返回 None"""
+    name = key.rsplit("/", 1)[-1]
+    if not key.startswith("pages/") or not name.endswith(".json"):
+        return None
+    try:
+        fetched_at = datetime.strptime(name[:-len(".json")], _SNAPSHOT_TIME_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return SnapshotRef(key=key, fetched_at=fetched_at)
+
+
+class LocalPageCacheStore:
+    """本地目录存储"""
+
+    def __init__(self, base_dir: str):
+        """
+        初始化本地存储
+
+        Args:
+            base_dir: 缓存根目录
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return (self.base_dir / key).exists()
+
+    def put(self, key: str, data: bytes, content_type: str = "application/octet-stream"):
+        """写入对象（先写临时文件再原子替换，中断时不会留下不完整的文件）"""
+        path = self.base_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, key: str) -> bytes:
+        return (self.base_dir / key).read_bytes()
+
+    def list(self, prefix: str) -> List[str]:
+        root = self.base_dir / prefix
+        if not root.exists():
+            return []
+        return sorted(
+            path.relative_to(self.base_dir).as_posix()
+            for path in root.rglob("*")
+            if path.is_file() and not path.name.startswith(".tmp-")
+        )
+
+    def __str__(self):
+        return str(self.base_dir)
+
+
+class MinIOPageCacheStore:
+    """MinIO 存储（独立 bucket，不经过 /images 代理对外提供）"""
+
+    def __init__(self, bucket: Optional[str] = None, prefix: str = "", minio_client=None):
+        """
+        初始化 MinIO 存储
+
+        Args:
+            bucket: bucket 名称，默认 MINIO_PAGE_CACHE_BUCKET
+            prefix: key 前缀
+            minio_client: 已创建的 MinIOClient（测试或复用连接时传入）
+        """
+        if minio_client is None:
+            if MinIOClient is None:
+                raise ImportError("minio 未安装。请运行: pip install minio")
+            minio_client = MinIOClient(bucket=bucket or PAGE_CACHE_BUCKET)
+        self.client = minio_client
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def exists(self, key: str) -> bool:
+        return self.client.object_exists(self.prefix + key)
+
+    def put(self, key: str, data: bytes, content_type: str = "application/octet-stream"):
+        self.client.upload_object(self.prefix + key, data, content_type=content_type)
+
+    def get(self, key: str) -> bytes:
+        return self.client.download_image(self.prefix + key)
+
+    def list(self, prefix: str) -> List[str]:
+        return sorted(
+            name[len(self.prefix):] for name in self.client.list_objects(prefix=self.prefix + prefix)
+        )
+
+    def __str__(self):
+        return f"minio://{self.client.bucket}/{self.prefix}"
+
+
+class PageCache:
+    """内容寻址的页面缓存"""
+
+    def __init__(self, store):
+        """
+        初始化页面缓存
+
+        Args:
+            store: LocalPageCacheStore 或 MinIOPageCacheStore
+        """
+        self.store = store
+        self.stats = {"snapshots_written": 0, "blobs_written": 0, "blobs_reused": 0, "snapshots_read": 0}
+
+    def _put_blob(self, data: bytes, compress: bool = False) -> str:
+        """保存数据块（已存在时跳过），返回 blob key"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = f"blobs/{sha256[:2]}/{sha256}" + (".gz" if compress else "")
+        if self.store.exists(key):
+            self.stats["blobs_reused"] += 1
+            return key
+        payload = gzip.compress(data, compresslevel=6, mtime=0) if compress else data
+        self.store.put(key, payload)
+        self.stats["blobs_written"] += 1
+        return key
+
+    def _get_blob(self, key: str) -> bytes:
+        data = self.store.get(key)
+        return gzip.decompress(data) if key.endswith(".gz") else data
+
+    def put(self, page: Page, fetched_at: Optional[datetime] = None) -> str:
+        """
+        保存一次抓取的快照
+
+        Args:
+            page: 抓取到的页面
+            fetched_at: 抓取时间，默认 page.fetched_at 或当前时间
+
+        Returns:
+            快照 key
+        """
+        fetched_at = fetched_at or page.fetched_at or datetime.now(timezone.utc)
+        if fetched_at.tzinfo is None:
+            fetched_at = fetched_at.astimezone()
+        fetched_at = fetched_at.astimezone(timezone.utc)
+
+        snapshot = {
+            "url": page.url,
+            "fetched_at": fetched_at.isoformat(),
+            "status_code": page.status_code,
+            "html": self._put_blob(page.html.encode("utf-8"), compress=True),
+            "resources": {
+                resource_url: self._put_blob(body)
+                for resource_url, body in (page.resources or {}).items()
+            },
+        }
+        key = f"pages/{url_key(page.url)}/{fetched_at.strftime(_SNAPSHOT_TIME_FORMAT)}.json"
+        self.store.put(key, json.dumps(snapshot, ensure_ascii=False).encode("utf-8"), "application/json")
+        self.stats["snapshots_written"] += 1
+        return key
+
+    def list_snapshots(self, url: str) -> List[SnapshotRef]:
+        """
+        列出 URL 的所有快照（按抓取时间升序）
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            快照引用列表
+        """
+        refs = [_parse_snapshot_key(key) for key in self.store.list(f"pages/{url_key(url)}/")]
+        return sorted((ref for ref in refs if ref), key=lambda ref: ref.fetched_at)
+
+    def iter_snapshots(
+        self,
+        urls: Optional[Sequence[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[SnapshotRef]:
+        """
+        列出缓存中的快照（按抓取时间升序），只根据 key 过滤，不读取快照内容
+
+        Args:
+            urls: 只列出这些 URL 的快照，None 表示全部
+            since: 抓取时间下限（含）
+            until: 抓取时间上限（不含）
+
+        Returns:
+            快照引用列表
+        """
+        if urls is None:
+            refs = [_parse_snapshot_key(key) for key in self.store.list("pages/")]
+            refs = [ref for ref in refs if ref]
+        else:
+            refs = [ref for url in dict.fromkeys(urls) for ref in self.list_snapshots(url)]
+        since = _as_utc(since)
+        until = _as_utc(until)
+        return sorted(
+            (ref for ref in refs
+             if (since is None or ref.fetched_at >= since) and (until is None or ref.fetched_at < until)),
+            key=lambda ref: ref.fetched_at
+        )
+
+    def load(self, ref: SnapshotRef) -> Page:
+        """
+        读取快照还原为 Page（包括图片资源）
+
+        Args:
+            ref: 快照引用
+
+        Returns:
+            Page对象（fetched_at 为原始抓取时间）
+        """
+        snapshot = json.loads(self.store.get(ref.key))
+        self.stats["snapshots_read"] += 1
+        resources = {
+            resource_url: self._get_blob(blob_key)
+            for resource_url, blob_key in snapshot["resources"].items()
+        }
+        return Page(
+            url=snapshot["url"],
+            html=self._get_blob(snapshot["html"]).decode("utf-8"),
+            status_code=snapshot["status_code"],
+            resources=resources or None,
+            fetched_at=datetime.fromisoformat(snapshot["fetched_at"]),
+        )
+
+    def get(self, url: str, at: Optional[datetime] = None) -> Page:
+        """
+        读取 URL 在 at 时刻（含）之前最新的快照
+
+        Args:
+            url: 页面URL
+            at: 时间点，None 表示最新
+
+        Returns:
+            Page对象
+
+        Raises:
+            PageNotCached: 没有符合条件的快照
+        """
+        at = _as_utc(at)
+        refs = [ref for ref in self.list_snapshots(url) if at is None or ref.fetched_at <= at]
+        if not refs:
+            raise PageNotCached(url)
+        return self.load(refs[-1])
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """把时间转换为 UTC（无时区的按本地时间处理）"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+def open_page_cache(spec: str) -> PageCache:
+    """
+    根据路径写法创建页面缓存
+
+    Args:
+        spec: 本地目录，或 minio:// / minio://{bucket}/{前缀}
+
+    Returns:
+        PageCache
+    """
+    if spec.startswith("minio://"):
+        bucket, _, prefix = spec[len("minio://"):].partition("/")
+        return PageCache(MinIOPageCacheStore(bucket=bucket or None, prefix=prefix))
+    return PageCache(LocalPageCacheStore(spec))
+
+
+class CachingFetcher:
+    """包装实际的抓取器：每次抓取后把 Page 写入页面缓存（写入失败只打印警告）"""
+
+    def __init__(self, fetcher, cache: PageCache):
+        """
+        初始化
+
+        Args:
+            fetcher: 实际的抓取器（如 PlaywrightFetcher）
+            cache: 页面缓存
+        """
+        self.fetcher = fetcher
+        self.cache = cache
+
+    async def start(self):
+        await self.fetcher.start()
+
+    async def stop(self):
+        await self.fetcher.stop()
+        print(f"[CachingFetcher] 页面缓存 {self.cache.store}: {self.cache.stats}")
+
+    async def fetch(self, url: str, config: FetchConfig) -> Page:
+        """抓取页面并写入缓存（Page.fetched_at 为抓取完成时间）"""
+        page = await self.fetcher.fetch(url, config)
+        page.fetched_at = datetime.now(timezone.utc)
+        try:
+            await asyncio.to_thread(self.cache.put, page)
+        except Exception as e:
+            print(f"[CachingFetcher] 警告: 写入页面缓存失败 {url}: {e}")
+        return page
+
+
+class ReplayFetcher:
+    """
+    从页面缓存回放的抓取器（不启动浏览器，不访问网络）
+
+    默认返回每个 URL 在 at 时刻之前最新的快照；queue_snapshots() 排入的快照按顺序逐个返回，
+    用于按抓取时间回放全部历史快照。
+    """
+
+    def __init__(self, cache: PageCache, at: Optional[datetime] = None):
+        """
+        初始化
+
+        Args:
+            cache: 页面缓存
+            at: 回放的时间点，None 表示最新快照
+        """
+        self.cache = cache
+        self.at = at
+        self._queued: Dict[str, Deque[SnapshotRef]] = {}
+
+    def queue_snapshots(self, refs: Sequence[SnapshotRef]) -> List[str]:
+        """
+        排入要依次回放的快照（读取快照以获得 URL）
+
+        Args:
+            refs: 快照引用（按抓取时间升序）
+
+        Returns:
+            与快照一一对应的 URL 列表，作为抓取循环的 URL 列表
+        """
+        urls = []
+        for ref in refs:
+            url = json.loads(self.cache.store.get(ref.key))["url"]
+            self._queued.setdefault(url, deque()).append(ref)
+            urls.append(url)
+        return urls
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        print(f"[ReplayFetcher] 页面缓存 {self.cache.store}: {self.cache.stats}")
+
+    async def fetch(self, url: str, config: FetchConfig) -> Page:
+        """
+        从缓存读取页面
+
+        Raises:
+            PageNotCached: 缓存中没有该 URL 的快照
+        """
+        queued = self._queued.get(url)
+        if queued:
+            return await asyncio.to_thread(self.cache.load, queued.popleft())
+        return await asyncio.to_thread(self.cache.get, url, self.at)
+
+
+def iter_cached_urls(cache: PageCache) -> Iterator[str]:
+    """列出缓存中的所有 URL（每个 URL 读取一个快照）"""
+    seen = set()
+    for ref in cache.iter_snapshots():
+        directory = ref.key.rsplit("/", 1)[0]
+        if directory in seen:
+            continue
+        seen.add(directory)
+        yield json.loads(cache.store.get(ref.key))["url"]
+
+
+def prepare_replay(
+    spec: str,
+    urls: Optional[Sequence[str]] = None,
+    history: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    创建回放抓取器和要处理的 URL 列表（CLI 的 --replay 使用）
+
+    Args:
+        spec: 缓存路径（本地目录 / minio://...）
+        urls: 只回放这些 URL，None 表示缓存中的全部 URL
+        history: True 时按抓取时间回放 [since, until) 内的全部快照；否则每个 URL 回放 until 之前最新的快照
+        since: 历史回放的抓取时间下限
+        until: 抓取时间上限
+
+    Returns:
+        (ReplayFetcher, URL 列表)
+    """
+    cache = open_page_cache(spec)
+    fetcher = ReplayFetcher(cache, at=until)
+    if history:
+        refs = cache.iter_snapshots(urls, since=since, until=until)
+        return fetcher, fetcher.queue_snapshots(refs)
+    return fetcher, list(urls) if urls else list(iter_cached_urls(cache))
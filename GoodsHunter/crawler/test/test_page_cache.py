@@ -0,0 +1,57 @@
+"""页面缓存记录/回放测试（本地目录存储，不启动浏览器）"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+# 将项目根目录添加到Python路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from core.types import FetchConfig, Page
+from fetch.page_cache import PageNotCached, open_page_cache, prepare_replay
+
+
+URL = "https://example.com/list?page=1"
+
+
+def _at(hour):
+    return datetime(2026, 1, 1, hour, 0, tzinfo=timezone.utc)
+
+
+def test_snapshots_roundtrip_and_share_blobs(tmp_path):
+    """快照还原 HTML、资源和抓取时间；相同的图片只保存一次；按时间点取快照"""
+    cache = open_page_cache(str(tmp_path))
+    image = b"\x89PNG fake image"
+    cache.put(Page(url=URL, html="<p>v1 ¥100</p>", resources={"https://img/1.png": image}), fetched_at=_at(1))
+    cache.put(Page(url=URL, html="<p>v2 ¥90</p>", resources={"https://img/1.png": image}), fetched_at=_at(2))
+
+    assert cache.stats["blobs_reused"] == 1
+    latest = cache.get(URL)
+    assert latest.html == "<p>v2 ¥90</p>"
+    assert latest.resources == {"https://img/1.png": image}
+    assert latest.fetched_at == _at(2)
+    assert cache.get(URL, at=_at(1)).html == "<p>v1 ¥100</p>"
+    with pytest.raises(PageNotCached):
+        cache.get(URL, at=datetime(2025, 12, 31, tzinfo=timezone.utc))
+
+
+def test_replay_history_returns_snapshots_in_fetch_order(tmp_path):
+    """--replay-history：同一 URL 的快照按抓取时间依次返回"""
+    cache = open_page_cache(str(tmp_path))
+    for hour in (3, 1, 2):
+        cache.put(Page(url=URL, html=f"<p>{hour}</p>"), fetched_at=_at(hour))
+    cache.put(Page(url="https://example.com/other", html="<p>other</p>"), fetched_at=_at(4))
+
+    fetcher, urls = prepare_replay(str(tmp_path), urls=[URL], history=True, since=_at(2))
+
+    async def replay():
+        return [await fetcher.fetch(url, FetchConfig()) for url in urls]
+
+    pages = asyncio.run(replay())
+    assert urls == [URL, URL]
+    assert [page.html for page in pages] == ["<p>2</p>", "<p>3</p>"]
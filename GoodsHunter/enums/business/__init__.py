@@ -2,6 +2,6 @@
 from .category import Category
 from .status import ItemStatus
 from .change_type import ChangeType
-from .crawler_status import CrawlerLogStatus
+from .crawler_status import CrawlerLogStatus, CrawlRunStatus
 
-__all__ = ['Category', 'ItemStatus', 'ChangeType', 'CrawlerLogStatus']
+__all__ = ['Category', 'ItemStatus', 'ChangeType', 'CrawlerLogStatus', 'CrawlRunStatus']
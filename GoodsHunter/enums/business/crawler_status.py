@@ -27,3 +27,30 @@ class CrawlerLogStatus(str, Enum):
     def get_default(cls) -> str:
         """获取默认状态"""
         return cls.SUCCESS.value
+
+
+class CrawlRunStatus(str, Enum):
+    """抓取运行状态枚举
+    
+    用于标识 crawl_run 表中一次抓取运行的状态。
+    """
+    RUNNING = "running"    # 运行中
+    FINISHED = "finished"  # 正常结束
+    FAILED = "failed"      # 异常结束
+    
+    @classmethod
+    def all_values(cls) -> List[str]:
+        """获取所有枚举值列表"""
+        return [item.value for item in cls]
+    
+    @classmethod
+    def is_valid(cls, value: Optional[str]) -> bool:
+        """检查值是否为有效的运行状态"""
+        if value is None:
+            return False
+        return value in cls.all_values()
+    
+    @classmethod
+    def get_default(cls) -> str:
+        """获取默认状态"""
+        return cls.RUNNING.value
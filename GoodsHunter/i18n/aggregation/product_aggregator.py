@@ -9,6 +9,16 @@ try:
 except ImportError:
     psycopg2 = None
 
+try:
+    from storage.phash_index import PHashIndex
+except ImportError:
+    PHashIndex = None
+
+try:
+    from storage.db_pool import get_pool
+except ImportError:
+    get_pool = None
+
 from ..translation.normalizer import Normalizer
 from .matcher import ProductMatcher
 
@@ -26,11 +36,14 @@ class ProductAggregator:
         self.database_url = database_url or os.getenv("DATABASE_URL")
         if not self.database_url:
             raise ValueError("数据库连接URL未设置（请设置 DATABASE_URL 环境变量）")
+        self._phash_index = None
     
     def _get_db_connection(self):
-        """获取数据库连接"""
+        """获取数据库连接（优先从共享连接池获取，conn.close() 即归还）"""
         if psycopg2 is None:
             raise ImportError("psycopg2 未安装，请运行: pip install psycopg2-binary")
+        if get_pool is not None:
+            return get_pool(self.database_url).getconn()
         return psycopg2.connect(self.database_url)
     
     def find_or_create_product(
@@ -291,3 +304,86 @@ class ProductAggregator:
             print(f"[ProductAggregator] 批量聚合失败: {e}")
             raise
 
+    def _get_phash_index(self, cursor) -> "PHashIndex":
+        """
+        获取已关联 product 的商品图片感知哈希索引（首次调用时加载）
+        
+        Args:
+            cursor: RealDictCursor
+            
+        Returns:
+            PHashIndex，值为 (product_id, crawler_item.id)
+        """
+        if self._phash_index is None:
+            cursor.execute(
+                """
+                SELECT id, product_id, image_phash
+                FROM crawler_item
+                WHERE product_id IS NOT NULL AND image_phash IS NOT NULL
+                """
+            )
+            self._phash_index = PHashIndex(
+                (row['image_phash'], (row['product_id'], row['id'])) for row in cursor.fetchall()
+            )
+            print(f"[ProductAggregator] 感知哈希索引已加载: {len(self._phash_index)} 个商品")
+        return self._phash_index
+    
+    def find_image_candidates(
+        self,
+        item_id: int,
+        max_distance: int = 6,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        根据图片感知哈希查找候选 product（近似重复图片往往是同一款商品）
+        
+        这是一个廉价的候选信号，不会直接修改 product_id，需要结合品牌/型号匹配确认
+        
+        Args:
+            item_id: crawler_item.id
+            max_distance: 最大汉明距离
+            limit: 最多返回的候选 product 数量
+            
+        Returns:
+            候选列表，按距离升序：
+            [{"product_id": ..., "distance": ..., "item_id": 命中的 crawler_item.id}, ...]
+        """
+        if PHashIndex is None:
+            print("[ProductAggregator] storage.phash_index 未导入，无法查找图片候选")
+            return []
+        
+        conn = self._get_db_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cursor.execute(
+                "SELECT image_phash FROM crawler_item WHERE id = %s",
+                (item_id,)
+            )
+            row = cursor.fetchone()
+            if not row or not row['image_phash']:
+                return []
+            
+            candidates = []
+            seen_products = set()
+            for distance, (product_id, matched_item_id) in self._get_phash_index(cursor).search(
+                row['image_phash'], max_distance
+            ):
+                if matched_item_id == item_id or product_id in seen_products:
+                    continue
+                seen_products.add(product_id)
+                candidates.append({
+                    "product_id": product_id,
+                    "distance": distance,
+                    "item_id": matched_item_id
+                })
+                if len(candidates) >= limit:
+                    break
+            return candidates
+            
+        except Exception as e:
+            print(f"[ProductAggregator] 查找图片候选失败 (item_id={item_id}): {e}")
+            return []
+        finally:
+            cursor.close()
+            conn.close()
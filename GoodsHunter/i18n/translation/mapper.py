@@ -12,6 +12,11 @@ try:
 except ImportError:
     psycopg2 = None
 
+try:
+    from storage.db_pool import get_pool
+except ImportError:
+    get_pool = None
+
 
 class TranslationMapper:
     """翻译映射器，负责将标准英文转换为目标语言"""
@@ -27,11 +32,13 @@ class TranslationMapper:
         self._translation_cache: Dict[str, Dict[str, str]] = {}
     
     def _get_db_connection(self):
-        """获取数据库连接"""
+        """获取数据库连接（优先从共享连接池获取，conn.close() 即归还）"""
         if psycopg2 is None:
             raise ImportError("psycopg2 未安装")
         if not self.database_url:
             raise ValueError("数据库连接URL未设置")
+        if get_pool is not None:
+            return get_pool(self.database_url).getconn()
         return psycopg2.connect(self.database_url)
     
     def translate_brand(
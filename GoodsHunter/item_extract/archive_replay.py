@@ -0,0 +1,62 @@
+"""归档回放：把 crawler_log 冷归档中的历史记录重新交给 item_extract 处理"""
+from typing import Dict, Iterable
+
+from .sync_processor import process_batch
+
+
+def replay_archive(
+    conn,
+    log_records: Iterable[Dict],
+    batch_size: int = 100,
+    batch_mode: bool = False
+) -> Dict:
+    """
+    回放归档记录（逐批调用 process_batch，每批提交一次）
+
+    不读取也不更新 last_log_id 游标：归档数据的 id 都小于当前游标，
+    回放用于在空库或重建的 crawler_item / item_change_history 上恢复历史。
+    价格事件的 event_key 由 source_uid + log_id 生成，重复回放不会写入重复的历史记录。
+
+    Args:
+        conn: 数据库连接对象
+        log_records: 归档记录迭代器（CrawlerLogArchiveReader.scan(status='success') 的结果）
+        batch_size: 每批处理的记录数
+        batch_mode: 使用集合操作的批量 upsert（见 sync_processor.process_batch）
+
+    Returns:
+        回放结果统计字典
+    """
+    totals = {
+        'total_processed': 0,
+        'total_success': 0,
+        'total_failed': 0,
+        'total_price_changed': 0,
+        'total_history_written': 0,
+        'errors': []
+    }
+
+    def flush(batch):
+        results = process_batch(conn, batch, batch_mode=batch_mode)
+        conn.commit()
+        totals['total_processed'] += results['total']
+        totals['total_success'] += results['success']
+        totals['total_failed'] += results['failed']
+        totals['total_price_changed'] += results['price_changed']
+        totals['total_history_written'] += results['history_written']
+        totals['errors'].extend(results['errors'])
+        print(
+            f"[archive_replay] 已回放 {totals['total_processed']} 条记录, "
+            f"成功={totals['total_success']}, 失败={totals['total_failed']}, "
+            f"价格变化={totals['total_price_changed']}"
+        )
+
+    batch = []
+    for record in log_records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    return totals
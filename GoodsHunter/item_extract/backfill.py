@@ -0,0 +1,682 @@
+"""全量回填：按 source_uid 哈希把 crawler_log 分块并行重建到 UNLOGGED 暂存表，再一次事务合并进 crawler_item / item_change_history
+
+用于规范化逻辑修复后重建商品和价格历史（代替重置游标后逐行重放）。
+合并前请停止 item_extract 同步循环；暂存阶段可以与同步并行。
+
+用法（在项目根目录）：
+    python -m item_extract.backfill --workers 8
+    python -m item_extract.backfill --start-dt 2025-06-01 --workers 8
+    python -m item_extract.backfill --resume
+    python -m item_extract.backfill --abort
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .utils import get_db_connection
+from .item_upserter import parse_log_record
+from .batch_upserter import ITEM_FIELDS, PRICE_HISTORY_FIELDS, group_by_source_uid, coalesce_group, change_row
+from .history_writer import ChangeType
+from .state_manager import CURSOR_KEY_LAST_LOG_ID, get_last_log_id, get_state, set_state
+from .exceptions import DatabaseError, ValidationError
+
+
+# 回填状态在 pipeline_state 中的键：区间和块数（JSON），每个块完成后写入 {STATE_KEY}:chunk:{i}/{N}
+STATE_KEY = "item_backfill"
+
+ITEM_STAGING_TABLE = "crawler_item_backfill"
+HISTORY_STAGING_TABLE = "item_change_history_backfill"
+
+_LOG_COLUMNS = (
+    "id", "category", "site", "item_id",
+    "brand_name", "model_name", "model_no",
+    "currency", "price",
+    "image_original_key", "image_thumb_300_key", "image_thumb_600_key", "image_sha256", "image_phash",
+    "source_uid", "raw_hash", "product_url", "crawl_time", "dt",
+)
+
+# 合并时不取重建结果、而与现有值比较的列：
+#   首次发现日期取较早者（起点之前的日志可能已归档）；
+#   最后发现时间取较晚者（DBWriter 精简模式的未变化发现不写 crawler_log，重建结果可能更早，回退会被 sold_sweeper 误判为已售）；
+#   版本号取较大者（重放不包含区间内的状态事件，如已售 / 恢复 active，这些事件保留在 item_change_history 中，版本号不能低于它们）
+_MERGE_KEEP = {
+    "first_seen_dt": "LEAST(ci.first_seen_dt, EXCLUDED.first_seen_dt)",
+    "last_seen_dt": "GREATEST(ci.last_seen_dt, EXCLUDED.last_seen_dt)",
+    "last_crawl_time": "GREATEST(ci.last_crawl_time, EXCLUDED.last_crawl_time)",
+    "version": "GREATEST(ci.version, EXCLUDED.version)",
+}
+
+# 合并时覆盖的列：_MERGE_KEEP 中的列按上面的规则，其余取重建结果
+_MERGE_SET = ",\n        ".join(
+    f"{field} = {_MERGE_KEEP.get(field, 'EXCLUDED.' + field)}"
+    for field in ITEM_FIELDS
+    if field not in ("source_uid", "site", "category", "item_id")
+)
+
+
+# 部分区间回填时每个商品在起点之前的状态：起点前最后一条日志（每个 crawler_item.source_uid 一条），
+# 加上 crawler_item 的首次发现日期 / image_phash、起点前最后一个历史事件的版本号、起点前最后一个价格事件。
+# 按 crawler_log.source_uid（COLLATE "C"，与 Python 字符串比较一致）排序，与块内日志归并
+_SEED_SQL = f"""
+    SELECT {', '.join('l.' + column for column in _LOG_COLUMNS)},
+           ci.first_seen_dt, ci.image_phash, hv.item_version,
+           hp.change_time, hp.dt, hp.new_value
+    FROM (
+        SELECT DISTINCT ON (source_uid, category) {', '.join(_LOG_COLUMNS)}
+        FROM crawler_log
+        WHERE id < %(start_id)s
+          AND status = 'success'
+          AND mod(abs(hashtext(source_uid)::bigint), %(chunks)s) = %(chunk)s
+        ORDER BY source_uid, category, id DESC
+    ) l
+    LEFT JOIN crawler_item ci
+      ON ci.source_uid = btrim(l.site) || ':' || btrim(l.category) || ':' || btrim(l.item_id)
+    LEFT JOIN LATERAL (
+        SELECT h.item_version
+        FROM item_change_history h
+        WHERE h.source_uid = ci.source_uid AND h.log_id < %(start_id)s
+        ORDER BY h.log_id DESC, h.item_version DESC
+        LIMIT 1
+    ) hv ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT h.change_time, h.dt, h.new_value
+        FROM item_change_history h
+        WHERE h.source_uid = ci.source_uid AND h.change_type = %(price)s AND h.log_id < %(start_id)s
+        ORDER BY h.log_id DESC
+        LIMIT 1
+    ) hp ON TRUE
+    ORDER BY l.source_uid COLLATE "C"
+"""
+
+
+def seed_state(
+    last_log: Dict,
+    first_seen_dt: Optional[date] = None,
+    image_phash: Optional[str] = None,
+    version: Optional[int] = None,
+    price_event: Optional[Tuple] = None
+) -> Dict:
+    """
+    商品在回填起点之前的状态（部分区间回填时作为 coalesce_group 的初始状态）
+
+    以起点前最后一条日志为基础（最后发现时间、last_log_id、last_raw_hash、product_url 等）；
+    版本号取起点前最后一个历史事件，价格和最后变价时间取起点前最后一个价格事件
+    （没有价格事件时价格未变过，取最后一条日志的价格）
+
+    Args:
+        last_log: 起点前最后一条 crawler_log 记录
+        first_seen_dt: crawler_item.first_seen_dt
+        image_phash: crawler_item.image_phash（首次出现的非空值）
+        version: 起点前最后一个历史事件的 item_version，None 表示没有事件（版本 1）
+        price_event: 起点前最后一个价格事件 (change_time, dt, new_value)
+
+    Returns:
+        状态行（ITEM_FIELDS 各列）
+    """
+    state, _ = coalesce_group(None, [parse_log_record(last_log)])
+    if first_seen_dt is not None:
+        state['first_seen_dt'] = first_seen_dt
+    if image_phash is not None:
+        state['image_phash'] = image_phash
+    if version is not None:
+        state['version'] = version
+    if price_event is not None:
+        changed_at, changed_dt, new_value = price_event
+        state['price'] = int(new_value) if new_value is not None else None
+        state['price_last_changed_at'] = changed_at
+        state['price_last_changed_dt'] = changed_dt
+    return state
+
+
+def _read_seeds(reader, chunk: int, chunks: int, start_id: int, itersize: int) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    流式读取一个块中各商品在起点之前的状态（见 _SEED_SQL / seed_state）
+
+    Args:
+        reader: 读连接
+        chunk: 块序号
+        chunks: 块数
+        start_id: 起始 log_id
+        itersize: 服务端游标每次取回的行数
+
+    Yields:
+        (crawler_log.source_uid, crawler_item.source_uid, 状态行)，按 crawler_log.source_uid 升序
+    """
+    cursor = reader.cursor(name=f"item_backfill_seed_{chunk}")
+    cursor.itersize = itersize
+    cursor.execute(
+        _SEED_SQL,
+        {'start_id': start_id, 'chunks': chunks, 'chunk': chunk, 'price': ChangeType.PRICE.value}
+    )
+    try:
+        for row in cursor:
+            last_log = dict(zip(_LOG_COLUMNS, row))
+            first_seen_dt, image_phash, version, changed_at, changed_dt, new_value = row[len(_LOG_COLUMNS):]
+            try:
+                state = seed_state(
+                    last_log, first_seen_dt, image_phash, version,
+                    (changed_at, changed_dt, new_value) if changed_at is not None else None
+                )
+            except ValueError:
+                continue
+            yield last_log['source_uid'], state['source_uid'], state
+    finally:
+        cursor.close()
+
+
+def chunk_state_key(chunk: int, chunks: int) -> str:
+    """块完成状态在 pipeline_state 中的键名"""
+    return f"{STATE_KEY}:chunk:{chunk}/{chunks}"
+
+
+def _copy_value(value) -> str:
+    """COPY text 格式的单个字段（NULL 为 \\N，转义反斜杠和控制字符）"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(cursor, table: str, columns: List[str], rows: List[tuple]) -> None:
+    """用 COPY FROM STDIN 写入一批行"""
+    if not rows:
+        return
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def create_staging_tables(conn) -> None:
+    """
+    创建暂存表（UNLOGGED，列类型与正式表一致，另有 chunk 列）
+
+    Args:
+        conn: 数据库连接对象
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            CREATE UNLOGGED TABLE IF NOT EXISTS {ITEM_STAGING_TABLE} AS
+            SELECT 0::integer AS chunk, {', '.join(ITEM_FIELDS)}
+            FROM crawler_item WITH NO DATA
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE UNLOGGED TABLE IF NOT EXISTS {HISTORY_STAGING_TABLE} AS
+            SELECT 0::integer AS chunk, {', '.join(PRICE_HISTORY_FIELDS)}
+            FROM item_change_history WITH NO DATA
+            """
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"创建回填暂存表失败: {e}")
+    finally:
+        cursor.close()
+
+
+def get_backfill_state(conn) -> Optional[Dict]:
+    """
+    读取进行中的回填（区间和块数），没有时返回 None
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        {start_id, end_id, chunks, started_at}
+    """
+    value = get_state(conn, STATE_KEY)
+    return json.loads(value) if value else None
+
+
+def get_done_chunks(conn, chunks: int) -> Dict[int, Dict]:
+    """
+    读取已完成的块
+
+    Args:
+        conn: 数据库连接对象
+        chunks: 块数
+
+    Returns:
+        {chunk: 块统计}
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT key, value FROM pipeline_state WHERE key LIKE %s",
+            (f"{STATE_KEY}:chunk:%/{chunks}",)
+        )
+        return {
+            int(key.rsplit(":", 1)[1].split("/")[0]): json.loads(value)
+            for key, value in cursor.fetchall()
+        }
+    finally:
+        cursor.close()
+
+
+def resolve_start_id(conn, start_dt: date) -> int:
+    """
+    把起始日期换算为起始 log_id（dt >= start_dt 的最小 id）
+
+    Args:
+        conn: 数据库连接对象
+        start_dt: 起始日期
+
+    Returns:
+        起始 log_id
+
+    Raises:
+        ValidationError: 该日期之后没有日志
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(id) FROM crawler_log WHERE dt >= %s", (start_dt,))
+        start_id = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if start_id is None:
+        raise ValidationError(f"{start_dt} 之后没有 crawler_log 记录")
+    return start_id
+
+
+def backfill_chunk(
+    database_url: Optional[str],
+    chunk: int,
+    chunks: int,
+    start_id: int,
+    end_id: int,
+    flush_rows: int = 5000
+) -> Dict:
+    """
+    重建一个块（在子进程中运行）：按 source_uid、id 顺序流式读取该块的日志，
+    每个商品依次应用（coalesce_group，与同步路径的规则相同），结果 COPY 进暂存表。
+    全量回填（start_id 为 0）从空状态开始；部分区间回填从该商品在起点之前的状态开始（seed_state），
+    版本号、价格和最后变价时间接续起点之前的值，起点处的第一次变价照常产生事件
+
+    读连接使用服务端游标，写连接每 flush_rows 个商品提交一次；块完成标记与最后一批同一事务提交，
+    中断后重跑会先清空该块已写入的暂存行
+
+    Args:
+        database_url: 数据库连接URL
+        chunk: 块序号
+        chunks: 块数
+        start_id: 起始 log_id（含）
+        end_id: 结束 log_id（含）
+        flush_rows: 每次 COPY 的商品数
+
+    Returns:
+        块统计：chunk / logs / items / events / failed / seconds
+    """
+    started = time.perf_counter()
+    stats = {'chunk': chunk, 'logs': 0, 'items': 0, 'events': 0, 'failed': 0}
+    item_columns = ['chunk', *ITEM_FIELDS]
+    history_columns = ['chunk', *PRICE_HISTORY_FIELDS]
+
+    reader = get_db_connection(database_url)
+    writer = get_db_connection(database_url)
+    write_cursor = writer.cursor()
+    item_rows: List[tuple] = []
+    history_rows: List[tuple] = []
+
+    def apply_group(log_records: List[Dict], seeds: Dict[str, Dict]) -> None:
+        items = []
+        for log_record in log_records:
+            try:
+                items.append(parse_log_record(log_record))
+            except Exception:
+                stats['failed'] += 1
+        for source_uid, group in group_by_source_uid(items).items():
+            state, events = coalesce_group(seeds.get(source_uid), group)
+            item_rows.append((chunk, *(state[field] for field in ITEM_FIELDS)))
+            history_rows.extend((chunk, *change_row(event)) for event in events)
+            stats['items'] += 1
+            stats['events'] += len(events)
+
+    def flush() -> None:
+        _copy_rows(write_cursor, ITEM_STAGING_TABLE, item_columns, item_rows)
+        _copy_rows(write_cursor, HISTORY_STAGING_TABLE, history_columns, history_rows)
+        item_rows.clear()
+        history_rows.clear()
+
+    try:
+        write_cursor.execute(f"DELETE FROM {ITEM_STAGING_TABLE} WHERE chunk = %s", (chunk,))
+        write_cursor.execute(f"DELETE FROM {HISTORY_STAGING_TABLE} WHERE chunk = %s", (chunk,))
+        writer.commit()
+
+        # 部分区间：起点之前的状态与块内日志按 crawler_log.source_uid 归并
+        seed_rows = _read_seeds(reader, chunk, chunks, start_id, flush_rows) if start_id > 0 else iter(())
+        pending_seed = next(seed_rows, None)
+
+        def seeds_for(log_source_uid: str) -> Dict[str, Dict]:
+            nonlocal pending_seed
+            seeds = {}
+            while pending_seed is not None and pending_seed[0] <= log_source_uid:
+                if pending_seed[0] == log_source_uid:
+                    seeds[pending_seed[1]] = pending_seed[2]
+                pending_seed = next(seed_rows, None)
+            return seeds
+
+        # 同一 crawler_log.source_uid 的日志连续读出，只需缓冲一个商品的记录
+        read_cursor = reader.cursor(name=f"item_backfill_{chunk}")
+        read_cursor.itersize = flush_rows
+        read_cursor.execute(
+            f"""
+            SELECT {', '.join(_LOG_COLUMNS)}
+            FROM crawler_log
+            WHERE id BETWEEN %s AND %s
+              AND status = 'success'
+              AND mod(abs(hashtext(source_uid)::bigint), %s) = %s
+            ORDER BY source_uid COLLATE "C", id
+            """,
+            (start_id, end_id, chunks, chunk)
+        )
+        group: List[Dict] = []
+        for row in read_cursor:
+            record = dict(zip(_LOG_COLUMNS, row))
+            if group and record['source_uid'] != group[0]['source_uid']:
+                apply_group(group, seeds_for(group[0]['source_uid']))
+                group = []
+                if len(item_rows) >= flush_rows:
+                    flush()
+                    writer.commit()
+                    print(
+                        f"[backfill] 块 {chunk}/{chunks}: 日志 {stats['logs']}，商品 {stats['items']}，"
+                        f"价格事件 {stats['events']}"
+                    )
+            group.append(record)
+            stats['logs'] += 1
+        if group:
+            apply_group(group, seeds_for(group[0]['source_uid']))
+        read_cursor.close()
+        if start_id > 0:
+            seed_rows.close()
+        reader.rollback()
+
+        flush()
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        write_cursor.execute(
+            """
+            INSERT INTO pipeline_state (key, value, updated_at)
+            VALUES (%s, %s, now())
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+            """,
+            (chunk_state_key(chunk, chunks), json.dumps(stats))
+        )
+        writer.commit()
+        return stats
+    except Exception as e:
+        writer.rollback()
+        raise DatabaseError(f"回填块 {chunk}/{chunks} 失败: {e}")
+    finally:
+        write_cursor.close()
+        writer.close()
+        reader.close()
+
+
+def merge_backfill(conn, state: Dict) -> Dict:
+    """
+    把暂存表一次事务合并进正式表，并把同步游标设为回填终点
+
+    - crawler_item：重建结果覆盖商品字段（status / sold_* / product_id 不变；first_seen_dt 取较早者，
+      last_seen_dt / last_crawl_time 和 version 取较大者，见 _MERGE_KEEP）
+    - item_change_history：删除这些商品 log_id >= 起点的价格事件，写入重建的事件
+    - items_sync_last_log_id 设为终点、清除分片游标：终点之后的日志由同步循环在重建结果上重新应用
+
+    Args:
+        conn: 数据库连接对象
+        state: get_backfill_state 的结果
+
+    Returns:
+        合并统计：items / history_deleted / history_written
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            INSERT INTO crawler_item AS ci ({', '.join(ITEM_FIELDS)}, status)
+            SELECT {', '.join(ITEM_FIELDS)}, 'active'
+            FROM {ITEM_STAGING_TABLE}
+            ORDER BY source_uid
+            ON CONFLICT (source_uid) DO UPDATE SET
+                {_MERGE_SET},
+                updated_at = now()
+            """
+        )
+        items = cursor.rowcount
+        cursor.execute(
+            f"""
+            DELETE FROM item_change_history h
+            USING {ITEM_STAGING_TABLE} b
+            WHERE h.source_uid = b.source_uid
+              AND h.change_type = %s
+              AND h.log_id >= %s
+            """,
+            (ChangeType.PRICE.value, state['start_id'])
+        )
+        history_deleted = cursor.rowcount
+        cursor.execute(
+            f"""
+            INSERT INTO item_change_history ({', '.join(PRICE_HISTORY_FIELDS)})
+            SELECT {', '.join(PRICE_HISTORY_FIELDS)}
+            FROM {HISTORY_STAGING_TABLE}
+            ORDER BY log_id
+            ON CONFLICT (event_key) DO NOTHING
+            """
+        )
+        history_written = cursor.rowcount
+        # 显式把游标设为终点（终点之后的日志在重建结果上重新应用）
+        cursor.execute(
+            """
+            INSERT INTO pipeline_state (key, value, updated_at)
+            VALUES (%s, %s, now())
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+            """,
+            (CURSOR_KEY_LAST_LOG_ID, str(state['end_id']))
+        )
+        cursor.execute(
+            "DELETE FROM pipeline_state WHERE key LIKE %s OR key LIKE %s OR key = %s",
+            (f"{CURSOR_KEY_LAST_LOG_ID}:shard:%", f"{STATE_KEY}:chunk:%", STATE_KEY)
+        )
+        cursor.execute(f"DROP TABLE {ITEM_STAGING_TABLE}, {HISTORY_STAGING_TABLE}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"合并回填结果失败: {e}")
+    finally:
+        cursor.close()
+
+    return {'items': items, 'history_deleted': history_deleted, 'history_written': history_written}
+
+
+def abort_backfill(conn) -> None:
+    """
+    放弃进行中的回填：删除暂存表和状态
+
+    Args:
+        conn: 数据库连接对象
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {ITEM_STAGING_TABLE}, {HISTORY_STAGING_TABLE}")
+        cursor.execute(
+            "DELETE FROM pipeline_state WHERE key LIKE %s OR key = %s",
+            (f"{STATE_KEY}:chunk:%", STATE_KEY)
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"放弃回填失败: {e}")
+    finally:
+        cursor.close()
+
+
+def run_backfill(
+    database_url: Optional[str] = None,
+    workers: int = 4,
+    chunks: Optional[int] = None,
+    start_id: int = 0,
+    end_id: Optional[int] = None,
+    resume: bool = False,
+    flush_rows: int = 5000
+) -> Dict:
+    """
+    执行回填：记录区间 -> 并行重建各块到暂存表 -> 全部完成后合并
+
+    块按 mod(abs(hashtext(crawler_log.source_uid)), chunks) 划分，同一商品的日志只在一个块中，
+    块之间互不依赖；块数多于进程数时进度更细，中断后只需重跑未完成的块（--resume）
+
+    Args:
+        database_url: 数据库连接URL
+        workers: 进程数
+        chunks: 块数，默认 workers * 4（续跑时使用记录的块数）
+        start_id: 起始 log_id（含），起点之前的日志不参与重建
+        end_id: 结束 log_id（含），默认当前同步游标（游标为空时为 MAX(crawler_log.id)）
+        resume: 继续进行中的回填
+        flush_rows: 每次 COPY 的商品数
+
+    Returns:
+        结果字典：state / chunks（各块统计）/ merged（合并统计）
+    """
+    if workers < 1:
+        raise ValueError(f"workers 必须大于 0: {workers}")
+
+    conn = get_db_connection(database_url)
+    try:
+        state = get_backfill_state(conn)
+        if state and not resume:
+            raise ValidationError(
+                f"存在进行中的回填（log_id {state['start_id']} ~ {state['end_id']}），使用 --resume 继续或 --abort 放弃"
+            )
+        if not state:
+            if resume:
+                raise ValidationError("没有进行中的回填")
+            if end_id is None:
+                end_id = get_last_log_id(conn)
+                if not end_id:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM crawler_log")
+                    end_id = cursor.fetchone()[0]
+                    cursor.close()
+            state = {
+                'start_id': start_id,
+                'end_id': end_id,
+                'chunks': chunks or workers * 4,
+                'started_at': datetime.now().isoformat(),
+            }
+            set_state(conn, STATE_KEY, json.dumps(state))
+        create_staging_tables(conn)
+        done = get_done_chunks(conn, state['chunks'])
+    finally:
+        conn.close()
+
+    pending = [chunk for chunk in range(state['chunks']) if chunk not in done]
+    print(
+        f"[backfill] log_id {state['start_id']} ~ {state['end_id']}，{state['chunks']} 块，"
+        f"已完成 {len(done)}，待处理 {len(pending)}，workers={workers}"
+    )
+
+    failures = []
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                backfill_chunk, database_url, chunk, state['chunks'],
+                state['start_id'], state['end_id'], flush_rows
+            ): chunk
+            for chunk in pending
+        }
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                done[chunk] = future.result()
+                print(
+                    f"[backfill] 块 {chunk}/{state['chunks']} 完成（{len(done)}/{state['chunks']}，"
+                    f"{time.perf_counter() - started:.0f}s）: 日志 {done[chunk]['logs']}，"
+                    f"商品 {done[chunk]['items']}，价格事件 {done[chunk]['events']}"
+                )
+            except Exception as e:
+                failures.append(f"块 {chunk}: {e}")
+                print(f"[backfill] 块 {chunk}/{state['chunks']} 失败: {e}")
+
+    if failures:
+        raise DatabaseError(f"回填未完成（使用 --resume 重跑失败的块）: {'; '.join(failures)}")
+
+    conn = get_db_connection(database_url)
+    try:
+        merged = merge_backfill(conn, state)
+    finally:
+        conn.close()
+    print(
+        f"[backfill] 合并完成: 商品 {merged['items']}，删除价格事件 {merged['history_deleted']}，"
+        f"写入价格事件 {merged['history_written']}，last_log_id -> {state['end_id']}"
+    )
+    return {'state': state, 'chunks': [done[chunk] for chunk in sorted(done)], 'merged': merged}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 crawler_log 并行重建 crawler_item 和价格历史")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--start-id", type=int, default=None, help="起始 log_id（含，默认 0 即全量重建）")
+    start.add_argument("--start-dt", type=date.fromisoformat, default=None, help="起始日期 YYYY-MM-DD（换算为起始 log_id）")
+    parser.add_argument("--end-id", type=int, default=None, help="结束 log_id（含，默认当前同步游标）")
+    parser.add_argument("--workers", type=int, default=4, help="并行进程数（默认: 4）")
+    parser.add_argument("--chunks", type=int, default=None, help="块数（默认 workers * 4）")
+    parser.add_argument("--flush-rows", type=int, default=5000, help="每次 COPY 的商品数（默认: 5000）")
+    parser.add_argument("--resume", action="store_true", help="继续进行中的回填（只重跑未完成的块）")
+    parser.add_argument("--abort", action="store_true", help="放弃进行中的回填，删除暂存表")
+    parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+    args = parser.parse_args()
+
+    if args.abort:
+        conn = get_db_connection(args.database_url)
+        try:
+            abort_backfill(conn)
+        finally:
+            conn.close()
+        print("[backfill] 已放弃进行中的回填")
+        return
+
+    try:
+        start_id = args.start_id or 0
+        if args.start_dt is not None:
+            conn = get_db_connection(args.database_url)
+            try:
+                start_id = resolve_start_id(conn, args.start_dt)
+            finally:
+                conn.close()
+
+        run_backfill(
+            database_url=args.database_url,
+            workers=args.workers,
+            chunks=args.chunks,
+            start_id=start_id,
+            end_id=args.end_id,
+            resume=args.resume,
+            flush_rows=args.flush_rows
+        )
+    except (ValueError, ValidationError) as e:
+        parser.error(str(e))
+    except DatabaseError as e:
+        print(f"[backfill] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
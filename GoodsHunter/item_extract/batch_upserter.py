@@ -0,0 +1,517 @@
+"""批量 Upsert：一批 crawler_log 记录用集合操作写入 crawler_item 和 item_change_history"""
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from psycopg2.extras import execute_values
+except ImportError:
+    execute_values = None
+
+from .item_upserter import parse_log_record
+from .change_detector import should_record_price_change
+from .event_key_generator import generate_price_event_key, generate_status_event_key
+from .history_writer import ChangeType, ItemStatus, REACTIVATED_REASON
+from .price_daily import record_price_daily
+from .metrics import stage_timer, error_class
+from .exceptions import DatabaseError
+
+
+# 合并后每个 source_uid 一行，列顺序与 ITEM_FIELDS 一致；可能整列为 NULL 的非文本列显式转换类型
+ITEM_FIELDS = (
+    'source_uid', 'site', 'category', 'item_id',
+    'brand_name', 'model_name', 'model_no',
+    'currency', 'price',
+    'image_sha256', 'image_phash', 'image_original_key', 'image_thumb_300_key', 'image_thumb_600_key',
+    'product_url', 'first_seen_dt', 'last_seen_dt',
+    'last_crawl_time', 'last_log_id', 'last_raw_hash',
+    'price_last_changed_at', 'price_last_changed_dt', 'version',
+)
+
+# 同步路径读写的列：ITEM_FIELDS 加上状态（再次出现的已售 / 下架商品恢复为 active）
+ROW_FIELDS = ITEM_FIELDS + ('status',)
+
+_ITEM_TEMPLATE = (
+    "(%s, %s, %s, %s, %s, %s, %s, %s, %s::integer, "
+    "%s, %s, %s, %s, %s, %s, %s::date, %s::date, "
+    "%s::timestamptz, %s::bigint, %s, %s::timestamptz, %s::date, %s::integer, %s)"
+)
+
+# 已存在的行在 _lock_items 中已锁定，合并结果即最终状态；只更新逐行路径会更新的列
+_UPSERT_SQL = f"""
+    INSERT INTO crawler_item AS ci (
+        {', '.join(ROW_FIELDS)}
+    )
+    SELECT v.*
+    FROM (VALUES %s) AS v ({', '.join(ROW_FIELDS)})
+    ORDER BY v.source_uid
+    ON CONFLICT (source_uid) DO UPDATE SET
+        last_seen_dt = EXCLUDED.last_seen_dt,
+        last_crawl_time = EXCLUDED.last_crawl_time,
+        last_log_id = EXCLUDED.last_log_id,
+        product_url = EXCLUDED.product_url,
+        image_phash = EXCLUDED.image_phash,
+        last_raw_hash = EXCLUDED.last_raw_hash,
+        price = EXCLUDED.price,
+        price_last_changed_at = EXCLUDED.price_last_changed_at,
+        price_last_changed_dt = EXCLUDED.price_last_changed_dt,
+        version = EXCLUDED.version,
+        status = EXCLUDED.status,
+        sold_dt = CASE WHEN ci.status = EXCLUDED.status THEN ci.sold_dt END,
+        sold_reason = CASE WHEN ci.status = EXCLUDED.status THEN ci.sold_reason END,
+        updated_at = CASE
+            WHEN ci.price IS DISTINCT FROM EXCLUDED.price
+              OR ci.product_url IS DISTINCT FROM EXCLUDED.product_url
+              OR ci.image_phash IS DISTINCT FROM EXCLUDED.image_phash
+              OR ci.status IS DISTINCT FROM EXCLUDED.status
+            THEN now() ELSE ci.updated_at
+        END
+    RETURNING ci.source_uid, (ci.xmax = 0) AS inserted
+"""
+
+# 内容未变化的 active 商品只在跨天时刷新最后发现时间；在行上重新检查 raw_hash 和状态，不更新 updated_at
+_BUMP_SQL = """
+    UPDATE crawler_item AS ci
+    SET
+        last_seen_dt = v.dt,
+        last_crawl_time = GREATEST(ci.last_crawl_time, v.crawl_time),
+        last_log_id = GREATEST(ci.last_log_id, v.log_id)
+    FROM (VALUES %s) AS v (source_uid, raw_hash, dt, crawl_time, log_id)
+    WHERE ci.source_uid = v.source_uid
+      AND ci.last_raw_hash = v.raw_hash
+      AND ci.status = 'active'
+      AND ci.last_seen_dt < v.dt
+"""
+
+
+def group_by_source_uid(items: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    按 source_uid 分组，组内按 log_id 升序（log_id 相同或缺失时保持原顺序）
+
+    Args:
+        items: parse_log_record 的结果列表
+
+    Returns:
+        {source_uid: [item, ...]}
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for item in items:
+        groups.setdefault(item['source_uid'], []).append(item)
+    for group in groups.values():
+        group.sort(key=lambda item: (item['log_id'] is None, item['log_id'] or 0))
+    return groups
+
+
+def coalesce_group(current: Optional[Dict], group: List[Dict]) -> Tuple[Dict, List[Dict]]:
+    """
+    在内存中按 log_id 顺序把同一商品的多条记录依次应用到当前状态
+
+    每一步与逐行路径相同：不存在则以该条记录插入；存在则更新最后发现时间、product_url，
+    image_phash 保留已有值，last_raw_hash 取新值（为空时保留旧值），
+    旧价格非空且与新价格不同（IS DISTINCT FROM）时更新价格、version + 1 并产生一个价格事件。
+    已售 / 下架（status 不是 active）的商品再次出现时先恢复为 active、version + 1 并产生一个状态事件。
+    log_id 不大于当前 last_log_id 的记录已经应用过（DBWriter inline 模式写入后同步循环再次读到），
+    直接跳过，last_log_id 只增不减
+
+    Args:
+        current: crawler_item 中已锁定的当前行（ROW_FIELDS 各列，不存在为 None；没有 status 视为 active）
+        group: 同一 source_uid 的记录（按 log_id 升序）
+
+    Returns:
+        (最终状态行, 变更事件列表)；事件按 change_type 区分：价格事件包含 old_price / price，
+        状态事件包含 old_status / status，另有 version / currency / log_id / crawl_time / dt（见 change_row）
+    """
+    state = dict(current) if current is not None else None
+    if state is not None:
+        state.setdefault('status', ItemStatus.ACTIVE.value)
+    events = []
+    for item in group:
+        if state is None:
+            state = {field: item.get(field) for field in ITEM_FIELDS}
+            state.update({
+                'first_seen_dt': item['dt'],
+                'last_seen_dt': item['dt'],
+                'last_crawl_time': item['crawl_time'],
+                'last_log_id': item['log_id'],
+                'last_raw_hash': item['raw_hash'],
+                'price_last_changed_at': None,
+                'price_last_changed_dt': None,
+                'version': 1,
+                'status': ItemStatus.ACTIVE.value,
+            })
+            continue
+
+        if (
+            item['log_id'] is not None and state['last_log_id'] is not None
+            and item['log_id'] <= state['last_log_id']
+        ):
+            continue
+
+        state['last_seen_dt'] = item['dt']
+        state['last_crawl_time'] = item['crawl_time']
+        state['last_log_id'] = item['log_id']
+        state['product_url'] = item['product_url']
+        if state['image_phash'] is None:
+            state['image_phash'] = item['image_phash']
+        if item['raw_hash'] is not None:
+            state['last_raw_hash'] = item['raw_hash']
+
+        if state['status'] != ItemStatus.ACTIVE.value:
+            state['version'] += 1
+            events.append({
+                'change_type': ChangeType.STATUS.value,
+                'source_uid': item['source_uid'],
+                'old_status': state['status'],
+                'status': ItemStatus.ACTIVE.value,
+                'version': state['version'],
+                'currency': None,
+                'log_id': item['log_id'],
+                'crawl_time': item['crawl_time'],
+                'dt': item['dt'],
+            })
+            state['status'] = ItemStatus.ACTIVE.value
+
+        if should_record_price_change(state['price'], item['price']):
+            state['version'] += 1
+            events.append({
+                'change_type': ChangeType.PRICE.value,
+                'source_uid': item['source_uid'],
+                'old_price': state['price'],
+                'price': item['price'],
+                'version': state['version'],
+                'currency': item['currency'],
+                'log_id': item['log_id'],
+                'crawl_time': item['crawl_time'],
+                'dt': item['dt'],
+            })
+            state['price'] = item['price']
+            state['price_last_changed_at'] = item['crawl_time']
+            state['price_last_changed_dt'] = item['dt']
+    return state, events
+
+
+def _unchanged_sighting(current: Optional[Dict], group: List[Dict]) -> Optional[Tuple]:
+    """
+    判断一组记录是否都只是内容未变化的重复发现（active 商品，raw_hash 和价格与当前行相同）
+
+    已经应用过的记录（log_id 不大于 last_log_id）不参与判断
+
+    Args:
+        current: crawler_item 中的当前行（不存在为 None）
+        group: 同一 source_uid 的记录（按 log_id 升序）
+
+    Returns:
+        (source_uid, raw_hash, dt, crawl_time, log_id)，供 _BUMP_SQL 使用；有变化或商品不存在时返回 None
+    """
+    if current is None or current['last_raw_hash'] is None or current['status'] != ItemStatus.ACTIVE.value:
+        return None
+    pending = [
+        item for item in group
+        if item['log_id'] is None or current['last_log_id'] is None or item['log_id'] > current['last_log_id']
+    ]
+    for item in pending:
+        if item['raw_hash'] != current['last_raw_hash'] or item['price'] != current['price']:
+            return None
+    if not pending:
+        return (current['source_uid'], current['last_raw_hash'], current['last_seen_dt'],
+                current['last_crawl_time'], current['last_log_id'])
+    log_ids = [item['log_id'] for item in pending if item['log_id'] is not None]
+    return (
+        current['source_uid'], current['last_raw_hash'],
+        max(item['dt'] for item in pending),
+        max(item['crawl_time'] for item in pending),
+        max(log_ids) if log_ids else current['last_log_id'],
+    )
+
+
+def _read_items(cursor, source_uids: List[str]) -> Dict[str, Dict]:
+    """
+    不加锁读取已存在行的当前状态（用于跳过内容未变化的商品）
+
+    Args:
+        cursor: 数据库游标
+        source_uids: 本批涉及的 source_uid
+
+    Returns:
+        {source_uid: 行字典（ROW_FIELDS 各列）}
+    """
+    cursor.execute(
+        f"""
+        SELECT {', '.join(ROW_FIELDS)}
+        FROM crawler_item
+        WHERE source_uid = ANY(%s)
+        """,
+        (list(source_uids),)
+    )
+    return {row[0]: dict(zip(ROW_FIELDS, row)) for row in cursor.fetchall()}
+
+
+def _bump_unchanged(cursor, sightings: List[Tuple]) -> None:
+    """
+    内容未变化的商品：一条 UPDATE ... FROM (VALUES ...) 按天刷新最后发现时间（不加锁、不更新 updated_at）
+
+    Args:
+        cursor: 数据库游标
+        sightings: _unchanged_sighting 的结果列表
+    """
+    if not sightings:
+        return
+    execute_values(
+        cursor,
+        _BUMP_SQL,
+        sightings,
+        template="(%s, %s, %s::date, %s::timestamptz, %s::bigint)",
+        page_size=len(sightings)
+    )
+
+
+def _lock_items(cursor, source_uids: List[str]) -> Dict[str, Dict]:
+    """
+    按固定顺序锁定已存在的行（SELECT ... FOR UPDATE），返回当前状态
+
+    Args:
+        cursor: 数据库游标
+        source_uids: 本批涉及的 source_uid
+
+    Returns:
+        {source_uid: 行字典（ROW_FIELDS 各列）}
+    """
+    cursor.execute(
+        f"""
+        SELECT {', '.join(ROW_FIELDS)}
+        FROM crawler_item
+        WHERE source_uid = ANY(%s)
+        ORDER BY source_uid
+        FOR UPDATE
+        """,
+        (sorted(source_uids),)
+    )
+    return {row[0]: dict(zip(ROW_FIELDS, row)) for row in cursor.fetchall()}
+
+
+def _write_items(cursor, states: Dict[str, Dict], expected_new: set) -> None:
+    """
+    一条 INSERT ... ON CONFLICT DO UPDATE 写入所有商品的最终状态
+
+    Args:
+        cursor: 数据库游标
+        states: {source_uid: 最终状态行}
+        expected_new: 锁定时不存在、应当插入的 source_uid
+
+    Raises:
+        DatabaseError: 实际插入/更新与锁定时的判断不一致（并发插入了同一商品）
+    """
+    rows = execute_values(
+        cursor,
+        _UPSERT_SQL,
+        [tuple(state[field] for field in ROW_FIELDS) for state in states.values()],
+        template=_ITEM_TEMPLATE,
+        page_size=len(states),
+        fetch=True
+    )
+    inserted = {source_uid for source_uid, was_inserted in rows if was_inserted}
+    if inserted != expected_new:
+        raise DatabaseError("crawler_item 在锁定后被并发插入")
+
+
+# item_change_history 中变更事件的列，顺序与 price_change_row / status_change_row 一致
+PRICE_HISTORY_FIELDS = (
+    'dt', 'source_uid', 'change_time', 'change_type',
+    'old_value', 'new_value', 'currency',
+    'reason', 'log_id', 'item_version', 'event_key',
+)
+
+
+def price_change_row(change: Dict) -> Tuple:
+    """
+    把 coalesce_group 产生的价格事件转换为 item_change_history 行（列顺序见 PRICE_HISTORY_FIELDS）
+
+    Args:
+        change: 价格事件
+
+    Returns:
+        行元组
+    """
+    return (
+        change['dt'], change['source_uid'], change['crawl_time'], ChangeType.PRICE.value,
+        str(change['old_price']) if change['old_price'] is not None else None,
+        str(change['price']) if change['price'] is not None else None,
+        change['currency'], 'crawler_update', change['log_id'], change['version'],
+        generate_price_event_key(change['source_uid'], change['log_id'], change['price'])
+    )
+
+
+def status_change_row(change: Dict) -> Tuple:
+    """
+    把 coalesce_group 产生的状态事件（再次出现，恢复为 active）转换为 item_change_history 行
+
+    event_key 为 generate_status_event_key(source_uid, dt, 'active')，与逐行路径的 write_reactivation 相同
+
+    Args:
+        change: 状态事件
+
+    Returns:
+        行元组（列顺序见 PRICE_HISTORY_FIELDS）
+    """
+    return (
+        change['dt'], change['source_uid'], change['crawl_time'], ChangeType.STATUS.value,
+        change['old_status'], change['status'], None,
+        REACTIVATED_REASON, change['log_id'], change['version'],
+        generate_status_event_key(change['source_uid'], change['dt'], change['status'])
+    )
+
+
+def change_row(change: Dict) -> Tuple:
+    """
+    按 change_type 把 coalesce_group 产生的事件转换为 item_change_history 行
+
+    Args:
+        change: 价格或状态事件
+
+    Returns:
+        行元组（列顺序见 PRICE_HISTORY_FIELDS）
+    """
+    if change.get('change_type') == ChangeType.STATUS.value:
+        return status_change_row(change)
+    return price_change_row(change)
+
+
+def _write_changes(cursor, changes: List[Dict]) -> int:
+    """
+    批量写入价格 / 状态变化历史（ON CONFLICT (event_key) DO NOTHING）
+
+    Args:
+        cursor: 数据库游标
+        changes: coalesce_group 产生的事件列表
+
+    Returns:
+        实际写入的价格变化行数
+    """
+    if not changes:
+        return 0
+    rows = [change_row(change) for change in changes]
+    inserted = execute_values(
+        cursor,
+        f"""
+        INSERT INTO item_change_history ({', '.join(PRICE_HISTORY_FIELDS)})
+        VALUES %s
+        ON CONFLICT (event_key) DO NOTHING
+        RETURNING change_type
+        """,
+        rows,
+        template="(%s::date, %s, %s::timestamptz, %s, %s, %s, %s, %s, %s::bigint, %s::integer, %s)",
+        page_size=len(rows),
+        fetch=True
+    )
+    return sum(1 for (change_type,) in inserted if change_type == ChangeType.PRICE.value)
+
+
+def apply_log_records(conn, log_records: List[Dict]) -> Dict:
+    """
+    在调用方的事务中用集合操作处理一批日志记录（不提交、不回滚）
+
+    同一 source_uid 的多条记录在内存中按 log_id 顺序合并（coalesce_group），
+    每个商品只写一次最终状态：一次 SELECT ... FOR UPDATE、一条 INSERT ... ON CONFLICT DO UPDATE，
+    价格变化和恢复为 active 的状态变化历史用 execute_values 批量写入（event_key 与逐行路径相同），
+    每日价格聚合在同一事务中合并。
+    raw_hash 和价格都与当前行相同的 active 商品不加锁、不重写整行，只按天刷新最后发现时间（_bump_unchanged）。
+    字段缺失的记录不进入 SQL，按逐行路径的错误信息计入失败。
+    DBWriter 的 inline 模式在写入 crawler_log 的同一事务中调用。
+
+    Args:
+        conn: 数据库连接对象
+        log_records: 日志记录列表（含 id）
+
+    Returns:
+        处理结果统计字典（与 process_batch 相同，timings 为 upsert / history 阶段耗时）
+
+    Raises:
+        Exception: SQL 执行失败（由调用方回滚）
+    """
+    if execute_values is None:
+        raise ImportError("psycopg2 未安装。请运行: pip install psycopg2-binary")
+
+    results = {
+        'total': len(log_records),
+        'success': 0,
+        'failed': 0,
+        'price_changed': 0,
+        'history_written': 0,
+        'errors': [],
+        'timings': {}
+    }
+    timings = results['timings']
+
+    items = []
+    for log_record in log_records:
+        try:
+            items.append(parse_log_record(log_record))
+        except Exception as e:
+            results['failed'] += 1
+            results['errors'].append({
+                'log_id': log_record.get('id'),
+                'source_uid': log_record.get('source_uid', 'unknown'),
+                'error': str(DatabaseError(f"Upsert item 失败: {e}")),
+                'error_type': error_class(e)
+            })
+
+    if not items:
+        return results
+
+    groups = group_by_source_uid(items)
+    cursor = conn.cursor()
+    try:
+        with stage_timer(timings, 'upsert'):
+            snapshot = _read_items(cursor, list(groups))
+            sightings = []
+            changed = []
+            for source_uid, group in groups.items():
+                sighting = _unchanged_sighting(snapshot.get(source_uid), group)
+                if sighting is not None:
+                    sightings.append(sighting)
+                else:
+                    changed.append(source_uid)
+            _bump_unchanged(cursor, sightings)
+
+            changes = []
+            if changed:
+                current = _lock_items(cursor, changed)
+                states = {}
+                for source_uid in changed:
+                    states[source_uid], events = coalesce_group(current.get(source_uid), groups[source_uid])
+                    changes.extend(events)
+                _write_items(cursor, states, set(changed) - set(current))
+        with stage_timer(timings, 'history'):
+            results['price_changed'] = sum(
+                1 for change in changes if change['change_type'] == ChangeType.PRICE.value
+            )
+            results['history_written'] = _write_changes(cursor, changes)
+            record_price_daily(conn, items)
+    finally:
+        cursor.close()
+
+    results['success'] = len(items)
+    return results
+
+
+def upsert_batch(conn, log_records: List[Dict]) -> Dict:
+    """
+    用集合操作处理一批日志记录并提交，结果与逐行的 process_batch 相同（见 apply_log_records）
+
+    SQL 执行失败时回滚整批并抛出 DatabaseError，由调用方决定是否回退为逐行处理。
+
+    Args:
+        conn: 数据库连接对象
+        log_records: 日志记录列表
+
+    Returns:
+        处理结果统计字典（与 process_batch 相同）
+    """
+    try:
+        results = apply_log_records(conn, log_records)
+        with stage_timer(results['timings'], 'commit'):
+            conn.commit()
+        return results
+    except ImportError:
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"批量 upsert 失败: {e}")
@@ -21,6 +21,11 @@ if not any('enums' in str(p) or Path(str(p)).name == 'GoodsHunter' for p in sys.
             break
 
 from enums.business.change_type import ChangeType
+from enums.business.status import ItemStatus
+
+
+# 已售 / 下架商品再次被抓取到、恢复为 active 时的原因（写入历史记录 reason）
+REACTIVATED_REASON = "seen_again"
 
 
 def write_price_change(
@@ -96,6 +101,68 @@ def write_price_change(
         cursor.close()
 
 
+def write_reactivation(
+    conn,
+    source_uid: str,
+    old_status: str,
+    log_id: int,
+    crawl_time: datetime,
+    dt: date,
+    item_version: int
+) -> bool:
+    """
+    写入已售 / 下架商品再次出现、恢复为 active 的状态变化记录
+
+    event_key 为 generate_status_event_key(source_uid, dt, 'active')，与批量路径相同
+    
+    Args:
+        conn: 数据库连接对象
+        source_uid: 商品唯一标识
+        old_status: 原状态（sold / removed）
+        log_id: 再次出现的 crawler_log 的 id
+        crawl_time: 抓取时间
+        dt: 再次出现的日期
+        item_version: 恢复后 item 的版本号
+        
+    Returns:
+        如果写入成功返回 True，如果因为唯一约束冲突（已存在）返回 False
+    """
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            """
+            INSERT INTO item_change_history (
+                dt, source_uid, change_time, change_type,
+                old_value, new_value, currency,
+                reason, log_id, item_version, event_key
+            ) VALUES (
+                %s, %s, %s, %s,
+                %s, %s, %s,
+                %s, %s, %s, %s
+            )
+            ON CONFLICT (event_key) DO NOTHING
+            """,
+            (
+                dt, source_uid, crawl_time, ChangeType.STATUS.value,
+                old_status, ItemStatus.ACTIVE.value, None,
+                REACTIVATED_REASON, log_id, item_version,
+                generate_status_event_key(source_uid, dt, ItemStatus.ACTIVE.value)
+            )
+        )
+        
+        inserted = cursor.rowcount > 0
+        
+        conn.commit()
+        return inserted
+        
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"写入状态变化历史失败: {e}")
+    finally:
+        cursor.close()
+
+
 def write_status_change(
     conn,
     source_uid: str,
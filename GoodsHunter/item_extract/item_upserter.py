@@ -3,18 +3,165 @@ from typing import Dict, Optional, Tuple
 from datetime import datetime, date
 from .source_uid_generator import generate_source_uid
 from .price_normalizer import normalize_price
+from .history_writer import ItemStatus
 from .exceptions import DatabaseError
 
 
+def parse_log_record(log_record: Dict) -> Dict:
+    """
+    从 crawler_log 记录提取并规范化 item 字段（逐行与批量 upsert 共用）
+    
+    Args:
+        log_record: crawler_log 记录字典
+        
+    Returns:
+        字段字典（source_uid / site / category / item_id / price / crawl_time / dt / log_id 等）
+        
+    Raises:
+        ValueError: 缺少 site / category / item_id
+    """
+    # 从 log_record 提取数据
+    site = log_record.get('site', '').strip()
+    category = log_record.get('category', '').strip()
+    item_id = log_record.get('item_id', '').strip()
+    
+    if not site or not category or not item_id:
+        raise ValueError(
+            f"缺少必要字段: site={site}, category={category}, item_id={item_id}"
+        )
+    
+    # 生成 source_uid
+    source_uid = generate_source_uid(site, category, item_id)
+    
+    # 规范化价格
+    raw_price = log_record.get('price')
+    currency = log_record.get('currency', 'JPY')
+    new_price = normalize_price(raw_price, currency)
+    
+    # 提取其他字段
+    brand_name = log_record.get('brand_name')
+    model_name = log_record.get('model_name')
+    model_no = log_record.get('model_no')
+    image_sha256 = log_record.get('image_sha256')
+    image_phash = log_record.get('image_phash')
+    image_original_key = log_record.get('image_original_key')
+    image_thumb_300_key = log_record.get('image_thumb_300_key')
+    image_thumb_600_key = log_record.get('image_thumb_600_key')
+    product_url = log_record.get('product_url')
+    raw_hash = log_record.get('raw_hash')
+    
+    # 时间字段
+    crawl_time = log_record.get('crawl_time')
+    if isinstance(crawl_time, str):
+        # 如果是字符串，尝试解析
+        try:
+            crawl_time = datetime.fromisoformat(crawl_time.replace('Z', '+00:00'))
+        except:
+            crawl_time = datetime.now()
+    elif not isinstance(crawl_time, datetime):
+        crawl_time = datetime.now()
+    
+    dt = log_record.get('dt')
+    if isinstance(dt, str):
+        try:
+            dt = date.fromisoformat(dt)
+        except:
+            dt = date.today()
+    elif not isinstance(dt, date):
+        dt = date.today()
+    
+    log_id = log_record.get('id')
+    
+    return {
+        'source_uid': source_uid,
+        'site': site,
+        'category': category,
+        'item_id': item_id,
+        'brand_name': brand_name,
+        'model_name': model_name,
+        'model_no': model_no,
+        'currency': currency,
+        'price': new_price,
+        'image_sha256': image_sha256,
+        'image_phash': image_phash,
+        'image_original_key': image_original_key,
+        'image_thumb_300_key': image_thumb_300_key,
+        'image_thumb_600_key': image_thumb_600_key,
+        'product_url': product_url,
+        'raw_hash': raw_hash,
+        'crawl_time': crawl_time,
+        'dt': dt,
+        'log_id': log_id
+    }
+
+
+def _bump_unchanged_item(cursor, fields: Dict) -> Optional[Tuple[int, Optional[int], int]]:
+    """
+    内容未变化（raw_hash 和价格与上次相同）的 active 商品走短路：不加锁，只在跨天时刷新最后发现时间
+
+    条件 UPDATE 在行上重新检查 raw_hash 和状态，每个商品每天最多写一次，不更新 updated_at（搜索增量同步不会重新索引）。
+    已标记为 sold / removed 的商品不走短路，由加锁路径恢复为 active；已经应用过的记录（log_id 不大于 last_log_id）不写入
+
+    Args:
+        cursor: 数据库游标
+        fields: parse_log_record 的结果
+
+    Returns:
+        (id, price, version)；商品不存在或内容有变化时返回 None，由调用方走加锁路径
+    """
+    if fields['raw_hash'] is None:
+        return None
+    cursor.execute(
+        """
+        SELECT id, price, version, last_raw_hash, status, last_log_id
+        FROM crawler_item
+        WHERE source_uid = %s
+        """,
+        (fields['source_uid'],)
+    )
+    row = cursor.fetchone()
+    if (
+        row is None or row[3] != fields['raw_hash'] or row[1] != fields['price']
+        or row[4] != ItemStatus.ACTIVE.value
+    ):
+        return None
+    if fields['log_id'] is not None and row[5] is not None and fields['log_id'] <= row[5]:
+        # 已经应用过的记录，无需刷新
+        return row[0], row[1], row[2]
+    cursor.execute(
+        """
+        UPDATE crawler_item
+        SET
+            last_seen_dt = %s,
+            last_crawl_time = GREATEST(last_crawl_time, %s),
+            last_log_id = GREATEST(last_log_id, %s)
+        WHERE id = %s
+          AND last_raw_hash = %s
+          AND status = %s
+          AND last_seen_dt < %s
+        """,
+        (fields['dt'], fields['crawl_time'], fields['log_id'], row[0], fields['raw_hash'],
+         ItemStatus.ACTIVE.value, fields['dt'])
+    )
+    return row[0], row[1], row[2]
+
+
 def upsert_item(conn, log_record: Dict) -> Tuple[Dict, Optional[int]]:
     """
     Upsert item 到 crawler_item 表
     
     逻辑：
     1. 如果 item 不存在：插入新记录，返回 (item_data, None)
-    2. 如果 item 存在：更新 last_seen_dt/last_crawl_time/last_log_id，返回 (item_data, old_price)
+    2. 如果 item 存在且 raw_hash、价格与上次相同（内容未变化）：不加锁，
+       只在跨天时刷新 last_seen_dt / last_crawl_time / last_log_id（不更新 updated_at），返回 (item_data, old_price)
+    3. 否则：更新 last_seen_dt/last_crawl_time/last_log_id 等字段，返回 (item_data, old_price)；
+       updated_at 只在 product_url / image_phash / 状态实际变化时更新（价格变化由 update_item_price 更新）。
+       已标记为 sold / removed 的商品再次出现时恢复为 active（清空 sold_dt / sold_reason，version + 1），
+       item_data['reactivated_from'] 为原状态，由调用方写入状态变化历史
+    4. 如果 log_id 不大于 crawler_item.last_log_id（该记录已经应用过）：不修改商品，
+       item_data['already_applied'] 为 True，price 为当前价格（调用方不会产生价格变化）
     
-    使用 SELECT ... FOR UPDATE 防止并发问题
+    有变化时使用 SELECT ... FOR UPDATE 防止并发问题
     
     Args:
         conn: 数据库连接对象
@@ -28,129 +175,130 @@ def upsert_item(conn, log_record: Dict) -> Tuple[Dict, Optional[int]]:
     cursor = conn.cursor()
     
     try:
-        # 从 log_record 提取数据
-        site = log_record.get('site', '').strip()
-        category = log_record.get('category', '').strip()
-        item_id = log_record.get('item_id', '').strip()
+        fields = parse_log_record(log_record)
+        source_uid = fields['source_uid']
+        site = fields['site']
+        category = fields['category']
+        item_id = fields['item_id']
+        brand_name = fields['brand_name']
+        model_name = fields['model_name']
+        model_no = fields['model_no']
+        currency = fields['currency']
+        new_price = fields['price']
+        image_sha256 = fields['image_sha256']
+        image_phash = fields['image_phash']
+        image_original_key = fields['image_original_key']
+        image_thumb_300_key = fields['image_thumb_300_key']
+        image_thumb_600_key = fields['image_thumb_600_key']
+        product_url = fields['product_url']
+        raw_hash = fields['raw_hash']
+        crawl_time = fields['crawl_time']
+        dt = fields['dt']
+        log_id = fields['log_id']
         
-        if not site or not category or not item_id:
-            raise ValueError(
-                f"缺少必要字段: site={site}, category={category}, item_id={item_id}"
-            )
+        unchanged = _bump_unchanged_item(cursor, fields)
+        reactivated_from = None
+        already_applied = False
         
-        # 生成 source_uid
-        source_uid = generate_source_uid(site, category, item_id)
-        
-        # 规范化价格
-        raw_price = log_record.get('price')
-        currency = log_record.get('currency', 'JPY')
-        new_price = normalize_price(raw_price, currency)
-        
-        # 提取其他字段
-        brand_name = log_record.get('brand_name')
-        model_name = log_record.get('model_name')
-        model_no = log_record.get('model_no')
-        image_sha256 = log_record.get('image_sha256')
-        image_original_key = log_record.get('image_original_key')
-        image_thumb_300_key = log_record.get('image_thumb_300_key')
-        image_thumb_600_key = log_record.get('image_thumb_600_key')
-        product_url = log_record.get('product_url')
-        
-        # 时间字段
-        crawl_time = log_record.get('crawl_time')
-        if isinstance(crawl_time, str):
-            # 如果是字符串，尝试解析
-            try:
-                crawl_time = datetime.fromisoformat(crawl_time.replace('Z', '+00:00'))
-            except:
-                crawl_time = datetime.now()
-        elif not isinstance(crawl_time, datetime):
-            crawl_time = datetime.now()
-        
-        dt = log_record.get('dt')
-        if isinstance(dt, str):
-            try:
-                dt = date.fromisoformat(dt)
-            except:
-                dt = date.today()
-        elif not isinstance(dt, date):
-            dt = date.today()
-        
-        log_id = log_record.get('id')
-        
-        # 使用 SELECT ... FOR UPDATE 锁定行（如果存在）
-        cursor.execute(
-            """
-            SELECT id, price, version
-            FROM crawler_item
-            WHERE source_uid = %s
-            FOR UPDATE
-            """,
-            (source_uid,)
-        )
-        
-        existing = cursor.fetchone()
-        new_item_id = None
-        
-        if existing is None:
-            # 新商品：插入
-            old_price = None
-            version = 1
-            
+        if unchanged is not None:
+            # 内容未变化：价格不变，不产生历史
+            new_item_id, old_price, version = unchanged
+        else:
+            # 使用 SELECT ... FOR UPDATE 锁定行（如果存在）
             cursor.execute(
                 """
-                INSERT INTO crawler_item (
-                    source_uid, site, category, item_id,
-                    brand_name, model_name, model_no,
-                    currency, price,
-                    image_sha256, image_original_key, image_thumb_300_key, image_thumb_600_key,
-                    product_url,
-                    status, first_seen_dt, last_seen_dt,
-                    last_crawl_time, last_log_id, version
-                ) VALUES (
-                    %s, %s, %s, %s,
-                    %s, %s, %s,
-                    %s, %s,
-                    %s, %s, %s, %s,
-                    %s,
-                    'active', %s, %s,
-                    %s, %s, %s
-                )
-                RETURNING id
+                SELECT id, price, version, status, last_log_id
+                FROM crawler_item
+                WHERE source_uid = %s
+                FOR UPDATE
                 """,
-                (
-                    source_uid, site, category, item_id,
-                    brand_name, model_name, model_no,
-                    currency, new_price,
-                    image_sha256, image_original_key, image_thumb_300_key, image_thumb_600_key,
-                    product_url,
-                    dt, dt,  # first_seen_dt, last_seen_dt
-                    crawl_time, log_id, version
-                )
+                (source_uid,)
             )
-            new_item_id = cursor.fetchone()[0]
             
-        else:
-            # 已存在商品：更新
-            item_db_id, old_price, current_version = existing
+            existing = cursor.fetchone()
+            new_item_id = None
             
-            # 更新基础字段（不论价格是否变化都更新）
-            cursor.execute(
-                """
-                UPDATE crawler_item
-                SET 
-                    last_seen_dt = %s,
-                    last_crawl_time = %s,
-                    last_log_id = %s,
-                    product_url = %s,
-                    updated_at = now()
-                WHERE id = %s
-                """,
-                (dt, crawl_time, log_id, product_url, item_db_id)
-            )
+            if existing is None:
+                # 新商品：插入
+                old_price = None
+                version = 1
+            
+                cursor.execute(
+                    """
+                    INSERT INTO crawler_item (
+                        source_uid, site, category, item_id,
+                        brand_name, model_name, model_no,
+                        currency, price,
+                        image_sha256, image_phash, image_original_key, image_thumb_300_key, image_thumb_600_key,
+                        product_url,
+                        status, first_seen_dt, last_seen_dt,
+                        last_crawl_time, last_log_id, last_raw_hash, version
+                    ) VALUES (
+                        %s, %s, %s, %s,
+                        %s, %s, %s,
+                        %s, %s,
+                        %s, %s, %s, %s, %s,
+                        %s,
+                        'active', %s, %s,
+                        %s, %s, %s, %s
+                    )
+                    RETURNING id
+                    """,
+                    (
+                        source_uid, site, category, item_id,
+                        brand_name, model_name, model_no,
+                        currency, new_price,
+                        image_sha256, image_phash, image_original_key, image_thumb_300_key, image_thumb_600_key,
+                        product_url,
+                        dt, dt,  # first_seen_dt, last_seen_dt
+                        crawl_time, log_id, raw_hash, version
+                    )
+                )
+                new_item_id = cursor.fetchone()[0]
+            
+            elif log_id is not None and existing[4] is not None and log_id <= existing[4]:
+                # 已经应用过的记录（DBWriter inline 模式写入后同步循环再次读到，或分片游标回退后重读）：不做任何修改
+                new_item_id, old_price, version = existing[0], existing[1], existing[2]
+                new_price = old_price
+                already_applied = True
+            
+            else:
+                # 已存在商品：更新
+                item_db_id, old_price, current_version, current_status, _ = existing
+                if current_status != ItemStatus.ACTIVE.value:
+                    # 已售 / 下架的商品再次出现：恢复为 active
+                    reactivated_from = current_status
+            
+                # 更新基础字段（不论价格是否变化都更新）；updated_at 只在展示字段或状态变化时更新（搜索增量同步依据）
+                cursor.execute(
+                    """
+                    UPDATE crawler_item
+                    SET 
+                        last_seen_dt = %s,
+                        last_crawl_time = %s,
+                        last_log_id = %s,
+                        product_url = %s,
+                        image_phash = COALESCE(image_phash, %s),
+                        last_raw_hash = COALESCE(%s, last_raw_hash),
+                        status = %s,
+                        sold_dt = NULL,
+                        sold_reason = NULL,
+                        version = %s,
+                        updated_at = CASE
+                            WHEN product_url IS DISTINCT FROM %s
+                              OR (image_phash IS NULL AND %s IS NOT NULL)
+                              OR status <> %s
+                            THEN now() ELSE updated_at
+                        END
+                    WHERE id = %s
+                    """,
+                    (dt, crawl_time, log_id, product_url, image_phash, raw_hash,
+                     ItemStatus.ACTIVE.value, current_version + (1 if reactivated_from else 0),
+                     product_url, image_phash, ItemStatus.ACTIVE.value, item_db_id)
+                )
             
-            version = current_version
-            new_item_id = item_db_id
+                version = current_version + (1 if reactivated_from else 0)
+                new_item_id = item_db_id
         
         # 构建返回的 item_data
         item_data = {
@@ -165,11 +313,14 @@ def upsert_item(conn, log_record: Dict) -> Tuple[Dict, Optional[int]]:
             'currency': currency,
             'price': new_price,
             'image_sha256': image_sha256,
+            'image_phash': image_phash,
             'image_original_key': image_original_key,
             'image_thumb_300_key': image_thumb_300_key,
             'image_thumb_600_key': image_thumb_600_key,
             'product_url': product_url,
             'version': version,
+            'reactivated_from': reactivated_from,
+            'already_applied': already_applied,
             'crawl_time': crawl_time,
             'dt': dt,
             'log_id': log_id
@@ -0,0 +1,119 @@
+"""LISTEN/NOTIFY：DBWriter 写入 crawler_log 后发送通知，同步守护进程收到通知后立即处理"""
+import select
+import time
+from typing import Optional
+
+try:
+    import psycopg2
+    from psycopg2 import sql
+except ImportError:
+    psycopg2 = None
+    sql = None
+
+from storage.notify import CRAWLER_LOG_CHANNEL
+from .utils import get_database_url
+from .exceptions import DatabaseError
+
+
+class LogNotificationListener:
+    """
+    在独立的 autocommit 连接上 LISTEN crawler_log 写入通知
+
+    不使用共享连接池：LISTEN 绑定在会话上，需要长期占用一个连接
+    """
+
+    def __init__(self, database_url: Optional[str] = None, channel: str = CRAWLER_LOG_CHANNEL):
+        """
+        初始化监听器
+
+        Args:
+            database_url: 数据库连接URL，如果为None则从环境变量读取
+            channel: 通知频道
+        """
+        if psycopg2 is None:
+            raise ImportError("psycopg2 未安装。请运行: pip install psycopg2-binary")
+        self.database_url = database_url or get_database_url()
+        self.channel = channel
+        self.conn = None
+
+    def connect(self):
+        """建立连接并 LISTEN（重复调用时先关闭旧连接）"""
+        self.close()
+        try:
+            self.conn = psycopg2.connect(self.database_url)
+            self.conn.autocommit = True
+            cursor = self.conn.cursor()
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            cursor.close()
+            print(f"[listener] 已监听频道 {self.channel}")
+        except Exception as e:
+            self.conn = None
+            raise DatabaseError(f"LISTEN {self.channel} 失败: {e}")
+
+    def _drain(self) -> int:
+        """读取并清空已到达的通知，返回数量"""
+        self.conn.poll()
+        count = len(self.conn.notifies)
+        self.conn.notifies.clear()
+        return count
+
+    def _ready(self, timeout: float) -> bool:
+        """等待连接上有数据可读（最多 timeout 秒）"""
+        readable, _, _ = select.select([self.conn], [], [], max(timeout, 0))
+        return bool(readable)
+
+    def wait(self, timeout: float, debounce: float = 0.2, max_delay: float = 2.0) -> int:
+        """
+        等待通知（防抖）
+
+        收到第一条通知后继续收集，直到 debounce 秒内没有新通知或累计等待超过 max_delay 秒，
+        一次抓取写入的多个批次合并为一次同步
+
+        Args:
+            timeout: 最长等待秒数（兜底轮询间隔），超时返回 0
+            debounce: 防抖间隔（秒）
+            max_delay: 收到第一条通知后最多再等待的秒数
+
+        Returns:
+            收到的通知数；0 表示超时或连接断开（调用方按兜底轮询处理）
+        """
+        try:
+            if self.conn is None:
+                self.connect()
+            count = self._drain()
+            if not count:
+                if not self._ready(timeout):
+                    return 0
+                count = self._drain()
+                if not count:
+                    return 0
+            first_at = time.monotonic()
+            while True:
+                remaining = max_delay - (time.monotonic() - first_at)
+                if remaining <= 0 or not self._ready(min(debounce, remaining)):
+                    break
+                count += self._drain()
+            return count
+        except DatabaseError as e:
+            print(f"[listener] {e}，按兜底轮询间隔重试")
+            time.sleep(timeout)
+            return 0
+        except (psycopg2.Error, OSError) as e:
+            print(f"[listener] 监听连接断开: {e}，下次等待时重连")
+            self.close()
+            return 0
+
+    def close(self):
+        """关闭监听连接"""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,5 +1,6 @@
 """Crawler Log 读取：从 crawler_log 表读取未处理的记录"""
 from typing import List, Dict, Optional
+from storage.sync_state import read_lag_seconds, read_max_log_id
 from .exceptions import DatabaseError
 
 
@@ -28,8 +29,8 @@ def fetch_unprocessed_logs(
                 id, category, site, item_id, raw_json,
                 brand_name, model_name, model_no,
                 currency, price,
-                image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256,
-                source_uid, product_url, crawl_time, dt
+                image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256, image_phash,
+                source_uid, raw_hash, product_url, crawl_time, dt
             FROM crawler_log
             WHERE id > %s 
                 AND status = 'success'
@@ -56,6 +57,110 @@ def fetch_unprocessed_logs(
         cursor.close()
 
 
+def fetch_shard_logs(
+    conn,
+    last_log_id: int,
+    max_log_id: int,
+    shard: int,
+    shards: int,
+    batch_size: int = 100
+) -> List[Dict]:
+    """
+    获取某个分片中 (last_log_id, max_log_id] 范围内的未处理日志记录
+    
+    按 hashtext(crawler_log.source_uid) 取模分片：同一商品的所有日志落在同一分片，
+    分片内按 id 升序处理，保证单个商品的处理顺序与全局游标模式一致
+    
+    Args:
+        conn: 数据库连接对象
+        last_log_id: 该分片上次处理的 log_id
+        max_log_id: 本次运行的上界（含）
+        shard: 分片序号（0 ~ shards-1）
+        shards: 分片总数
+        batch_size: 批量大小
+        
+    Returns:
+        日志记录列表，每个记录是一个字典
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT 
+                id, category, site, item_id, raw_json,
+                brand_name, model_name, model_no,
+                currency, price,
+                image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256, image_phash,
+                source_uid, raw_hash, product_url, crawl_time, dt
+            FROM crawler_log
+            WHERE id > %s
+                AND id <= %s
+                AND status = 'success'
+                AND mod(abs(hashtext(source_uid)::bigint), %s) = %s
+            ORDER BY id ASC
+            LIMIT %s
+            """,
+            (last_log_id, max_log_id, shards, shard, batch_size)
+        )
+        
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+    except Exception as e:
+        raise DatabaseError(f"读取 crawler_log 分片 {shard}/{shards} 失败: {e}")
+    finally:
+        cursor.close()
+
+
+def get_max_log_id(conn) -> int:
+    """
+    获取 crawler_log 当前最大 id（并行同步每次运行的上界）
+    
+    Args:
+        conn: 数据库连接对象
+        
+    Returns:
+        最大 id，表为空时返回 0
+    """
+    try:
+        return read_max_log_id(conn)
+    except Exception as e:
+        raise DatabaseError(f"获取 crawler_log 最大 id 失败: {e}")
+
+
+def get_log_lag(conn, last_log_id: int) -> int:
+    """
+    同步延迟：crawler_log 最大 id 与游标之差（主键索引上取 MAX，代替 COUNT(*)）
+    
+    包含非 success 状态的行，是待处理记录数的上界
+    
+    Args:
+        conn: 数据库连接对象
+        last_log_id: 游标
+        
+    Returns:
+        max(id) - last_log_id，不小于 0
+    """
+    return max(get_max_log_id(conn) - last_log_id, 0)
+
+
+def get_log_lag_seconds(conn, last_log_id: int) -> float:
+    """
+    同步延迟（秒）：游标之后最早一条待处理（success）日志的抓取时间距今多久（查询见 storage.sync_state.LAG_SECONDS_SQL）
+
+    Args:
+        conn: 数据库连接对象
+        last_log_id: 游标
+
+    Returns:
+        延迟秒数，没有待处理日志时返回 0
+    """
+    try:
+        return read_lag_seconds(conn, last_log_id)
+    except Exception as e:
+        raise DatabaseError(f"获取同步延迟失败: {e}")
+
+
 def get_log_count(conn, last_log_id: int) -> int:
     """
     获取待处理记录数（用于进度显示）
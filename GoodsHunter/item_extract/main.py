@@ -4,6 +4,7 @@ import sys
 import argparse
 import time
 import logging
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Optional
 
@@ -22,6 +23,9 @@ except ImportError:
 from item_extract.utils import get_db_connection, create_connection_pool
 from item_extract.models import create_tables
 from item_extract.sync_processor import run_sync
+from item_extract.parallel_sync import run_parallel_sync, create_shard_executor
+from item_extract.listener import LogNotificationListener
+from item_extract.metrics import format_timings
 from item_extract.exceptions import DatabaseError, ItemExtractError
 
 
@@ -56,7 +60,10 @@ def init_database(database_url: Optional[str] = None):
 def run_once(
     database_url: Optional[str] = None,
     batch_size: int = 100,
-    max_records: Optional[int] = None
+    max_records: Optional[int] = None,
+    batch_mode: bool = False,
+    workers: int = 1,
+    executor=None
 ):
     """
     运行一次同步
@@ -64,12 +71,26 @@ def run_once(
     Args:
         database_url: 数据库连接URL
         batch_size: 批量大小
-        max_records: 最大处理记录数
+        max_records: 最大处理记录数（仅单进程模式）
+        batch_mode: 使用集合操作的批量 upsert
+        workers: 并行分片数，大于 1 时使用 run_parallel_sync
+        executor: 常驻模式复用的分片进程池（None 表示本次临时创建）
+        
+    Returns:
+        同步结果统计字典
     """
     conn = None
     try:
-        conn = get_db_connection(database_url)
-        results = run_sync(conn, batch_size=batch_size, max_records=max_records)
+        if workers > 1:
+            results = run_parallel_sync(
+                database_url, workers=workers, batch_size=batch_size, batch_mode=batch_mode,
+                executor=executor
+            )
+        else:
+            conn = get_db_connection(database_url)
+            results = run_sync(
+                conn, batch_size=batch_size, max_records=max_records, batch_mode=batch_mode
+            )
         
         logger.info("=" * 60)
         logger.info("同步完成")
@@ -79,6 +100,14 @@ def run_once(
         logger.info(f"价格变化: {results['total_price_changed']}")
         logger.info(f"历史记录: {results['total_history_written']}")
         logger.info(f"last_log_id: {results['last_log_id_before']} -> {results['last_log_id_after']}")
+        metrics = results.get('metrics') or {}
+        if metrics:
+            logger.info(
+                f"耗时: {metrics['duration_seconds']}s, 吞吐: {metrics['rows_per_second']} 条/秒, "
+                f"阶段: {format_timings(metrics['stage_seconds'])}"
+            )
+            if metrics['errors_by_type']:
+                logger.warning(f"失败按类型: {metrics['errors_by_type']}")
         
         if results['errors']:
             logger.warning(f"错误数: {len(results['errors'])}")
@@ -86,6 +115,7 @@ def run_once(
                 logger.warning(f"  错误: {error}")
         
         logger.info("=" * 60)
+        return results
         
     except Exception as e:
         logger.error(f"同步失败: {e}", exc_info=True)
@@ -95,10 +125,41 @@ def run_once(
             conn.close()
 
 
+class ShardPool:
+    """常驻模式的分片进程池：workers > 1 时在整个运行期间复用一个进程池，子进程异常退出后重建"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = create_shard_executor(workers) if workers > 1 else None
+    
+    def run_once(self, database_url: Optional[str], batch_size: int, batch_mode: bool):
+        """用常驻进程池运行一次同步（见 run_once）"""
+        try:
+            return run_once(
+                database_url, batch_size=batch_size, batch_mode=batch_mode,
+                workers=self.workers, executor=self.executor
+            )
+        except BrokenProcessPool:
+            logger.warning("分片进程池中的子进程异常退出，重建进程池")
+            self.executor.shutdown(wait=False)
+            self.executor = create_shard_executor(self.workers)
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.executor is not None:
+            self.executor.shutdown()
+        return False
+
+
 def run_continuous(
     database_url: Optional[str] = None,
     batch_size: int = 100,
-    interval: int = 60
+    interval: int = 60,
+    batch_mode: bool = False,
+    workers: int = 1
 ):
     """
     持续运行模式（定期轮询）
@@ -107,18 +168,21 @@ def run_continuous(
         database_url: 数据库连接URL
         batch_size: 批量大小
         interval: 轮询间隔（秒）
+        batch_mode: 使用集合操作的批量 upsert
+        workers: 并行分片数
     """
     logger.info(f"启动持续运行模式，轮询间隔: {interval} 秒")
     
     try:
-        while True:
-            try:
-                run_once(database_url, batch_size=batch_size)
-            except Exception as e:
-                logger.error(f"本次同步失败: {e}", exc_info=True)
-            
-            logger.info(f"等待 {interval} 秒后继续...")
-            time.sleep(interval)
+        with ShardPool(workers) as pool:
+            while True:
+                try:
+                    pool.run_once(database_url, batch_size=batch_size, batch_mode=batch_mode)
+                except Exception as e:
+                    logger.error(f"本次同步失败: {e}", exc_info=True)
+                
+                logger.info(f"等待 {interval} 秒后继续...")
+                time.sleep(interval)
             
     except KeyboardInterrupt:
         logger.info("收到中断信号，退出")
@@ -127,6 +191,53 @@ def run_continuous(
         raise
 
 
+def run_listen(
+    database_url: Optional[str] = None,
+    batch_size: int = 100,
+    interval: int = 60,
+    batch_mode: bool = False,
+    workers: int = 1,
+    debounce: float = 0.2
+):
+    """
+    事件驱动模式：LISTEN DBWriter 的 crawler_log 写入通知，收到后（防抖）立即同步
+    
+    interval 秒内没有通知时也同步一次（兜底轮询，覆盖未发送通知的写入方和断线期间的写入）
+    
+    Args:
+        database_url: 数据库连接URL
+        batch_size: 批量大小
+        interval: 兜底轮询间隔（秒）
+        batch_mode: 使用集合操作的批量 upsert
+        workers: 并行分片数
+        debounce: 防抖间隔（秒）
+    """
+    logger.info(f"启动事件驱动模式，防抖 {debounce}s，兜底轮询间隔 {interval}s")
+    
+    with LogNotificationListener(database_url) as listener, ShardPool(workers) as pool:
+        listener.connect()
+        try:
+            while True:
+                try:
+                    started = time.monotonic()
+                    results = pool.run_once(database_url, batch_size=batch_size, batch_mode=batch_mode)
+                    logger.info(
+                        f"本次同步耗时 {time.monotonic() - started:.3f}s，"
+                        f"开始时 lag={results.get('lag', '-')}"
+                    )
+                except Exception as e:
+                    logger.error(f"本次同步失败: {e}", exc_info=True)
+                
+                notifications = listener.wait(interval, debounce=debounce)
+                if notifications:
+                    logger.info(f"收到 {notifications} 条 crawler_log 写入通知")
+                else:
+                    logger.info(f"{interval} 秒内没有通知，兜底同步")
+                
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，退出")
+
+
 def main():
     """主函数：解析命令行参数并执行"""
     parser = argparse.ArgumentParser(
@@ -167,6 +278,32 @@ def main():
         help='持续运行模式的轮询间隔（秒，默认: 60）'
     )
     
+    parser.add_argument(
+        '--batch-mode',
+        action='store_true',
+        help='集合操作批量 upsert：每批一条 INSERT ... ON CONFLICT，一次提交（默认: 逐行处理）'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='并行分片数：按 source_uid 哈希分片，每个分片一个进程和一个游标（默认: 1，单进程）'
+    )
+    
+    parser.add_argument(
+        '--listen',
+        action='store_true',
+        help='事件驱动模式：LISTEN crawler_log 写入通知后立即同步，--interval 作为兜底轮询间隔'
+    )
+    
+    parser.add_argument(
+        '--debounce-ms',
+        type=int,
+        default=200,
+        help='事件驱动模式的防抖间隔（毫秒，默认: 200）'
+    )
+    
     parser.add_argument(
         '--init-db',
         action='store_true',
@@ -186,13 +323,26 @@ def main():
             run_once(
                 database_url=args.database_url,
                 batch_size=args.batch_size,
-                max_records=args.max_records
+                max_records=args.max_records,
+                batch_mode=args.batch_mode,
+                workers=args.workers
+            )
+        elif args.listen:
+            run_listen(
+                database_url=args.database_url,
+                batch_size=args.batch_size,
+                interval=args.interval,
+                batch_mode=args.batch_mode,
+                workers=args.workers,
+                debounce=args.debounce_ms / 1000
             )
         else:
             run_continuous(
                 database_url=args.database_url,
                 batch_size=args.batch_size,
-                interval=args.interval
+                interval=args.interval,
+                batch_mode=args.batch_mode,
+                workers=args.workers
             )
             
     except KeyboardInterrupt:
@@ -0,0 +1,330 @@
+"""同步流水线指标：每批各阶段耗时、吞吐、按错误类型的失败计数和游标延迟，持久化到 pipeline_state
+
+run_sync / run_parallel_sync 每次运行结束时把本次运行的指标和累计计数写入
+pipeline_state（键 items_sync_metrics，JSON）；管理端 API 读取后以 JSON 和 Prometheus 文本格式暴露，
+游标延迟（行数、秒数）在读取时实时计算，同步进程停止时延迟仍会增长，可据此告警。
+键、延迟查询、状态读取和 Prometheus 渲染在 storage/sync_state.py 中，与 API 共用。
+
+输出 Prometheus 文本（可供 node_exporter textfile collector 采集）：
+    python -m item_extract.metrics
+    python -m item_extract.metrics --json
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from storage.sync_state import METRICS_KEY, SYNC_STAGES, empty_totals, read_sync_status, render_prometheus
+from .exceptions import DatabaseError
+from .utils import get_db_connection
+from .log_reader import get_log_lag, get_log_lag_seconds
+from .state_manager import get_last_log_id
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """
+    计时一个阶段，耗时累加到 timings[stage]（timings 为 None 时不计时）
+
+    Args:
+        timings: 阶段名 -> 累计耗时（秒）
+        stage: 阶段名（见 SYNC_STAGES）
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def error_class(error: BaseException) -> str:
+    """
+    错误类型名：取异常链最内层的原因（DatabaseError 包装的 psycopg2 / KeyError 等），用作失败计数的标签
+
+    Args:
+        error: 异常
+
+    Returns:
+        类型名，如 UniqueViolation、KeyError
+    """
+    seen = set()
+    while id(error) not in seen:
+        seen.add(id(error))
+        cause = error.__cause__ or error.__context__
+        if cause is None:
+            break
+        error = cause
+    return type(error).__name__
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """把阶段耗时格式化为日志用的一行文本，如 fetch=0.012s upsert=0.210s"""
+    return " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
+
+
+def errors_by_type(errors: List[Dict]) -> Dict[str, int]:
+    """
+    按错误类型统计失败记录（process_batch 结果中的 errors）
+
+    Args:
+        errors: 错误列表，每项含 error_type（缺失时记为 Exception）
+
+    Returns:
+        错误类型 -> 次数
+    """
+    return dict(Counter(error.get('error_type') or 'Exception' for error in errors))
+
+
+class SyncMetrics:
+    """一次同步运行的指标累加器（每批调用 observe_batch，并行模式下合并各分片的结果）"""
+
+    def __init__(self):
+        """初始化累加器，开始计时"""
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.duration_seconds: Optional[float] = None
+        self.batches = 0
+        self.rows = 0
+        self.success = 0
+        self.failed = 0
+        self.batch_fallbacks = 0
+        self.stage_seconds: Dict[str, float] = {stage: 0.0 for stage in SYNC_STAGES}
+        self.slowest_batch_seconds = 0.0
+        self.errors_by_type: Counter = Counter()
+
+    def observe_batch(self, batch_results: Dict, timings: Dict[str, float]) -> Dict[str, float]:
+        """
+        记录一批的处理结果和各阶段耗时
+
+        Args:
+            batch_results: process_batch 的结果
+            timings: 本批各阶段耗时（含 fetch，以及 batch_results['timings'] 之外的阶段）
+
+        Returns:
+            本批合并后的各阶段耗时
+        """
+        batch_timings = dict(timings)
+        for stage, seconds in (batch_results.get('timings') or {}).items():
+            batch_timings[stage] = batch_timings.get(stage, 0.0) + seconds
+        for stage, seconds in batch_timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.slowest_batch_seconds = max(self.slowest_batch_seconds, sum(batch_timings.values()))
+        self.batches += 1
+        self.rows += batch_results['total']
+        self.success += batch_results['success']
+        self.failed += batch_results['failed']
+        self.batch_fallbacks += batch_results.get('batch_fallbacks', 0)
+        self.errors_by_type.update(errors_by_type(batch_results['errors']))
+        return batch_timings
+
+    def absorb(self, other: Dict) -> None:
+        """
+        合并另一个累加器的结果（并行模式下各分片在子进程中计数，以 to_dict() 的形式返回）
+
+        Args:
+            other: SyncMetrics.to_dict() 的结果
+        """
+        self.batches += other['batches']
+        self.rows += other['rows']
+        self.success += other['success']
+        self.failed += other['failed']
+        self.batch_fallbacks += other['batch_fallbacks']
+        for stage, seconds in other['stage_seconds'].items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.slowest_batch_seconds = max(self.slowest_batch_seconds, other['slowest_batch_seconds'])
+        self.errors_by_type.update(other['errors_by_type'])
+
+    def finish(self) -> None:
+        """结束计时（运行耗时为墙钟时间，并行模式下小于各分片阶段耗时之和）"""
+        self.duration_seconds = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict:
+        """
+        转换为可 JSON 序列化的字典
+
+        Returns:
+            本次运行的指标：批次数、行数、各阶段耗时、吞吐、按错误类型的失败数等
+        """
+        duration = self.duration_seconds
+        if duration is None:
+            duration = time.perf_counter() - self._started
+        return {
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(duration, 3),
+            'batches': self.batches,
+            'rows': self.rows,
+            'success': self.success,
+            'failed': self.failed,
+            'batch_fallbacks': self.batch_fallbacks,
+            'rows_per_second': round(self.rows / duration, 3) if duration > 0 else None,
+            'stage_seconds': {stage: round(seconds, 6) for stage, seconds in self.stage_seconds.items()},
+            'avg_batch_seconds': (
+                round(sum(self.stage_seconds.values()) / self.batches, 6) if self.batches else None
+            ),
+            'slowest_batch_seconds': round(self.slowest_batch_seconds, 6),
+            'errors_by_type': dict(self.errors_by_type),
+        }
+
+
+def _save_snapshot(conn, update) -> Optional[Dict]:
+    """
+    在一个事务中锁定并改写 pipeline_state 中的指标（读-改-写，并发写入方按行锁排队）
+
+    指标写入失败只打印警告，不影响同步本身
+
+    Args:
+        conn: 数据库连接对象
+        update: 接收当前快照字典并原地修改的函数
+
+    Returns:
+        写入后的快照，失败返回 None
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO pipeline_state (key, value, updated_at)
+            VALUES (%s, '{}', now())
+            ON CONFLICT (key) DO NOTHING
+            """,
+            (METRICS_KEY,)
+        )
+        cursor.execute(
+            "SELECT value FROM pipeline_state WHERE key = %s FOR UPDATE",
+            (METRICS_KEY,)
+        )
+        row = cursor.fetchone()
+        try:
+            snapshot = json.loads(row[0]) if row and row[0] else {}
+        except ValueError:
+            snapshot = {}
+        totals = empty_totals()
+        for field, value in (snapshot.get('totals') or {}).items():
+            totals[field] = value
+        snapshot['totals'] = totals
+        update(snapshot)
+        snapshot['updated_at'] = datetime.now(timezone.utc).isoformat()
+        cursor.execute(
+            "UPDATE pipeline_state SET value = %s, updated_at = now() WHERE key = %s",
+            (json.dumps(snapshot, ensure_ascii=False), METRICS_KEY)
+        )
+        conn.commit()
+        return snapshot
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print(f"[metrics] 写入同步指标失败: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def record_sync_run(conn, metrics: SyncMetrics) -> Optional[Dict]:
+    """
+    持久化一次同步运行：本次运行的指标（last_run）、运行结束时的游标延迟，并累加到 totals
+
+    Args:
+        conn: 数据库连接对象
+        metrics: 本次运行的累加器
+
+    Returns:
+        写入后的快照，失败返回 None
+    """
+    if metrics.duration_seconds is None:
+        metrics.finish()
+    run = metrics.to_dict()
+    run['finished_at'] = datetime.now(timezone.utc).isoformat()
+    try:
+        cursor_after = get_last_log_id(conn) or 0
+        run['cursor'] = cursor_after
+        run['lag_rows'] = get_log_lag(conn, cursor_after)
+        run['lag_seconds'] = get_log_lag_seconds(conn, cursor_after)
+    except Exception as e:
+        conn.rollback()
+        print(f"[metrics] 计算游标延迟失败: {e}")
+
+    def update(snapshot):
+        totals = snapshot['totals']
+        totals['runs'] += 1
+        for field in ('batches', 'rows', 'success', 'failed', 'batch_fallbacks'):
+            totals[field] += run[field]
+        for stage, seconds in run['stage_seconds'].items():
+            totals['stage_seconds'][stage] = totals['stage_seconds'].get(stage, 0.0) + seconds
+        for error_type, count in run['errors_by_type'].items():
+            totals['errors_by_type'][error_type] = totals['errors_by_type'].get(error_type, 0) + count
+        snapshot['last_run'] = run
+
+    return _save_snapshot(conn, update)
+
+
+def record_sync_failure(conn, error: Exception) -> Optional[Dict]:
+    """
+    记录一次整体失败的同步运行（run_failures 和按错误类型的计数各加一）
+
+    Args:
+        conn: 数据库连接对象（可能处于失败事务中，先回滚）
+        error: 导致运行失败的异常
+
+    Returns:
+        写入后的快照，失败返回 None
+    """
+    try:
+        conn.rollback()
+    except Exception:
+        return None
+
+    def update(snapshot):
+        totals = snapshot['totals']
+        totals['run_failures'] += 1
+        error_type = error_class(error)
+        totals['errors_by_type'][error_type] = totals['errors_by_type'].get(error_type, 0) + 1
+        snapshot['last_failure'] = {
+            'at': datetime.now(timezone.utc).isoformat(),
+            'error_type': error_type,
+            'error': str(error)[:500],
+        }
+
+    return _save_snapshot(conn, update)
+
+
+def load_sync_status(conn) -> Dict:
+    """
+    读取持久化的指标，并实时计算当前游标延迟（同步进程停止时延迟继续增长）
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        {cursor, max_log_id, lag_rows, lag_seconds, updated_at, last_run, last_failure, totals}
+    """
+    try:
+        return read_sync_status(conn)
+    except Exception as e:
+        raise DatabaseError(f"读取同步状态失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输出 item 同步指标（Prometheus 文本格式）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+    args = parser.parse_args()
+
+    conn = get_db_connection(args.database_url)
+    try:
+        status = load_sync_status(conn)
+    finally:
+        conn.close()
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+    else:
+        print(render_prometheus(status), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""并行同步：按 source_uid 哈希分片，多个进程各自持有游标处理 crawler_log"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from .utils import get_db_connection
+from .log_reader import fetch_shard_logs, get_max_log_id
+from .sync_processor import process_batch
+from .metrics import SyncMetrics, stage_timer, record_sync_run, record_sync_failure
+from .state_manager import (
+    CURSOR_KEY_LAST_LOG_ID,
+    get_last_log_id,
+    update_last_log_id,
+    get_state,
+    set_state,
+)
+from .exceptions import DatabaseError
+
+
+def shard_cursor_key(shard: int, shards: int) -> str:
+    """
+    分片游标在 pipeline_state 中的键名
+
+    键名包含分片总数：调整 --workers 后使用一组新的游标，从全局低水位开始
+
+    Args:
+        shard: 分片序号
+        shards: 分片总数
+
+    Returns:
+        键名，如 items_sync_last_log_id:shard:0/4
+    """
+    return f"{CURSOR_KEY_LAST_LOG_ID}:shard:{shard}/{shards}"
+
+
+def get_shard_cursor(conn, shard: int, shards: int, default: int) -> int:
+    """
+    读取分片游标，不存在或无法解析时返回 default（全局游标）
+
+    Args:
+        conn: 数据库连接对象
+        shard: 分片序号
+        shards: 分片总数
+        default: 默认值
+
+    Returns:
+        分片已处理的最大 log_id
+    """
+    value = get_state(conn, shard_cursor_key(shard, shards))
+    try:
+        return int(value) if value is not None else default
+    except (ValueError, TypeError):
+        return default
+
+
+def create_shard_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    创建分片进程池；常驻模式（--listen / 持续运行）在进程生命周期内复用同一个池
+
+    使用 spawn：子进程不继承父进程连接池中的连接
+
+    Args:
+        workers: 进程数（与分片数相同）
+
+    Returns:
+        ProcessPoolExecutor，由调用方负责 shutdown()
+    """
+    if workers < 1:
+        raise ValueError(f"workers 必须大于 0: {workers}")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def sync_shard(
+    database_url: Optional[str],
+    shard: int,
+    shards: int,
+    max_log_id: int,
+    batch_size: int = 100,
+    batch_mode: bool = False
+) -> Dict:
+    """
+    处理一个分片中 (分片游标, max_log_id] 范围内的日志（在子进程中运行，使用独立连接）
+
+    每批处理后推进分片游标；分片内的记录处理完后游标直接推进到 max_log_id，
+    没有新日志的分片不会拖住全局低水位
+
+    Args:
+        database_url: 数据库连接URL
+        shard: 分片序号
+        shards: 分片总数
+        max_log_id: 本次运行的上界（含）
+        batch_size: 批量大小
+        batch_mode: 使用集合操作的批量 upsert
+
+    Returns:
+        分片结果统计字典（metrics 为本分片的指标，由 run_parallel_sync 合并）
+    """
+    metrics = SyncMetrics()
+    conn = get_db_connection(database_url)
+    try:
+        global_cursor = get_last_log_id(conn) or 0
+        # 单进程 run_sync 可能已把全局游标推进到分片游标之后
+        cursor_before = max(get_shard_cursor(conn, shard, shards, global_cursor), global_cursor)
+        results = {
+            'shard': shard,
+            'total_processed': 0,
+            'total_success': 0,
+            'total_failed': 0,
+            'total_price_changed': 0,
+            'total_history_written': 0,
+            'last_log_id_before': cursor_before,
+            'last_log_id_after': cursor_before,
+            'errors': []
+        }
+
+        current_log_id = cursor_before
+        while current_log_id < max_log_id:
+            timings = {}
+            with stage_timer(timings, 'fetch'):
+                log_records = fetch_shard_logs(
+                    conn, current_log_id, max_log_id, shard, shards, batch_size
+                )
+            if len(log_records) < batch_size:
+                # 本分片在上界内的记录已全部取出
+                next_log_id = max_log_id
+            else:
+                next_log_id = max(record['id'] for record in log_records)
+
+            if log_records:
+                batch_results = process_batch(conn, log_records, batch_mode=batch_mode)
+                metrics.observe_batch(batch_results, timings)
+                results['total_processed'] += batch_results['total']
+                results['total_success'] += batch_results['success']
+                results['total_failed'] += batch_results['failed']
+                results['total_price_changed'] += batch_results['price_changed']
+                results['total_history_written'] += batch_results['history_written']
+                results['errors'].extend(batch_results['errors'])
+
+            with stage_timer(metrics.stage_seconds, 'commit'):
+                set_state(conn, shard_cursor_key(shard, shards), str(next_log_id))
+            current_log_id = next_log_id
+
+        results['last_log_id_after'] = current_log_id
+        results['metrics'] = metrics.to_dict()
+        print(
+            f"[parallel_sync] 分片 {shard}/{shards} 完成: 处理={results['total_processed']}, "
+            f"成功={results['total_success']}, 失败={results['total_failed']}, "
+            f"游标 {cursor_before} -> {current_log_id}"
+        )
+        return results
+    finally:
+        conn.close()
+
+
+def run_parallel_sync(
+    database_url: Optional[str] = None,
+    workers: int = 4,
+    batch_size: int = 100,
+    batch_mode: bool = False,
+    executor: Optional[ProcessPoolExecutor] = None
+) -> Dict:
+    """
+    并行同步：workers 个进程各处理一个分片，全部结束后推进全局低水位
+
+    分片按 hashtext(crawler_log.source_uid) % workers 划分，同一商品的日志只在一个分片中按 id 顺序处理。
+    全局游标（items_sync_last_log_id）取所有分片游标的最小值：
+    它之前的日志所有分片都已处理，切回单进程 run_sync 或调整 workers 时从这里继续；
+    领先的分片已处理过的日志会被重读，逐行和批量路径都按商品 last_log_id 跳过，不会重复应用。
+
+    Args:
+        database_url: 数据库连接URL
+        workers: 分片数 / 进程数
+        batch_size: 每个分片的批量大小
+        batch_mode: 使用集合操作的批量 upsert
+        executor: 复用的分片进程池（见 create_shard_executor，进程数不少于 workers）；
+            None 表示本次运行临时创建，结束后关闭
+
+    Returns:
+        同步结果统计字典（字段同 run_sync，另有 shards: 各分片结果）
+
+    Raises:
+        BrokenProcessPool: 进程池中的子进程异常退出，调用方需要重建进程池
+    """
+    if workers < 1:
+        raise ValueError(f"workers 必须大于 0: {workers}")
+
+    metrics = SyncMetrics()
+
+    conn = get_db_connection(database_url)
+    try:
+        last_log_id = get_last_log_id(conn) or 0
+        max_log_id = get_max_log_id(conn)
+    finally:
+        conn.close()
+
+    print(
+        f"[parallel_sync] 开始并行同步，workers={workers}, "
+        f"last_log_id={last_log_id}, max_log_id={max_log_id}"
+    )
+
+    shard_results: List[Dict] = []
+    failures = []
+    owns_executor = executor is None
+    if owns_executor:
+        executor = create_shard_executor(workers)
+    try:
+        futures = [
+            executor.submit(sync_shard, database_url, shard, workers, max_log_id, batch_size, batch_mode)
+            for shard in range(workers)
+        ]
+        for shard, future in enumerate(futures):
+            try:
+                shard_results.append(future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                failures.append(f"分片 {shard}/{workers}: {e}")
+                print(f"[parallel_sync] 分片 {shard}/{workers} 失败: {e}")
+    finally:
+        if owns_executor:
+            executor.shutdown()
+
+    # 推进全局低水位（失败分片的游标停在最后成功的批次）
+    conn = get_db_connection(database_url)
+    try:
+        watermark = min(
+            get_shard_cursor(conn, shard, workers, last_log_id) for shard in range(workers)
+        )
+        if watermark > last_log_id:
+            update_last_log_id(conn, watermark)
+            print(f"[parallel_sync] 更新 last_log_id: {last_log_id} -> {watermark}")
+
+        # 各分片的阶段耗时相加，吞吐按本次运行的墙钟时间计算
+        for result in shard_results:
+            metrics.absorb(result['metrics'])
+        metrics.finish()
+        if failures:
+            error = DatabaseError(f"并行同步失败: {'; '.join(failures)}")
+            record_sync_failure(conn, error)
+            raise error
+        record_sync_run(conn, metrics)
+    finally:
+        conn.close()
+
+    return {
+        'total_processed': sum(r['total_processed'] for r in shard_results),
+        'total_success': sum(r['total_success'] for r in shard_results),
+        'total_failed': sum(r['total_failed'] for r in shard_results),
+        'total_price_changed': sum(r['total_price_changed'] for r in shard_results),
+        'total_history_written': sum(r['total_history_written'] for r in shard_results),
+        'last_log_id_before': last_log_id,
+        'last_log_id_after': max(watermark, last_log_id),
+        'lag': max(max_log_id - last_log_id, 0),
+        'errors': [error for r in shard_results for error in r['errors']],
+        'metrics': metrics.to_dict(),
+        'shards': shard_results
+    }
@@ -0,0 +1,262 @@
+"""每日价格聚合：同步时增量维护 item_price_daily / product_price_daily（价格走势 API 使用）
+
+用法（在项目根目录，回填已有数据）：
+    python -m item_extract.price_daily --rebuild-items --start-dt 2025-01-01 --end-dt 2025-12-31
+    python -m item_extract.price_daily --rebuild-products
+"""
+import argparse
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from psycopg2.extras import execute_values
+except ImportError:
+    execute_values = None
+
+from .utils import get_db_connection
+from .exceptions import DatabaseError
+
+
+_DAILY_COLUMNS = "dt, currency, min_price, max_price, last_price, last_seen_at"
+
+# 已有当天的行时合并：min / max 取极值，last 取抓取时间更晚的一侧（重复处理同一条日志结果不变）
+_MERGE_SET = """
+    min_price = LEAST(d.min_price, EXCLUDED.min_price),
+    max_price = GREATEST(d.max_price, EXCLUDED.max_price),
+    last_price = CASE WHEN EXCLUDED.last_seen_at >= d.last_seen_at THEN EXCLUDED.last_price ELSE d.last_price END,
+    currency = CASE WHEN EXCLUDED.last_seen_at >= d.last_seen_at THEN EXCLUDED.currency ELSE d.currency END,
+    last_seen_at = GREATEST(d.last_seen_at, EXCLUDED.last_seen_at)
+"""
+
+_ITEM_UPSERT_SQL = f"""
+    INSERT INTO item_price_daily AS d (source_uid, {_DAILY_COLUMNS})
+    VALUES %s
+    ON CONFLICT (source_uid, dt) DO UPDATE SET {_MERGE_SET}
+"""
+
+# 同一批观测按 crawler_item.product_id 再聚合一次（未关联 product 的商品跳过）
+_PRODUCT_UPSERT_SQL = f"""
+    INSERT INTO product_price_daily AS d (product_id, {_DAILY_COLUMNS})
+    SELECT
+        ci.product_id, v.dt,
+        (array_agg(v.currency ORDER BY v.last_seen_at DESC))[1],
+        MIN(v.min_price), MAX(v.max_price),
+        (array_agg(v.last_price ORDER BY v.last_seen_at DESC))[1],
+        MAX(v.last_seen_at)
+    FROM (VALUES %s) AS v (source_uid, {_DAILY_COLUMNS})
+    JOIN crawler_item ci ON ci.source_uid = v.source_uid
+    WHERE ci.product_id IS NOT NULL
+    GROUP BY ci.product_id, v.dt
+    ON CONFLICT (product_id, dt) DO UPDATE SET {_MERGE_SET}
+"""
+
+_DAILY_TEMPLATE = "(%s, %s::date, %s, %s::integer, %s::integer, %s::integer, %s::timestamptz)"
+
+
+def aggregate_observations(items: List[Dict]) -> List[Tuple]:
+    """
+    在内存中按 (source_uid, dt) 聚合一批价格观测（每个键一行，满足 ON CONFLICT 的要求）
+
+    Args:
+        items: parse_log_record 的结果列表（价格为空的观测跳过）
+
+    Returns:
+        [(source_uid, dt, currency, min_price, max_price, last_price, last_seen_at), ...]
+    """
+    daily: Dict[Tuple, List] = {}
+    for item in items:
+        price = item.get('price')
+        if price is None:
+            continue
+        key = (item['source_uid'], item['dt'])
+        order = (item['crawl_time'].timestamp(), item.get('log_id') or 0)
+        row = daily.get(key)
+        if row is None:
+            daily[key] = [item['currency'], price, price, price, item['crawl_time'], order]
+            continue
+        row[1] = min(row[1], price)
+        row[2] = max(row[2], price)
+        if order >= row[5]:
+            row[0], row[3], row[4], row[5] = item['currency'], price, item['crawl_time'], order
+    return [
+        (source_uid, dt, currency, min_price, max_price, last_price, last_seen_at)
+        for (source_uid, dt), (currency, min_price, max_price, last_price, last_seen_at, _) in daily.items()
+    ]
+
+
+def write_price_daily(cursor, items: List[Dict]) -> int:
+    """
+    把一批价格观测合并进 item_price_daily 和 product_price_daily（不提交）
+
+    Args:
+        cursor: 数据库游标
+        items: parse_log_record 的结果列表
+
+    Returns:
+        写入的 (source_uid, dt) 行数
+    """
+    rows = aggregate_observations(items)
+    if not rows:
+        return 0
+    execute_values(cursor, _ITEM_UPSERT_SQL, rows, template=_DAILY_TEMPLATE, page_size=len(rows))
+    execute_values(cursor, _PRODUCT_UPSERT_SQL, rows, template=_DAILY_TEMPLATE, page_size=len(rows))
+    return len(rows)
+
+
+def record_price_daily(conn, items: List[Dict]) -> int:
+    """
+    在当前事务中维护每日价格聚合（保存点内执行，由调用方提交）
+
+    聚合表是可重建的派生数据：写入失败（如尚未执行 006 迁移）时只回滚到保存点并打印警告，
+    不影响 crawler_item 和 item_change_history 的写入
+
+    Args:
+        conn: 数据库连接对象
+        items: parse_log_record 的结果列表
+
+    Returns:
+        写入的 (source_uid, dt) 行数，失败返回 0
+    """
+    if execute_values is None or not items:
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SAVEPOINT price_daily")
+        written = write_price_daily(cursor, items)
+        cursor.execute("RELEASE SAVEPOINT price_daily")
+        return written
+    except Exception as e:
+        try:
+            cursor.execute("ROLLBACK TO SAVEPOINT price_daily")
+        except Exception:
+            # 事务在进入前已处于失败状态，由调用方回滚
+            pass
+        print(f"[price_daily] 更新每日价格聚合失败: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def rebuild_item_price_daily(conn, start_dt: date, end_dt: date) -> int:
+    """
+    从 crawler_log 重建 [start_dt, end_dt] 的 item_price_daily（按天分区裁剪，一条 INSERT ... SELECT）
+
+    Args:
+        conn: 数据库连接对象
+        start_dt: 起始日期（含）
+        end_dt: 结束日期（含）
+
+    Returns:
+        写入的行数
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            DELETE FROM item_price_daily WHERE dt BETWEEN %s AND %s
+            """,
+            (start_dt, end_dt)
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO item_price_daily (source_uid, {_DAILY_COLUMNS})
+            SELECT
+                concat_ws(':', btrim(site), btrim(category), btrim(item_id)),
+                dt,
+                (array_agg(currency ORDER BY crawl_time DESC, id DESC))[1],
+                MIN(price), MAX(price),
+                (array_agg(price ORDER BY crawl_time DESC, id DESC))[1],
+                MAX(crawl_time)
+            FROM crawler_log
+            WHERE dt BETWEEN %s AND %s
+              AND status = 'success'
+              AND price IS NOT NULL
+            GROUP BY 1, dt
+            """,
+            (start_dt, end_dt)
+        )
+        written = cursor.rowcount
+        conn.commit()
+        return written
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"重建 item_price_daily 失败: {e}")
+    finally:
+        cursor.close()
+
+
+def rebuild_product_price_daily(conn, product_ids: Optional[List[int]] = None) -> int:
+    """
+    从 item_price_daily 重建 product_price_daily（商品关联到 product 之前的历史由此补齐）
+
+    Args:
+        conn: 数据库连接对象
+        product_ids: 只重建这些 product，None 表示全部
+
+    Returns:
+        写入的行数
+    """
+    product_filter = "AND ci.product_id = ANY(%s)" if product_ids else ""
+    params = (list(product_ids),) if product_ids else ()
+    cursor = conn.cursor()
+    try:
+        if product_ids:
+            cursor.execute("DELETE FROM product_price_daily WHERE product_id = ANY(%s)", params)
+        else:
+            cursor.execute("DELETE FROM product_price_daily")
+        cursor.execute(
+            f"""
+            INSERT INTO product_price_daily (product_id, {_DAILY_COLUMNS})
+            SELECT
+                ci.product_id, d.dt,
+                (array_agg(d.currency ORDER BY d.last_seen_at DESC))[1],
+                MIN(d.min_price), MAX(d.max_price),
+                (array_agg(d.last_price ORDER BY d.last_seen_at DESC))[1],
+                MAX(d.last_seen_at)
+            FROM item_price_daily d
+            JOIN crawler_item ci ON ci.source_uid = d.source_uid
+            WHERE ci.product_id IS NOT NULL {product_filter}
+            GROUP BY ci.product_id, d.dt
+            """,
+            params
+        )
+        written = cursor.rowcount
+        conn.commit()
+        return written
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"重建 product_price_daily 失败: {e}")
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每日价格聚合回填（item_price_daily / product_price_daily）")
+    parser.add_argument("--rebuild-items", action="store_true", help="从 crawler_log 重建 item_price_daily")
+    parser.add_argument("--start-dt", type=date.fromisoformat, default=None, help="起始日期 YYYY-MM-DD（含）")
+    parser.add_argument("--end-dt", type=date.fromisoformat, default=None, help="结束日期 YYYY-MM-DD（含，默认今天）")
+    parser.add_argument("--rebuild-products", action="store_true", help="从 item_price_daily 重建 product_price_daily")
+    parser.add_argument("--product-id", type=int, action="append", default=None, help="只重建指定 product（可重复）")
+    parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+    args = parser.parse_args()
+
+    if not args.rebuild_items and not args.rebuild_products:
+        parser.error("需要指定 --rebuild-items 或 --rebuild-products")
+    if args.rebuild_items and args.start_dt is None:
+        parser.error("--rebuild-items 需要 --start-dt")
+
+    conn = get_db_connection(args.database_url)
+    try:
+        if args.rebuild_items:
+            end_dt = args.end_dt or date.today()
+            written = rebuild_item_price_daily(conn, args.start_dt, end_dt)
+            print(f"[price_daily] item_price_daily {args.start_dt} ~ {end_dt}: {written} 行")
+        if args.rebuild_products:
+            written = rebuild_product_price_daily(conn, args.product_id)
+            print(f"[price_daily] product_price_daily: {written} 行")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""已售判定：按站点把长期未出现（或完整抓取中缺失）的 active 商品批量标记为 sold
+
+用法（在项目根目录）：
+    python -m item_extract.sold_sweeper --days 14
+    python -m item_extract.sold_sweeper --days 14 --site commit-watch.co.jp --dry-run
+    python -m item_extract.sold_sweeper --full-crawl-run 123 --site commit-watch.co.jp --ids-output sold_ids.jsonl
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from psycopg2.extras import execute_values
+except ImportError:
+    execute_values = None
+
+from .utils import get_db_connection
+from .event_key_generator import generate_status_event_key
+from .history_writer import ChangeType
+from .state_manager import get_last_log_id
+from .exceptions import DatabaseError, ValidationError
+
+from enums.business.status import ItemStatus
+from enums.business.crawler_status import CrawlRunStatus
+
+
+def not_seen_reason(days: int) -> str:
+    """长期未出现的判定原因（写入 sold_reason 和历史记录 reason）"""
+    return f"not_seen_for_{days}_days"
+
+
+def missing_from_run_reason(run_id: int) -> str:
+    """完整抓取中缺失的判定原因"""
+    return f"missing_from_run_{run_id}"
+
+
+def list_active_sites(conn) -> List[str]:
+    """
+    获取存在 active 商品的站点
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        站点列表
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT DISTINCT site FROM crawler_item WHERE status = %s ORDER BY site",
+            (ItemStatus.ACTIVE.value,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def get_full_crawl_cutoff(conn, run_id: int):
+    """
+    校验完整抓取运行并返回其开始时间
+
+    运行必须已正常结束，且它写入的 crawler_log 已全部被 item_extract 处理，
+    否则本次运行中出现过、但尚未提取的商品会被误判为缺失
+
+    Args:
+        conn: 数据库连接对象
+        run_id: crawl_run.id
+
+    Returns:
+        运行开始时间（last_seen_dt 早于其日期的商品视为在本次抓取中缺失）
+
+    Raises:
+        ValidationError: 运行不存在、未正常结束或日志尚未提取完
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT status, started_at FROM crawl_run WHERE id = %s", (run_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValidationError(f"crawl_run 不存在: {run_id}")
+        status, started_at = row
+        if status != CrawlRunStatus.FINISHED.value:
+            raise ValidationError(f"crawl_run {run_id} 状态为 {status}，只能使用已正常结束的运行")
+
+        cursor.execute("SELECT MAX(id) FROM crawler_log WHERE run_id = %s", (run_id,))
+        max_log_id = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+    last_log_id = get_last_log_id(conn) or 0
+    if max_log_id is not None and max_log_id > last_log_id:
+        raise ValidationError(
+            f"crawl_run {run_id} 的日志尚未提取完（max log id={max_log_id} > last_log_id={last_log_id}）"
+        )
+    return started_at
+
+
+def sweep_site(
+    conn,
+    site: str,
+    reason: str,
+    sold_dt: date,
+    seen_before_dt: Optional[date] = None,
+    crawled_before=None,
+    max_ratio: Optional[float] = 0.5,
+    dry_run: bool = False
+) -> Dict:
+    """
+    把一个站点中符合条件的 active 商品标记为 sold（一条 UPDATE ... RETURNING + 批量写入状态历史，同一事务）
+
+    条件二选一：last_seen_dt < seen_before_dt（长期未出现），或 last_seen_dt 早于 crawled_before 当天（完整抓取中缺失）。
+    UPDATE 在行锁上重新检查条件，同步进程并发刷新了最后发现时间的商品不会被误标。
+
+    Args:
+        conn: 数据库连接对象
+        site: 站点
+        reason: 判定原因（写入 sold_reason 和历史记录 reason）
+        sold_dt: 判定为已售的日期
+        seen_before_dt: 最后发现日期早于该日期的商品视为已售
+        crawled_before: 最后发现日期早于该时间所在日期的商品视为已售
+        max_ratio: 标记数占该站点 active 商品的比例上限，超过时回滚（防止抓取故障导致整站下架），None 表示不限制
+        dry_run: 只统计，回滚所有修改
+
+    Returns:
+        结果字典：site / reason / active / swept / history_written / ids / aborted
+    """
+    if (seen_before_dt is None) == (crawled_before is None):
+        raise ValueError("seen_before_dt 和 crawled_before 必须且只能指定一个")
+    if execute_values is None:
+        raise ImportError("psycopg2 未安装。请运行: pip install psycopg2-binary")
+
+    if seen_before_dt is not None:
+        condition, cutoff = "ci.last_seen_dt < %s", seen_before_dt
+    else:
+        # 内容未变化的商品每天只刷新一次最后发现时间，按天比较（运行开始当天出现过的商品不会被标记）
+        condition, cutoff = "ci.last_seen_dt < (%s::timestamptz)::date", crawled_before
+
+    result = {
+        'site': site,
+        'reason': reason,
+        'active': 0,
+        'swept': 0,
+        'history_written': 0,
+        'ids': [],
+        'aborted': False
+    }
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM crawler_item WHERE site = %s AND status = %s",
+            (site, ItemStatus.ACTIVE.value)
+        )
+        result['active'] = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"""
+            UPDATE crawler_item AS ci
+            SET status = %s,
+                sold_dt = %s,
+                sold_reason = %s,
+                version = ci.version + 1,
+                updated_at = now()
+            WHERE ci.site = %s
+              AND ci.status = %s
+              AND {condition}
+            RETURNING ci.id, ci.source_uid, ci.version
+            """,
+            (ItemStatus.SOLD.value, sold_dt, reason, site, ItemStatus.ACTIVE.value, cutoff)
+        )
+        swept = cursor.fetchall()
+        result['swept'] = len(swept)
+        result['ids'] = sorted(row[0] for row in swept)
+
+        if swept and max_ratio is not None and result['active'] and len(swept) > result['active'] * max_ratio:
+            conn.rollback()
+            result['aborted'] = True
+            result['ids'] = []
+            print(
+                f"[sold_sweeper] {site}: 待标记 {len(swept)}/{result['active']} 超过上限 {max_ratio:.0%}，"
+                f"已回滚（确认无误后调大 --max-ratio）"
+            )
+            return result
+
+        if swept:
+            inserted = execute_values(
+                cursor,
+                """
+                INSERT INTO item_change_history (
+                    dt, source_uid, change_time, change_type,
+                    old_value, new_value,
+                    reason, item_version, event_key
+                ) VALUES %s
+                ON CONFLICT (event_key) DO NOTHING
+                RETURNING event_key
+                """,
+                [
+                    (
+                        sold_dt, source_uid, ChangeType.STATUS.value,
+                        ItemStatus.ACTIVE.value, ItemStatus.SOLD.value,
+                        reason, version,
+                        generate_status_event_key(source_uid, sold_dt, ItemStatus.SOLD.value)
+                    )
+                    for _, source_uid, version in swept
+                ],
+                template="(%s::date, %s, now(), %s, %s, %s, %s, %s::integer, %s)",
+                page_size=len(swept),
+                fetch=True
+            )
+            result['history_written'] = len(inserted)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        print(
+            f"[sold_sweeper] {site}: {'（dry-run）' if dry_run else ''}标记 sold {result['swept']}/{result['active']}，"
+            f"历史记录 {result['history_written']}，原因 {reason}"
+        )
+        return result
+    except Exception as e:
+        conn.rollback()
+        raise DatabaseError(f"站点 {site} 已售判定失败: {e}")
+    finally:
+        cursor.close()
+
+
+def run_sweep(
+    conn,
+    days: Optional[int] = None,
+    full_crawl_run: Optional[int] = None,
+    sites: Optional[List[str]] = None,
+    as_of: Optional[date] = None,
+    max_ratio: Optional[float] = 0.5,
+    dry_run: bool = False
+) -> Dict:
+    """
+    按站点执行已售判定
+
+    Args:
+        conn: 数据库连接对象
+        days: 超过 N 天未出现的商品标记为 sold
+        full_crawl_run: 完整抓取运行的 crawl_run.id，运行开始后未再出现的商品标记为 sold（必须指定 sites）
+        sites: 站点列表，None 表示所有存在 active 商品的站点
+        as_of: 判定日期（sold_dt），默认今天
+        max_ratio: 单个站点标记比例上限（见 sweep_site）
+        dry_run: 只统计，不提交
+
+    Returns:
+        结果字典：total_swept / total_history_written / ids（所有被标记商品的 crawler_item.id，用于删除搜索索引）/ sites
+    """
+    if (days is None) == (full_crawl_run is None):
+        raise ValueError("days 和 full_crawl_run 必须且只能指定一个")
+    as_of = as_of or date.today()
+
+    if full_crawl_run is not None:
+        if not sites:
+            raise ValueError("按完整抓取判定时必须指定站点（该运行覆盖的站点列表）")
+        crawled_before = get_full_crawl_cutoff(conn, full_crawl_run)
+        reason = missing_from_run_reason(full_crawl_run)
+        seen_before_dt = None
+    else:
+        crawled_before = None
+        reason = not_seen_reason(days)
+        seen_before_dt = as_of - timedelta(days=days)
+
+    site_results = [
+        sweep_site(
+            conn, site, reason, as_of,
+            seen_before_dt=seen_before_dt,
+            crawled_before=crawled_before,
+            max_ratio=max_ratio,
+            dry_run=dry_run
+        )
+        for site in (sites or list_active_sites(conn))
+    ]
+    return {
+        'total_swept': sum(r['swept'] for r in site_results if not r['aborted']),
+        'total_history_written': sum(r['history_written'] for r in site_results),
+        'ids': [item_id for r in site_results for item_id in r['ids']],
+        'sites': site_results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="已售判定：把长期未出现的 active 商品批量标记为 sold")
+    criterion = parser.add_mutually_exclusive_group(required=True)
+    criterion.add_argument("--days", type=int, help="超过 N 天未出现的商品标记为 sold")
+    criterion.add_argument("--full-crawl-run", type=int, metavar="RUN_ID",
+                           help="完整抓取了站点列表页的 crawl_run.id，运行开始后未再出现的商品标记为 sold（需配合 --site）")
+    parser.add_argument("--site", action="append", default=None, help="站点（可重复，默认所有站点）")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="判定日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--max-ratio", type=float, default=0.5,
+                        help="单个站点标记数占 active 商品的比例上限，超过则回滚（默认: 0.5，0 表示不限制）")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不提交")
+    parser.add_argument("--ids-output", default=None,
+                        help="把被标记商品的 crawler_item.id 写入 JSONL 文件（每行 {\"id\": ...}），供删除搜索索引使用")
+    parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+    args = parser.parse_args()
+
+    conn = get_db_connection(args.database_url)
+    try:
+        results = run_sweep(
+            conn,
+            days=args.days,
+            full_crawl_run=args.full_crawl_run,
+            sites=args.site,
+            as_of=args.as_of,
+            max_ratio=args.max_ratio or None,
+            dry_run=args.dry_run
+        )
+    except (ValueError, ValidationError) as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+
+    if args.ids_output and not args.dry_run:
+        output = Path(args.ids_output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            for item_id in results['ids']:
+                f.write(json.dumps({"id": item_id}) + "\n")
+        print(f"[sold_sweeper] 已写入 {len(results['ids'])} 个 id 到 {output}")
+
+    print(
+        f"[sold_sweeper] 完成: 标记 sold {results['total_swept']}，"
+        f"历史记录 {results['total_history_written']}"
+    )
+    if any(r['aborted'] for r in results['sites']):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,8 @@
 from typing import Optional
 from .utils import get_db_connection
 from .exceptions import DatabaseError
-
-
-# 游标键名
-CURSOR_KEY_LAST_LOG_ID = "items_sync_last_log_id"
+# 游标键名（与 storage 侧共用）
+from storage.sync_state import CURSOR_KEY_LAST_LOG_ID
 
 
 def get_last_log_id(conn) -> Optional[int]:
@@ -1,26 +1,33 @@
 """主处理流程：协调各个模块完成同步"""
 from typing import Dict, List, Optional
 from datetime import datetime
-from .log_reader import fetch_unprocessed_logs, get_log_count
-from .item_upserter import upsert_item, update_item_price
+from .log_reader import fetch_unprocessed_logs, get_log_lag
+from .item_upserter import upsert_item, update_item_price, parse_log_record
 from .change_detector import should_record_price_change
-from .history_writer import write_price_change
+from .history_writer import write_price_change, write_reactivation
+from .batch_upserter import upsert_batch
+from .price_daily import record_price_daily
 from .state_manager import get_last_log_id, update_last_log_id
+from .metrics import (
+    SyncMetrics, stage_timer, format_timings, error_class, record_sync_run, record_sync_failure
+)
 from .exceptions import DatabaseError
 
 
-def process_single_log(conn, log_record: Dict) -> Dict:
+def process_single_log(conn, log_record: Dict, timings: Optional[Dict[str, float]] = None) -> Dict:
     """
     处理单条 log 记录
     
     步骤：
-    1. Upsert item（获取 old_price）
+    1. Upsert item（获取 old_price；已售 / 下架的商品恢复为 active 并写入状态 history；
+       log_id 不大于商品 last_log_id 的记录已经应用过，直接返回成功）
     2. 检测价格变化
     3. 如果变化，更新 item 价格字段并写入 history
     
     Args:
         conn: 数据库连接对象
         log_record: crawler_log 记录字典
+        timings: 阶段耗时累加字典（upsert / history），None 表示不计时
         
     Returns:
         处理结果字典，包含：
@@ -29,18 +36,45 @@ def process_single_log(conn, log_record: Dict) -> Dict:
         - price_changed: 价格是否变化
         - history_written: 是否写入了历史记录
         - error: 错误信息（如果有）
+        - error_type: 错误类型（如果有，见 metrics.error_class）
     """
     try:
         # 1. Upsert item（获取 old_price）
-        item_data, old_price = upsert_item(conn, log_record)
+        with stage_timer(timings, 'upsert'):
+            item_data, old_price = upsert_item(conn, log_record)
         
         source_uid = item_data['source_uid']
+        if item_data['already_applied']:
+            # 已经应用过的记录：不产生状态或价格历史
+            return {
+                'success': True,
+                'source_uid': source_uid,
+                'price_changed': False,
+                'history_written': False,
+                'old_price': old_price,
+                'new_price': old_price,
+                'error': None
+            }
+        
         new_price = item_data['price']
         crawl_time = item_data['crawl_time']
         dt = item_data['dt']
         log_id = item_data['log_id']
         current_version = item_data['version']
         
+        if item_data['reactivated_from']:
+            # 已售 / 下架的商品再次出现（write_reactivation 自行提交）
+            with stage_timer(timings, 'history'):
+                write_reactivation(
+                    conn,
+                    source_uid,
+                    item_data['reactivated_from'],
+                    log_id,
+                    crawl_time,
+                    dt,
+                    current_version
+                )
+        
         # 2. 检测价格变化
         price_changed = should_record_price_change(old_price, new_price)
         
@@ -49,28 +83,30 @@ def process_single_log(conn, log_record: Dict) -> Dict:
         if price_changed:
             # 3. 价格变化：更新 item 价格相关字段
             new_version = current_version + 1
-            update_item_price(
-                conn,
-                source_uid,
-                new_price,
-                crawl_time,
-                dt,
-                new_version
-            )
+            with stage_timer(timings, 'upsert'):
+                update_item_price(
+                    conn,
+                    source_uid,
+                    new_price,
+                    crawl_time,
+                    dt,
+                    new_version
+                )
             
-            # 4. 写入历史记录
+            # 4. 写入历史记录（write_price_change 自行提交）
             currency = item_data.get('currency', 'JPY')
-            history_written = write_price_change(
-                conn,
-                source_uid,
-                old_price,
-                new_price,
-                currency,
-                log_id,
-                crawl_time,
-                dt,
-                new_version
-            )
+            with stage_timer(timings, 'history'):
+                history_written = write_price_change(
+                    conn,
+                    source_uid,
+                    old_price,
+                    new_price,
+                    currency,
+                    log_id,
+                    crawl_time,
+                    dt,
+                    new_version
+                )
         
         return {
             'success': True,
@@ -88,34 +124,52 @@ def process_single_log(conn, log_record: Dict) -> Dict:
             'source_uid': log_record.get('source_uid', 'unknown'),
             'price_changed': False,
             'history_written': False,
-            'error': str(e)
+            'error': str(e),
+            'error_type': error_class(e)
         }
 
 
-def process_batch(conn, log_records: List[Dict]) -> Dict:
+def process_batch(conn, log_records: List[Dict], batch_mode: bool = False) -> Dict:
     """
     批量处理日志记录
     
     Args:
         conn: 数据库连接对象
         log_records: 日志记录列表
+        batch_mode: 使用集合操作（batch_upserter.upsert_batch）整批处理；
+            SQL 失败时回滚并回退为逐行处理，逐行路径会给出具体出错的记录
         
     Returns:
-        处理结果统计字典
+        处理结果统计字典；timings 为各阶段耗时（upsert / history / commit），
+        batch_fallbacks 为批量模式回退为逐行处理的次数（0 或 1）
     """
+    batch_fallbacks = 0
+    if batch_mode:
+        try:
+            results = upsert_batch(conn, log_records)
+            results['batch_fallbacks'] = 0
+            return results
+        except DatabaseError as e:
+            print(f"[sync_processor] {e}，本批回退为逐行处理")
+            batch_fallbacks = 1
+    
     results = {
         'total': len(log_records),
         'success': 0,
         'failed': 0,
         'price_changed': 0,
         'history_written': 0,
-        'errors': []
+        'errors': [],
+        'timings': {},
+        'batch_fallbacks': batch_fallbacks
     }
     
+    processed_items = []
     for log_record in log_records:
-        result = process_single_log(conn, log_record)
+        result = process_single_log(conn, log_record, timings=results['timings'])
         
         if result['success']:
+            processed_items.append(parse_log_record(log_record))
             results['success'] += 1
             if result['price_changed']:
                 results['price_changed'] += 1
@@ -126,16 +180,22 @@ def process_batch(conn, log_records: List[Dict]) -> Dict:
             results['errors'].append({
                 'log_id': log_record.get('id'),
                 'source_uid': result.get('source_uid'),
-                'error': result.get('error')
+                'error': result.get('error'),
+                'error_type': result.get('error_type')
             })
     
+    # 每日价格聚合（随后续游标更新一起提交）
+    with stage_timer(results['timings'], 'history'):
+        record_price_daily(conn, processed_items)
+    
     return results
 
 
 def run_sync(
     conn,
     batch_size: int = 100,
-    max_records: Optional[int] = None
+    max_records: Optional[int] = None,
+    batch_mode: bool = False
 ) -> Dict:
     """
     主运行函数：执行完整的同步流程
@@ -146,22 +206,27 @@ def run_sync(
     3. 批量处理
     4. 更新 last_log_id
     
+    每批的各阶段耗时（fetch / upsert / history / commit）、吞吐、按错误类型的失败数和
+    运行结束时的游标延迟写入 pipeline_state（见 metrics.record_sync_run），失败的运行记录到 run_failures
+    
     Args:
         conn: 数据库连接对象
         batch_size: 批量大小
         max_records: 最大处理记录数（None 表示不限制）
+        batch_mode: 使用集合操作的批量 upsert（见 process_batch）
         
     Returns:
-        同步结果统计字典
+        同步结果统计字典（metrics 为本次运行的指标）
     """
+    metrics = SyncMetrics()
     try:
         # 1. 获取 last_log_id
         last_log_id = get_last_log_id(conn) or 0
         
-        # 获取待处理记录数
-        total_pending = get_log_count(conn, last_log_id)
+        # 同步延迟（max id - 游标），不再对待处理记录做 COUNT(*)
+        lag = get_log_lag(conn, last_log_id)
         
-        print(f"[sync_processor] 开始同步，last_log_id={last_log_id}, 待处理记录数={total_pending}")
+        print(f"[sync_processor] 开始同步，last_log_id={last_log_id}, lag={lag}")
         
         # 2. 读取并处理记录
         total_processed = 0
@@ -183,14 +248,17 @@ def run_sync(
             remaining = max_records - total_processed if max_records else None
             current_batch_size = min(batch_size, remaining) if remaining else batch_size
             
-            log_records = fetch_unprocessed_logs(conn, current_log_id, current_batch_size)
+            timings = {}
+            with stage_timer(timings, 'fetch'):
+                log_records = fetch_unprocessed_logs(conn, current_log_id, current_batch_size)
             
             if not log_records:
                 print(f"[sync_processor] 没有更多待处理记录")
                 break
             
             # 处理这一批
-            batch_results = process_batch(conn, log_records)
+            batch_results = process_batch(conn, log_records, batch_mode=batch_mode)
+            batch_timings = metrics.observe_batch(batch_results, timings)
             
             # 更新统计
             total_processed += batch_results['total']
@@ -206,10 +274,11 @@ def run_sync(
             max_log_id = max(max_log_id, batch_max_id)
             
             print(
-                f"[sync_processor] 已处理 {total_processed}/{total_pending} 条记录, "
+                f"[sync_processor] 已处理 {total_processed} 条记录（lag={lag}）, "
                 f"成功={total_success}, 失败={total_failed}, "
                 f"价格变化={total_price_changed}, 历史记录={total_history_written}, "
-                f"current_log_id={current_log_id}"
+                f"current_log_id={current_log_id}, "
+                f"耗时 {format_timings(batch_timings)}"
             )
             
             # 如果这批记录数小于 batch_size，说明已经处理完所有记录
@@ -218,9 +287,13 @@ def run_sync(
         
         # 3. 更新 last_log_id（只有在成功处理后才更新）
         if max_log_id > last_log_id:
-            update_last_log_id(conn, max_log_id)
+            with stage_timer(metrics.stage_seconds, 'commit'):
+                update_last_log_id(conn, max_log_id)
             print(f"[sync_processor] 更新 last_log_id: {last_log_id} -> {max_log_id}")
         
+        metrics.finish()
+        record_sync_run(conn, metrics)
+        
         return {
             'total_processed': total_processed,
             'total_success': total_success,
@@ -229,9 +302,12 @@ def run_sync(
             'total_history_written': total_history_written,
             'last_log_id_before': last_log_id,
             'last_log_id_after': max_log_id,
-            'errors': all_errors
+            'lag': lag,
+            'errors': all_errors,
+            'metrics': metrics.to_dict()
         }
         
     except Exception as e:
+        record_sync_failure(conn, e)
         raise DatabaseError(f"同步流程失败: {e}")
 
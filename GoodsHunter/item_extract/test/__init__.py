@@ -0,0 +1 @@
+"""Item Extract测试模块"""
@@ -0,0 +1,141 @@
+"""内存中的 crawler_item / item_change_history / pipeline_state 替身，按逐行路径（item_upserter / history_writer / state_manager）的 SQL 执行"""
+from typing import Dict, List, Optional
+
+
+def _normalize(sql: str) -> str:
+    """压缩 SQL 中的空白，便于按片段匹配"""
+    return " ".join(sql.split())
+
+
+class FakeCursor:
+    """只支持逐行路径用到的几条 SQL 的游标"""
+
+    def __init__(self, conn: "FakeConnection"):
+        self.conn = conn
+        self.rowcount = -1
+        self._result: List[tuple] = []
+
+    def execute(self, sql: str, params: tuple = ()):
+        sql = _normalize(sql)
+        self.conn.statements.append(sql)
+        items = self.conn.items
+        self._result = []
+        self.rowcount = 0
+
+        if sql.startswith("SELECT id, price, version, last_raw_hash, status, last_log_id FROM crawler_item"):
+            row = items.get(params[0])
+            if row is not None:
+                self._result = [(row['id'], row['price'], row['version'], row['last_raw_hash'], row['status'],
+                                 row['last_log_id'])]
+        elif sql.startswith("SELECT id, price, version, status, last_log_id FROM crawler_item") and sql.endswith("FOR UPDATE"):
+            row = items.get(params[0])
+            if row is not None:
+                self._result = [(row['id'], row['price'], row['version'], row['status'], row['last_log_id'])]
+        elif sql.startswith("UPDATE crawler_item SET last_seen_dt = %s, last_crawl_time = GREATEST"):
+            dt, crawl_time, log_id, item_id, raw_hash, status, _ = params
+            row = self.conn.row_by_id(item_id)
+            if row['last_raw_hash'] == raw_hash and row['status'] == status and row['last_seen_dt'] < dt:
+                row['last_seen_dt'] = dt
+                row['last_crawl_time'] = max(row['last_crawl_time'], crawl_time)
+                row['last_log_id'] = max(row['last_log_id'], log_id)
+                self.rowcount = 1
+        elif sql.startswith("INSERT INTO crawler_item"):
+            (source_uid, site, category, item_id, brand_name, model_name, model_no,
+             currency, price, image_sha256, image_phash, image_original_key,
+             image_thumb_300_key, image_thumb_600_key, product_url,
+             first_seen_dt, last_seen_dt, crawl_time, log_id, raw_hash, version) = params
+            new_id = len(items) + 1
+            items[source_uid] = {
+                'id': new_id, 'source_uid': source_uid, 'site': site, 'category': category,
+                'item_id': item_id, 'brand_name': brand_name, 'model_name': model_name,
+                'model_no': model_no, 'currency': currency, 'price': price,
+                'image_sha256': image_sha256, 'image_phash': image_phash,
+                'image_original_key': image_original_key, 'image_thumb_300_key': image_thumb_300_key,
+                'image_thumb_600_key': image_thumb_600_key, 'product_url': product_url,
+                'status': 'active', 'sold_dt': None, 'sold_reason': None, 'first_seen_dt': first_seen_dt, 'last_seen_dt': last_seen_dt,
+                'last_crawl_time': crawl_time, 'last_log_id': log_id, 'last_raw_hash': raw_hash,
+                'price_last_changed_at': None, 'price_last_changed_dt': None, 'version': version,
+            }
+            self._result = [(new_id,)]
+            self.rowcount = 1
+        elif sql.startswith("UPDATE crawler_item SET last_seen_dt = %s, last_crawl_time = %s"):
+            dt, crawl_time, log_id, product_url, image_phash, raw_hash, status, version = params[:8]
+            row = self.conn.row_by_id(params[-1])
+            row.update({'status': status, 'sold_dt': None, 'sold_reason': None, 'version': version})
+            row['last_seen_dt'] = dt
+            row['last_crawl_time'] = crawl_time
+            row['last_log_id'] = log_id
+            row['product_url'] = product_url
+            if row['image_phash'] is None:
+                row['image_phash'] = image_phash
+            if raw_hash is not None:
+                row['last_raw_hash'] = raw_hash
+            self.rowcount = 1
+        elif sql.startswith("UPDATE crawler_item SET price = %s"):
+            price, changed_at, changed_dt, version, source_uid = params
+            row = items[source_uid]
+            row.update({
+                'price': price, 'price_last_changed_at': changed_at,
+                'price_last_changed_dt': changed_dt, 'version': version,
+            })
+            self.rowcount = 1
+        elif sql.startswith("SELECT value FROM pipeline_state WHERE key = %s"):
+            if params[0] in self.conn.state:
+                self._result = [(self.conn.state[params[0]],)]
+        elif sql.startswith("INSERT INTO pipeline_state (key, value, updated_at)"):
+            self.conn.state[params[0]] = params[1]
+            self.rowcount = 1
+        elif sql.startswith("INSERT INTO item_change_history"):
+            if len(params) == 10:
+                # 价格变化：reason 固定为 'crawler_update'
+                params = (*params[:7], 'crawler_update', *params[7:])
+            if params[-1] not in self.conn.history:
+                self.conn.history[params[-1]] = tuple(params)
+                self.rowcount = 1
+        else:
+            raise NotImplementedError(f"FakeCursor 不支持的 SQL: {sql}")
+
+    def fetchone(self) -> Optional[tuple]:
+        return self._result[0] if self._result else None
+
+    def fetchall(self) -> List[tuple]:
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """持有内存表的连接替身；commit / rollback 只计数"""
+
+    def __init__(self):
+        self.items: Dict[str, Dict] = {}
+        self.history: Dict[str, tuple] = {}
+        self.state: Dict[str, str] = {}
+        self.statements: List[str] = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def mark_sold(self, source_uid: str, sold_dt, reason: str = "not_seen_for_7_days"):
+        """模拟 sold_sweeper 把商品标记为 sold（version + 1）"""
+        row = self.items[source_uid]
+        row.update({'status': 'sold', 'sold_dt': sold_dt, 'sold_reason': reason, 'version': row['version'] + 1})
+
+    def row_by_id(self, item_id: int) -> Dict:
+        return next(row for row in self.items.values() if row['id'] == item_id)
+
+    def writes(self) -> List[str]:
+        """已执行的写语句（INSERT / UPDATE）"""
+        return [sql for sql in self.statements if not sql.startswith("SELECT")]
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
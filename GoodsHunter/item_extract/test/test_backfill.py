@@ -0,0 +1,105 @@
+"""部分区间回填的初始状态（seed_state）测试：在起点处切开重放与整段重放结果相同（不依赖数据库）"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from item_extract.backfill import _MERGE_SET, seed_state
+from item_extract.batch_upserter import coalesce_group, price_change_row
+from item_extract.item_upserter import parse_log_record
+
+PRICES = [1000, 1000, 1200, 1200, 900, 900, 900, 1500]
+
+
+def make_logs(prices):
+    """同一商品每天一条日志"""
+    start = datetime(2026, 2, 1, 8, 0, 0)
+    logs = []
+    for i, price in enumerate(prices):
+        crawl_time = start + timedelta(days=i)
+        logs.append({
+            'id': 500 + i * 3,
+            'site': 'example.com',
+            'category': 'bag',
+            'item_id': 'B7',
+            'currency': 'JPY',
+            'price': price,
+            'image_phash': 'aa55aa55aa55aa55' if i >= 1 else None,
+            'product_url': 'https://example.com/items/B7',
+            'raw_hash': f"hash-{price}",
+            'crawl_time': crawl_time,
+            'dt': crawl_time.date(),
+        })
+    return logs
+
+
+def coalesce(state, logs):
+    return coalesce_group(state, [parse_log_record(log) for log in logs])
+
+
+def seed_from_history(logs_before, events_before):
+    """按 _SEED_SQL 的取法，从起点之前的日志、商品行和历史事件构造初始状态"""
+    before, _ = coalesce(None, logs_before)
+    price_events = [event for event in events_before if event['change_type'] == 'price']
+    last_price = price_events[-1] if price_events else None
+    return seed_state(
+        logs_before[-1],
+        first_seen_dt=before['first_seen_dt'],
+        image_phash=before['image_phash'],
+        version=events_before[-1]['version'] if events_before else None,
+        price_event=(
+            (last_price['crawl_time'], last_price['dt'], str(last_price['price'])) if last_price else None
+        )
+    )
+
+
+@pytest.mark.parametrize("split", range(1, len(PRICES)))
+def test_split_range_matches_full_replay(split):
+    """在任意起点切开：起点之前的状态 + 区间内重放 = 整段重放（状态和区间内的价格事件都相同）"""
+    logs = make_logs(PRICES)
+    full_state, full_events = coalesce(None, logs)
+
+    _, events_before = coalesce(None, logs[:split])
+    state, events = coalesce(seed_from_history(logs[:split], events_before), logs[split:])
+
+    assert state == full_state
+    assert [price_change_row(e) for e in events_before + events] == [price_change_row(e) for e in full_events]
+
+
+def test_first_change_at_start_is_kept():
+    """起点处的第一条日志就是一次变价：版本号接续、事件不丢失（从空状态重放会丢掉它并把版本号重置为 1）"""
+    logs = make_logs(PRICES)
+    split = 2  # logs[2] 价格 1000 -> 1200
+    _, events_before = coalesce(None, logs[:split])
+    state, events = coalesce(seed_from_history(logs[:split], events_before), logs[split:])
+    assert (events[0]['old_price'], events[0]['price'], events[0]['log_id']) == (1000, 1200, logs[2]['id'])
+    assert state['version'] == 4
+
+    empty_state, empty_events = coalesce(None, logs[split:])
+    assert empty_state['version'] == 3
+    assert empty_events[0]['old_price'] == 1200
+
+
+def test_seed_without_price_events_keeps_last_price():
+    """起点之前没有价格事件：价格取最后一条日志，版本号为 1，最后变价时间为空"""
+    logs = make_logs([800, 800, 800])
+    state = seed_state(logs[-1], first_seen_dt=logs[0]['dt'])
+    assert (state['price'], state['version'], state['price_last_changed_at']) == (800, 1, None)
+    assert state['first_seen_dt'] == logs[0]['dt']
+    assert state['last_log_id'] == logs[-1]['id']
+
+
+def test_merge_never_moves_sightings_or_version_backwards():
+    """合并不回退最后发现时间（精简模式的发现不在日志中）和版本号（区间内的状态事件不重放）"""
+    merge_set = {line.strip().rstrip(',') for line in _MERGE_SET.splitlines()}
+    assert "last_seen_dt = GREATEST(ci.last_seen_dt, EXCLUDED.last_seen_dt)" in merge_set
+    assert "last_crawl_time = GREATEST(ci.last_crawl_time, EXCLUDED.last_crawl_time)" in merge_set
+    assert "version = GREATEST(ci.version, EXCLUDED.version)" in merge_set
+    assert "first_seen_dt = LEAST(ci.first_seen_dt, EXCLUDED.first_seen_dt)" in merge_set
@@ -0,0 +1,116 @@
+"""批量合并（group_by_source_uid / coalesce_group）的顺序、去重与跳过测试（不依赖数据库）"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from item_extract.batch_upserter import coalesce_group, group_by_source_uid, price_change_row
+from item_extract.item_upserter import parse_log_record
+
+
+def make_item(log_id, item_id, price, day=0):
+    """构造一条 parse_log_record 结果"""
+    crawl_time = datetime(2026, 3, 1, 9, 0, 0) + timedelta(days=day, minutes=log_id)
+    return parse_log_record({
+        'id': log_id,
+        'site': 'example.com',
+        'category': 'watch',
+        'item_id': item_id,
+        'currency': 'JPY',
+        'price': price,
+        'product_url': f"https://example.com/items/{item_id}",
+        'raw_hash': f"hash-{item_id}-{price}",
+        'crawl_time': crawl_time,
+        'dt': crawl_time.date(),
+    })
+
+
+def event_keys(groups, current=None):
+    """对每组合并，返回 {source_uid: [event_key, ...]} 和 {source_uid: 最终状态}"""
+    current = current or {}
+    keys, states = {}, {}
+    for source_uid, group in groups.items():
+        states[source_uid], events = coalesce_group(current.get(source_uid), group)
+        keys[source_uid] = [price_change_row(event)[-1] for event in events]
+    return keys, states
+
+
+# 两个商品交错出现，每个商品多条记录
+SEQUENCE = [
+    make_item(1, 'A', 1000), make_item(2, 'B', 500), make_item(3, 'A', 1200),
+    make_item(4, 'A', 1200, day=1), make_item(5, 'B', 450), make_item(6, 'A', 1100, day=1),
+    make_item(7, 'B', 450, day=2), make_item(8, 'B', 400, day=2),
+]
+
+
+def test_group_sorts_by_log_id():
+    """组内按 log_id 升序，与输入顺序无关"""
+    shuffled = SEQUENCE[:]
+    random.Random(42).shuffle(shuffled)
+    groups = group_by_source_uid(shuffled)
+    assert set(groups) == {'example.com:watch:A', 'example.com:watch:B'}
+    for group in groups.values():
+        assert [item['log_id'] for item in group] == sorted(item['log_id'] for item in group)
+
+
+def test_out_of_order_input_gives_same_event_keys():
+    """乱序输入与顺序输入产生相同的最终状态和 event_key"""
+    expected_keys, expected_states = event_keys(group_by_source_uid(SEQUENCE))
+    assert [len(keys) for keys in expected_keys.values()] == [2, 2]
+    for seed in range(5):
+        shuffled = SEQUENCE[:]
+        random.Random(seed).shuffle(shuffled)
+        keys, states = event_keys(group_by_source_uid(shuffled))
+        assert keys == expected_keys
+        assert states == expected_states
+
+
+def test_multiple_rows_per_source_uid_in_one_batch():
+    """同一批内同一商品多条记录：逐条合并与整组合并结果相同，version 按变化次数递增"""
+    whole_keys, whole_states = event_keys(group_by_source_uid(SEQUENCE))
+
+    states, keys = {}, {}
+    for item in SEQUENCE:
+        uid = item['source_uid']
+        states[uid], events = coalesce_group(states.get(uid), [item])
+        keys.setdefault(uid, []).extend(price_change_row(event)[-1] for event in events)
+
+    assert keys == whole_keys
+    assert states == whole_states
+    assert whole_states['example.com:watch:A']['version'] == 3
+    assert whole_states['example.com:watch:A']['price'] == 1100
+    assert whole_states['example.com:watch:B']['last_log_id'] == 8
+
+
+def test_already_applied_log_ids_are_skipped():
+    """log_id 不大于当前 last_log_id 的记录已经应用过，重复读到时跳过，event_key 不变"""
+    first_half = [item for item in SEQUENCE if item['log_id'] <= 4]
+    second_half = [item for item in SEQUENCE if item['log_id'] > 4]
+    first_keys, first_states = event_keys(group_by_source_uid(first_half))
+
+    # 同步循环再次读到已写入的记录（含 inline 模式已应用的前半段）
+    replay_keys, replay_states = event_keys(group_by_source_uid(first_half), first_states)
+    assert replay_keys == {uid: [] for uid in first_keys}
+    assert replay_states == first_states
+
+    # 前后两段重叠时，只有新记录产生事件，合起来与整段一次合并相同
+    overlap_keys, overlap_states = event_keys(group_by_source_uid(first_half[1:] + second_half), first_states)
+    whole_keys, whole_states = event_keys(group_by_source_uid(SEQUENCE))
+    for uid in whole_keys:
+        assert first_keys[uid] + overlap_keys[uid] == whole_keys[uid]
+    assert overlap_states == whole_states
+
+
+def test_last_log_id_never_moves_backwards():
+    """较早的 log_id 晚到时不回退 last_log_id，也不改写价格"""
+    _, states = event_keys(group_by_source_uid([make_item(10, 'C', 900), make_item(11, 'C', 800)]))
+    keys, late = event_keys(group_by_source_uid([make_item(9, 'C', 700)]), states)
+    assert keys == {'example.com:watch:C': []}
+    assert late['example.com:watch:C']['last_log_id'] == 11
+    assert late['example.com:watch:C']['price'] == 800
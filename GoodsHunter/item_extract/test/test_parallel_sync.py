@@ -0,0 +1,154 @@
+"""并行同步的分片游标和全局低水位测试（不依赖数据库）"""
+import sys
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from item_extract import parallel_sync
+from item_extract.exceptions import DatabaseError
+from item_extract.parallel_sync import run_parallel_sync, shard_cursor_key, sync_shard
+from item_extract.state_manager import CURSOR_KEY_LAST_LOG_ID
+from item_extract.test.fake_db import FakeConnection
+
+
+def make_logs(entries):
+    """按 (item_id, price) 序列构造 crawler_log 记录，id 从 101 开始，每条相隔一天"""
+    start = datetime(2026, 3, 1, 9, 0, 0)
+    logs = []
+    for i, (item_id, price) in enumerate(entries):
+        crawl_time = start + timedelta(days=i)
+        logs.append({
+            'id': 101 + i,
+            'site': 'example.com',
+            'category': 'watch',
+            'item_id': item_id,
+            'currency': 'JPY',
+            'price': price,
+            'image_phash': None,
+            'product_url': f"https://example.com/items/{item_id}",
+            'raw_hash': f"hash-{item_id}-{price}",
+            'crawl_time': crawl_time,
+            'dt': crawl_time.date(),
+        })
+    return logs
+
+
+class InlineExecutor:
+    """在当前进程中同步执行 submit 的执行器替身"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def fake_sync(monkeypatch):
+    """
+    用 FakeConnection 替换数据库：分片按 shard_of[item_id] 划分（代替 hashtext），
+    failing_shards 中的分片读取日志时抛出异常
+    """
+    conn = FakeConnection()
+    env = {'conn': conn, 'logs': [], 'shard_of': {}, 'failing_shards': set(), 'cursor_writes': []}
+
+    def fetch_shard_logs(_conn, last_log_id, max_log_id, shard, shards, batch_size=100):
+        if shard in env['failing_shards']:
+            raise DatabaseError(f"shard {shard} down")
+        return [
+            dict(log) for log in env['logs']
+            if last_log_id < log['id'] <= max_log_id and env['shard_of'][log['item_id']] % shards == shard
+        ][:batch_size]
+
+    original_set_state = parallel_sync.set_state
+
+    def set_state(_conn, key, value):
+        env['cursor_writes'].append((key, int(value)))
+        original_set_state(_conn, key, value)
+
+    monkeypatch.setattr(parallel_sync, 'get_db_connection', lambda database_url=None: conn)
+    monkeypatch.setattr(parallel_sync, 'fetch_shard_logs', fetch_shard_logs)
+    monkeypatch.setattr(parallel_sync, 'get_max_log_id', lambda _conn: max(log['id'] for log in env['logs']))
+    monkeypatch.setattr(parallel_sync, 'set_state', set_state)
+    monkeypatch.setattr(parallel_sync, 'record_sync_run', lambda _conn, metrics: None)
+    monkeypatch.setattr(parallel_sync, 'record_sync_failure', lambda _conn, error: None)
+    return env
+
+
+def test_shard_cursor_advances_per_batch_and_to_upper_bound(fake_sync):
+    """分片游标每批推进到本批最大 id，取完本分片的记录后直接推进到上界"""
+    fake_sync['logs'] = make_logs([('A', 1000), ('B', 2000), ('A', 1100), ('B', 2100), ('A', 1200)])
+    fake_sync['shard_of'] = {'A': 0, 'B': 1}
+
+    results = sync_shard(None, 0, 2, max_log_id=105, batch_size=2)
+
+    assert results['total_processed'] == 3
+    assert results['last_log_id_before'] == 0
+    assert results['last_log_id_after'] == 105
+    key = shard_cursor_key(0, 2)
+    assert fake_sync['cursor_writes'] == [(key, 103), (key, 105)]
+    assert fake_sync['conn'].state[key] == '105'
+
+
+def test_shard_starts_from_global_cursor_when_it_is_ahead(fake_sync):
+    """单进程 run_sync 已把全局游标推进到分片游标之后时，分片从全局游标继续"""
+    fake_sync['logs'] = make_logs([('A', 1000), ('A', 1100), ('A', 1200)])
+    fake_sync['shard_of'] = {'A': 0}
+    conn = fake_sync['conn']
+    conn.state[CURSOR_KEY_LAST_LOG_ID] = '102'
+    conn.state[shard_cursor_key(0, 2)] = '101'
+
+    results = sync_shard(None, 0, 2, max_log_id=103)
+
+    assert results['last_log_id_before'] == 102
+    assert results['total_processed'] == 1
+
+
+def test_watermark_stops_at_failed_shard(fake_sync):
+    """全局游标取各分片游标的最小值：失败分片的游标拖住低水位，运行整体报错"""
+    fake_sync['logs'] = make_logs([('A', 1000), ('B', 2000), ('A', 1100)])
+    fake_sync['shard_of'] = {'A': 0, 'B': 1}
+    fake_sync['failing_shards'] = {1}
+    conn = fake_sync['conn']
+    conn.state[CURSOR_KEY_LAST_LOG_ID] = '100'
+    conn.state[shard_cursor_key(1, 2)] = '101'
+
+    with pytest.raises(DatabaseError):
+        run_parallel_sync(None, workers=2, executor=InlineExecutor())
+
+    assert conn.state[shard_cursor_key(0, 2)] == '103'
+    assert conn.state[CURSOR_KEY_LAST_LOG_ID] == '101'
+
+
+def test_reread_from_watermark_after_changing_workers_does_not_reapply(fake_sync):
+    """调整 workers 后从低水位重读领先分片已处理的日志（默认逐行路径）：商品和历史不变"""
+    fake_sync['logs'] = make_logs([('A', 1000), ('B', 2000), ('A', 1200), ('B', 2100), ('A', 1000)])
+    fake_sync['shard_of'] = {'A': 0, 'B': 1}
+    fake_sync['failing_shards'] = {1}
+    conn = fake_sync['conn']
+
+    with pytest.raises(DatabaseError):
+        run_parallel_sync(None, workers=2, executor=InlineExecutor())
+    assert CURSOR_KEY_LAST_LOG_ID not in conn.state
+    assert conn.state[shard_cursor_key(0, 2)] == '105'
+    item_a = dict(conn.items['example.com:watch:A'])
+    history_a = {k: v for k, v in conn.history.items() if v[1] == 'example.com:watch:A'}
+    assert item_a['version'] == 3 and len(history_a) == 2
+
+    fake_sync['failing_shards'] = set()
+    results = run_parallel_sync(None, workers=3, executor=InlineExecutor())
+
+    assert results['last_log_id_after'] == 105
+    assert conn.items['example.com:watch:A'] == item_a
+    assert {k: v for k, v in conn.history.items() if v[1] == 'example.com:watch:A'} == history_a
+    assert conn.items['example.com:watch:B']['version'] == 2
@@ -0,0 +1,176 @@
+"""逐行路径（process_single_log）与批量路径（coalesce_group / change_row）等价性测试（不依赖数据库）"""
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from item_extract.batch_upserter import coalesce_group, group_by_source_uid, change_row
+from item_extract.item_upserter import parse_log_record
+from item_extract.sync_processor import process_single_log
+from item_extract.test.fake_db import FakeConnection
+
+SOURCE_UID = "example.com:watch:A1"
+
+# 两条路径都维护的商品字段
+COMPARED_FIELDS = (
+    'price', 'version', 'price_last_changed_at', 'price_last_changed_dt',
+    'first_seen_dt', 'last_seen_dt', 'last_crawl_time', 'last_log_id',
+    'last_raw_hash', 'product_url', 'image_phash', 'status',
+)
+
+
+def make_logs(prices, same_day=False):
+    """按价格序列构造同一商品的 crawler_log 记录（默认每条相隔一天，价格决定 raw_hash）"""
+    start = datetime(2026, 3, 1, 9, 0, 0)
+    logs = []
+    for i, price in enumerate(prices):
+        crawl_time = start + (timedelta(minutes=i) if same_day else timedelta(days=i))
+        logs.append({
+            'id': 100 + i,
+            'site': 'example.com',
+            'category': 'watch',
+            'item_id': 'A1',
+            'currency': 'JPY',
+            'price': price,
+            'image_phash': 'ff00ff00ff00ff00',
+            'product_url': "https://example.com/items/A1",
+            'raw_hash': f"hash-{price}",
+            'crawl_time': crawl_time,
+            'dt': crawl_time.date(),
+        })
+    return logs
+
+
+def run_row_path(logs):
+    """逐条经 process_single_log 处理，返回 (最终商品行, 历史行列表)"""
+    conn = FakeConnection()
+    for log in logs:
+        result = process_single_log(conn, log)
+        assert result['success'], result['error']
+    return conn.items[SOURCE_UID], list(conn.history.values())
+
+
+def run_batch_path(logs, batch_size):
+    """按 batch_size 分批经 coalesce_group 合并（批间传递状态），返回 (最终状态, 历史行列表)"""
+    state = None
+    rows = []
+    for start in range(0, len(logs), batch_size):
+        items = [parse_log_record(log) for log in logs[start:start + batch_size]]
+        state, events = coalesce_group(state, group_by_source_uid(items)[SOURCE_UID])
+        rows.extend(change_row(event) for event in events)
+    return state, rows
+
+
+def assert_equivalent(logs, fields=COMPARED_FIELDS):
+    """两条路径的商品字段、版本号和历史行（含 event_key）完全一致"""
+    row_item, row_history = run_row_path(logs)
+    for batch_size in (1, 2, len(logs)):
+        state, batch_history = run_batch_path(logs, batch_size)
+        assert {f: state[f] for f in fields} == {f: row_item[f] for f in fields}, batch_size
+        assert batch_history == row_history, batch_size
+    return row_item, row_history
+
+
+def test_price_changes_match():
+    """普通价格变化：每次变化 version + 1，event_key 相同"""
+    item, history = assert_equivalent(make_logs([1000, 1200, 900]))
+    assert item['version'] == 3
+    assert [(row[4], row[5]) for row in history] == [('1000', '1200'), ('1200', '900')]
+
+
+def test_price_to_none_and_back_match():
+    """价格 → None 记录一次变化；旧价格为 None 时按新商品规则不记录（两条路径相同）"""
+    item, history = assert_equivalent(make_logs([1000, None, 800]))
+    assert [(row[4], row[5]) for row in history] == [('1000', None)]
+    assert item['version'] == 2
+
+
+def test_none_initial_price_match():
+    """首次出现时价格为 None：之后出现价格不产生历史"""
+    item, history = assert_equivalent(make_logs([None, None, 1500, 1500]))
+    assert history == []
+    assert item['version'] == 1
+
+
+def test_repeated_prices_across_days_match():
+    """跨天重复相同价格：不产生历史，最后发现时间随之前移"""
+    logs = make_logs([1000, 1000, 1000, 1100, 1100])
+    item, history = assert_equivalent(logs)
+    assert len(history) == 1
+    assert item['last_seen_dt'] == logs[-1]['dt']
+    assert item['version'] == 2
+
+
+def test_repeated_prices_same_day_match():
+    """同一天重复相同价格：价格、版本和历史一致
+
+    逐行路径的同日重复只做无写入的短路（last_log_id / last_crawl_time 不前移），只比较价格相关字段
+    """
+    fields = ('price', 'version', 'price_last_changed_at', 'price_last_changed_dt', 'last_seen_dt', 'last_raw_hash')
+    item, history = assert_equivalent(make_logs([1000, 1000, 1200, 1200, 1200], same_day=True), fields)
+    assert len(history) == 1
+    assert item['last_seen_dt'] == date(2026, 3, 1)
+
+
+def test_sold_item_reactivated_on_sighting_match():
+    """已售商品再次出现：两条路径都恢复为 active、version + 1，写入相同 event_key 的状态历史，随后的价格变化照常记录"""
+    logs = make_logs([1000, 1000, 1000, 1300])
+    sold_dt = logs[1]['dt'] + timedelta(days=7)
+
+    conn = FakeConnection()
+    for log in logs[:2]:
+        assert process_single_log(conn, log)['success']
+    conn.mark_sold(SOURCE_UID, sold_dt)
+    for log in logs[2:]:
+        assert process_single_log(conn, log)['success']
+    row_item, row_history = conn.items[SOURCE_UID], list(conn.history.values())
+
+    state, _ = coalesce_group(None, group_by_source_uid([parse_log_record(log) for log in logs[:2]])[SOURCE_UID])
+    state.update({'status': 'sold', 'version': state['version'] + 1})
+    state, events = coalesce_group(state, group_by_source_uid([parse_log_record(log) for log in logs[2:]])[SOURCE_UID])
+
+    assert {f: state[f] for f in COMPARED_FIELDS} == {f: row_item[f] for f in COMPARED_FIELDS}
+    assert [change_row(event) for event in events] == row_history
+    assert row_item['status'] == 'active' and row_item['sold_dt'] is None and row_item['sold_reason'] is None
+    # 1（插入）→ 2（标记 sold）→ 3（恢复 active）→ 4（价格变化）
+    assert [(row[3], row[4], row[5], row[9]) for row in row_history] == [
+        ('status', 'sold', 'active', 3), ('price', '1000', '1300', 4)
+    ]
+
+
+def test_unchanged_sighting_of_sold_item_is_not_short_circuited():
+    """内容未变化的已售商品不走无写入短路，同一天再次出现也会恢复为 active"""
+    logs = make_logs([1000, 1000], same_day=True)
+    conn = FakeConnection()
+    assert process_single_log(conn, logs[0])['success']
+    conn.mark_sold(SOURCE_UID, logs[0]['dt'])
+    assert process_single_log(conn, logs[1])['success']
+    assert conn.items[SOURCE_UID]['status'] == 'active'
+    assert conn.items[SOURCE_UID]['version'] == 3
+    assert len(conn.history) == 1
+
+
+def test_row_path_skips_already_applied_logs():
+    """逐行路径重读已应用的日志（inline 模式写入后、分片游标回退后）：不改动商品，不产生反向价格事件"""
+    logs = make_logs([1000, 1200])
+    conn = FakeConnection()
+    for log in logs:
+        assert process_single_log(conn, log)['success']
+    item = dict(conn.items[SOURCE_UID])
+    history = dict(conn.history)
+    writes = len(conn.writes())
+
+    for log in logs:
+        result = process_single_log(conn, log)
+        assert result['success'], result['error']
+        assert not result['price_changed']
+
+    assert conn.items[SOURCE_UID] == item
+    assert conn.history == history
+    assert len(conn.writes()) == writes
+    assert item['version'] == 2
@@ -0,0 +1,141 @@
+"""内容未变化的重复发现短路测试（_unchanged_sighting / _bump_unchanged_item，不依赖数据库）"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from item_extract.batch_upserter import _unchanged_sighting, coalesce_group
+from item_extract.item_upserter import parse_log_record
+from item_extract.sync_processor import process_single_log
+from item_extract.test.fake_db import FakeConnection
+
+SOURCE_UID = "example.com:shoe:S3"
+FIRST_SEEN = datetime(2026, 4, 10, 7, 30, 0)
+
+
+def make_log(log_id, price=2000, raw_hash="hash-a", crawl_time=FIRST_SEEN):
+    """同一商品的一条 crawler_log 记录"""
+    return {
+        'id': log_id,
+        'site': 'example.com',
+        'category': 'shoe',
+        'item_id': 'S3',
+        'currency': 'JPY',
+        'price': price,
+        'product_url': 'https://example.com/items/S3',
+        'raw_hash': raw_hash,
+        'crawl_time': crawl_time,
+        'dt': crawl_time.date(),
+    }
+
+
+def inserted_item():
+    """逐行路径插入一次后的连接（商品已存在）"""
+    conn = FakeConnection()
+    assert process_single_log(conn, make_log(1))['success']
+    conn.statements.clear()
+    return conn
+
+
+def current_row(log_id=1):
+    """批量路径中 _read_items 读到的当前行"""
+    state, _ = coalesce_group(None, [parse_log_record(make_log(log_id))])
+    return state
+
+
+# ---------- 逐行路径：_bump_unchanged_item ----------
+
+def test_same_day_repeat_makes_no_write():
+    """同一天重复出现（raw_hash 和价格相同）：条件 UPDATE 不命中任何行，不写历史、不改商品"""
+    conn = inserted_item()
+    before = dict(conn.items[SOURCE_UID])
+    result = process_single_log(conn, make_log(2, crawl_time=FIRST_SEEN + timedelta(hours=3)))
+    assert result['success'] and not result['price_changed']
+    assert conn.items[SOURCE_UID] == before
+    assert not any(sql.startswith("INSERT") for sql in conn.writes())
+    assert not any("FOR UPDATE" in sql for sql in conn.statements)
+
+
+def test_next_day_repeat_bumps_last_seen_only():
+    """第二天重复出现：只刷新 last_seen_dt / last_crawl_time / last_log_id，不加锁、版本号和价格不变"""
+    conn = inserted_item()
+    before = dict(conn.items[SOURCE_UID])
+    next_day = FIRST_SEEN + timedelta(days=1)
+    assert process_single_log(conn, make_log(2, crawl_time=next_day))['success']
+
+    after = conn.items[SOURCE_UID]
+    assert (after['last_seen_dt'], after['last_crawl_time'], after['last_log_id']) == (next_day.date(), next_day, 2)
+    changed = {key for key in after if after[key] != before[key]}
+    assert changed == {'last_seen_dt', 'last_crawl_time', 'last_log_id'}
+    assert not any("FOR UPDATE" in sql for sql in conn.statements)
+    assert len(conn.writes()) == 1
+
+
+def test_price_change_with_same_raw_hash_takes_full_path():
+    """raw_hash 相同但价格不同：不走短路，加锁更新并记录价格变化"""
+    conn = inserted_item()
+    result = process_single_log(conn, make_log(2, price=1800, crawl_time=FIRST_SEEN + timedelta(days=1)))
+    assert result['price_changed'] and result['history_written']
+    assert any("FOR UPDATE" in sql for sql in conn.statements)
+    assert conn.items[SOURCE_UID]['price'] == 1800
+    assert conn.items[SOURCE_UID]['version'] == 2
+
+
+def test_missing_raw_hash_takes_full_path():
+    """没有 raw_hash 的记录无法判断内容是否变化，走加锁路径"""
+    conn = inserted_item()
+    assert process_single_log(conn, make_log(2, raw_hash=None))['success']
+    assert any("FOR UPDATE" in sql for sql in conn.statements)
+
+
+# ---------- 批量路径：_unchanged_sighting ----------
+
+def test_batch_same_day_repeat_is_unchanged_sighting():
+    """同一天重复出现的整组记录：返回刷新参数，_BUMP_SQL 的 last_seen_dt < dt 条件使其不写入"""
+    current = current_row()
+    group = [parse_log_record(make_log(2, crawl_time=FIRST_SEEN + timedelta(hours=1)))]
+    sighting = _unchanged_sighting(current, group)
+    assert sighting == (SOURCE_UID, 'hash-a', FIRST_SEEN.date(), FIRST_SEEN + timedelta(hours=1), 2)
+    assert not sighting[2] > current['last_seen_dt']
+
+
+def test_batch_next_day_repeat_bumps_to_latest():
+    """跨天的多条重复记录：刷新到组内最晚的日期、抓取时间和 log_id"""
+    group = [
+        parse_log_record(make_log(log_id, crawl_time=FIRST_SEEN + timedelta(days=days)))
+        for log_id, days in ((3, 2), (2, 1))
+    ]
+    sighting = _unchanged_sighting(current_row(), group)
+    latest = FIRST_SEEN + timedelta(days=2)
+    assert sighting == (SOURCE_UID, 'hash-a', latest.date(), latest, 3)
+
+
+def test_batch_price_change_with_same_raw_hash_is_not_short_circuited():
+    """组内任何一条 raw_hash 相同但价格不同：整组走加锁合并路径"""
+    group = [
+        parse_log_record(make_log(2, crawl_time=FIRST_SEEN + timedelta(days=1))),
+        parse_log_record(make_log(3, price=1800, crawl_time=FIRST_SEEN + timedelta(days=2))),
+    ]
+    assert _unchanged_sighting(current_row(), group) is None
+
+
+def test_batch_already_applied_records_are_ignored():
+    """log_id 不大于 last_log_id 的记录不参与判断；全部已应用时按当前行返回（不会前移）"""
+    current = current_row(log_id=5)
+    old = parse_log_record(make_log(4, price=1800, raw_hash="hash-b"))
+    assert _unchanged_sighting(current, [old]) == (
+        SOURCE_UID, 'hash-a', current['last_seen_dt'], current['last_crawl_time'], 5
+    )
+
+
+def test_batch_new_or_sold_item_is_not_short_circuited():
+    """商品不存在或不是 active：不走短路"""
+    group = [parse_log_record(make_log(2, crawl_time=FIRST_SEEN + timedelta(days=1)))]
+    assert _unchanged_sighting(None, group) is None
+    sold = dict(current_row(), status='sold')
+    assert _unchanged_sighting(sold, group) is None
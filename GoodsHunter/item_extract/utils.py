@@ -5,10 +5,10 @@ from datetime import datetime
 
 try:
     import psycopg2
-    from psycopg2.pool import SimpleConnectionPool
 except ImportError:
     psycopg2 = None
-    SimpleConnectionPool = None
+
+from storage.db_pool import ConnectionPool, get_pool
 
 from .exceptions import DatabaseError
 
@@ -33,9 +33,9 @@ def create_connection_pool(
     database_url: Optional[str] = None,
     pool_size: int = 5,
     max_overflow: int = 10
-) -> SimpleConnectionPool:
+) -> ConnectionPool:
     """
-    创建数据库连接池
+    获取数据库连接池（进程内按 database_url 共享，线程安全）
     
     Args:
         database_url: 数据库连接URL，如果为None则从环境变量读取
@@ -57,11 +57,7 @@ def create_connection_pool(
     if database_url is None:
         database_url = get_database_url()
     
-    pool = SimpleConnectionPool(
-        minconn=1,
-        maxconn=pool_size + max_overflow,
-        dsn=database_url
-    )
+    pool = get_pool(database_url, max_size=pool_size + max_overflow)
     
     if pool is None:
         raise DatabaseError("无法创建数据库连接池")
@@ -71,13 +67,13 @@ def create_connection_pool(
 
 def get_db_connection(database_url: Optional[str] = None):
     """
-    获取单个数据库连接（不使用连接池）
+    获取单个数据库连接（从共享连接池获取，conn.close() 即归还，持续运行模式下不再每轮重新建连）
     
     Args:
         database_url: 数据库连接URL，如果为None则从环境变量读取
         
     Returns:
-        数据库连接对象
+        数据库连接对象（连接池代理连接）
         
     Raises:
         ImportError: 如果 psycopg2 未安装
@@ -93,8 +89,7 @@ def get_db_connection(database_url: Optional[str] = None):
         database_url = get_database_url()
     
     try:
-        conn = psycopg2.connect(database_url)
-        return conn
+        return get_pool(database_url).getconn()
     except Exception as e:
         raise DatabaseError(f"数据库连接失败: {e}")
 
@@ -1,5 +1,5 @@
 """数据库 ORM 模型"""
-from sqlalchemy import Column, BigInteger, Text, Integer, Date, DateTime, String
+from sqlalchemy import Column, BigInteger, Text, Integer, Date, DateTime, String, Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -52,3 +52,63 @@ class CrawlerItem(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+
+class CrawlRun(Base):
+    """抓取运行台账模型（crawler_log.run_id 关联 id）"""
+    __tablename__ = "crawl_run"
+    
+    id = Column(BigInteger, primary_key=True, index=True)
+    status = Column(Text, nullable=False, default="running", index=True)
+    command = Column(Text, nullable=True)
+    host = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=False)
+    error = Column(Text, nullable=True)
+    
+    # URL / item / 图片计数
+    urls_planned = Column(Integer, nullable=False, default=0)
+    urls_succeeded = Column(Integer, nullable=False, default=0)
+    urls_failed = Column(Integer, nullable=False, default=0)
+    urls_skipped = Column(Integer, nullable=False, default=0)
+    items_extracted = Column(Integer, nullable=False, default=0)
+    log_rows_written = Column(Integer, nullable=False, default=0)
+    items_sighted = Column(Integer, nullable=False, default=0)
+    images_fetched = Column(Integer, nullable=False, default=0)
+    images_deduped = Column(Integer, nullable=False, default=0)
+    images_uploaded = Column(Integer, nullable=False, default=0)
+    
+    # 各阶段累计耗时（秒）
+    fetch_seconds = Column(Float, nullable=False, default=0)
+    extract_seconds = Column(Float, nullable=False, default=0)
+    file_seconds = Column(Float, nullable=False, default=0)
+    image_seconds = Column(Float, nullable=False, default=0)
+    db_seconds = Column(Float, nullable=False, default=0)
+    slowest_page_url = Column(Text, nullable=True)
+    slowest_page_seconds = Column(Float, nullable=True)
+
+
+class ItemPriceDaily(Base):
+    """商品每日价格聚合模型（item_extract 同步时维护）"""
+    __tablename__ = "item_price_daily"
+    
+    source_uid = Column(Text, primary_key=True)
+    dt = Column(Date, primary_key=True)
+    currency = Column(Text, nullable=True)
+    min_price = Column(Integer, nullable=False)
+    max_price = Column(Integer, nullable=False)
+    last_price = Column(Integer, nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ProductPriceDaily(Base):
+    """聚合商品每日价格聚合模型（crawler_item.product_id 关联）"""
+    __tablename__ = "product_price_daily"
+    
+    product_id = Column(BigInteger, primary_key=True)
+    dt = Column(Date, primary_key=True)
+    currency = Column(Text, nullable=True)
+    min_price = Column(Integer, nullable=False)
+    max_price = Column(Integer, nullable=False)
+    last_price = Column(Integer, nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
@@ -2,9 +2,10 @@
 import sys
 from pathlib import Path
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, and_
+from sqlalchemy import desc, asc, and_, func, text
 from typing import Optional, List, Tuple
-from app.db.models import CrawlerItem
+from datetime import date, datetime, timedelta, timezone
+from app.db.models import CrawlerItem, CrawlRun, ItemPriceDaily, ProductPriceDaily
 
 # 添加项目根目录到路径（如果还未添加）
 # 检查是否已经添加了项目根目录
@@ -30,6 +31,7 @@ if not any('enums' in str(p) or Path(str(p)).name == 'GoodsHunter' for p in sys.
 from enums.business.category import Category
 from enums.business.status import ItemStatus
 from enums.display.sort import SortOption
+from storage.sync_state import read_sync_status
 
 
 def get_items(
@@ -96,3 +98,199 @@ def get_item_by_id(db: Session, item_id: int) -> Optional[CrawlerItem]:
     """
     return db.query(CrawlerItem).filter(CrawlerItem.id == item_id).first()
 
+
+def get_crawl_runs(
+    db: Session,
+    page: int = 1,
+    page_size: int = 20,
+    status: Optional[str] = None
+) -> Tuple[List[CrawlRun], int]:
+    """
+    获取抓取运行列表（按开始时间倒序、分页）
+    
+    Args:
+        db: 数据库会话
+        page: 页码（从1开始）
+        page_size: 每页数量
+        status: 运行状态（running/finished/failed），None 表示不过滤
+    
+    Returns:
+        (运行列表, 总数)
+    """
+    query = db.query(CrawlRun)
+    if status:
+        query = query.filter(CrawlRun.status == status)
+    total = query.count()
+    runs = (
+        query.order_by(desc(CrawlRun.started_at), desc(CrawlRun.id))
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    return runs, total
+
+
+def get_crawl_run_by_id(db: Session, run_id: int) -> Optional[CrawlRun]:
+    """
+    根据 ID 获取抓取运行
+    
+    Args:
+        db: 数据库会话
+        run_id: 运行 ID（crawler_log.run_id）
+    
+    Returns:
+        运行对象，如果不存在返回 None
+    """
+    return db.query(CrawlRun).filter(CrawlRun.id == run_id).first()
+
+
+def get_crawl_run_daily_totals(db: Session, days: int = 30) -> List[dict]:
+    """
+    按天汇总最近 days 天开始的抓取运行（计数和各阶段耗时之和）
+    
+    Args:
+        db: 数据库会话
+        days: 天数
+    
+    Returns:
+        每天一个字典（day、runs、计数、run_seconds、{stage}_seconds），按日期升序
+    """
+    day = func.date_trunc("day", CrawlRun.started_at).label("day")
+    ended_at = func.coalesce(CrawlRun.finished_at, CrawlRun.heartbeat_at)
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    rows = (
+        db.query(
+            day,
+            func.count(CrawlRun.id).label("runs"),
+            func.sum(CrawlRun.urls_succeeded).label("urls_succeeded"),
+            func.sum(CrawlRun.urls_failed).label("urls_failed"),
+            func.sum(CrawlRun.items_extracted).label("items_extracted"),
+            func.sum(func.extract("epoch", ended_at - CrawlRun.started_at)).label("run_seconds"),
+            func.sum(CrawlRun.fetch_seconds).label("fetch_seconds"),
+            func.sum(CrawlRun.extract_seconds).label("extract_seconds"),
+            func.sum(CrawlRun.file_seconds).label("file_seconds"),
+            func.sum(CrawlRun.image_seconds).label("image_seconds"),
+            func.sum(CrawlRun.db_seconds).label("db_seconds"),
+        )
+        .filter(CrawlRun.started_at >= since)
+        .group_by(day)
+        .order_by(day)
+        .all()
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+def price_history_bucket_days(start_dt: date, end_dt: date, max_points: int) -> int:
+    """
+    价格走势的分桶天数：区间天数不超过 max_points 时按天返回，否则若干天合并为一个点
+    
+    Args:
+        start_dt: 起始日期（含）
+        end_dt: 结束日期（含）
+        max_points: 最多返回的点数
+    
+    Returns:
+        每个点覆盖的天数（>= 1）
+    """
+    span_days = (end_dt - start_dt).days + 1
+    return max(1, -(-span_days // max_points))
+
+
+def _get_price_history(
+    db: Session,
+    model,
+    key_column: str,
+    key_value,
+    start_dt: date,
+    end_dt: date,
+    bucket_days: int
+) -> List[dict]:
+    """
+    从每日价格聚合表读取走势，按 bucket_days 在 SQL 中降采样（主键范围扫描，不读取 crawler_log）
+    
+    每个桶：min / max 取极值，last_price / currency 取桶内最后一天的值，dt 为桶内第一天
+    """
+    table = model.__tablename__
+    rows = db.execute(
+        text(f"""
+            SELECT
+                MIN(dt) AS dt,
+                MIN(min_price) AS min_price,
+                MAX(max_price) AS max_price,
+                (array_agg(last_price ORDER BY dt DESC))[1] AS last_price,
+                (array_agg(currency ORDER BY dt DESC))[1] AS currency
+            FROM {table}
+            WHERE {key_column} = :key_value
+              AND dt BETWEEN :start_dt AND :end_dt
+            GROUP BY (dt - CAST(:start_dt AS date)) / :bucket_days
+            ORDER BY 1
+        """),
+        {
+            "key_value": key_value,
+            "start_dt": start_dt,
+            "end_dt": end_dt,
+            "bucket_days": bucket_days,
+        }
+    ).all()
+    return [dict(row._mapping) for row in rows]
+
+
+def get_item_price_history(
+    db: Session,
+    source_uid: str,
+    start_dt: date,
+    end_dt: date,
+    bucket_days: int = 1
+) -> List[dict]:
+    """
+    获取商品的价格走势（item_price_daily）
+    
+    Args:
+        db: 数据库会话
+        source_uid: 商品唯一标识
+        start_dt: 起始日期（含）
+        end_dt: 结束日期（含）
+        bucket_days: 每个点覆盖的天数（见 price_history_bucket_days）
+    
+    Returns:
+        每个点一个字典（dt、min_price、max_price、last_price、currency），按日期升序
+    """
+    return _get_price_history(db, ItemPriceDaily, "source_uid", source_uid, start_dt, end_dt, bucket_days)
+
+
+def get_product_price_history(
+    db: Session,
+    product_id: int,
+    start_dt: date,
+    end_dt: date,
+    bucket_days: int = 1
+) -> List[dict]:
+    """
+    获取聚合商品的价格走势（product_price_daily）
+    
+    Args:
+        db: 数据库会话
+        product_id: 聚合商品 ID
+        start_dt: 起始日期（含）
+        end_dt: 结束日期（含）
+        bucket_days: 每个点覆盖的天数（见 price_history_bucket_days）
+    
+    Returns:
+        每个点一个字典（dt、min_price、max_price、last_price、currency），按日期升序
+    """
+    return _get_price_history(db, ProductPriceDaily, "product_id", product_id, start_dt, end_dt, bucket_days)
+
+
+def get_item_sync_status(db: Session) -> dict:
+    """
+    获取 item 同步状态：pipeline_state 中持久化的指标，以及实时计算的游标延迟
+    
+    与 item_extract 共用 storage.sync_state.read_sync_status，在会话底层的 DB-API 连接上执行
+    
+    Args:
+        db: 数据库会话
+    
+    Returns:
+        字典：cursor、max_log_id、lag_rows、lag_seconds、updated_at、last_run、last_failure、totals
+    """
+    return read_sync_status(db.connection().connection)
@@ -50,7 +50,7 @@ if project_root is None:
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import items, search
+from app.routers import items, search, admin, products
 
 # 设置日志级别
 logger.setLevel(logging.DEBUG)
@@ -79,6 +79,8 @@ app.add_middleware(
 # 注册路由
 app.include_router(items.router, prefix="/api", tags=["items"])
 app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+app.include_router(products.router, prefix="/api", tags=["products"])
 
 
 @app.get("/")
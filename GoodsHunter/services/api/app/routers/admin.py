@@ -0,0 +1,168 @@
+"""管理端路由：抓取运行台账（crawl_run）、item 同步状态和指标
+
+所有路由都要求 X-Admin-Token 头与配置的 ADMIN_API_TOKEN 一致
+"""
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+
+from app.db.session import get_db
+from app.settings import settings
+from app.db.queries import (
+    get_crawl_runs,
+    get_crawl_run_by_id,
+    get_crawl_run_daily_totals,
+    get_item_sync_status,
+)
+from app.schemas.admin import (
+    CrawlRunSummary,
+    CrawlRunsListResponse,
+    CrawlRunTrendPoint,
+    CrawlRunTrendResponse,
+    ItemSyncStatusResponse,
+)
+from enums.business.crawler_status import CrawlRunStatus
+from storage.crawl_run import CRAWL_RUN_STAGES, bottleneck_stage
+from storage.sync_state import render_prometheus
+
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+    """
+    管理端鉴权：未配置 ADMIN_API_TOKEN 时返回 503，令牌缺失或不匹配时返回 401
+
+    Args:
+        x_admin_token: 请求头 X-Admin-Token
+    """
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_API_TOKEN not set)")
+    if not x_admin_token or not secrets.compare_digest(
+        x_admin_token.encode("utf-8"), settings.ADMIN_API_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+def _stage_share(stage_seconds: Dict[str, float]) -> Dict[str, float]:
+    """各阶段耗时占比（总耗时为 0 时全部为 0）"""
+    total = sum(stage_seconds.values())
+    return {
+        stage: round(seconds / total, 4) if total > 0 else 0.0
+        for stage, seconds in stage_seconds.items()
+    }
+
+
+def _rate(count: float, seconds: float, per: float = 1.0) -> Optional[float]:
+    """计算速率，耗时为 0 时返回 None"""
+    if not seconds or seconds <= 0:
+        return None
+    return round(count / seconds * per, 3)
+
+
+def _build_run_summary(run) -> CrawlRunSummary:
+    """由 CrawlRun 构建响应（附加耗时、吞吐、阶段占比和瓶颈阶段）"""
+    stage_seconds = {
+        stage: float(getattr(run, f"{stage}_seconds") or 0.0) for stage in CRAWL_RUN_STAGES
+    }
+    ended_at = run.finished_at or run.heartbeat_at
+    duration = max((ended_at - run.started_at).total_seconds(), 0.0)
+    pages = run.urls_succeeded + run.urls_failed
+    return CrawlRunSummary.model_validate({
+        **{column.name: getattr(run, column.name) for column in run.__table__.columns},
+        "duration_seconds": round(duration, 3),
+        "pages_per_minute": _rate(pages, duration, per=60.0),
+        "items_per_second": _rate(run.items_extracted, duration),
+        "stage_seconds": stage_seconds,
+        "stage_share": _stage_share(stage_seconds),
+        "bottleneck_stage": bottleneck_stage(stage_seconds),
+    })
+
+
+@router.get("/admin/crawl-runs", response_model=CrawlRunsListResponse)
+async def list_crawl_runs(
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    status: Optional[str] = Query(None, description=f"运行状态（{'/'.join(CrawlRunStatus.all_values())}），可选"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取抓取运行列表（按开始时间倒序）
+    
+    每次运行附带耗时、吞吐（pages_per_minute / items_per_second）、各阶段耗时占比和瓶颈阶段
+    """
+    if status and not CrawlRunStatus.is_valid(status):
+        raise HTTPException(status_code=400, detail=f"无效的运行状态: {status}")
+    runs, total = get_crawl_runs(db, page=page, page_size=page_size, status=status)
+    return CrawlRunsListResponse(
+        total=total,
+        page=page,
+        page_size=page_size,
+        runs=[_build_run_summary(run) for run in runs],
+    )
+
+
+@router.get("/admin/crawl-runs/trend", response_model=CrawlRunTrendResponse)
+async def crawl_run_trend(
+    days: int = Query(30, ge=1, le=365, description="统计最近多少天开始的运行"),
+    db: Session = Depends(get_db)
+):
+    """
+    按天汇总抓取运行：计数、吞吐、各阶段耗时占比和每天的瓶颈阶段
+    """
+    points = []
+    for row in get_crawl_run_daily_totals(db, days=days):
+        stage_seconds = {
+            stage: float(row[f"{stage}_seconds"] or 0.0) for stage in CRAWL_RUN_STAGES
+        }
+        run_seconds = float(row["run_seconds"] or 0.0)
+        points.append(CrawlRunTrendPoint(
+            day=row["day"].date(),
+            runs=row["runs"],
+            urls_succeeded=row["urls_succeeded"] or 0,
+            urls_failed=row["urls_failed"] or 0,
+            items_extracted=row["items_extracted"] or 0,
+            run_seconds=round(run_seconds, 3),
+            items_per_second=_rate(row["items_extracted"] or 0, run_seconds),
+            stage_seconds=stage_seconds,
+            stage_share=_stage_share(stage_seconds),
+            bottleneck_stage=bottleneck_stage(stage_seconds),
+        ))
+    return CrawlRunTrendResponse(days=days, points=points)
+
+
+@router.get("/admin/item-sync", response_model=ItemSyncStatusResponse)
+async def item_sync_status(db: Session = Depends(get_db)):
+    """
+    item 同步状态：实时游标延迟（行数、秒数）和最近一次运行的各阶段耗时、吞吐、按错误类型的失败数
+    """
+    return ItemSyncStatusResponse.model_validate(get_item_sync_status(db))
+
+
+@router.get("/admin/item-sync/metrics", response_class=PlainTextResponse)
+async def item_sync_metrics(db: Session = Depends(get_db)):
+    """
+    item 同步指标（Prometheus 文本格式），供抓取端告警，如 goodshunter_item_sync_lag_seconds > 600
+    """
+    return PlainTextResponse(
+        render_prometheus(get_item_sync_status(db)),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@router.get("/admin/crawl-runs/{run_id}", response_model=CrawlRunSummary)
+async def get_crawl_run(
+    run_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    获取单次抓取运行（run_id 即 crawler_log.run_id）
+    """
+    run = get_crawl_run_by_id(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="运行记录不存在")
+    return _build_run_summary(run)
@@ -1,7 +1,8 @@
 """商品相关路由"""
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Header
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import date, timedelta
 import sys
 import logging
 from pathlib import Path
@@ -47,15 +48,33 @@ if project_root is None:
             continue
 
 from app.db.session import get_db
-from app.db.queries import get_items, get_item_by_id
-from app.schemas.items import ItemsListResponse, ItemListItem, ItemDetail
+from app.db.queries import get_items, get_item_by_id, get_item_price_history, price_history_bucket_days
+from app.schemas.items import (
+    ItemsListResponse,
+    ItemListItem,
+    ItemDetail,
+    PriceHistoryPoint,
+    PriceHistoryResponse,
+)
 from app.services.images import image_service, get_image_service
+from app.services.image_proxy import (
+    image_bytes_cache,
+    cache_control_for_key,
+    derived_image_key,
+    ensure_derived_image,
+    etag_for_key,
+    etag_matches,
+    guess_content_type,
+    parse_range_header,
+    iter_object_stream,
+    RangeNotSatisfiable,
+)
 from app.settings import settings
 from enums.business.category import Category
 from enums.business.status import ItemStatus
 from enums.display.sort import SortOption
 from enums.display.lang import LanguageCode
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 
 # 获取 logger
 logger = logging.getLogger(__name__)
@@ -125,6 +144,9 @@ async def list_items(
             logger.warning(f"翻译映射器初始化失败: {e}", exc_info=True)
     
     # 转换为响应格式，生成图片 URL
+    # 一页商品的缩略图 URL 批量生成
+    image_urls = image_service.get_image_urls(item.image_thumb_300_key for item in items)
+    
     item_list = []
     for item in items:
         brand_final = None
@@ -188,7 +210,10 @@ async def list_items(
             "model_no": item.model_no,
             "currency": item.currency,
             "price": item.price,
-            "image_thumb_url": image_service.get_image_url(item.image_thumb_300_key),
+            "image_thumb_url": (
+                image_urls.get(item.image_thumb_300_key) if item.image_thumb_300_key
+                else image_service.get_derived_image_url(item.image_original_key, 300)
+            ),
             "last_seen_dt": item.last_seen_dt,
             "status": item.status,
             "product_id": getattr(item, 'product_id', None)
@@ -272,6 +297,12 @@ async def get_item(
             logger.warning(f"翻译商品失败 (item_id={item_id}): {e}", exc_info=True)
     
     # 转换为响应格式，生成图片 URL
+    image_urls = image_service.get_image_urls([
+        item.image_thumb_300_key,
+        item.image_thumb_600_key,
+        item.image_original_key,
+    ])
+    
     item_dict = {
         "id": item.id,
         "source_uid": item.source_uid,
@@ -285,9 +316,16 @@ async def get_item(
         "model_no": item.model_no,
         "currency": item.currency,
         "price": item.price,
-        "image_thumb_url": image_service.get_image_url(item.image_thumb_300_key),
-        "image_600_url": image_service.get_image_url(item.image_thumb_600_key),
-        "image_original_url": image_service.get_image_url(item.image_original_key),
+        # 没有预生成的缩略图尺寸回退到按需生成的派生图片
+        "image_thumb_url": (
+            image_urls.get(item.image_thumb_300_key) if item.image_thumb_300_key
+            else image_service.get_derived_image_url(item.image_original_key, 300)
+        ),
+        "image_600_url": (
+            image_urls.get(item.image_thumb_600_key) if item.image_thumb_600_key
+            else image_service.get_derived_image_url(item.image_original_key, 600)
+        ),
+        "image_original_url": image_urls.get(item.image_original_key) if item.image_original_key else None,
         "product_url": item.product_url,
         "status": item.status,
         "first_seen_dt": item.first_seen_dt,
@@ -303,44 +341,191 @@ async def get_item(
     return ItemDetail(**item_dict)
 
 
+@router.get("/items/{item_id}/price-history", response_model=PriceHistoryResponse)
+async def get_item_price_history_endpoint(
+    item_id: int,
+    start_dt: Optional[date] = Query(None, description="起始日期（含），默认商品首次发现日期和 end_dt 前 365 天中较晚者"),
+    end_dt: Optional[date] = Query(None, description="结束日期（含），默认今天"),
+    max_points: int = Query(200, ge=2, le=1000, description="最多返回的点数，区间更长时按若干天一个点降采样"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取商品价格走势（读取每日价格聚合表 item_price_daily）
+    
+    - **item_id**: 商品 ID
+    - **start_dt** / **end_dt**: 日期范围
+    - **max_points**: 最多返回的点数
+    """
+    item = get_item_by_id(db=db, item_id=item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="商品不存在")
+    
+    end_dt = end_dt or date.today()
+    start_dt = start_dt or max(item.first_seen_dt, end_dt - timedelta(days=365))
+    if start_dt > end_dt:
+        raise HTTPException(status_code=400, detail="start_dt 不能晚于 end_dt")
+    
+    bucket_days = price_history_bucket_days(start_dt, end_dt, max_points)
+    points = get_item_price_history(db, item.source_uid, start_dt, end_dt, bucket_days)
+    return PriceHistoryResponse(
+        start_dt=start_dt,
+        end_dt=end_dt,
+        bucket_days=bucket_days,
+        points=[PriceHistoryPoint(**point) for point in points]
+    )
+
+
+def _get_initialized_image_service():
+    """获取已初始化 MinIO 客户端的 ImageService 实例"""
+    # 获取实际的 ImageService 实例（延迟初始化）
+    service = get_image_service()
+    service._ensure_initialized()  # 确保已初始化
+
+    if not service.minio_client:
+        raise HTTPException(status_code=500, detail="图片服务未初始化")
+    return service
+
+
+# 注意：必须注册在 /images/{key:path} 之前，否则会被通配路由匹配
+@router.get("/images/derived/{width}/{fmt}/{key:path}")
+def get_derived_image(
+    width: int,
+    fmt: str,
+    key: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    """
+    按需生成的派生尺寸图片
+
+    key 为原图 key（original/...），首次请求时从原图生成指定宽度和格式的图片，
+    写回 MinIO 的 thumb/{width}/... 下，之后与普通图片一样由代理返回。
+    宽度和格式只允许 IMAGE_DERIVED_WIDTHS / IMAGE_DERIVED_FORMATS 中配置的值。
+    """
+    if width not in settings.image_derived_widths:
+        raise HTTPException(status_code=400, detail=f"不支持的图片宽度: {width}")
+    if fmt not in settings.image_derived_formats:
+        raise HTTPException(status_code=400, detail=f"不支持的图片格式: {fmt}")
+
+    service = _get_initialized_image_service()
+    try:
+        derived_key = derived_image_key(service.minio_client, key, width, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 派生 key 同样是内容寻址的，If-None-Match 命中时无需生成也无需访问 MinIO
+    etag = etag_for_key(derived_key)
+    if etag and etag_matches(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": cache_control_for_key(derived_key)}
+        )
+
+    try:
+        ensure_derived_image(service.minio_client, key, width, fmt)
+    except Exception as e:
+        logger.error(f"[ImageProxy] 生成派生图片失败: {e}", exc_info=True)
+        raise HTTPException(status_code=404, detail=f"图片不存在: {key}")
+
+    return _serve_image(service, derived_key, range_header, if_none_match)
+
+
 @router.get("/images/{key:path}")
-async def get_image(key: str):
+def get_image(
+    key: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
     """
-    图片代理端点：从 MinIO 获取图片并转发给前端
+    图片代理端点：从 MinIO 流式获取图片并转发给前端
     这样可以避免 presigned URL 的端点问题
+
+    - 内容寻址 key 内容永不变化，返回 immutable 长缓存头，重复访问浏览器不会再请求
+    - 内容寻址 key 直接由 sha256 生成 ETag，If-None-Match 命中时不访问 MinIO 直接返回 304
+    - 支持单段 Range 请求（206 / 416）
+    - 热点缩略图（默认 thumb/300/）缓存在进程内 LRU 中，其余对象分块流式转发，不整体读入内存
+
+    使用同步函数定义，FastAPI 会在线程池中执行，避免 MinIO 阻塞 IO 卡住事件循环
     """
+    service = _get_initialized_image_service()
+    return _serve_image(service, key, range_header, if_none_match)
+
+
+def _serve_image(service, key: str, range_header: Optional[str], if_none_match: Optional[str]):
+    """从热点缓存或 MinIO 返回图片（处理 ETag/304、Range 和流式转发）"""
+    content_type = guess_content_type(key)
+    etag = etag_for_key(key)
+    headers = {
+        "Cache-Control": cache_control_for_key(key),
+        "Accept-Ranges": "bytes",
+    }
+    if etag:
+        headers["ETag"] = etag
+        # key 与内容一一对应，无需访问 MinIO 即可判断 304
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
     try:
-        # 使用内部端点客户端下载图片
-        # 获取实际的 ImageService 实例（延迟初始化）
-        service = get_image_service()
-        service._ensure_initialized()  # 确保已初始化
-        
-        if not service.minio_client:
-            raise HTTPException(status_code=500, detail="图片服务未初始化")
-        
-        # 从 MinIO 下载图片
-        # MinIOClient 有 download_image 方法
-        image_data = service.minio_client.download_image(key)
-        
-        # 根据文件扩展名确定 content type
-        content_type = "image/jpeg"
-        if key.endswith(".webp"):
-            content_type = "image/webp"
-        elif key.endswith(".png"):
-            content_type = "image/png"
-        elif key.endswith(".gif"):
-            content_type = "image/gif"
-        
-        # 返回图片流
-        from io import BytesIO
-        return StreamingResponse(
-            BytesIO(image_data),
-            media_type=content_type,
-            headers={
-                "Cache-Control": "public, max-age=3600"  # 缓存1小时
-            }
+        # 1. 热点缓存命中
+        image_data = image_bytes_cache.get(key)
+
+        if image_data is None:
+            stat = service.minio_client.stat_image(key)
+            if not etag and stat.etag:
+                # 非内容寻址 key：使用 MinIO 的 etag
+                headers["ETag"] = f'"{stat.etag}"'
+                if etag_matches(if_none_match, headers["ETag"]):
+                    return Response(status_code=304, headers=headers)
+
+            # 2. 小对象且允许缓存：整体读入并放入缓存
+            if image_bytes_cache.should_cache(key, stat.size):
+                image_data = service.minio_client.download_image(key)
+                image_bytes_cache.put(key, image_data)
+            else:
+                # 3. 其他对象：按 Range 流式转发
+                total_size = stat.size
+                byte_range = parse_range_header(range_header, total_size)
+                status_code = 200
+                offset, length = 0, 0
+                if byte_range:
+                    start, end = byte_range
+                    offset, length = start, end - start + 1
+                    status_code = 206
+                    headers["Content-Range"] = f"bytes {start}-{end}/{total_size}"
+                    headers["Content-Length"] = str(length)
+                else:
+                    headers["Content-Length"] = str(total_size)
+
+                response = service.minio_client.open_image_stream(key, offset=offset, length=length)
+                return StreamingResponse(
+                    iter_object_stream(response, settings.IMAGE_PROXY_CHUNK_SIZE),
+                    status_code=status_code,
+                    media_type=content_type,
+                    headers=headers
+                )
+
+        # 缓存中的对象：直接切片响应 Range
+        total_size = len(image_data)
+        byte_range = parse_range_header(range_header, total_size)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{total_size}"
+            return Response(
+                content=image_data[start:end + 1],
+                status_code=206,
+                media_type=content_type,
+                headers=headers
+            )
+        return Response(content=image_data, media_type=content_type, headers=headers)
+
+    except RangeNotSatisfiable as e:
+        raise HTTPException(
+            status_code=416,
+            detail=str(e),
+            headers={"Content-Range": f"bytes */{e.total_size}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[ImageProxy] 获取图片失败: {e}", exc_info=True)
         raise HTTPException(status_code=404, detail=f"图片不存在: {key}")
-
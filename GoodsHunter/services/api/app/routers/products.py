@@ -0,0 +1,41 @@
+"""聚合商品（product）相关路由"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date, timedelta
+
+from app.db.session import get_db
+from app.db.queries import get_product_price_history, price_history_bucket_days
+from app.schemas.items import PriceHistoryPoint, PriceHistoryResponse
+
+router = APIRouter()
+
+
+@router.get("/products/{product_id}/price-history", response_model=PriceHistoryResponse)
+async def get_product_price_history_endpoint(
+    product_id: int,
+    start_dt: Optional[date] = Query(None, description="起始日期（含），默认 end_dt 前 365 天"),
+    end_dt: Optional[date] = Query(None, description="结束日期（含），默认今天"),
+    max_points: int = Query(200, ge=2, le=1000, description="最多返回的点数，区间更长时按若干天一个点降采样"),
+    db: Session = Depends(get_db)
+):
+    """
+    获取聚合商品价格走势（读取每日价格聚合表 product_price_daily，覆盖关联到该 product 的所有商品）
+    
+    - **product_id**: 聚合商品 ID
+    - **start_dt** / **end_dt**: 日期范围
+    - **max_points**: 最多返回的点数
+    """
+    end_dt = end_dt or date.today()
+    start_dt = start_dt or end_dt - timedelta(days=365)
+    if start_dt > end_dt:
+        raise HTTPException(status_code=400, detail="start_dt 不能晚于 end_dt")
+    
+    bucket_days = price_history_bucket_days(start_dt, end_dt, max_points)
+    points = get_product_price_history(db, product_id, start_dt, end_dt, bucket_days)
+    return PriceHistoryResponse(
+        start_dt=start_dt,
+        end_dt=end_dt,
+        bucket_days=bucket_days,
+        points=[PriceHistoryPoint(**point) for point in points]
+    )
@@ -264,12 +264,17 @@ async def search_products(
                 mapper = None
         
         # 处理结果，添加图片 URL 和翻译
+        # 一页结果的缩略图 URL 批量生成
+        image_urls = image_service.get_image_urls(
+            item.get("image_thumb_300_key") for item in result.items
+        )
+        
         items = []
         for item in result.items:
             # 生成图片 URL
             image_thumb_url = None
             if item.get("image_thumb_300_key"):
-                image_thumb_url = image_service.get_image_url(item["image_thumb_300_key"])
+                image_thumb_url = image_urls.get(item["image_thumb_300_key"])
             
             # 翻译处理
             brand_translated = None
@@ -0,0 +1,116 @@
+"""管理端 API 响应 Schema"""
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Optional
+from datetime import date, datetime
+
+
+class CrawlRunSummary(BaseModel):
+    """抓取运行（crawl_run 一行 + 派生的吞吐和瓶颈指标）"""
+    id: int
+    status: str
+    command: Optional[str]
+    host: Optional[str]
+    started_at: datetime
+    finished_at: Optional[datetime]
+    heartbeat_at: datetime
+    error: Optional[str]
+    urls_planned: int
+    urls_succeeded: int
+    urls_failed: int
+    urls_skipped: int
+    items_extracted: int
+    log_rows_written: int
+    items_sighted: int
+    images_fetched: int
+    images_deduped: int
+    images_uploaded: int
+    slowest_page_url: Optional[str]
+    slowest_page_seconds: Optional[float]
+    duration_seconds: float  # 结束时间（运行中为最近心跳）- 开始时间
+    pages_per_minute: Optional[float]
+    items_per_second: Optional[float]
+    stage_seconds: Dict[str, float]  # 阶段 -> 累计耗时（秒）
+    stage_share: Dict[str, float]  # 阶段 -> 占各阶段总耗时的比例
+    bottleneck_stage: Optional[str]  # 累计耗时最长的阶段
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CrawlRunsListResponse(BaseModel):
+    """抓取运行列表响应"""
+    total: int
+    page: int
+    page_size: int
+    runs: list[CrawlRunSummary]
+
+
+class CrawlRunTrendPoint(BaseModel):
+    """按天汇总的抓取运行指标"""
+    day: date
+    runs: int
+    urls_succeeded: int
+    urls_failed: int
+    items_extracted: int
+    run_seconds: float
+    items_per_second: Optional[float]
+    stage_seconds: Dict[str, float]
+    stage_share: Dict[str, float]
+    bottleneck_stage: Optional[str]
+
+
+class CrawlRunTrendResponse(BaseModel):
+    """抓取运行趋势响应"""
+    days: int
+    points: list[CrawlRunTrendPoint]
+
+
+class ItemSyncRunMetrics(BaseModel):
+    """一次 item 同步运行的指标（item_extract.metrics.SyncMetrics）"""
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    duration_seconds: float
+    batches: int
+    rows: int
+    success: int
+    failed: int
+    batch_fallbacks: int
+    rows_per_second: Optional[float]
+    stage_seconds: Dict[str, float]  # fetch / upsert / history / commit -> 累计耗时（秒）
+    avg_batch_seconds: Optional[float]
+    slowest_batch_seconds: float
+    errors_by_type: Dict[str, int]  # 错误类型 -> 失败记录数
+    cursor: Optional[int] = None  # 运行结束时的游标
+    lag_rows: Optional[int] = None  # 运行结束时的延迟（行）
+    lag_seconds: Optional[float] = None  # 运行结束时的延迟（秒）
+
+
+class ItemSyncFailure(BaseModel):
+    """最近一次整体失败的同步运行"""
+    at: datetime
+    error_type: str
+    error: str
+
+
+class ItemSyncTotals(BaseModel):
+    """item 同步累计计数（自首次记录以来）"""
+    runs: int = 0
+    run_failures: int = 0
+    batches: int = 0
+    rows: int = 0
+    success: int = 0
+    failed: int = 0
+    batch_fallbacks: int = 0
+    stage_seconds: Dict[str, float] = {}
+    errors_by_type: Dict[str, int] = {}
+
+
+class ItemSyncStatusResponse(BaseModel):
+    """item 同步状态：实时游标延迟 + 持久化的运行指标"""
+    cursor: int
+    max_log_id: int
+    lag_rows: int  # MAX(crawler_log.id) - 游标
+    lag_seconds: float  # 游标之后最早一条日志的抓取时间距今
+    updated_at: Optional[datetime]  # 指标最近写入时间
+    last_run: Optional[ItemSyncRunMetrics]
+    last_failure: Optional[ItemSyncFailure]
+    totals: ItemSyncTotals
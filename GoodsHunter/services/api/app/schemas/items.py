@@ -66,3 +66,20 @@ class ItemsListResponse(BaseModel):
     page_size: int
     items: list[ItemListItem]
 
+
+
+class PriceHistoryPoint(BaseModel):
+    """价格走势中的一个点（覆盖 bucket_days 天）"""
+    dt: date  # 桶内第一天
+    min_price: int
+    max_price: int
+    last_price: int  # 桶内最后一次观测到的价格
+    currency: Optional[str] = None
+
+
+class PriceHistoryResponse(BaseModel):
+    """价格走势响应"""
+    start_dt: date
+    end_dt: date
+    bucket_days: int
+    points: list[PriceHistoryPoint]
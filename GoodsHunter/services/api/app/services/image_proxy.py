@@ -0,0 +1,359 @@
+"""图片代理辅助工具：ETag、Range 解析、流式读取、热点图片内存缓存和按需生成派生尺寸"""
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.settings import settings
+
+try:
+    from storage.image_processing import format_extension, generate_thumbnail
+except ImportError:
+    format_extension = None
+    generate_thumbnail = None
+
+
+# MinIOClient._get_object_key 生成的内容寻址 key：
+#   original/{sha256[0:2]}/{sha256}.{ext}
+#   thumb/{size}/{sha256[0:2]}/{sha256}.{ext}（抓取时生成的为 webp，按需生成的派生图片可能是其他格式）
+_CONTENT_ADDRESSED_KEY_RE = re.compile(
+    r"^(?:original|thumb/(?P<size>\d+))/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})\.(?P<ext>[a-z0-9]+)$"
+)
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range 请求超出对象范围"""
+
+    def __init__(self, range_header: str, total_size: int):
+        super().__init__(f"Range 不合法: {range_header}（对象大小 {total_size}）")
+        self.total_size = total_size
+
+
+def parse_content_addressed_key(key: str) -> Optional[Tuple[str, Optional[int], str]]:
+    """
+    解析内容寻址的对象 key
+
+    Args:
+        key: MinIO 对象 key
+
+    Returns:
+        (sha256, size, ext) 元组，原图的 size 为 None；如果不是内容寻址 key 返回 None
+    """
+    match = _CONTENT_ADDRESSED_KEY_RE.match(key or "")
+    if not match:
+        return None
+    size = match.group("size")
+    return match.group("sha256"), int(size) if size else None, match.group("ext")
+
+
+def etag_for_key(key: str) -> Optional[str]:
+    """
+    根据内容寻址 key 生成强 ETag（无需访问 MinIO）
+
+    原图使用 sha256，缩略图使用 sha256-{size}，保证不同尺寸的 ETag 不同
+
+    Args:
+        key: MinIO 对象 key
+
+    Returns:
+        带引号的 ETag 字符串，如果 key 不是内容寻址的返回 None
+    """
+    parsed = parse_content_addressed_key(key)
+    if parsed is None:
+        return None
+    sha256, size, ext = parsed
+    tag = sha256 if size is None else f"{sha256}-{size}"
+    if size is not None and ext != "webp":
+        tag = f"{tag}-{ext}"
+    return f'"{tag}"'
+
+
+def cache_control_for_key(key: str) -> str:
+    """
+    生成 Cache-Control 响应头
+
+    内容寻址 key 的内容永不变化，使用 immutable 长缓存；其他 key 使用短缓存
+
+    Args:
+        key: MinIO 对象 key
+
+    Returns:
+        Cache-Control 响应头的值
+    """
+    if parse_content_addressed_key(key) is not None:
+        return f"public, max-age={settings.IMAGE_IMMUTABLE_MAX_AGE}, immutable"
+    return "public, max-age=3600"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否命中 ETag（弱比较）
+
+    Args:
+        if_none_match: If-None-Match 请求头
+        etag: 当前资源的 ETag
+
+    Returns:
+        命中返回 True
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def guess_content_type(key: str) -> str:
+    """根据文件扩展名确定 content type"""
+    if key.endswith(".webp"):
+        return "image/webp"
+    if key.endswith(".png"):
+        return "image/png"
+    if key.endswith(".gif"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def parse_range_header(range_header: Optional[str], total_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 请求头
+
+    只支持 bytes 单段范围（bytes=start-end / bytes=start- / bytes=-suffix），
+    多段或格式无法识别时返回 None，按 RFC 7233 回退为完整响应。
+
+    Args:
+        range_header: Range 请求头
+        total_size: 对象总大小
+
+    Returns:
+        (start, end) 闭区间，无 Range 或忽略时返回 None
+
+    Raises:
+        RangeNotSatisfiable: 范围超出对象大小
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+    start_str, end_str = start_str.strip(), end_str.strip()
+
+    try:
+        start = int(start_str) if start_str else None
+        end = int(end_str) if end_str else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # bytes=-N：最后 N 个字节
+        if end is None or end <= 0 or total_size == 0:
+            raise RangeNotSatisfiable(range_header, total_size)
+        return max(total_size - end, 0), total_size - 1
+
+    if start >= total_size:
+        raise RangeNotSatisfiable(range_header, total_size)
+    if end is None:
+        end = total_size - 1
+    if start > end:
+        return None
+    return start, min(end, total_size - 1)
+
+
+def iter_object_stream(response, chunk_size: int) -> Iterator[bytes]:
+    """
+    逐块读取 MinIO 响应，结束后释放连接
+
+    Args:
+        response: MinIOClient.open_image_stream 返回的响应对象
+        chunk_size: 每块字节数
+    """
+    try:
+        for chunk in response.stream(chunk_size):
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+
+class ImageBytesCache:
+    """
+    热点图片字节缓存（进程内 LRU，按总字节数限制容量）
+
+    只缓存前缀匹配且体积较小的对象（默认 300px 缩略图），
+    列表页的每个格子都命中内存，不再访问 MinIO。
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, prefixes: List[str]):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存总字节上限，0 表示禁用
+            max_item_bytes: 单个对象字节上限
+            prefixes: 允许缓存的 key 前缀列表
+        """
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.prefixes = tuple(p for p in prefixes if p)
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def should_cache(self, key: str, size: Optional[int] = None) -> bool:
+        """判断对象是否应进入缓存"""
+        if self.max_bytes <= 0 or not key.startswith(self.prefixes):
+            return False
+        if size is not None and size > self.max_item_bytes:
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存，命中时移动到最近使用位置"""
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的对象"""
+        if not self.should_cache(key, len(data)):
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._current_bytes -= len(old)
+            self._items[key] = data
+            self._current_bytes += len(data)
+            while self._current_bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._current_bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+image_bytes_cache = ImageBytesCache(
+    max_bytes=settings.IMAGE_HOT_CACHE_MAX_BYTES,
+    max_item_bytes=settings.IMAGE_HOT_CACHE_MAX_ITEM_BYTES,
+    prefixes=[p.strip() for p in settings.IMAGE_HOT_CACHE_PREFIXES.split(",")],
+)
+
+
+# 单飞锁：同一个派生 key 同一时间只有一个线程在生成（进程内）
+# 多个 worker 进程之间仍可能重复生成，但结果是内容寻址的同一个对象，重复上传会被跳过
+_derived_locks: Dict[str, list] = {}
+_derived_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _single_flight(key: str):
+    """按 key 加锁，锁在没有等待者后自动回收"""
+    with _derived_locks_guard:
+        entry = _derived_locks.get(key)
+        if entry is None:
+            entry = [threading.Lock(), 0]
+            _derived_locks[key] = entry
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _derived_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _derived_locks.pop(key, None)
+
+
+def derived_image_key(minio_client, original_key: str, width: int, fmt: str) -> str:
+    """
+    计算派生图片的对象 key（与抓取时生成的缩略图共用 thumb/{size}/ 命名）
+
+    Args:
+        minio_client: MinIOClient 实例
+        original_key: 原图 key（original/...）
+        width: 目标宽度
+        fmt: 输出格式（webp / jpeg / png）
+
+    Returns:
+        派生图片 key，例如 thumb/900/ab/{sha256}.webp
+
+    Raises:
+        ValueError: key 不是原图 key 或格式不支持
+    """
+    if format_extension is None:
+        raise ValueError("图片处理模块不可用（storage.image_processing 导入失败）")
+    parsed = parse_content_addressed_key(original_key)
+    if parsed is None or parsed[1] is not None:
+        raise ValueError(f"只能从原图 key 派生图片: {original_key}")
+    sha256 = parsed[0]
+    return minio_client._get_object_key(sha256, format_extension(fmt), size=width)
+
+
+def ensure_derived_image(minio_client, original_key: str, width: int, fmt: str) -> str:
+    """
+    确保派生图片存在：不存在时从原图生成并写回 MinIO
+
+    Args:
+        minio_client: MinIOClient 实例
+        original_key: 原图 key（original/...）
+        width: 目标宽度
+        fmt: 输出格式（webp / jpeg / png）
+
+    Returns:
+        派生图片 key
+
+    Raises:
+        ValueError: key 不是原图 key 或格式不支持
+        RuntimeError: 生成失败
+    """
+    derived_key = derived_image_key(minio_client, original_key, width, fmt)
+    if minio_client.object_exists(derived_key):
+        return derived_key
+
+    with _single_flight(derived_key):
+        # 等锁期间可能已经被其他请求生成
+        if minio_client.object_exists(derived_key):
+            return derived_key
+
+        original_data = minio_client.download_image(original_key)
+        data = generate_thumbnail(
+            original_data, width, quality=settings.IMAGE_DERIVED_QUALITY, fmt=fmt
+        )
+        if not data:
+            raise RuntimeError(f"生成派生图片失败: {derived_key}")
+
+        sha256 = parse_content_addressed_key(original_key)[0]
+        minio_client.upload_thumbnail(
+            thumbnail_data=data,
+            sha256=sha256,
+            size=width,
+            ext=format_extension(fmt)
+        )
+        image_bytes_cache.put(derived_key, data)
+        return derived_key
@@ -1,7 +1,11 @@
 """图片 URL 生成服务"""
 import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
 # 添加项目根目录到路径，以便导入 storage 模块
 # services/api/app/services/images.py -> GoodsHunter/
@@ -31,12 +35,13 @@ except ImportError:
                     secure=use_ssl
                 )
             
-            def get_presigned_url(self, key, expires_seconds=3600):
+            def get_presigned_url(self, key, expires_seconds=3600, request_date=None):
                 from datetime import timedelta
                 return self.client.presigned_get_object(
                     self.bucket,
                     key,
-                    expires=timedelta(seconds=expires_seconds)
+                    expires=timedelta(seconds=expires_seconds),
+                    request_date=request_date
                 )
     except ImportError:
         MinIOClient = None
@@ -52,13 +57,23 @@ class ImageService:
         self.minio_client = None
         self.presign_client = None  # 专门用于生成 presigned URL 的客户端
         self._initialized = False
+        
+        # 已签名 URL 缓存：(key, mode) -> (url, 缓存过期时间戳)
+        self.presign_cache_ttl = settings.PRESIGN_CACHE_TTL_SECONDS
+        if self.presign_cache_ttl >= settings.PRESIGN_EXPIRES_SECONDS:
+            # 缓存时间不能超过签名有效期，否则会返回已过期的 URL
+            self.presign_cache_ttl = settings.PRESIGN_EXPIRES_SECONDS // 2
+        self.presign_cache_max_entries = settings.PRESIGN_CACHE_MAX_ENTRIES
+        self._url_cache: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._url_cache_lock = threading.Lock()
     
     def _ensure_initialized(self):
         """确保客户端已初始化（延迟初始化，避免启动时阻塞）"""
         if self._initialized:
             return
         
-        if self.mode == "presign":
+        # proxy 模式下图片代理端点也需要 MinIO 客户端读取对象
+        if self.mode in ("presign", "proxy"):
             try:
                 # 使用内部端点初始化客户端（用于检查 bucket 等操作）
                 # 添加超时处理，避免启动时阻塞
@@ -75,7 +90,7 @@ class ImageService:
                     # 如果配置了外部端点，创建专门用于生成 presigned URL 的客户端
                     # 使用外部端点，这样生成的 URL 浏览器可以访问
                     external_endpoint = settings.MINIO_EXTERNAL_ENDPOINT
-                    if external_endpoint:
+                    if external_endpoint and self.mode == "presign":
                         try:
                             # 创建一个轻量级的客户端用于生成 presigned URL
                             # 直接使用 minio 库，跳过 bucket 检查（因为可能无法连接）
@@ -94,12 +109,13 @@ class ImageService:
                                     self.client = client
                                     self.bucket = bucket
                                 
-                                def get_presigned_url(self, key, expires_seconds=3600):
+                                def get_presigned_url(self, key, expires_seconds=3600, request_date=None):
                                     from datetime import timedelta
                                     return self.client.presigned_get_object(
                                         self.bucket,
                                         key,
-                                        expires=timedelta(seconds=expires_seconds)
+                                        expires=timedelta(seconds=expires_seconds),
+                                        request_date=request_date
                                     )
                             
                             self.presign_client = PresignOnlyClient(minio_client, settings.MINIO_BUCKET)
@@ -118,10 +134,108 @@ class ImageService:
         
         self._initialized = True
     
+    def _signing_window(self, now: Optional[float] = None) -> Tuple[datetime, float]:
+        """
+        计算当前签名时间窗口
+        
+        签名时间按缓存 TTL 对齐，同一窗口内同一个 key 生成的 URL 完全一致，
+        浏览器和 CDN 可以跨请求复用缓存。URL 实际有效期至少还有
+        PRESIGN_EXPIRES_SECONDS - PRESIGN_CACHE_TTL_SECONDS 秒。
+        
+        Args:
+            now: 当前时间戳，为 None 时使用 time.time()
+        
+        Returns:
+            (签名时间, 窗口结束时间戳)
+        """
+        now = time.time() if now is None else now
+        ttl = max(self.presign_cache_ttl, 1)
+        window_start = int(now // ttl) * ttl
+        return datetime.fromtimestamp(window_start, tz=timezone.utc), window_start + ttl
+    
+    def _cache_get(self, cache_key: Tuple[str, str], now: float) -> Optional[str]:
+        """读取 URL 缓存，过期条目直接丢弃"""
+        with self._url_cache_lock:
+            entry = self._url_cache.get(cache_key)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at <= now:
+                del self._url_cache[cache_key]
+                return None
+            self._url_cache.move_to_end(cache_key)
+            return url
+    
+    def _cache_put(self, cache_key: Tuple[str, str], url: str, expires_at: float) -> None:
+        """写入 URL 缓存，超出容量时淘汰最久未使用的条目"""
+        if self.presign_cache_ttl <= 0 or self.presign_cache_max_entries <= 0:
+            return
+        with self._url_cache_lock:
+            self._url_cache[cache_key] = (url, expires_at)
+            self._url_cache.move_to_end(cache_key)
+            while len(self._url_cache) > self.presign_cache_max_entries:
+                self._url_cache.popitem(last=False)
+    
+    def _proxy_url(self, key: str) -> str:
+        """生成图片代理端点 URL"""
+        api_base = settings.API_BASE_URL.rstrip('/')
+        return f"{api_base}/api/images/{key}"
+    
+    def get_derived_image_url(
+        self,
+        original_key: Optional[str],
+        width: int,
+        fmt: str = "webp"
+    ) -> Optional[str]:
+        """
+        生成按需派生图片的 URL（抓取时没有预生成该尺寸时使用）
+        
+        Args:
+            original_key: 原图 key
+            width: 目标宽度（需在 IMAGE_DERIVED_WIDTHS 中）
+            fmt: 输出格式（需在 IMAGE_DERIVED_FORMATS 中）
+        
+        Returns:
+            /api/images/derived/{width}/{fmt}/{key} URL，原图 key 为空或参数不允许时返回 None
+        """
+        if not original_key:
+            return None
+        if width not in settings.image_derived_widths or fmt not in settings.image_derived_formats:
+            return None
+        api_base = settings.API_BASE_URL.rstrip('/')
+        return f"{api_base}/api/images/derived/{width}/{fmt}/{original_key}"
+    
+    def _presign(self, key: str, request_date: datetime) -> Optional[str]:
+        """
+        生成预签名 URL
+        
+        Args:
+            key: MinIO 对象 key
+            request_date: 对齐后的签名时间
+        
+        Returns:
+            预签名 URL，失败返回 None
+        """
+        try:
+            # 优先使用外部端点客户端生成 URL（浏览器可访问）
+            client_to_use = self.presign_client if self.presign_client else self.minio_client
+            return client_to_use.get_presigned_url(
+                key,
+                expires_seconds=settings.PRESIGN_EXPIRES_SECONDS,
+                request_date=request_date
+            )
+        except Exception as e:
+            print(f"[ImageService] 生成 presign URL 失败: {e}，尝试使用代理端点")
+            import traceback
+            traceback.print_exc()
+            return None
+    
     def get_image_url(self, key: Optional[str]) -> Optional[str]:
         """
         根据 MinIO key 生成可访问的 URL
         
+        Presign 模式下签名结果按 (key, mode) 缓存，缓存时间小于签名有效期
+        
         Args:
             key: MinIO 对象 key
         
@@ -130,38 +244,57 @@ class ImageService:
         """
         if not key:
             return None
+        return self.get_image_urls([key]).get(key)
+    
+    def get_image_urls(self, keys: Iterable[Optional[str]]) -> Dict[str, str]:
+        """
+        批量生成图片 URL（一页商品共用一次初始化和同一个签名时间窗口）
         
-        # 延迟初始化 MinIO 客户端（避免启动时阻塞）
-        self._ensure_initialized()
+        Args:
+            keys: MinIO 对象 key 列表，空值会被忽略
+        
+        Returns:
+            key -> URL 的字典
+        """
+        unique_keys = list(dict.fromkeys(k for k in keys if k))
+        if not unique_keys:
+            return {}
         
         if self.mode == "cdn" and self.cdn_base_url:
             # CDN 模式：直接拼接 URL
-            return f"{self.cdn_base_url.rstrip('/')}/{key}"
-        elif self.mode == "presign" and self.minio_client:
+            base = self.cdn_base_url.rstrip('/')
+            return {key: f"{base}/{key}" for key in unique_keys}
+        if self.mode == "proxy":
+            # Proxy 模式：key 是内容寻址的，URL 永久稳定，无需签名也无需连接 MinIO
+            return {key: self._proxy_url(key) for key in unique_keys}
+        
+        # 延迟初始化 MinIO 客户端（避免启动时阻塞）
+        self._ensure_initialized()
+        
+        if self.mode == "presign" and self.minio_client:
             # 如果启用了图片代理，使用代理端点
             if settings.USE_IMAGE_PROXY:
-                api_base = settings.API_BASE_URL.rstrip('/')
-                return f"{api_base}/api/images/{key}"
+                return {key: self._proxy_url(key) for key in unique_keys}
             
-            # Presign 模式：生成预签名 URL
-            try:
-                # 优先使用外部端点客户端生成 URL（浏览器可访问）
-                client_to_use = self.presign_client if self.presign_client else self.minio_client
-                url = client_to_use.get_presigned_url(
-                    key,
-                    expires_seconds=settings.PRESIGN_EXPIRES_SECONDS
-                )
-                return url
-            except Exception as e:
-                print(f"[ImageService] 生成 presign URL 失败: {e}，尝试使用代理端点")
-                import traceback
-                traceback.print_exc()
-                # 降级到代理端点
-                api_base = settings.API_BASE_URL.rstrip('/')
-                return f"{api_base}/api/images/{key}"
+            # Presign 模式：先查缓存，未命中的在同一个签名窗口内生成
+            now = time.time()
+            request_date, window_end = self._signing_window(now)
+            urls = {}
+            for key in unique_keys:
+                cache_key = (key, self.mode)
+                url = self._cache_get(cache_key, now)
+                if url is None:
+                    url = self._presign(key, request_date)
+                    if url is None:
+                        # 降级到代理端点（不缓存，下次重新尝试签名）
+                        urls[key] = self._proxy_url(key)
+                        continue
+                    self._cache_put(cache_key, url, window_end)
+                urls[key] = url
+            return urls
         else:
             # 降级：直接返回 key（可能需要前端处理）
-            return key
+            return {key: key for key in unique_keys}
 
 
 # 全局实例（延迟初始化，避免启动时阻塞）
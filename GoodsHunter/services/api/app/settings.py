@@ -1,6 +1,6 @@
 """应用配置"""
 import os
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -23,23 +23,56 @@ class Settings(BaseSettings):
     MINIO_USE_SSL: bool = os.getenv("MINIO_USE_SSL", "false").lower() == "true"
     
     # 图片 URL 策略
-    IMAGE_URL_MODE: str = os.getenv("IMAGE_URL_MODE", "presign")  # presign 或 cdn
+    # presign: 预签名 URL；cdn: CDN_BASE_URL + key；proxy: 稳定的 /api/images/{key} 代理 URL（不签名）
+    IMAGE_URL_MODE: str = os.getenv("IMAGE_URL_MODE", "presign")
     CDN_BASE_URL: Optional[str] = os.getenv("CDN_BASE_URL", None)
+    # 内容寻址图片（original/、thumb/）的缓存时间（秒），默认一年，配合 immutable 使用
+    IMAGE_IMMUTABLE_MAX_AGE: int = int(os.getenv("IMAGE_IMMUTABLE_MAX_AGE", "31536000"))
     
     # Presign 过期时间（秒）
     PRESIGN_EXPIRES_SECONDS: int = int(os.getenv("PRESIGN_EXPIRES_SECONDS", "1800"))  # 30分钟
+    # Presign URL 缓存时间（秒），必须小于 PRESIGN_EXPIRES_SECONDS，保证返回给前端的 URL 仍有足够的有效期
+    PRESIGN_CACHE_TTL_SECONDS: int = int(os.getenv("PRESIGN_CACHE_TTL_SECONDS", "600"))  # 10分钟
+    # Presign URL 缓存的最大条目数
+    PRESIGN_CACHE_MAX_ENTRIES: int = int(os.getenv("PRESIGN_CACHE_MAX_ENTRIES", "50000"))
     
     # 是否使用图片代理（当 presigned URL 有问题时使用）
     USE_IMAGE_PROXY: bool = os.getenv("USE_IMAGE_PROXY", "false").lower() == "true"
     
     # API 基础 URL（用于生成代理 URL）
     API_BASE_URL: str = os.getenv("API_BASE_URL", "http://localhost:8000")
-    
+
+    # 图片代理：流式转发的分块大小（字节）
+    IMAGE_PROXY_CHUNK_SIZE: int = int(os.getenv("IMAGE_PROXY_CHUNK_SIZE", str(64 * 1024)))
+    # 图片代理：热点图片内存缓存（LRU），总容量为 0 时禁用
+    IMAGE_HOT_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_HOT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    IMAGE_HOT_CACHE_MAX_ITEM_BYTES: int = int(os.getenv("IMAGE_HOT_CACHE_MAX_ITEM_BYTES", str(512 * 1024)))
+    # 允许进入热点缓存的 key 前缀（逗号分隔），默认只缓存列表页使用的 300px 缩略图
+    IMAGE_HOT_CACHE_PREFIXES: str = os.getenv("IMAGE_HOT_CACHE_PREFIXES", "thumb/300/")
+
+    # 按需生成的派生图片：允许的宽度和格式（逗号分隔），不在列表中的请求返回 400
+    IMAGE_DERIVED_WIDTHS: str = os.getenv("IMAGE_DERIVED_WIDTHS", "150,300,450,600,900,1200")
+    IMAGE_DERIVED_FORMATS: str = os.getenv("IMAGE_DERIVED_FORMATS", "webp,jpeg")
+    IMAGE_DERIVED_QUALITY: int = int(os.getenv("IMAGE_DERIVED_QUALITY", "85"))
+
     # Elasticsearch 配置
     ES_HOST: str = os.getenv("ES_HOST", "localhost")
     ES_PORT: int = int(os.getenv("ES_PORT", "9200"))
     ES_INDEX_NAME: str = os.getenv("ES_INDEX_NAME", "products")
+
+    # 管理端接口（/api/admin/*）的访问令牌，请求需携带 X-Admin-Token 头；未设置时管理端接口一律拒绝
+    ADMIN_API_TOKEN: Optional[str] = os.getenv("ADMIN_API_TOKEN", None)
     
+    @property
+    def image_derived_widths(self) -> List[int]:
+        """允许的派生图片宽度列表"""
+        return [int(w) for w in self.IMAGE_DERIVED_WIDTHS.split(",") if w.strip()]
+
+    @property
+    def image_derived_formats(self) -> List[str]:
+        """允许的派生图片格式列表"""
+        return [f.strip().lower() for f in self.IMAGE_DERIVED_FORMATS.split(",") if f.strip()]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
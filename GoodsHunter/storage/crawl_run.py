@@ -0,0 +1,411 @@
+"""抓取运行台账：记录每次抓取运行（crawl_run 表）的计数和各阶段耗时
+
+抓取入口在开始时创建一行 crawl_run，拿到的 id 作为 crawler_log.run_id 写入；
+每个页面的 fetch / extract / file 阶段耗时汇总到运行上，image / db 阶段耗时来自
+DBWriter.stats（写后线程中累计）。运行期间按心跳间隔写回数据库，结束时写入最终状态。
+
+查看最近的运行及其瓶颈阶段：
+    python -m storage.crawl_run --list 20
+把心跳超时的 running 运行标记为 failed（进程被杀死等情况）：
+    python -m storage.crawl_run --mark-stale-minutes 60
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+from storage.db_pool import get_pool
+from enums.business.crawler_status import CrawlRunStatus
+
+
+# 汇总的阶段（顺序即展示顺序），对应 crawl_run.{stage}_seconds 列
+CRAWL_RUN_STAGES = ("fetch", "extract", "file", "image", "db")
+
+# 页面结果 -> crawl_run 计数列
+PAGE_RESULTS = {
+    "succeeded": "urls_succeeded",
+    "failed": "urls_failed",
+    "skipped": "urls_skipped",
+}
+
+# DBWriter.stats 键 -> crawl_run 列
+WRITER_STATS_COLUMNS = {
+    "log_rows": "log_rows_written",
+    "sightings": "items_sighted",
+    "images_fetched": "images_fetched",
+    "images_deduped": "images_deduped",
+    "images_uploaded": "images_uploaded",
+    "image_seconds": "image_seconds",
+    "db_seconds": "db_seconds",
+}
+
+# 每次写回时更新的列
+_UPDATE_COLUMNS = (
+    "urls_planned", "urls_succeeded", "urls_failed", "urls_skipped", "items_extracted",
+    "log_rows_written", "items_sighted", "images_fetched", "images_deduped", "images_uploaded",
+    "fetch_seconds", "extract_seconds", "file_seconds", "image_seconds", "db_seconds",
+    "slowest_page_url", "slowest_page_seconds",
+)
+
+
+def bottleneck_stage(stage_seconds: Dict[str, float]) -> Optional[str]:
+    """
+    找出累计耗时最长的阶段
+
+    Args:
+        stage_seconds: 阶段名 -> 累计耗时（秒）
+
+    Returns:
+        阶段名，全部为 0 时返回 None
+    """
+    stage, seconds = max(stage_seconds.items(), key=lambda kv: kv[1], default=(None, 0))
+    return stage if seconds and seconds > 0 else None
+
+
+class PageTiming:
+    """单个页面的阶段计时（由 CrawlRunRecorder.page() 创建）"""
+
+    def __init__(self, url: str):
+        """
+        初始化页面计时
+
+        Args:
+            url: 页面URL
+        """
+        self.url = url
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        计时一个阶段（同一阶段多次进入时累加）
+
+        Args:
+            name: 阶段名（fetch / extract / file 等）
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def total_seconds(self) -> float:
+        """页面各阶段耗时之和"""
+        return sum(self.seconds.values())
+
+
+class CrawlRunRecorder:
+    """
+    抓取运行记录器
+
+    数据库不可用时记录器自动禁用（run_id 为 -1），不影响抓取本身。
+    计数只在调用方所在的线程（抓取事件循环）中修改；DBWriter.stats 在写回时读取快照。
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        command: Optional[str] = None,
+        heartbeat_seconds: float = 30.0
+    ):
+        """
+        初始化运行记录器
+
+        Args:
+            database_url: 数据库连接URL，如果为None则从环境变量DATABASE_URL读取
+            command: 记录到 crawl_run.command 的启动命令，默认使用 sys.argv
+            heartbeat_seconds: 运行期间写回数据库的最小间隔（秒）
+        """
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        self.command = command if command is not None else " ".join(sys.argv)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.run_id = -1
+        self.counters: Dict[str, Any] = {column: 0 for column in _UPDATE_COLUMNS}
+        for stage in CRAWL_RUN_STAGES:
+            self.counters[f"{stage}_seconds"] = 0.0
+        self.counters["slowest_page_url"] = None
+        self.counters["slowest_page_seconds"] = None
+        self._writer_stats: Optional[Dict[str, Any]] = None
+        self._writer_baseline: Dict[str, Any] = {}
+        self._last_flush = 0.0
+        self._finished = False
+
+    @property
+    def enabled(self) -> bool:
+        """是否已在数据库中创建运行记录"""
+        return self.run_id > 0
+
+    def _get_connection(self):
+        """从共享连接池获取数据库连接（conn.close() 即归还）"""
+        return get_pool(self.database_url).getconn()
+
+    def start(self, urls_planned: int) -> int:
+        """
+        创建 crawl_run 记录
+
+        Args:
+            urls_planned: 计划抓取的 URL 数
+
+        Returns:
+            run_id（写入 crawler_log.run_id），创建失败返回 -1
+        """
+        self.counters["urls_planned"] = urls_planned
+        if psycopg2 is None or not self.database_url:
+            print("[CrawlRunRecorder] 警告: 数据库不可用，不记录运行台账")
+            return self.run_id
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO crawl_run (status, command, host, urls_planned)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+                """,
+                (CrawlRunStatus.RUNNING.value, self.command, socket.gethostname(), urls_planned)
+            )
+            self.run_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            self._last_flush = time.monotonic()
+            print(f"[CrawlRunRecorder] 运行已开始: run_id={self.run_id}，计划 {urls_planned} 个URL")
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"[CrawlRunRecorder] 警告: 创建运行记录失败: {e}，不记录运行台账")
+        finally:
+            if conn:
+                conn.close()
+        return self.run_id
+
+    def attach_writer_stats(self, stats: Dict[str, Any]):
+        """
+        关联 DBWriter.stats，写回时汇总图片和数据库阶段的计数/耗时（只统计关联之后的增量）
+
+        Args:
+            stats: DBWriter.stats 字典（持续更新的同一个对象）
+        """
+        self._writer_stats = stats
+        self._writer_baseline = {key: stats.get(key, 0) for key in WRITER_STATS_COLUMNS}
+
+    def page(self, url: str) -> PageTiming:
+        """
+        开始一个页面的计时
+
+        Args:
+            url: 页面URL
+
+        Returns:
+            PageTiming，使用 page.stage(name) 计时各阶段
+        """
+        return PageTiming(url)
+
+    def finish_page(self, page: PageTiming, result: str, items: int = 0):
+        """
+        把页面的计时和结果汇总到运行上（到达心跳间隔时写回数据库）
+
+        Args:
+            page: page() 返回的计时对象
+            result: 页面结果（succeeded / failed / skipped）
+            items: 抽取到的列表项数
+        """
+        self.counters[PAGE_RESULTS[result]] += 1
+        self.counters["items_extracted"] += items
+        for stage, seconds in page.seconds.items():
+            column = f"{stage}_seconds"
+            if column in self.counters:
+                self.counters[column] += seconds
+        total = page.total_seconds
+        slowest = self.counters["slowest_page_seconds"]
+        if slowest is None or total > slowest:
+            self.counters["slowest_page_url"] = page.url
+            self.counters["slowest_page_seconds"] = total
+        if self.enabled and time.monotonic() - self._last_flush >= self.heartbeat_seconds:
+            self.flush()
+
+    def _absorb_writer_stats(self):
+        """把 DBWriter.stats 的增量合并到计数中"""
+        if self._writer_stats is None:
+            return
+        for key, column in WRITER_STATS_COLUMNS.items():
+            self.counters[column] = self._writer_stats.get(key, 0) - self._writer_baseline.get(key, 0)
+
+    def stage_seconds(self) -> Dict[str, float]:
+        """
+        各阶段累计耗时
+
+        Returns:
+            阶段名 -> 秒
+        """
+        self._absorb_writer_stats()
+        return {stage: self.counters[f"{stage}_seconds"] for stage in CRAWL_RUN_STAGES}
+
+    def flush(self, status: Optional[str] = None, error: Optional[str] = None):
+        """
+        把当前计数写回 crawl_run（失败只打印警告）
+
+        Args:
+            status: 同时更新的状态（结束时传入 finished / failed）
+            error: 失败原因
+        """
+        if not self.enabled:
+            return
+        self._absorb_writer_stats()
+        assignments = [f"{column} = %s" for column in _UPDATE_COLUMNS]
+        params = [self.counters[column] for column in _UPDATE_COLUMNS]
+        assignments.append("heartbeat_at = now()")
+        if status:
+            assignments.extend(["status = %s", "error = %s", "finished_at = now()"])
+            params.extend([status, error])
+        params.append(self.run_id)
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE crawl_run SET {', '.join(assignments)} WHERE id = %s",
+                params
+            )
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"[CrawlRunRecorder] 警告: 写回运行记录失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+            self._last_flush = time.monotonic()
+
+    def finish(self, error: Optional[str] = None):
+        """
+        结束运行：写入最终计数、状态和结束时间，并打印阶段耗时汇总
+
+        应在写后队列排空之后调用，保证 image / db 阶段的统计完整。
+
+        Args:
+            error: 失败原因，为 None 时状态为 finished
+        """
+        if self._finished:
+            return
+        self._finished = True
+        status = CrawlRunStatus.FAILED.value if error else CrawlRunStatus.FINISHED.value
+        self.flush(status=status, error=error)
+        stages = self.stage_seconds()
+        summary = ", ".join(f"{stage}={seconds:.1f}s" for stage, seconds in stages.items())
+        print(
+            f"[CrawlRunRecorder] 运行结束: run_id={self.run_id}, status={status}, "
+            f"成功={self.counters['urls_succeeded']}, 失败={self.counters['urls_failed']}, "
+            f"跳过={self.counters['urls_skipped']}, items={self.counters['items_extracted']}; "
+            f"阶段耗时: {summary}; 瓶颈: {bottleneck_stage(stages) or '-'}"
+        )
+
+
+def list_runs(database_url: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    查询最近的运行
+
+    Args:
+        database_url: 数据库连接URL
+        limit: 返回条数
+
+    Returns:
+        运行记录字典列表（按开始时间倒序）
+    """
+    conn = get_pool(database_url).getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id, status, started_at, finished_at, urls_planned, urls_succeeded, urls_failed,
+                   items_extracted, fetch_seconds, extract_seconds, file_seconds, image_seconds, db_seconds
+            FROM crawl_run
+            ORDER BY started_at DESC
+            LIMIT %s
+            """,
+            (limit,)
+        )
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.close()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def mark_stale_runs(database_url: str, stale_minutes: int) -> int:
+    """
+    把心跳超时的 running 运行标记为 failed
+
+    Args:
+        database_url: 数据库连接URL
+        stale_minutes: 心跳超过多少分钟未更新视为已退出
+
+    Returns:
+        标记的运行数
+    """
+    conn = get_pool(database_url).getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE crawl_run
+            SET status = %s, error = %s, finished_at = heartbeat_at
+            WHERE status = %s AND heartbeat_at < now() - make_interval(mins => %s)
+            """,
+            (CrawlRunStatus.FAILED.value, "heartbeat timeout", CrawlRunStatus.RUNNING.value, stale_minutes)
+        )
+        marked = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return marked
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取运行台账（crawl_run）")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--list", type=int, default=None, metavar="N", help="列出最近 N 次运行")
+    parser.add_argument("--mark-stale-minutes", type=int, default=None,
+                        help="把心跳超过该分钟数的 running 运行标记为 failed")
+    args = parser.parse_args()
+
+    if psycopg2 is None:
+        raise ImportError("psycopg2 未安装。请运行: pip install psycopg2-binary")
+    if not args.database_url:
+        raise ValueError("未提供--database-url且环境变量DATABASE_URL未设置")
+
+    if args.mark_stale_minutes is not None:
+        marked = mark_stale_runs(args.database_url, args.mark_stale_minutes)
+        print(f"[CrawlRunRecorder] 已标记 {marked} 个超时运行为 failed")
+
+    if args.list:
+        print(f"{'run_id':>7} {'status':<9} {'started_at':<19} {'urls':>11} {'items':>7} "
+              + " ".join(f"{stage:>8}" for stage in CRAWL_RUN_STAGES) + "  bottleneck")
+        for row in list_runs(args.database_url, args.list):
+            stages = {stage: row[f"{stage}_seconds"] for stage in CRAWL_RUN_STAGES}
+            urls = f"{row['urls_succeeded']}/{row['urls_planned']}"
+            print(f"{row['id']:>7} {row['status']:<9} {row['started_at']:%Y-%m-%d %H:%M:%S} {urls:>11} "
+                  f"{row['items_extracted']:>7} "
+                  + " ".join(f"{stages[stage]:>7.1f}s" for stage in CRAWL_RUN_STAGES)
+                  + f"  {bottleneck_stage(stages) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,10 @@
 -- 如果表已存在则删除（用于开发环境重置）
 -- DROP TABLE IF EXISTS crawler_log CASCADE;
 
--- 创建 crawler_log 表
+-- 创建 crawler_log 表（按 dt 按天 RANGE 分区）
+-- 主键必须包含分区键，因此为 (id, dt)；id 仍由序列全局递增
 CREATE TABLE IF NOT EXISTS crawler_log (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL NOT NULL,
     category TEXT NOT NULL,
     site TEXT NOT NULL,
     item_id TEXT NOT NULL,
@@ -24,6 +25,7 @@ CREATE TABLE IF NOT EXISTS crawler_log (
     image_thumb_300_key TEXT NULL,
     image_thumb_600_key TEXT NULL,
     image_sha256 TEXT NULL,
+    image_phash TEXT NULL,
     source_uid TEXT NOT NULL,
     raw_hash TEXT NOT NULL,
     status TEXT NOT NULL DEFAULT 'success',
@@ -33,28 +35,115 @@ CREATE TABLE IF NOT EXISTS crawler_log (
     product_url TEXT NULL,
     run_id BIGINT NULL,
     crawl_time TIMESTAMPTZ NOT NULL DEFAULT now(),
-    dt DATE NOT NULL DEFAULT CURRENT_DATE
-);
-
--- 创建索引
-CREATE INDEX idx_crawler_log_site ON crawler_log(site);
-CREATE INDEX idx_crawler_log_item_id ON crawler_log(item_id);
-CREATE INDEX idx_crawler_log_category ON crawler_log(category);
-CREATE INDEX idx_crawler_log_brand_name ON crawler_log(brand_name);
-CREATE INDEX idx_crawler_log_model_name ON crawler_log(model_name);
-CREATE INDEX idx_crawler_log_model_no ON crawler_log(model_no);
-CREATE INDEX idx_crawler_log_price ON crawler_log(price);
-CREATE INDEX idx_crawler_log_crawl_time ON crawler_log(crawl_time DESC);
-CREATE INDEX idx_crawler_log_dt ON crawler_log(dt);
-CREATE INDEX idx_crawler_log_image_sha256 ON crawler_log(image_sha256);
-CREATE INDEX idx_crawler_log_source_uid ON crawler_log(source_uid);
-CREATE INDEX idx_crawler_log_raw_hash ON crawler_log(raw_hash);
-CREATE INDEX idx_crawler_log_status ON crawler_log(status);
-CREATE INDEX idx_crawler_log_run_id ON crawler_log(run_id);
-
--- 创建组合索引
-CREATE INDEX idx_crawler_log_site_item_id ON crawler_log(site, item_id);
-CREATE INDEX idx_crawler_log_brand_model ON crawler_log(brand_name, model_name);
+    dt DATE NOT NULL DEFAULT CURRENT_DATE,
+    PRIMARY KEY (id, dt)
+) PARTITION BY RANGE (dt);
+
+-- 默认分区：兜底超出已创建分区范围的数据，保证写入不失败（正常情况下应为空）
+CREATE TABLE IF NOT EXISTS crawler_log_default PARTITION OF crawler_log DEFAULT;
+
+-- 创建索引（在父表上创建，自动下发为每个分区的本地索引）
+-- 写入优化的索引组合：每次插入只维护 1 个主键 + 2 个 B-tree + 1 个 BRIN
+--   item_extract 增量读取：WHERE id > ? AND status = 'success' ORDER BY id LIMIT ?
+CREATE INDEX IF NOT EXISTS idx_crawler_log_id_success ON crawler_log(id) WHERE status = 'success';
+--   按商品查询抓取历史（按 id 有序，无需排序）；source_uid 已包含 site 和 item_id
+CREATE INDEX IF NOT EXISTS idx_crawler_log_source_uid_id ON crawler_log(source_uid, id);
+--   随写入顺序递增的列使用 BRIN（按块范围记录最小/最大值，体积极小、几乎不增加写入成本）：
+--   id 范围（归档/回放）、crawl_time 时间范围、dt（默认分区）、run_id（按 crawl run 查询/清理）
+CREATE INDEX IF NOT EXISTS idx_crawler_log_brin ON crawler_log
+    USING brin (id, crawl_time, dt, run_id) WITH (pages_per_range = 32);
+
+-- 分区维护函数：创建某一天的按天分区，返回从默认分区搬入的行数
+--   默认分区中已有该天的行时，直接 CREATE ... PARTITION OF 会因默认分区约束冲突而失败：
+--   先分离默认分区，建好按天分区后把这些行搬过去，再挂回默认分区（期间持有父表锁，写入会短暂等待）
+--   是否已有分区按 pg_inherits 判断；同名表存在但未挂载（保留期分离后尚未归档/删除）时报错，
+--   需先归档或删除该表，否则默认分区中该天的行无处可搬
+CREATE OR REPLACE FUNCTION crawler_log_create_partition(p_day DATE)
+RETURNS BIGINT AS $$
+DECLARE
+    part_name TEXT := 'crawler_log_p' || to_char(p_day, 'YYYYMMDD');
+    moved BIGINT := 0;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_inherits
+        WHERE inhrelid = to_regclass(part_name) AND inhparent = 'crawler_log'::regclass
+    ) THEN
+        RETURN 0;
+    END IF;
+    IF to_regclass(part_name) IS NOT NULL THEN
+        RAISE EXCEPTION '表 % 已存在但未挂载到 crawler_log（已分离的旧分区），无法创建 % 的分区；请先归档（python -m storage.log_archive archive --partition %）或删除该表',
+            part_name, p_day, part_name;
+    END IF;
+    IF EXISTS (SELECT 1 FROM crawler_log_default WHERE dt = p_day) THEN
+        ALTER TABLE crawler_log DETACH PARTITION crawler_log_default;
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+            part_name, p_day, p_day + 1
+        );
+        WITH moved_rows AS (
+            DELETE FROM crawler_log_default WHERE dt = p_day RETURNING *
+        )
+        INSERT INTO crawler_log SELECT * FROM moved_rows;
+        GET DIAGNOSTICS moved = ROW_COUNT;
+        ALTER TABLE crawler_log ATTACH PARTITION crawler_log_default DEFAULT;
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+            part_name, p_day, p_day + 1
+        );
+    END IF;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 分区维护函数：创建 [p_start, p_start + p_days) 范围内缺失的按天分区（默认分区中对应日期的行一并搬入）
+CREATE OR REPLACE FUNCTION crawler_log_create_partitions(p_start DATE, p_days INT)
+RETURNS INT AS $$
+DECLARE
+    d DATE;
+    created INT := 0;
+BEGIN
+    FOR i IN 0 .. GREATEST(p_days, 0) - 1 LOOP
+        d := p_start + i;
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_inherits
+            WHERE inhrelid = to_regclass('crawler_log_p' || to_char(d, 'YYYYMMDD'))
+              AND inhparent = 'crawler_log'::regclass
+        ) THEN
+            PERFORM crawler_log_create_partition(d);
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 分区维护函数：分离（可选删除）dt 早于 p_before 的按天分区，返回被处理的分区名
+CREATE OR REPLACE FUNCTION crawler_log_detach_partitions(p_before DATE, p_drop BOOLEAN DEFAULT FALSE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'crawler_log'::regclass
+          AND c.relname ~ '^crawler_log_p[0-9]{8}$'
+          AND to_date(substring(c.relname FROM 14 FOR 8), 'YYYYMMDD') < p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE crawler_log DETACH PARTITION %I', part.relname);
+        IF p_drop THEN
+            EXECUTE format('DROP TABLE %I', part.relname);
+        END IF;
+        RETURN NEXT part.relname;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 预先创建最近 7 天到未来 14 天的分区（之后由 storage/partition_manager.py 定时维护）
+SELECT crawler_log_create_partitions(CURRENT_DATE - 7, 22);
 
 -- 添加注释
 COMMENT ON TABLE crawler_log IS '原始抓取记录表';
@@ -72,6 +161,7 @@ COMMENT ON COLUMN crawler_log.image_original_key IS 'MinIO原图key';
 COMMENT ON COLUMN crawler_log.image_thumb_300_key IS 'MinIO 300px缩略图key';
 COMMENT ON COLUMN crawler_log.image_thumb_600_key IS 'MinIO 600px缩略图key';
 COMMENT ON COLUMN crawler_log.image_sha256 IS '图片SHA256哈希值（用于去重）';
+COMMENT ON COLUMN crawler_log.image_phash IS '图片感知哈希（64位dHash，16位十六进制），用于跨站点近似重复图片检测';
 COMMENT ON COLUMN crawler_log.source_uid IS '幂等去重键：{site}:{item_id}';
 COMMENT ON COLUMN crawler_log.raw_hash IS 'raw_json的SHA256哈希值（用于判断内容是否变化）';
 COMMENT ON COLUMN crawler_log.status IS '抓取状态：success/failed';
@@ -81,7 +171,7 @@ COMMENT ON COLUMN crawler_log.fetch_url IS '实际抓取的URL';
 COMMENT ON COLUMN crawler_log.product_url IS '原网站的商品URL';
 COMMENT ON COLUMN crawler_log.run_id IS '关联一次crawl run（用于任务调度）';
 COMMENT ON COLUMN crawler_log.crawl_time IS '抓取时间（精确时刻）';
-COMMENT ON COLUMN crawler_log.dt IS '分区键（按天）';
+COMMENT ON COLUMN crawler_log.dt IS '分区键（按天 RANGE 分区，分区名 crawler_log_pYYYYMMDD）';
 
 -- ============================================================================
 -- 2. pipeline_state 表（流水线状态表）
@@ -121,6 +211,7 @@ CREATE TABLE IF NOT EXISTS crawler_item (
     
     -- 图片引用（MinIO keys）
     image_sha256 TEXT NULL,
+    image_phash TEXT NULL,
     image_original_key TEXT NULL,
     image_thumb_300_key TEXT NULL,
     image_thumb_600_key TEXT NULL,
@@ -139,6 +230,7 @@ CREATE TABLE IF NOT EXISTS crawler_item (
     -- 时间戳字段
     last_crawl_time TIMESTAMPTZ NOT NULL,
     last_log_id BIGINT NULL,
+    last_raw_hash TEXT NULL,
     price_last_changed_at TIMESTAMPTZ NULL,
     price_last_changed_dt DATE NULL,
     
@@ -171,6 +263,8 @@ COMMENT ON COLUMN crawler_item.source_uid IS '幂等去重键：{site}:{item_id}
 COMMENT ON COLUMN crawler_item.product_url IS '原网站的商品URL';
 COMMENT ON COLUMN crawler_item.status IS '商品状态：active/sold/removed';
 COMMENT ON COLUMN crawler_item.product_id IS '关联的聚合商品ID，NULL表示未关联';
+COMMENT ON COLUMN crawler_item.image_phash IS '图片感知哈希（64位dHash，16位十六进制），用于跨站点近似重复图片检测';
+COMMENT ON COLUMN crawler_item.last_raw_hash IS '最近一次提取的 crawler_log.raw_hash，DBWriter 精简模式据此判断内容是否变化';
 
 -- ============================================================================
 -- 4. item_change_history 表（商品变更历史表）
@@ -285,3 +379,96 @@ COMMENT ON TABLE model_name_translations IS '型号名称翻译表，存储型
 COMMENT ON COLUMN model_name_translations.translations IS 'JSON格式，如：{"en": "Heritage Collection", "zh": "传承系列", "ja": "ヘリテージコレクション"}';
 
 
+
+-- ============================================================================
+-- 9. crawl_run 表（抓取运行台账）
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS crawl_run (
+    id BIGSERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    command TEXT NULL,
+    host TEXT NULL,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ NULL,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    error TEXT NULL,
+
+    -- URL / item / 图片计数
+    urls_planned INT NOT NULL DEFAULT 0,
+    urls_succeeded INT NOT NULL DEFAULT 0,
+    urls_failed INT NOT NULL DEFAULT 0,
+    urls_skipped INT NOT NULL DEFAULT 0,
+    items_extracted INT NOT NULL DEFAULT 0,
+    log_rows_written INT NOT NULL DEFAULT 0,
+    items_sighted INT NOT NULL DEFAULT 0,
+    images_fetched INT NOT NULL DEFAULT 0,
+    images_deduped INT NOT NULL DEFAULT 0,
+    images_uploaded INT NOT NULL DEFAULT 0,
+
+    -- 各阶段累计耗时（秒，由每页的计时汇总）
+    fetch_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    extract_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    file_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    image_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    db_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    slowest_page_url TEXT NULL,
+    slowest_page_seconds DOUBLE PRECISION NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawl_run_started_at ON crawl_run(started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_crawl_run_status ON crawl_run(status);
+
+COMMENT ON TABLE crawl_run IS '抓取运行台账：每次抓取运行一行，记录计数和各阶段耗时（crawler_log.run_id 关联 id）';
+COMMENT ON COLUMN crawl_run.status IS '运行状态：running/finished/failed';
+COMMENT ON COLUMN crawl_run.command IS '启动命令（入口和参数）';
+COMMENT ON COLUMN crawl_run.host IS '运行主机名';
+COMMENT ON COLUMN crawl_run.heartbeat_at IS '最近一次汇总写入时间（running 状态下长时间未更新说明进程已退出）';
+COMMENT ON COLUMN crawl_run.urls_planned IS '计划抓取的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_succeeded IS '抓取并抽取成功的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_failed IS '抓取或抽取失败的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_skipped IS '未匹配 Profile 而跳过的 URL 数';
+COMMENT ON COLUMN crawl_run.items_extracted IS '抽取到的列表项数';
+COMMENT ON COLUMN crawl_run.log_rows_written IS '写入 crawler_log 的行数';
+COMMENT ON COLUMN crawl_run.items_sighted IS '精简模式下内容未变化、只刷新最后发现时间的商品数';
+COMMENT ON COLUMN crawl_run.images_fetched IS '获取到图片数据的 item 数（页面内嵌或下载）';
+COMMENT ON COLUMN crawl_run.images_deduped IS '感知哈希命中、复用已有图片的数量';
+COMMENT ON COLUMN crawl_run.images_uploaded IS '上传原图到 MinIO 的数量';
+COMMENT ON COLUMN crawl_run.fetch_seconds IS '页面抓取阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.extract_seconds IS '字段抽取阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.file_seconds IS '本地文件输出（JSONL/图片/文本/分片）阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.image_seconds IS '图片处理阶段（下载/哈希/缩略图/上传）累计耗时（秒，写后线程中执行）';
+COMMENT ON COLUMN crawl_run.db_seconds IS 'crawler_log 写入和提交阶段累计耗时（秒，写后线程中执行）';
+COMMENT ON COLUMN crawl_run.slowest_page_url IS '抓取+抽取+文件输出耗时最长的页面';
+COMMENT ON COLUMN crawl_run.slowest_page_seconds IS '最慢页面的耗时（秒）';
+
+-- ============================================================================
+-- 10. item_price_daily / product_price_daily 表（每日价格聚合）
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS item_price_daily (
+    source_uid TEXT NOT NULL,
+    dt DATE NOT NULL,
+    currency TEXT NULL,
+    min_price INTEGER NOT NULL,
+    max_price INTEGER NOT NULL,
+    last_price INTEGER NOT NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (source_uid, dt)
+);
+
+CREATE TABLE IF NOT EXISTS product_price_daily (
+    product_id BIGINT NOT NULL,
+    dt DATE NOT NULL,
+    currency TEXT NULL,
+    min_price INTEGER NOT NULL,
+    max_price INTEGER NOT NULL,
+    last_price INTEGER NOT NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (product_id, dt)
+);
+
+COMMENT ON TABLE item_price_daily IS '商品每日价格聚合（item_extract 同步时增量维护），价格走势图按 (source_uid, dt) 主键范围扫描';
+COMMENT ON COLUMN item_price_daily.last_price IS '当天最后一次观测到的价格（按抓取时间）';
+COMMENT ON COLUMN item_price_daily.last_seen_at IS '当天最后一次观测的抓取时间';
+COMMENT ON TABLE product_price_daily IS '聚合商品每日价格（关联到该 product_id 的所有 item 的观测），同步时增量维护，关联前的历史用 python -m item_extract.price_daily --rebuild-products 重建';
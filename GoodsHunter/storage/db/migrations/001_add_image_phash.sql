@@ -0,0 +1,16 @@
+-- 迁移：为 crawler_log / crawler_item 增加图片感知哈希（dHash）字段
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/001_add_image_phash.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/001_add_image_phash_rollback.sql
+
+BEGIN;
+
+ALTER TABLE crawler_log ADD COLUMN IF NOT EXISTS image_phash TEXT NULL;
+COMMENT ON COLUMN crawler_log.image_phash IS '图片感知哈希（64位dHash，16位十六进制），用于跨站点近似重复图片检测';
+
+ALTER TABLE crawler_item ADD COLUMN IF NOT EXISTS image_phash TEXT NULL;
+COMMENT ON COLUMN crawler_item.image_phash IS '图片感知哈希（64位dHash，16位十六进制），用于跨站点近似重复图片检测';
+
+COMMIT;
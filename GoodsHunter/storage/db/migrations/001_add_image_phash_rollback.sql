@@ -0,0 +1,11 @@
+-- 回滚：删除图片感知哈希字段（001_add_image_phash.sql）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/001_add_image_phash_rollback.sql
+
+BEGIN;
+
+ALTER TABLE crawler_item DROP COLUMN IF EXISTS image_phash;
+ALTER TABLE crawler_log DROP COLUMN IF EXISTS image_phash;
+
+COMMIT;
@@ -0,0 +1,20 @@
+-- 迁移：crawler_item 增加 last_raw_hash 字段（DBWriter 精简模式判断内容是否变化）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/002_add_crawler_item_last_raw_hash.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/002_add_crawler_item_last_raw_hash_rollback.sql
+
+BEGIN;
+
+ALTER TABLE crawler_item ADD COLUMN IF NOT EXISTS last_raw_hash TEXT NULL;
+COMMENT ON COLUMN crawler_item.last_raw_hash IS '最近一次提取的 crawler_log.raw_hash，DBWriter 精简模式据此判断内容是否变化';
+
+-- 回填：使用每个商品 last_log_id 对应日志的 raw_hash
+UPDATE crawler_item ci
+SET last_raw_hash = cl.raw_hash
+FROM crawler_log cl
+WHERE cl.id = ci.last_log_id
+  AND ci.last_raw_hash IS NULL;
+
+COMMIT;
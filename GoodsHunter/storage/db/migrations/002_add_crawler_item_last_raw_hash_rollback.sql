@@ -0,0 +1,10 @@
+-- 回滚：删除 crawler_item.last_raw_hash 字段（002_add_crawler_item_last_raw_hash.sql）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/002_add_crawler_item_last_raw_hash_rollback.sql
+
+BEGIN;
+
+ALTER TABLE crawler_item DROP COLUMN IF EXISTS last_raw_hash;
+
+COMMIT;
@@ -0,0 +1,172 @@
+-- 迁移：crawler_log 改为按 dt 按天 RANGE 分区，并精简索引
+--
+-- 前置条件：已执行 001_add_image_phash.sql（需要 image_phash 列）
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/003_partition_crawler_log.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/003_partition_crawler_log_rollback.sql
+--
+-- 迁移会把旧表重命名为 crawler_log_legacy 并复制全部数据；确认无误后手动删除旧表：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter -c "DROP TABLE crawler_log_legacy"
+-- 迁移期间需停止爬虫写入（整个过程在一个事务中，会锁住 crawler_log）。
+
+BEGIN;
+
+-- 1. 旧表改名，释放表名、主键名和索引名（序列 crawler_log_id_seq 保留，继续为新表发号）
+ALTER TABLE crawler_log RENAME TO crawler_log_legacy;
+ALTER TABLE crawler_log_legacy RENAME CONSTRAINT crawler_log_pkey TO crawler_log_legacy_pkey;
+
+DROP INDEX IF EXISTS idx_crawler_log_site;
+DROP INDEX IF EXISTS idx_crawler_log_item_id;
+DROP INDEX IF EXISTS idx_crawler_log_category;
+DROP INDEX IF EXISTS idx_crawler_log_brand_name;
+DROP INDEX IF EXISTS idx_crawler_log_model_name;
+DROP INDEX IF EXISTS idx_crawler_log_model_no;
+DROP INDEX IF EXISTS idx_crawler_log_price;
+DROP INDEX IF EXISTS idx_crawler_log_crawl_time;
+DROP INDEX IF EXISTS idx_crawler_log_dt;
+DROP INDEX IF EXISTS idx_crawler_log_image_sha256;
+DROP INDEX IF EXISTS idx_crawler_log_source_uid;
+DROP INDEX IF EXISTS idx_crawler_log_raw_hash;
+DROP INDEX IF EXISTS idx_crawler_log_status;
+DROP INDEX IF EXISTS idx_crawler_log_run_id;
+DROP INDEX IF EXISTS idx_crawler_log_site_item_id;
+DROP INDEX IF EXISTS idx_crawler_log_brand_model;
+
+-- 2. 创建分区表（结构与 init.sql 一致）
+CREATE TABLE crawler_log (
+    id BIGINT NOT NULL DEFAULT nextval('crawler_log_id_seq'),
+    category TEXT NOT NULL,
+    site TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    raw_json JSONB NOT NULL,
+    brand_name TEXT NULL,
+    model_name TEXT NULL,
+    model_no TEXT NULL,
+    currency TEXT NOT NULL DEFAULT 'JPY',
+    price INTEGER NULL,
+    image_original_key TEXT NULL,
+    image_thumb_300_key TEXT NULL,
+    image_thumb_600_key TEXT NULL,
+    image_sha256 TEXT NULL,
+    image_phash TEXT NULL,
+    source_uid TEXT NOT NULL,
+    raw_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'success',
+    error TEXT NULL,
+    http_status INT NULL,
+    fetch_url TEXT NULL,
+    product_url TEXT NULL,
+    run_id BIGINT NULL,
+    crawl_time TIMESTAMPTZ NOT NULL DEFAULT now(),
+    dt DATE NOT NULL DEFAULT CURRENT_DATE,
+    PRIMARY KEY (id, dt)
+) PARTITION BY RANGE (dt);
+
+ALTER SEQUENCE crawler_log_id_seq OWNED BY crawler_log.id;
+
+CREATE TABLE crawler_log_default PARTITION OF crawler_log DEFAULT;
+
+CREATE INDEX idx_crawler_log_id_success ON crawler_log(id) WHERE status = 'success';
+CREATE INDEX idx_crawler_log_source_uid ON crawler_log(source_uid);
+CREATE INDEX idx_crawler_log_site_item_id ON crawler_log(site, item_id);
+CREATE INDEX idx_crawler_log_run_id ON crawler_log(run_id);
+
+-- 分区维护函数：创建 [p_start, p_start + p_days) 范围内缺失的按天分区
+CREATE OR REPLACE FUNCTION crawler_log_create_partitions(p_start DATE, p_days INT)
+RETURNS INT AS $$
+DECLARE
+    d DATE;
+    part_name TEXT;
+    created INT := 0;
+BEGIN
+    FOR i IN 0 .. GREATEST(p_days, 0) - 1 LOOP
+        d := p_start + i;
+        part_name := 'crawler_log_p' || to_char(d, 'YYYYMMDD');
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+                part_name, d, d + 1
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 分区维护函数：分离（可选删除）dt 早于 p_before 的按天分区，返回被处理的分区名
+CREATE OR REPLACE FUNCTION crawler_log_detach_partitions(p_before DATE, p_drop BOOLEAN DEFAULT FALSE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'crawler_log'::regclass
+          AND c.relname ~ '^crawler_log_p[0-9]{8}$'
+          AND to_date(substring(c.relname FROM 14 FOR 8), 'YYYYMMDD') < p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE crawler_log DETACH PARTITION %I', part.relname);
+        IF p_drop THEN
+            EXECUTE format('DROP TABLE %I', part.relname);
+        END IF;
+        RETURN NEXT part.relname;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3. 为历史数据和未来 14 天创建按天分区
+SELECT crawler_log_create_partitions(
+    LEAST(COALESCE((SELECT MIN(dt) FROM crawler_log_legacy), CURRENT_DATE), CURRENT_DATE),
+    (CURRENT_DATE + 14) - LEAST(COALESCE((SELECT MIN(dt) FROM crawler_log_legacy), CURRENT_DATE), CURRENT_DATE)
+);
+
+-- 4. 复制数据（保留原 id）
+INSERT INTO crawler_log (
+    id, category, site, item_id, raw_json, brand_name, model_name, model_no,
+    currency, price, image_original_key, image_thumb_300_key, image_thumb_600_key,
+    image_sha256, image_phash, source_uid, raw_hash, status, error, http_status,
+    fetch_url, product_url, run_id, crawl_time, dt
+)
+SELECT
+    id, category, site, item_id, raw_json, brand_name, model_name, model_no,
+    currency, price, image_original_key, image_thumb_300_key, image_thumb_600_key,
+    image_sha256, image_phash, source_uid, raw_hash, status, error, http_status,
+    fetch_url, product_url, run_id, crawl_time, dt
+FROM crawler_log_legacy;
+
+-- 5. 注释
+COMMENT ON TABLE crawler_log IS '原始抓取记录表';
+COMMENT ON COLUMN crawler_log.id IS '数据库自增ID';
+COMMENT ON COLUMN crawler_log.category IS '商品类别（珠宝/手表/包/服饰/...）';
+COMMENT ON COLUMN crawler_log.site IS '主域名，如 commit-watch.co.jp';
+COMMENT ON COLUMN crawler_log.item_id IS '在对方网站上，item对应的id';
+COMMENT ON COLUMN crawler_log.raw_json IS '原始数据（结构化原文）';
+COMMENT ON COLUMN crawler_log.brand_name IS '品牌名称';
+COMMENT ON COLUMN crawler_log.model_name IS '型号名称';
+COMMENT ON COLUMN crawler_log.model_no IS '型号编号';
+COMMENT ON COLUMN crawler_log.currency IS '货币单位，默认JPY';
+COMMENT ON COLUMN crawler_log.price IS '价格（整数，*100避免小数）';
+COMMENT ON COLUMN crawler_log.image_original_key IS 'MinIO原图key';
+COMMENT ON COLUMN crawler_log.image_thumb_300_key IS 'MinIO 300px缩略图key';
+COMMENT ON COLUMN crawler_log.image_thumb_600_key IS 'MinIO 600px缩略图key';
+COMMENT ON COLUMN crawler_log.image_sha256 IS '图片SHA256哈希值（用于去重）';
+COMMENT ON COLUMN crawler_log.image_phash IS '图片感知哈希（64位dHash，16位十六进制），用于跨站点近似重复图片检测';
+COMMENT ON COLUMN crawler_log.source_uid IS '幂等去重键：{site}:{item_id}';
+COMMENT ON COLUMN crawler_log.raw_hash IS 'raw_json的SHA256哈希值（用于判断内容是否变化）';
+COMMENT ON COLUMN crawler_log.status IS '抓取状态：success/failed';
+COMMENT ON COLUMN crawler_log.error IS '失败原因（如果status为failed）';
+COMMENT ON COLUMN crawler_log.http_status IS 'HTTP状态码';
+COMMENT ON COLUMN crawler_log.fetch_url IS '实际抓取的URL';
+COMMENT ON COLUMN crawler_log.product_url IS '原网站的商品URL';
+COMMENT ON COLUMN crawler_log.run_id IS '关联一次crawl run（用于任务调度）';
+COMMENT ON COLUMN crawler_log.crawl_time IS '抓取时间（精确时刻）';
+COMMENT ON COLUMN crawler_log.dt IS '分区键（按天 RANGE 分区，分区名 crawler_log_pYYYYMMDD）';
+
+ANALYZE crawler_log;
+
+COMMIT;
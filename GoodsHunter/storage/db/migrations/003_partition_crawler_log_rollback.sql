@@ -0,0 +1,45 @@
+-- 回滚：crawler_log 恢复为普通（非分区）表及原有索引（003_partition_crawler_log.sql）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/003_partition_crawler_log_rollback.sql
+-- 只回收当前仍挂载在 crawler_log 上的分区数据；已分离（detach）的分区需先手动导回。
+-- 如果迁移后尚未删除 crawler_log_legacy，本脚本会先删除它（数据以当前 crawler_log 为准）。
+
+BEGIN;
+
+DROP TABLE IF EXISTS crawler_log_legacy;
+
+-- 1. 复制当前数据到普通表（保留默认值和注释）
+CREATE TABLE crawler_log_unpartitioned (LIKE crawler_log INCLUDING DEFAULTS INCLUDING COMMENTS);
+INSERT INTO crawler_log_unpartitioned SELECT * FROM crawler_log;
+
+-- 2. 序列改归属普通表，再删除分区表及维护函数
+ALTER SEQUENCE crawler_log_id_seq OWNED BY crawler_log_unpartitioned.id;
+DROP TABLE crawler_log CASCADE;
+DROP FUNCTION IF EXISTS crawler_log_create_partitions(DATE, INT);
+DROP FUNCTION IF EXISTS crawler_log_detach_partitions(DATE, BOOLEAN);
+
+-- 3. 恢复表名、主键和原有索引
+ALTER TABLE crawler_log_unpartitioned RENAME TO crawler_log;
+ALTER TABLE crawler_log ADD CONSTRAINT crawler_log_pkey PRIMARY KEY (id);
+
+CREATE INDEX idx_crawler_log_site ON crawler_log(site);
+CREATE INDEX idx_crawler_log_item_id ON crawler_log(item_id);
+CREATE INDEX idx_crawler_log_category ON crawler_log(category);
+CREATE INDEX idx_crawler_log_brand_name ON crawler_log(brand_name);
+CREATE INDEX idx_crawler_log_model_name ON crawler_log(model_name);
+CREATE INDEX idx_crawler_log_model_no ON crawler_log(model_no);
+CREATE INDEX idx_crawler_log_price ON crawler_log(price);
+CREATE INDEX idx_crawler_log_crawl_time ON crawler_log(crawl_time DESC);
+CREATE INDEX idx_crawler_log_dt ON crawler_log(dt);
+CREATE INDEX idx_crawler_log_image_sha256 ON crawler_log(image_sha256);
+CREATE INDEX idx_crawler_log_source_uid ON crawler_log(source_uid);
+CREATE INDEX idx_crawler_log_raw_hash ON crawler_log(raw_hash);
+CREATE INDEX idx_crawler_log_status ON crawler_log(status);
+CREATE INDEX idx_crawler_log_run_id ON crawler_log(run_id);
+CREATE INDEX idx_crawler_log_site_item_id ON crawler_log(site, item_id);
+CREATE INDEX idx_crawler_log_brand_model ON crawler_log(brand_name, model_name);
+
+COMMENT ON COLUMN crawler_log.dt IS '分区键（按天）';
+
+COMMIT;
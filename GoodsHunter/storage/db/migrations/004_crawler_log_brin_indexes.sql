@@ -0,0 +1,21 @@
+-- 迁移：crawler_log 改为写入优化的索引组合（BRIN 覆盖随写入递增的列）
+--
+-- 前置条件：已执行 003_partition_crawler_log.sql
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/004_crawler_log_brin_indexes.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/004_crawler_log_brin_indexes_rollback.sql
+--
+-- 前后对比可用基准脚本：python storage/scripts/bench_crawler_log_indexes.py
+
+BEGIN;
+
+DROP INDEX IF EXISTS idx_crawler_log_source_uid;
+DROP INDEX IF EXISTS idx_crawler_log_site_item_id;
+DROP INDEX IF EXISTS idx_crawler_log_run_id;
+
+CREATE INDEX IF NOT EXISTS idx_crawler_log_source_uid_id ON crawler_log(source_uid, id);
+CREATE INDEX IF NOT EXISTS idx_crawler_log_brin ON crawler_log
+    USING brin (id, crawl_time, dt, run_id) WITH (pages_per_range = 32);
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- 回滚：恢复 003 之后的 crawler_log B-tree 索引（004_crawler_log_brin_indexes.sql）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/004_crawler_log_brin_indexes_rollback.sql
+
+BEGIN;
+
+DROP INDEX IF EXISTS idx_crawler_log_brin;
+DROP INDEX IF EXISTS idx_crawler_log_source_uid_id;
+
+CREATE INDEX IF NOT EXISTS idx_crawler_log_source_uid ON crawler_log(source_uid);
+CREATE INDEX IF NOT EXISTS idx_crawler_log_site_item_id ON crawler_log(site, item_id);
+CREATE INDEX IF NOT EXISTS idx_crawler_log_run_id ON crawler_log(run_id);
+
+COMMIT;
@@ -0,0 +1,68 @@
+-- 迁移：新增 crawl_run 表（抓取运行台账，crawler_log.run_id 关联 crawl_run.id）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/005_add_crawl_run.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/005_add_crawl_run_rollback.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS crawl_run (
+    id BIGSERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    command TEXT NULL,
+    host TEXT NULL,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ NULL,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    error TEXT NULL,
+
+    -- URL / item / 图片计数
+    urls_planned INT NOT NULL DEFAULT 0,
+    urls_succeeded INT NOT NULL DEFAULT 0,
+    urls_failed INT NOT NULL DEFAULT 0,
+    urls_skipped INT NOT NULL DEFAULT 0,
+    items_extracted INT NOT NULL DEFAULT 0,
+    log_rows_written INT NOT NULL DEFAULT 0,
+    items_sighted INT NOT NULL DEFAULT 0,
+    images_fetched INT NOT NULL DEFAULT 0,
+    images_deduped INT NOT NULL DEFAULT 0,
+    images_uploaded INT NOT NULL DEFAULT 0,
+
+    -- 各阶段累计耗时（秒，由每页的计时汇总）
+    fetch_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    extract_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    file_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    image_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    db_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    slowest_page_url TEXT NULL,
+    slowest_page_seconds DOUBLE PRECISION NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawl_run_started_at ON crawl_run(started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_crawl_run_status ON crawl_run(status);
+
+COMMENT ON TABLE crawl_run IS '抓取运行台账：每次抓取运行一行，记录计数和各阶段耗时（crawler_log.run_id 关联 id）';
+COMMENT ON COLUMN crawl_run.status IS '运行状态：running/finished/failed';
+COMMENT ON COLUMN crawl_run.command IS '启动命令（入口和参数）';
+COMMENT ON COLUMN crawl_run.host IS '运行主机名';
+COMMENT ON COLUMN crawl_run.heartbeat_at IS '最近一次汇总写入时间（running 状态下长时间未更新说明进程已退出）';
+COMMENT ON COLUMN crawl_run.urls_planned IS '计划抓取的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_succeeded IS '抓取并抽取成功的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_failed IS '抓取或抽取失败的 URL 数';
+COMMENT ON COLUMN crawl_run.urls_skipped IS '未匹配 Profile 而跳过的 URL 数';
+COMMENT ON COLUMN crawl_run.items_extracted IS '抽取到的列表项数';
+COMMENT ON COLUMN crawl_run.log_rows_written IS '写入 crawler_log 的行数';
+COMMENT ON COLUMN crawl_run.items_sighted IS '精简模式下内容未变化、只刷新最后发现时间的商品数';
+COMMENT ON COLUMN crawl_run.images_fetched IS '获取到图片数据的 item 数（页面内嵌或下载）';
+COMMENT ON COLUMN crawl_run.images_deduped IS '感知哈希命中、复用已有图片的数量';
+COMMENT ON COLUMN crawl_run.images_uploaded IS '上传原图到 MinIO 的数量';
+COMMENT ON COLUMN crawl_run.fetch_seconds IS '页面抓取阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.extract_seconds IS '字段抽取阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.file_seconds IS '本地文件输出（JSONL/图片/文本/分片）阶段累计耗时（秒）';
+COMMENT ON COLUMN crawl_run.image_seconds IS '图片处理阶段（下载/哈希/缩略图/上传）累计耗时（秒，写后线程中执行）';
+COMMENT ON COLUMN crawl_run.db_seconds IS 'crawler_log 写入和提交阶段累计耗时（秒，写后线程中执行）';
+COMMENT ON COLUMN crawl_run.slowest_page_url IS '抓取+抽取+文件输出耗时最长的页面';
+COMMENT ON COLUMN crawl_run.slowest_page_seconds IS '最慢页面的耗时（秒）';
+
+COMMIT;
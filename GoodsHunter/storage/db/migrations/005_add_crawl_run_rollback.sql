@@ -0,0 +1,11 @@
+-- 回滚：删除 crawl_run 表（005_add_crawl_run.sql）
+-- crawler_log.run_id 中已写入的运行 id 保留（只是不再有对应的台账行）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/005_add_crawl_run_rollback.sql
+
+BEGIN;
+
+DROP TABLE IF EXISTS crawl_run;
+
+COMMIT;
@@ -0,0 +1,38 @@
+-- 迁移：新增 item_price_daily / product_price_daily 表（每日价格聚合，价格走势 API 使用）
+-- 已有数据的回填：python -m item_extract.price_daily --rebuild-items --start-dt ... 和 --rebuild-products
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/006_add_price_daily.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/006_add_price_daily_rollback.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS item_price_daily (
+    source_uid TEXT NOT NULL,
+    dt DATE NOT NULL,
+    currency TEXT NULL,
+    min_price INTEGER NOT NULL,
+    max_price INTEGER NOT NULL,
+    last_price INTEGER NOT NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (source_uid, dt)
+);
+
+CREATE TABLE IF NOT EXISTS product_price_daily (
+    product_id BIGINT NOT NULL,
+    dt DATE NOT NULL,
+    currency TEXT NULL,
+    min_price INTEGER NOT NULL,
+    max_price INTEGER NOT NULL,
+    last_price INTEGER NOT NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (product_id, dt)
+);
+
+COMMENT ON TABLE item_price_daily IS '商品每日价格聚合（item_extract 同步时增量维护），价格走势图按 (source_uid, dt) 主键范围扫描';
+COMMENT ON COLUMN item_price_daily.last_price IS '当天最后一次观测到的价格（按抓取时间）';
+COMMENT ON COLUMN item_price_daily.last_seen_at IS '当天最后一次观测的抓取时间';
+COMMENT ON TABLE product_price_daily IS '聚合商品每日价格（关联到该 product_id 的所有 item 的观测），同步时增量维护，关联前的历史用 python -m item_extract.price_daily --rebuild-products 重建';
+
+COMMIT;
@@ -0,0 +1,12 @@
+-- 回滚：删除每日价格聚合表（006_add_price_daily.sql）
+-- 聚合数据可由 crawler_log 重建，item_change_history 不受影响
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/006_add_price_daily_rollback.sql
+
+BEGIN;
+
+DROP TABLE IF EXISTS product_price_daily;
+DROP TABLE IF EXISTS item_price_daily;
+
+COMMIT;
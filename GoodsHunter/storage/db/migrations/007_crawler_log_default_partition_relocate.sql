@@ -0,0 +1,83 @@
+-- 迁移：创建按天分区时把默认分区中对应日期的行搬入新分区
+--
+-- 默认分区中已有某天的行（例如回放旧日期、预建分区前的写入）时，原 crawler_log_create_partitions
+-- 对该天执行 CREATE ... PARTITION OF 会失败；新增 crawler_log_create_partition(p_day) 负责
+-- 分离默认分区、建分区、搬行、挂回默认分区，crawler_log_create_partitions 改为逐天调用它
+-- 分区是否存在按 pg_inherits（是否已挂载）判断；保留期分离后未删除的同名表会让该天报错，需先归档或删除
+--
+-- 前置条件：已执行 003_partition_crawler_log.sql
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/007_crawler_log_default_partition_relocate.sql
+-- 回滚命令：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/007_crawler_log_default_partition_relocate_rollback.sql
+--
+-- 默认分区中已有的行可用 python -m storage.partition_manager 搬入按天分区
+
+BEGIN;
+
+-- 分区维护函数：创建某一天的按天分区，返回从默认分区搬入的行数
+--   默认分区中已有该天的行时，直接 CREATE ... PARTITION OF 会因默认分区约束冲突而失败：
+--   先分离默认分区，建好按天分区后把这些行搬过去，再挂回默认分区（期间持有父表锁，写入会短暂等待）
+--   是否已有分区按 pg_inherits 判断；同名表存在但未挂载（保留期分离后尚未归档/删除）时报错，
+--   需先归档或删除该表，否则默认分区中该天的行无处可搬
+CREATE OR REPLACE FUNCTION crawler_log_create_partition(p_day DATE)
+RETURNS BIGINT AS $$
+DECLARE
+    part_name TEXT := 'crawler_log_p' || to_char(p_day, 'YYYYMMDD');
+    moved BIGINT := 0;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_inherits
+        WHERE inhrelid = to_regclass(part_name) AND inhparent = 'crawler_log'::regclass
+    ) THEN
+        RETURN 0;
+    END IF;
+    IF to_regclass(part_name) IS NOT NULL THEN
+        RAISE EXCEPTION '表 % 已存在但未挂载到 crawler_log（已分离的旧分区），无法创建 % 的分区；请先归档（python -m storage.log_archive archive --partition %）或删除该表',
+            part_name, p_day, part_name;
+    END IF;
+    IF EXISTS (SELECT 1 FROM crawler_log_default WHERE dt = p_day) THEN
+        ALTER TABLE crawler_log DETACH PARTITION crawler_log_default;
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+            part_name, p_day, p_day + 1
+        );
+        WITH moved_rows AS (
+            DELETE FROM crawler_log_default WHERE dt = p_day RETURNING *
+        )
+        INSERT INTO crawler_log SELECT * FROM moved_rows;
+        GET DIAGNOSTICS moved = ROW_COUNT;
+        ALTER TABLE crawler_log ATTACH PARTITION crawler_log_default DEFAULT;
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+            part_name, p_day, p_day + 1
+        );
+    END IF;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 分区维护函数：创建 [p_start, p_start + p_days) 范围内缺失的按天分区（默认分区中对应日期的行一并搬入）
+CREATE OR REPLACE FUNCTION crawler_log_create_partitions(p_start DATE, p_days INT)
+RETURNS INT AS $$
+DECLARE
+    d DATE;
+    created INT := 0;
+BEGIN
+    FOR i IN 0 .. GREATEST(p_days, 0) - 1 LOOP
+        d := p_start + i;
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_inherits
+            WHERE inhrelid = to_regclass('crawler_log_p' || to_char(d, 'YYYYMMDD'))
+              AND inhparent = 'crawler_log'::regclass
+        ) THEN
+            PERFORM crawler_log_create_partition(d);
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,33 @@
+-- 回滚：恢复 003 中的 crawler_log_create_partitions（007_crawler_log_default_partition_relocate.sql）
+--
+-- 执行命令（在 GoodsHunter 目录下）：
+--   docker exec -i goodshunter-postgres psql -U goodshunter -d goodshunter < storage/db/migrations/007_crawler_log_default_partition_relocate_rollback.sql
+
+BEGIN;
+
+-- 分区维护函数：创建 [p_start, p_start + p_days) 范围内缺失的按天分区
+CREATE OR REPLACE FUNCTION crawler_log_create_partitions(p_start DATE, p_days INT)
+RETURNS INT AS $$
+DECLARE
+    d DATE;
+    part_name TEXT;
+    created INT := 0;
+BEGIN
+    FOR i IN 0 .. GREATEST(p_days, 0) - 1 LOOP
+        d := p_start + i;
+        part_name := 'crawler_log_p' || to_char(d, 'YYYYMMDD');
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF crawler_log FOR VALUES FROM (%L) TO (%L)',
+                part_name, d, d + 1
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS crawler_log_create_partition(DATE);
+
+COMMIT;
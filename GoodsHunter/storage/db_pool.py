@@ -0,0 +1,424 @@
+"""共享数据库连接池：线程安全、可选异步、健康检查、最长存活时间回收和使用统计
+
+同一进程内按 database_url 共享一个连接池（get_pool），批处理任务、爬虫写入、
+聚合/翻译路径不再每次操作都新建连接：
+
+    from storage.db_pool import get_pool
+
+    pool = get_pool(database_url)
+    with pool.connection() as conn:      # 退出时自动归还（未提交的事务会回滚）
+        ...
+
+    conn = pool.getconn()                # 返回代理连接，conn.close() 即归还连接池
+    try:
+        ...
+    finally:
+        conn.close()
+
+    async with pool.connection_async() as conn:   # 在线程中获取/归还，不阻塞事件循环
+        ...
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+try:
+    import psycopg2
+    from psycopg2 import extensions as pg_extensions
+except ImportError:
+    psycopg2 = None
+    pg_extensions = None
+
+
+DEFAULT_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DEFAULT_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "30"))
+DEFAULT_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+
+
+class PoolTimeout(Exception):
+    """在超时时间内没有可用连接"""
+
+
+class _PoolEntry:
+    """连接池中的一个物理连接"""
+
+    __slots__ = ("raw", "created_at", "released_at")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class PooledConnection:
+    """
+    连接代理：除 close() 外所有属性和方法都转发给 psycopg2 连接
+
+    close() 把连接归还连接池而不是关闭，已有的 `conn = get(); ...; conn.close()` 写法
+    无需修改即可复用连接。`with conn:` 保持 psycopg2 的事务语义（提交/回滚，不归还）。
+    """
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self):
+        """底层 psycopg2 连接"""
+        if self._entry is None:
+            raise RuntimeError("连接已归还连接池")
+        return self._entry.raw
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def close(self):
+        """归还连接池（重复调用无副作用）"""
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry)
+
+    def __enter__(self):
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.raw.__exit__(exc_type, exc_val, exc_tb)
+
+    def __del__(self):
+        # 忘记归还的连接在回收时归还，避免连接池逐渐耗尽
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    线程安全的 psycopg2 连接池
+
+    - 最多 max_size 个物理连接，取不到时等待 acquire_timeout 秒后抛出 PoolTimeout
+    - 空闲超过 health_check_interval 秒的连接在取出时执行 SELECT 1，失败则丢弃重建
+    - 存活超过 max_lifetime 秒的连接在取出/归还时关闭重建（避免长连接内存膨胀和服务端超时）
+    - 归还时回滚未结束的事务，已断开的连接直接丢弃
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        max_size: int = DEFAULT_MAX_SIZE,
+        min_size: int = 0,
+        max_lifetime: float = DEFAULT_MAX_LIFETIME,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT
+    ):
+        """
+        初始化连接池
+
+        Args:
+            database_url: 数据库连接URL
+            max_size: 最大连接数
+            min_size: 预先建立的连接数
+            max_lifetime: 连接最长存活时间（秒），<=0 表示不限制
+            health_check_interval: 空闲超过该时间（秒）的连接取出前做健康检查，<=0 表示每次都检查
+            acquire_timeout: 获取连接的最长等待时间（秒）
+        """
+        if psycopg2 is None:
+            raise ImportError(
+                "psycopg2 未安装。请运行: pip install psycopg2-binary"
+            )
+        self.database_url = database_url
+        self.max_size = max(1, max_size)
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: deque = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._metrics = {
+            "acquired": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failed": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+        for _ in range(min(min_size, self.max_size)):
+            with self._cond:
+                self._size += 1
+            self._idle.append(self._create_entry())
+
+    def _create_entry(self) -> _PoolEntry:
+        """新建物理连接（调用前已占用一个连接名额，失败时释放名额）"""
+        try:
+            raw = psycopg2.connect(self.database_url)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._metrics["created"] += 1
+        return _PoolEntry(raw)
+
+    def _discard(self, entry: _PoolEntry, reason: str):
+        """关闭并丢弃物理连接，释放名额"""
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._metrics[reason] += 1
+            self._cond.notify()
+
+    def _expired(self, entry: _PoolEntry) -> bool:
+        """连接是否超过最长存活时间"""
+        return self.max_lifetime > 0 and time.monotonic() - entry.created_at >= self.max_lifetime
+
+    def _healthy(self, entry: _PoolEntry) -> bool:
+        """健康检查：连接未关闭，且空闲较久时 SELECT 1 成功"""
+        if entry.raw.closed:
+            return False
+        if time.monotonic() - entry.released_at < self.health_check_interval:
+            return True
+        try:
+            cursor = entry.raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            entry.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        获取连接
+
+        Args:
+            timeout: 最长等待时间（秒），为None时使用 acquire_timeout
+
+        Returns:
+            代理连接，close() 即归还
+
+        Raises:
+            PoolTimeout: 超时仍没有可用连接
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("连接池已关闭")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"{timeout:.1f}s 内没有可用的数据库连接（max_size={self.max_size}）"
+                        )
+                    self._cond.wait(remaining)
+
+            # 建连和健康检查在锁外进行，不阻塞其他线程
+            if create:
+                entry = self._create_entry()
+            elif self._expired(entry):
+                self._discard(entry, "recycled")
+                continue
+            elif not self._healthy(entry):
+                self._discard(entry, "health_check_failed")
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._metrics["acquired"] += 1
+                self._metrics["wait_seconds_total"] += waited
+                self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+            return PooledConnection(self, entry)
+
+    def putconn(self, conn: PooledConnection):
+        """
+        归还连接（等同于 conn.close()）
+
+        Args:
+            conn: getconn() 返回的代理连接
+        """
+        conn.close()
+
+    def _release(self, entry: _PoolEntry):
+        """归还物理连接：回滚未结束的事务，丢弃已断开或超龄的连接"""
+        raw = entry.raw
+        if raw.closed:
+            self._discard(entry, "discarded")
+            return
+        try:
+            if raw.get_transaction_status() != pg_extensions.TRANSACTION_STATUS_IDLE:
+                raw.rollback()
+        except Exception:
+            self._discard(entry, "discarded")
+            return
+        if self._closed:
+            self._discard(entry, "discarded")
+            return
+        if self._expired(entry):
+            self._discard(entry, "recycled")
+            return
+        entry.released_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        上下文管理器：获取连接，退出时归还
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Yields:
+            代理连接
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    async def getconn_async(self, timeout: Optional[float] = None) -> PooledConnection:
+        """异步获取连接（在线程中等待，不阻塞事件循环）"""
+        return await asyncio.to_thread(self.getconn, timeout)
+
+    @asynccontextmanager
+    async def connection_async(self, timeout: Optional[float] = None):
+        """
+        异步上下文管理器：获取连接，退出时归还
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Yields:
+            代理连接（查询本身仍是同步的，应放在 asyncio.to_thread 中执行）
+        """
+        conn = await self.getconn_async(timeout)
+        try:
+            yield conn
+        finally:
+            await asyncio.to_thread(conn.close)
+
+    def stats(self) -> Dict:
+        """
+        连接池使用统计
+
+        Returns:
+            size（物理连接数）、idle、in_use、max_size 以及累计的 acquired / created / recycled /
+            health_check_failed / discarded / timeouts / wait_seconds_total / wait_seconds_max
+        """
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                **self._metrics,
+            }
+
+    def closeall(self):
+        """关闭连接池：关闭所有空闲连接，使用中的连接归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry, "discarded")
+
+
+# database_url -> 共享连接池
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database_url: Optional[str] = None, max_size: Optional[int] = None, **kwargs) -> ConnectionPool:
+    """
+    获取（或创建）进程内共享的连接池
+
+    同一个 database_url 只会创建一个连接池；已存在时如果请求的 max_size 更大，会扩大上限。
+
+    Args:
+        database_url: 数据库连接URL，如果为None则从环境变量DATABASE_URL读取
+        max_size: 最大连接数（默认 DB_POOL_MAX_SIZE，10）
+        **kwargs: 传给 ConnectionPool 的其他参数（仅在首次创建时生效）
+
+    Returns:
+        连接池
+    """
+    database_url = database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("未提供database_url且环境变量DATABASE_URL未设置")
+    with _pools_lock:
+        pool = _pools.get(database_url)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(database_url, max_size=max_size or DEFAULT_MAX_SIZE, **kwargs)
+            _pools[database_url] = pool
+        elif max_size and max_size > pool.max_size:
+            with pool._cond:
+                pool.max_size = max_size
+                pool._cond.notify_all()
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """
+    所有共享连接池的使用统计
+
+    Returns:
+        {去掉密码的 database_url: stats}
+    """
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {_mask_password(url): pool.stats() for url, pool in pools}
+
+
+def close_all_pools():
+    """关闭所有共享连接池（进程退出时自动调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.closeall()
+
+
+def _mask_password(database_url: str) -> str:
+    """隐藏连接URL中的密码"""
+    if "@" not in database_url or "://" not in database_url:
+        return database_url
+    scheme, rest = database_url.split("://", 1)
+    credentials, host = rest.rsplit("@", 1)
+    user = credentials.split(":", 1)[0]
+    return f"{scheme}://{user}:***@{host}"
+
+
+atexit.register(close_all_pools)
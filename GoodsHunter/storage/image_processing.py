@@ -0,0 +1,140 @@
+"""图片处理：缩略图 / 派生尺寸生成（爬虫写入和 API 按需生成共用）"""
+from io import BytesIO
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# 输出格式 -> (PIL 格式名, 对象 key 扩展名, content type)
+OUTPUT_FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "png": ("PNG", "png", "image/png"),
+}
+
+
+def format_extension(fmt: str) -> str:
+    """
+    获取输出格式对应的对象 key 扩展名
+
+    Args:
+        fmt: 输出格式（webp / jpeg / png）
+
+    Returns:
+        扩展名
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的图片格式: {fmt}")
+    return OUTPUT_FORMATS[fmt][1]
+
+
+def generate_thumbnail(
+    image_data: bytes,
+    size: int,
+    quality: int = 85,
+    fmt: str = "webp"
+) -> Optional[bytes]:
+    """
+    生成缩略图（长边缩放到 size，保持宽高比，不放大）
+
+    Args:
+        image_data: 原图二进制数据
+        size: 目标尺寸（长边像素）
+        quality: JPEG/WebP质量（1-100）
+        fmt: 输出格式（webp / jpeg / png）
+
+    Returns:
+        缩略图二进制数据，失败返回None
+    """
+    if Image is None:
+        print("[ImageProcessing] 警告: PIL/Pillow未安装，无法生成缩略图")
+        return None
+
+    if fmt not in OUTPUT_FORMATS:
+        print(f"[ImageProcessing] 不支持的图片格式: {fmt}")
+        return None
+    pil_format = OUTPUT_FORMATS[fmt][0]
+
+    try:
+        # 打开图片
+        img = Image.open(BytesIO(image_data))
+
+        # 转换为RGB（如果是RGBA或其他格式）
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # 创建白色背景
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # 计算新尺寸（保持宽高比）
+        width, height = img.size
+        if width > height:
+            new_width = size
+            new_height = int(height * size / width)
+        else:
+            new_height = size
+            new_width = int(width * size / height)
+
+        # 生成缩略图
+        img.thumbnail((new_width, new_height), Image.Resampling.LANCZOS)
+
+        output = BytesIO()
+        if pil_format == "WEBP":
+            img.save(output, format=pil_format, quality=quality, method=6)
+        elif pil_format == "JPEG":
+            img.save(output, format=pil_format, quality=quality, optimize=True, progressive=True)
+        else:
+            img.save(output, format=pil_format, optimize=True)
+        output.seek(0)
+
+        return output.read()
+
+    except Exception as e:
+        print(f"[ImageProcessing] 生成缩略图失败: {e}")
+        return None
+
+
+def compute_dhash(image_data: bytes, hash_size: int = 8) -> Optional[str]:
+    """
+    计算图片的差异哈希（dHash）
+
+    缩放为 (hash_size+1) x hash_size 的灰度图，比较相邻像素的明暗得到 hash_size^2 位哈希。
+    对重新编码、缩放、轻微压缩不敏感，同一张图片在不同站点的副本汉明距离很小。
+
+    Args:
+        image_data: 图片二进制数据
+        hash_size: 哈希边长，默认 8（64 位）
+
+    Returns:
+        十六进制哈希字符串（64 位时为 16 个字符），失败返回None
+    """
+    if Image is None:
+        print("[ImageProcessing] 警告: PIL/Pillow未安装，无法计算感知哈希")
+        return None
+
+    try:
+        img = Image.open(BytesIO(image_data))
+        img = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(img.getdata())
+
+        value = 0
+        for row in range(hash_size):
+            offset = row * (hash_size + 1)
+            for col in range(hash_size):
+                value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+
+        return f"{value:0{hash_size * hash_size // 4}x}"
+
+    except Exception as e:
+        print(f"[ImageProcessing] 计算感知哈希失败: {e}")
+        return None
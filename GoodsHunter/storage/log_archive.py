@@ -0,0 +1,651 @@
+"""crawler_log 冷归档：把旧数据导出为压缩文件存入 MinIO（附 manifest）后从 Postgres 删除，并提供按 dt/site/source_uid 裁剪的读取接口
+
+归档对象存放在独立的 bucket（MINIO_ARCHIVE_BUCKET，默认 goodshunter-archive），
+不会被 API 的图片代理路由访问到：
+    crawler_log/dt=YYYY-MM-DD/site={site}/part-{min_id}-{max_id}.{ext}   数据文件（每个文件只含一个 dt + site）
+    crawler_log/manifest/dt=YYYY-MM-DD.json                              当天所有数据文件的统计信息
+
+文件格式：
+    jsonl.zst  每行一条记录的 JSON，zstd 压缩（需要 zstandard）
+    jsonl.gz   同上，gzip 压缩（标准库，无额外依赖）
+    parquet    列式存储，raw_json 以 JSON 字符串保存（需要 pyarrow）
+
+读取时先按 manifest 文件名裁剪 dt，再按 manifest 中的 site 和 source_uid 范围裁剪数据文件，
+只下载可能命中的文件；parquet 文件在文件内部再做一次谓词下推。
+
+用法：
+    python -m storage.log_archive archive --before 2026-01-01
+    python -m storage.log_archive archive --partition crawler_log_p20251231
+    python -m storage.log_archive archive --id-range 1 500000
+    python -m storage.log_archive scan --start-dt 2025-12-01 --end-dt 2025-12-31 --site commit-watch.co.jp
+    python -m storage.log_archive replay --start-dt 2025-12-01 --end-dt 2025-12-31
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import date, datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import psycopg2
+    from psycopg2 import sql
+except ImportError:
+    psycopg2 = None
+    sql = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+    parquet = None
+
+from storage.db_pool import get_pool
+from storage.minio_client import MinIOClient
+from storage.sync_state import read_sync_cursor
+
+
+ARCHIVE_BUCKET = os.getenv("MINIO_ARCHIVE_BUCKET", "goodshunter-archive")
+ARCHIVE_PREFIX = "crawler_log"
+MANIFEST_PREFIX = f"{ARCHIVE_PREFIX}/manifest/"
+
+# 归档列：crawler_log 全部列（含 id）
+ARCHIVE_COLUMNS = (
+    "id", "category", "site", "item_id", "raw_json",
+    "brand_name", "model_name", "model_no",
+    "currency", "price",
+    "image_original_key", "image_thumb_300_key", "image_thumb_600_key", "image_sha256", "image_phash",
+    "source_uid", "raw_hash", "status", "error", "http_status", "fetch_url", "product_url", "run_id",
+    "crawl_time", "dt",
+)
+
+# 格式 -> (扩展名, content type)
+ARCHIVE_FORMATS = {
+    "jsonl.zst": ("jsonl.zst", "application/zstd"),
+    "jsonl.gz": ("jsonl.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+_MANIFEST_KEY_RE = re.compile(r"dt=(\d{4}-\d{2}-\d{2})\.json$")
+_DAILY_PARTITION_RE = re.compile(r"^crawler_log_p(\d{8})$")
+
+
+def default_format() -> str:
+    """默认归档格式：安装了 zstandard 时使用 jsonl.zst，否则使用 jsonl.gz"""
+    return "jsonl.zst" if zstandard is not None else "jsonl.gz"
+
+
+def _check_format(fmt: str) -> None:
+    """检查归档格式及其可选依赖"""
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"不支持的归档格式: {fmt}（可选: {', '.join(ARCHIVE_FORMATS)}）")
+    if fmt == "jsonl.zst" and zstandard is None:
+        raise ImportError("zstandard 未安装。请运行: pip install zstandard")
+    if fmt == "parquet" and pyarrow is None:
+        raise ImportError("pyarrow 未安装。请运行: pip install pyarrow")
+
+
+def _json_default(value):
+    """JSON 序列化 datetime / date"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_rows(rows: List[Dict], fmt: str) -> bytes:
+    """
+    把一组 crawler_log 行编码为归档文件内容
+
+    Args:
+        rows: 行字典列表（键为 ARCHIVE_COLUMNS）
+        fmt: 归档格式
+
+    Returns:
+        文件二进制内容
+    """
+    _check_format(fmt)
+    if fmt == "parquet":
+        table = pyarrow.Table.from_pylist([
+            {**row, "raw_json": json.dumps(row["raw_json"], ensure_ascii=False)}
+            for row in rows
+        ])
+        output = BytesIO()
+        parquet.write_table(table, output, compression="zstd")
+        return output.getvalue()
+
+    payload = "".join(
+        json.dumps(row, ensure_ascii=False, default=_json_default) + "\n" for row in rows
+    ).encode("utf-8")
+    if fmt == "jsonl.zst":
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    return gzip.compress(payload, compresslevel=6)
+
+
+def decode_rows(data: bytes, fmt: str, sites: Optional[Sequence[str]] = None,
+                source_uids: Optional[Sequence[str]] = None) -> List[Dict]:
+    """
+    解码归档文件，crawl_time / dt 还原为 datetime / date，raw_json 还原为 dict
+
+    Args:
+        data: 文件二进制内容
+        fmt: 归档格式
+        sites: 只保留这些站点（parquet 在读取时下推）
+        source_uids: 只保留这些 source_uid（parquet 在读取时下推）
+
+    Returns:
+        行字典列表
+    """
+    _check_format(fmt)
+    if fmt == "parquet":
+        filters = []
+        if sites:
+            filters.append(("site", "in", list(sites)))
+        if source_uids:
+            filters.append(("source_uid", "in", list(source_uids)))
+        table = parquet.read_table(BytesIO(data), filters=filters or None)
+        rows = table.to_pylist()
+        for row in rows:
+            row["raw_json"] = json.loads(row["raw_json"])
+        return rows
+
+    if fmt == "jsonl.zst":
+        payload = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        payload = gzip.decompress(data)
+
+    site_set = set(sites) if sites else None
+    uid_set = set(source_uids) if source_uids else None
+    rows = []
+    for line in payload.decode("utf-8").splitlines():
+        if not line:
+            continue
+        row = json.loads(line)
+        if site_set is not None and row.get("site") not in site_set:
+            continue
+        if uid_set is not None and row.get("source_uid") not in uid_set:
+            continue
+        if row.get("crawl_time"):
+            row["crawl_time"] = datetime.fromisoformat(row["crawl_time"])
+        if row.get("dt"):
+            row["dt"] = date.fromisoformat(row["dt"])
+        rows.append(row)
+    return rows
+
+
+def _manifest_key(dt: date) -> str:
+    """某一天的 manifest 对象 key"""
+    return f"{MANIFEST_PREFIX}dt={dt.isoformat()}.json"
+
+
+def _data_key(dt: date, site: str, min_id: int, max_id: int, fmt: str) -> str:
+    """数据文件对象 key"""
+    ext = ARCHIVE_FORMATS[fmt][0]
+    return f"{ARCHIVE_PREFIX}/dt={dt.isoformat()}/site={site}/part-{min_id:012d}-{max_id:012d}.{ext}"
+
+
+def _create_archive_client(minio_client: Optional[MinIOClient]) -> MinIOClient:
+    """获取归档 bucket 的 MinIO 客户端"""
+    return minio_client or MinIOClient(bucket=ARCHIVE_BUCKET)
+
+
+def _load_manifest(minio_client: MinIOClient, dt: date) -> Dict:
+    """读取某一天的 manifest，不存在时返回空 manifest"""
+    key = _manifest_key(dt)
+    if not minio_client.object_exists(key):
+        return {"table": "crawler_log", "dt": dt.isoformat(), "files": []}
+    return json.loads(minio_client.download_image(key).decode("utf-8"))
+
+
+class CrawlerLogArchiver:
+    """
+    crawler_log 归档器
+
+    每次归档按 (dt, site, id) 顺序用服务端游标读取数据，每个 (dt, site) 至少一个文件，
+    全部文件和 manifest 上传成功后才在同一事务内删除源数据（DROP 分区或 DELETE），
+    任何一步失败都会回滚，Postgres 中的数据保持不变。
+    只归档 item 同步已应用的行：待归档数据的最大 id 超过同步游标时拒绝归档。
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        minio_client: Optional[MinIOClient] = None,
+        fmt: Optional[str] = None,
+        rows_per_file: int = 100000,
+        fetch_size: int = 5000
+    ):
+        """
+        初始化归档器
+
+        Args:
+            database_url: 数据库连接URL，如果为None则从环境变量DATABASE_URL读取
+            minio_client: 归档 bucket 的 MinIO 客户端，为None时使用 MINIO_ARCHIVE_BUCKET 创建
+            fmt: 归档格式（jsonl.zst / jsonl.gz / parquet），为None时自动选择
+            rows_per_file: 单个数据文件的最大行数
+            fetch_size: 服务端游标每次读取的行数
+        """
+        if psycopg2 is None:
+            raise ImportError(
+                "psycopg2 未安装。请运行: pip install psycopg2-binary"
+            )
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        if not self.database_url:
+            raise ValueError("未提供database_url且环境变量DATABASE_URL未设置")
+        self.fmt = fmt or default_format()
+        _check_format(self.fmt)
+        self.minio_client = _create_archive_client(minio_client)
+        self.rows_per_file = max(1, rows_per_file)
+        self.fetch_size = fetch_size
+
+    def _get_connection(self):
+        """从共享连接池获取数据库连接（conn.close() 即归还）"""
+        return get_pool(self.database_url).getconn()
+
+    def _export(self, conn, table: str, where: str = "TRUE", params: Tuple = ()) -> Dict:
+        """
+        导出 table 中满足条件的行并上传，最后合并写入 manifest
+
+        Args:
+            conn: 数据库连接（调用方负责提交/回滚）
+            table: 源表名（crawler_log 或已分离的分区表）
+            where: WHERE 条件（使用 %s 占位符）
+            params: 条件参数
+
+        Returns:
+            {"rows": 行数, "files": 文件数, "bytes": 压缩后字节数, "max_id": 最大id}
+        """
+        query = sql.SQL("SELECT {cols} FROM {table} WHERE {where} ORDER BY dt, site, id").format(
+            cols=sql.SQL(", ").join(sql.Identifier(c) for c in ARCHIVE_COLUMNS),
+            table=sql.Identifier(table),
+            where=sql.SQL(where),
+        )
+        cursor = conn.cursor(name="crawler_log_archive")
+        cursor.itersize = self.fetch_size
+        cursor.execute(query, params)
+
+        new_files: Dict[date, List[Dict]] = {}
+        summary = {"rows": 0, "files": 0, "bytes": 0, "max_id": None}
+        buffer: List[Dict] = []
+
+        def flush():
+            if not buffer:
+                return
+            entry = self._upload_file(buffer)
+            new_files.setdefault(buffer[0]["dt"], []).append(entry)
+            summary["rows"] += entry["rows"]
+            summary["files"] += 1
+            summary["bytes"] += entry["bytes"]
+            summary["max_id"] = max(summary["max_id"] or 0, entry["max_id"])
+            buffer.clear()
+
+        try:
+            for values in cursor:
+                row = dict(zip(ARCHIVE_COLUMNS, values))
+                if buffer and (
+                    (row["dt"], row["site"]) != (buffer[0]["dt"], buffer[0]["site"])
+                    or len(buffer) >= self.rows_per_file
+                ):
+                    flush()
+                buffer.append(row)
+            flush()
+        finally:
+            cursor.close()
+
+        for dt, files in new_files.items():
+            self._merge_manifest(dt, files)
+        return summary
+
+    def _upload_file(self, rows: List[Dict]) -> Dict:
+        """上传一个数据文件，返回 manifest 中的文件条目"""
+        ids = [r["id"] for r in rows]
+        uids = [r["source_uid"] for r in rows]
+        dt, site = rows[0]["dt"], rows[0]["site"]
+        data = encode_rows(rows, self.fmt)
+        key = _data_key(dt, site, min(ids), max(ids), self.fmt)
+        self.minio_client.upload_object(key, data, content_type=ARCHIVE_FORMATS[self.fmt][1])
+        return {
+            "key": key,
+            "format": self.fmt,
+            "site": site,
+            "rows": len(rows),
+            "min_id": min(ids),
+            "max_id": max(ids),
+            "min_source_uid": min(uids),
+            "max_source_uid": max(uids),
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    def _merge_manifest(self, dt: date, files: List[Dict]) -> None:
+        """把新文件合并进当天的 manifest（同名 key 覆盖）"""
+        manifest = _load_manifest(self.minio_client, dt)
+        new_keys = {f["key"] for f in files}
+        manifest["files"] = [f for f in manifest["files"] if f["key"] not in new_keys] + files
+        manifest["files"].sort(key=lambda f: (f["site"], f["min_id"]))
+        manifest["rows"] = sum(f["rows"] for f in manifest["files"])
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.minio_client.upload_object(
+            _manifest_key(dt),
+            json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"),
+            content_type="application/json"
+        )
+
+    def _check_synced(self, conn, max_id: Optional[int], what: str) -> None:
+        """待归档数据的最大 id 超过 item 同步游标时抛出 RuntimeError（这些行尚未应用到 crawler_item）"""
+        if max_id is None:
+            return
+        sync_cursor = read_sync_cursor(conn)
+        if max_id > sync_cursor:
+            raise RuntimeError(
+                f"{what} 的最大 id {max_id} 超过同步游标 items_sync_last_log_id={sync_cursor}，"
+                f"item 同步完成前拒绝归档"
+            )
+
+    def archive_partition(self, partition: str, drop: bool = True) -> Dict:
+        """
+        归档一个按天分区（已挂载的会先分离），成功后删除分区表
+
+        分离在单独的短事务中完成（DETACH 持有父表的 ACCESS EXCLUSIVE 锁），之后再导出已分离的表，
+        导出和上传期间不阻塞 crawler_log 的写入和同步读取；导出失败时分区保持分离状态，可重新执行本命令
+
+        Args:
+            partition: 分区表名，例如 crawler_log_p20251231（可以是 partition_manager 已分离的表）
+            drop: 归档后是否删除分区表
+
+        Returns:
+            归档统计
+        """
+        if not _DAILY_PARTITION_RE.match(partition):
+            raise ValueError(f"不是按天分区表名: {partition}")
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT 1 FROM pg_inherits
+                WHERE inhrelid = to_regclass(%s) AND inhparent = 'crawler_log'::regclass
+                """,
+                (partition,)
+            )
+            if cursor.fetchone():
+                cursor.execute(sql.SQL("ALTER TABLE crawler_log DETACH PARTITION {}").format(
+                    sql.Identifier(partition)))
+            # 分离后不会再有新行进入该表；未同步的分区回滚分离
+            cursor.execute(sql.SQL("SELECT MAX(id) FROM {}").format(sql.Identifier(partition)))
+            self._check_synced(conn, cursor.fetchone()[0], partition)
+            conn.commit()
+
+            summary = self._export(conn, partition)
+            if drop:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+            cursor.close()
+            conn.commit()
+            print(f"[CrawlerLogArchiver] 已归档分区 {partition}: {summary}")
+            return summary
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def archive_before(self, before: date) -> Dict:
+        """
+        归档 dt 早于 before 的全部数据：按天分区整表归档后删除，其余（默认分区 / 未分区表）归档后 DELETE
+
+        Args:
+            before: 截止日期（不含）
+
+        Returns:
+            汇总统计
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'crawler_log'::regclass
+                ORDER BY c.relname
+                """
+            )
+            partitions = [
+                name for (name,) in cursor.fetchall()
+                if _DAILY_PARTITION_RE.match(name)
+                and datetime.strptime(_DAILY_PARTITION_RE.match(name).group(1), "%Y%m%d").date() < before
+            ]
+            cursor.close()
+        finally:
+            conn.close()
+
+        total = {"rows": 0, "files": 0, "bytes": 0, "partitions": 0}
+        for partition in partitions:
+            summary = self.archive_partition(partition, drop=True)
+            total["partitions"] += 1
+            for k in ("rows", "files", "bytes"):
+                total[k] += summary[k]
+
+        summary = self._archive_rows("dt < %s", (before,))
+        for k in ("rows", "files", "bytes"):
+            total[k] += summary[k]
+        print(f"[CrawlerLogArchiver] dt < {before} 归档完成: {total}")
+        return total
+
+    def archive_id_range(self, start_id: int, end_id: int) -> Dict:
+        """
+        归档 id 在 [start_id, end_id] 内的行并删除（适用于未分区的旧表或默认分区）
+
+        Args:
+            start_id: 起始 id（含）
+            end_id: 结束 id（含）
+
+        Returns:
+            归档统计
+        """
+        return self._archive_rows("id BETWEEN %s AND %s", (start_id, end_id))
+
+    def _archive_rows(self, where: str, params: Tuple) -> Dict:
+        """归档 crawler_log 中满足条件的行，并在同一事务内删除已导出的行（含未同步的行时拒绝）"""
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MAX(id) FROM crawler_log WHERE {where}", params)
+            max_id = cursor.fetchone()[0]
+            cursor.close()
+            self._check_synced(conn, max_id, f"crawler_log（{where} {params}）")
+            # 只导出检查过的行，检查之后插入的行留给下次归档
+            where = f"({where}) AND id <= %s"
+            params = params + (max_id or 0,)
+            summary = self._export(conn, "crawler_log", where, params)
+            if summary["rows"]:
+                cursor = conn.cursor()
+                # 只删除导出时已存在的行（id 不超过导出的最大 id），之后插入的行留给下次归档
+                cursor.execute(
+                    f"DELETE FROM crawler_log WHERE ({where}) AND id <= %s",
+                    params + (summary["max_id"],)
+                )
+                deleted = cursor.rowcount
+                cursor.close()
+                if deleted != summary["rows"]:
+                    raise RuntimeError(f"删除行数 {deleted} 与归档行数 {summary['rows']} 不一致，已回滚")
+            conn.commit()
+            if summary["rows"]:
+                print(f"[CrawlerLogArchiver] 已归档并删除 {summary['rows']} 行（{where} {params}）")
+            return summary
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+class CrawlerLogArchiveReader:
+    """crawler_log 归档读取器（manifest 裁剪 + 文件内过滤）"""
+
+    def __init__(self, minio_client: Optional[MinIOClient] = None):
+        """
+        初始化读取器
+
+        Args:
+            minio_client: 归档 bucket 的 MinIO 客户端，为None时使用 MINIO_ARCHIVE_BUCKET 创建
+        """
+        self.minio_client = _create_archive_client(minio_client)
+
+    def list_files(
+        self,
+        start_dt: Optional[date] = None,
+        end_dt: Optional[date] = None,
+        sites: Optional[Sequence[str]] = None,
+        source_uids: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """
+        根据 manifest 列出可能包含目标数据的归档文件
+
+        Args:
+            start_dt: 起始日期（含）
+            end_dt: 结束日期（含）
+            sites: 站点列表
+            source_uids: source_uid 列表（按文件的 min/max source_uid 范围裁剪）
+
+        Returns:
+            文件条目列表（附带 dt），按 (dt, min_id) 排序
+        """
+        files = []
+        for key in self.minio_client.list_objects(prefix=MANIFEST_PREFIX):
+            match = _MANIFEST_KEY_RE.search(key)
+            if not match:
+                continue
+            dt = date.fromisoformat(match.group(1))
+            if (start_dt and dt < start_dt) or (end_dt and dt > end_dt):
+                continue
+            manifest = json.loads(self.minio_client.download_image(key).decode("utf-8"))
+            for entry in manifest.get("files", []):
+                if sites and entry["site"] not in sites:
+                    continue
+                if source_uids and not any(
+                    entry["min_source_uid"] <= uid <= entry["max_source_uid"] for uid in source_uids
+                ):
+                    continue
+                files.append({**entry, "dt": dt})
+        files.sort(key=lambda f: (f["dt"], f["min_id"]))
+        return files
+
+    def scan(
+        self,
+        start_dt: Optional[date] = None,
+        end_dt: Optional[date] = None,
+        sites: Optional[Sequence[str]] = None,
+        source_uids: Optional[Sequence[str]] = None,
+        status: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        扫描归档数据，逐行返回与 crawler_log 查询结果相同结构的字典
+
+        同一 source_uid 的行按 id 升序返回（source_uid 只属于一个站点，文件按 dt、min_id 顺序读取）。
+
+        Args:
+            start_dt: 起始日期（含）
+            end_dt: 结束日期（含）
+            sites: 站点列表
+            source_uids: source_uid 列表
+            status: 只返回该状态的行（例如 success），为None时不过滤
+
+        Yields:
+            行字典
+        """
+        for entry in self.list_files(start_dt, end_dt, sites, source_uids):
+            data = self.minio_client.download_image(entry["key"])
+            if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                raise ValueError(f"归档文件校验失败: {entry['key']}")
+            rows = decode_rows(data, entry["format"], sites=sites, source_uids=source_uids)
+            rows.sort(key=lambda r: r["id"])
+            for row in rows:
+                if status and row.get("status") != status:
+                    continue
+                yield row
+
+
+def _parse_date(value: str) -> date:
+    """解析命令行日期参数"""
+    return date.fromisoformat(value)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="crawler_log 冷归档")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("archive", help="归档并从 Postgres 删除")
+    target = archive_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--before", type=_parse_date, help="归档 dt 早于该日期的数据（YYYY-MM-DD）")
+    target.add_argument("--partition", help="归档指定的按天分区表（如 crawler_log_p20251231）")
+    target.add_argument("--id-range", type=int, nargs=2, metavar=("START", "END"), help="归档 id 范围（含两端）")
+    archive_parser.add_argument("--format", choices=list(ARCHIVE_FORMATS), default=None, help="归档格式（默认自动选择）")
+    archive_parser.add_argument("--rows-per-file", type=int, default=100000, help="单个文件最大行数（默认: 100000）")
+    archive_parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+
+    for name, help_text in (("scan", "扫描归档并输出 JSONL"), ("replay", "把归档回放到 item_extract")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--start-dt", type=_parse_date, default=None, help="起始日期（含）")
+        sub.add_argument("--end-dt", type=_parse_date, default=None, help="结束日期（含）")
+        sub.add_argument("--site", action="append", default=None, help="站点（可重复）")
+        sub.add_argument("--source-uid", action="append", default=None, help="source_uid（可重复）")
+        if name == "replay":
+            sub.add_argument("--batch-size", type=int, default=100, help="每批处理行数（默认: 100）")
+            sub.add_argument("--batch-mode", action="store_true", help="使用集合操作的批量 upsert（默认: 逐行处理）")
+            sub.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        archiver = CrawlerLogArchiver(
+            database_url=args.database_url, fmt=args.format, rows_per_file=args.rows_per_file
+        )
+        if args.before:
+            archiver.archive_before(args.before)
+        elif args.partition:
+            archiver.archive_partition(args.partition)
+        else:
+            archiver.archive_id_range(*args.id_range)
+        return
+
+    reader = CrawlerLogArchiveReader()
+    if args.command == "scan":
+        for row in reader.scan(args.start_dt, args.end_dt, args.site, args.source_uid):
+            print(json.dumps(row, ensure_ascii=False, default=_json_default))
+        return
+
+    from item_extract.archive_replay import replay_archive
+    from item_extract.utils import get_db_connection
+    conn = get_db_connection(args.database_url)
+    try:
+        rows = reader.scan(args.start_dt, args.end_dt, args.site, args.source_uid, status="success")
+        results = replay_archive(conn, rows, batch_size=args.batch_size, batch_mode=args.batch_mode)
+        print(f"[CrawlerLogArchiveReader] 回放完成: {results}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # 作为脚本直接运行时，确保项目根目录在路径中并加载 .env
+    _project_root = Path(__file__).resolve().parent.parent
+    if str(_project_root) not in sys.path:
+        sys.path.insert(0, str(_project_root))
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(_project_root / ".env")
+    except ImportError:
+        pass
+    main()
@@ -1,6 +1,7 @@
 """MinIO客户端：用于上传和下载图片"""
 import os
 import hashlib
+from datetime import datetime
 from typing import Optional, BinaryIO
 from pathlib import Path
 
@@ -12,6 +13,13 @@ except ImportError:
     S3Error = None
 
 
+# 对象 key 按 sha256 内容寻址，内容永不变化，上传时写入长期缓存头，
+# 通过 CDN / MinIO 直接访问时浏览器可以永久缓存
+OBJECT_CACHE_CONTROL = os.getenv(
+    "MINIO_OBJECT_CACHE_CONTROL", "public, max-age=31536000, immutable"
+)
+
+
 class MinIOClient:
     """MinIO客户端封装"""
     
@@ -77,15 +85,15 @@ class MinIOClient:
         Args:
             sha256: SHA256哈希值
             ext: 文件扩展名
-            size: 缩略图尺寸（300或600），如果为None则是原图
+            size: 缩略图尺寸（300或600，按需生成时可为其他允许的宽度），如果为None则是原图
             
         Returns:
-            对象key，格式：original/{sha256[0:2]}/{sha256}.{ext} 或 thumb/{size}/{sha256[0:2]}/{sha256}.webp
+            对象key，格式：original/{sha256[0:2]}/{sha256}.{ext} 或 thumb/{size}/{sha256[0:2]}/{sha256}.{ext}
+            （抓取时生成的缩略图统一为webp）
         """
         prefix = sha256[:2]
         if size:
-            # 缩略图统一使用webp格式
-            return f"thumb/{size}/{prefix}/{sha256}.webp"
+            return f"thumb/{size}/{prefix}/{sha256}.{ext}"
         else:
             # 原图保留原始格式
             return f"original/{prefix}/{sha256}.{ext}"
@@ -129,7 +137,8 @@ class MinIOClient:
                 object_name=key,
                 data=BytesIO(image_data),
                 length=len(image_data),
-                content_type=f"image/{ext}" if ext != "jpg" else "image/jpeg"
+                content_type=f"image/{ext}" if ext != "jpg" else "image/jpeg",
+                metadata={"Cache-Control": OBJECT_CACHE_CONTROL}
             )
             print(f"[MinIOClient] 上传成功: {key}")
             return key
@@ -142,7 +151,8 @@ class MinIOClient:
         self,
         thumbnail_data: bytes,
         sha256: str,
-        size: int
+        size: int,
+        ext: str = "webp"
     ) -> str:
         """
         上传缩略图到MinIO
@@ -151,11 +161,12 @@ class MinIOClient:
             thumbnail_data: 缩略图二进制数据
             sha256: 原图的SHA256哈希值
             size: 缩略图尺寸（300或600）
+            ext: 缩略图扩展名（默认webp）
             
         Returns:
             对象key
         """
-        key = self._get_object_key(sha256, "webp", size=size)
+        key = self._get_object_key(sha256, ext, size=size)
         
         try:
             # 检查对象是否已存在
@@ -174,7 +185,8 @@ class MinIOClient:
                 object_name=key,
                 data=BytesIO(thumbnail_data),
                 length=len(thumbnail_data),
-                content_type="image/webp"
+                content_type=f"image/{ext}" if ext != "jpg" else "image/jpeg",
+                metadata={"Cache-Control": OBJECT_CACHE_CONTROL}
             )
             print(f"[MinIOClient] 缩略图上传成功: {key}")
             return key
@@ -183,6 +195,38 @@ class MinIOClient:
             print(f"[MinIOClient] 缩略图上传失败: {e}")
             raise
     
+    def upload_object(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """
+        上传任意对象（覆盖同名对象，不写入长期缓存头），用于归档文件、manifest 等非内容寻址对象
+
+        Args:
+            key: 对象key
+            data: 对象二进制数据
+            content_type: 内容类型
+
+        Returns:
+            对象key
+        """
+        try:
+            from io import BytesIO
+            self.client.put_object(
+                bucket_name=self.bucket,
+                object_name=key,
+                data=BytesIO(data),
+                length=len(data),
+                content_type=content_type
+            )
+            print(f"[MinIOClient] 上传成功: {key} ({len(data)} bytes)")
+            return key
+        except S3Error as e:
+            print(f"[MinIOClient] 上传失败: {e}")
+            raise
+
     def download_image(self, key: str) -> bytes:
         """
         从MinIO下载图片
@@ -202,7 +246,43 @@ class MinIOClient:
         except S3Error as e:
             print(f"[MinIOClient] 下载失败: {e}")
             raise
-    
+
+    def stat_image(self, key: str):
+        """
+        获取对象元数据（大小、etag、content_type 等），不下载内容
+
+        Args:
+            key: 对象key
+
+        Returns:
+            minio 的 Object 元数据对象
+        """
+        try:
+            return self.client.stat_object(self.bucket, key)
+        except S3Error as e:
+            print(f"[MinIOClient] 获取对象元数据失败: {e}")
+            raise
+
+    def open_image_stream(self, key: str, offset: int = 0, length: int = 0):
+        """
+        以流的方式打开对象（不整体读入内存）
+
+        调用方负责在读取完毕后调用 response.close() 和 response.release_conn()
+
+        Args:
+            key: 对象key
+            offset: 起始字节偏移
+            length: 读取的字节数，0 表示读到结尾
+
+        Returns:
+            urllib3 的 HTTPResponse 对象，可通过 response.stream(chunk_size) 迭代
+        """
+        try:
+            return self.client.get_object(self.bucket, key, offset=offset, length=length)
+        except S3Error as e:
+            print(f"[MinIOClient] 打开对象流失败: {e}")
+            raise
+
     def list_objects(self, prefix: Optional[str] = None) -> list:
         """
         列出bucket中的对象
@@ -236,13 +316,20 @@ class MinIOClient:
         except S3Error:
             return False
     
-    def get_presigned_url(self, key: str, expires_seconds: int = 3600) -> str:
+    def get_presigned_url(
+        self,
+        key: str,
+        expires_seconds: int = 3600,
+        request_date: Optional[datetime] = None
+    ) -> str:
         """
         生成预签名URL
         
         Args:
             key: 对象key
             expires_seconds: 过期时间（秒）
+            request_date: 签名时间（UTC），为None时使用当前时间。
+                          传入对齐后的时间可以让同一时间窗口内生成的URL完全一致
             
         Returns:
             预签名URL
@@ -252,7 +339,8 @@ class MinIOClient:
             url = self.client.presigned_get_object(
                 self.bucket,
                 key,
-                expires=timedelta(seconds=expires_seconds)
+                expires=timedelta(seconds=expires_seconds),
+                request_date=request_date
             )
             return url
         except S3Error as e:
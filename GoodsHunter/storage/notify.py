@@ -0,0 +1,4 @@
+"""crawler_log 写入通知：DBWriter 发送、item_extract 监听共用的 LISTEN/NOTIFY 频道"""
+
+# DBWriter 提交 crawler_log 行时通知的频道（pg_notify 在事务提交后才投递）
+CRAWLER_LOG_CHANNEL = "crawler_log_inserted"
@@ -2,6 +2,7 @@
 from storage.output.writer import JSONLWriter
 from storage.output.fileWriter import FileWriter
 from storage.output.db_writer import DBWriter
+from storage.output.write_behind import WriteBehindDBWriter
 
-__all__ = ["JSONLWriter", "FileWriter", "DBWriter"]
+__all__ = ["JSONLWriter", "FileWriter", "DBWriter", "WriteBehindDBWriter"]
 
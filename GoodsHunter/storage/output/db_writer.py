@@ -2,6 +2,7 @@
 import os
 import json
 import hashlib
+import time
 import requests
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List, Tuple
@@ -12,11 +13,9 @@ from io import BytesIO
 try:
     import psycopg2
     from psycopg2.extras import execute_values
-    from psycopg2.pool import SimpleConnectionPool
 except ImportError:
     psycopg2 = None
     execute_values = None
-    SimpleConnectionPool = None
 
 try:
     from PIL import Image
@@ -29,9 +28,55 @@ try:
 except ImportError:
     MinIOClient = None
 
+from storage.db_pool import ConnectionPool, get_pool
+from storage.image_processing import compute_dhash, generate_thumbnail
+from storage.phash_index import PHashIndex
+from storage.sync_state import advance_sync_cursor
+
 from crawler.core.types import Record
 
 
+def _ensure_project_root_on_path():
+    """确保项目根目录在 sys.path 中，以便导入 enums 模块（模块加载时执行一次）"""
+    import sys
+    if any('enums' in str(p) or Path(str(p)).name == 'GoodsHunter' for p in sys.path):
+        return
+    current_file = Path(__file__)
+    possible_roots = [
+        current_file.parent.parent.parent.parent,  # 从 storage/output/db_writer.py 向上4级
+        Path("/app/..").resolve(),  # Docker 容器中的项目根目录
+        Path("/app").parent,  # Docker 容器中，/app 的父目录
+    ]
+    for root in possible_roots:
+        enums_path = root / "enums"
+        if enums_path.exists() and enums_path.is_dir():
+            sys.path.insert(0, str(root))
+            break
+
+
+_ensure_project_root_on_path()
+
+from enums.business.crawler_status import CrawlerLogStatus
+
+
+# crawler_log 写入列（顺序与 _build_log_row 返回的元组一致）
+CRAWLER_LOG_COLUMNS = (
+    "category", "site", "item_id", "raw_json",
+    "brand_name", "model_name", "model_no",
+    "currency", "price",
+    "image_original_key", "image_thumb_300_key", "image_thumb_600_key", "image_sha256", "image_phash",
+    "source_uid", "raw_hash", "status", "error", "http_status", "fetch_url", "product_url", "run_id",
+    "crawl_time", "dt",
+)
+
+_CRAWLER_LOG_INSERT_SQL = f"INSERT INTO crawler_log ({', '.join(CRAWLER_LOG_COLUMNS)}) VALUES %s"
+
+# execute_values 的行模板，raw_json 显式转换为 jsonb
+_CRAWLER_LOG_ROW_TEMPLATE = "(" + ", ".join(
+    "%s::jsonb" if col == "raw_json" else "%s" for col in CRAWLER_LOG_COLUMNS
+) + ")"
+
+
 class DBWriter:
     """数据库写入器，负责将抓取的数据写入Postgres数据库"""
     
@@ -40,7 +85,12 @@ class DBWriter:
         database_url: Optional[str] = None,
         pool_size: int = 5,
         max_overflow: int = 10,
-        enable_image_upload: bool = True
+        enable_image_upload: bool = True,
+        thumbnail_sizes: Tuple[int, ...] = (300, 600),
+        phash_dedupe_distance: Optional[int] = None,
+        compact_sightings: bool = False,
+        notify_channel: Optional[str] = None,
+        inline_items: bool = False
     ):
         """
         初始化数据库写入器
@@ -51,6 +101,19 @@ class DBWriter:
             pool_size: 连接池大小
             max_overflow: 最大溢出连接数
             enable_image_upload: 是否启用图片上传到MinIO（默认True）
+            thumbnail_sizes: 抓取时预先生成的缩略图尺寸（默认300和600）。
+                             未预生成的尺寸由 API 的 /api/images/derived 按需生成，
+                             例如只传 (300,) 可以省去600px缩略图的生成和上传
+            phash_dedupe_distance: 近似重复图片去重阈值（dHash 汉明距离），None 表示不去重。
+                                   命中已有图片时直接复用其 MinIO key，不再上传原图和生成缩略图
+            compact_sightings: 精简模式。item 的 raw_hash 与 crawler_item.last_raw_hash 一致（内容未变化）
+                               且商品仍为 active 时，只刷新 crawler_item 的最后发现时间，不写入完整的 crawler_log 行
+            notify_channel: 写入 crawler_log 的事务中 pg_notify 的频道（提交后投递，
+                            item_extract --listen 收到后立即同步），默认 None 不通知；
+                            通常传 storage.notify.CRAWLER_LOG_CHANNEL（run_with_db --notify）
+            inline_items: inline 模式。在写入 crawler_log 的同一事务中用 item_extract 的批量 upsert
+                          直接更新 crawler_item / 变更历史；同步游标紧邻本批时一并推进（见 storage.sync_state），
+                          否则同步循环读到这些行时按 last_log_id 跳过。同步失败时只回滚到保存点，日志行照常提交由同步循环处理
         """
         if psycopg2 is None:
             raise ImportError(
@@ -69,7 +132,28 @@ class DBWriter:
         self.pool_size = pool_size
         self.max_overflow = max_overflow
         self.enable_image_upload = enable_image_upload
-        self._pool: Optional[SimpleConnectionPool] = None
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.phash_dedupe_distance = phash_dedupe_distance
+        self._phash_index: Optional[PHashIndex] = None
+        self.compact_sightings = compact_sightings
+        self.notify_channel = notify_channel
+        self.inline_items = inline_items
+        # 站点 -> {crawler_item.source_uid: last_raw_hash}（精简模式使用，按站点懒加载）
+        self._raw_hash_maps: Dict[str, Dict[str, str]] = {}
+        # 写入统计：写入的日志行数、精简模式下仅刷新的商品数、inline 模式下直接同步的商品行数和推进同步游标的批次数、图片处理计数，
+        # 以及图片阶段（下载/哈希/缩略图/上传）和数据库阶段（写入+提交）的累计耗时（秒），由 crawl_run 汇总
+        self.stats = {
+            "log_rows": 0,
+            "sightings": 0,
+            "items_inline": 0,
+            "cursor_advanced": 0,
+            "images_fetched": 0,
+            "images_deduped": 0,
+            "images_uploaded": 0,
+            "image_seconds": 0.0,
+            "db_seconds": 0.0,
+        }
+        self._pool: Optional[ConnectionPool] = None
         
         # 初始化MinIO客户端（如果启用图片上传）
         self.minio_client = None
@@ -85,14 +169,10 @@ class DBWriter:
                     print(f"[DBWriter] 警告: MinIO客户端初始化失败: {e}，图片上传功能将被禁用")
                     self.enable_image_upload = False
     
-    def _get_pool(self) -> SimpleConnectionPool:
-        """获取或创建连接池"""
+    def _get_pool(self) -> ConnectionPool:
+        """获取进程内共享的连接池（线程安全，多个写入线程可并发使用）"""
         if self._pool is None:
-            self._pool = SimpleConnectionPool(
-                minconn=1,
-                maxconn=self.pool_size + self.max_overflow,
-                dsn=self.database_url
-            )
+            self._pool = get_pool(self.database_url, max_size=self.pool_size + self.max_overflow)
         return self._pool
     
     def _get_connection(self):
@@ -217,64 +297,60 @@ class DBWriter:
         Returns:
             缩略图二进制数据（WebP格式），失败返回None
         """
-        if Image is None:
-            print("[DBWriter] 警告: PIL/Pillow未安装，无法生成缩略图")
-            return None
+        return generate_thumbnail(image_data, size, quality=quality, fmt="webp")
+    
+    def _get_phash_index(self) -> PHashIndex:
+        """
+        获取感知哈希索引（首次使用时从 crawler_item 加载已有图片）
+        
+        Returns:
+            PHashIndex，值为 (image_sha256, image_original_key, image_thumb_300_key, image_thumb_600_key)
+        """
+        if self._phash_index is not None:
+            return self._phash_index
         
+        index = PHashIndex()
+        conn = None
         try:
-            # 打开图片
-            img = Image.open(BytesIO(image_data))
-            
-            # 转换为RGB（如果是RGBA或其他格式）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 创建白色背景
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 计算新尺寸（保持宽高比）
-            width, height = img.size
-            if width > height:
-                new_width = size
-                new_height = int(height * size / width)
-            else:
-                new_height = size
-                new_width = int(width * size / height)
-            
-            # 生成缩略图
-            img.thumbnail((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为WebP格式
-            output = BytesIO()
-            img.save(output, format='WEBP', quality=quality, method=6)
-            output.seek(0)
-            
-            return output.read()
-            
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT image_phash, image_sha256, image_original_key,
+                       image_thumb_300_key, image_thumb_600_key
+                FROM crawler_item
+                WHERE image_phash IS NOT NULL AND image_original_key IS NOT NULL
+            """)
+            for phash, sha256, original_key, thumb_300_key, thumb_600_key in cursor.fetchall():
+                index.add(phash, (sha256, original_key, thumb_300_key, thumb_600_key))
+            cursor.close()
+            print(f"[DBWriter] 感知哈希索引已加载: {len(index)} 张图片")
         except Exception as e:
-            print(f"[DBWriter] 生成缩略图失败: {e}")
-            return None
+            print(f"[DBWriter] 加载感知哈希索引失败: {e}，从空索引开始")
+        finally:
+            if conn:
+                self._return_connection(conn)
+        
+        self._phash_index = index
+        return index
     
     def _process_image(
         self,
         item: Dict[str, Any]
-    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]:
         """
-        处理图片：下载、计算SHA256、生成缩略图、上传MinIO
+        处理图片：下载、计算SHA256和感知哈希、生成缩略图、上传MinIO
+        
+        启用 phash_dedupe_distance 时，与已有图片近似重复的直接复用已有图片的 key（image_sha256 仍为本次图片的哈希）
         
         Args:
             item: item数据字典，可能包含_image_data或image字段
             
         Returns:
-            (image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256)
-            如果处理失败，返回(None, None, None, None)
+            (image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256, image_phash)
+            如果处理失败，返回(None, None, None, None, None)
         """
         if not self.enable_image_upload or not self.minio_client:
-            return None, None, None, None
+            return None, None, None, None, None
         
         # 获取图片数据
         image_data = item.get("_image_data")
@@ -285,12 +361,24 @@ class DBWriter:
             image_data = self._download_image(image_url)
         
         if not image_data:
-            return None, None, None, None
+            return None, None, None, None, None
+        self.stats["images_fetched"] += 1
         
         try:
             # 计算SHA256
             sha256 = hashlib.sha256(image_data).hexdigest()
             
+            # 计算感知哈希，并检测近似重复图片
+            phash = compute_dhash(image_data)
+            if phash and self.phash_dedupe_distance is not None:
+                match = self._get_phash_index().nearest(phash, self.phash_dedupe_distance)
+                if match:
+                    distance, (_, dup_original, dup_thumb_300, dup_thumb_600) = match
+                    print(f"[DBWriter] 近似重复图片（距离 {distance}），复用: {dup_original}")
+                    self.stats["images_deduped"] += 1
+                    # 只复用对象 key；image_sha256 仍记录本次图片字节的哈希，保持精确匹配语义
+                    return dup_original, dup_thumb_300, dup_thumb_600, sha256, phash
+            
             # 获取扩展名
             ext = self._get_image_extension(image_url, image_data)
             
@@ -301,45 +389,38 @@ class DBWriter:
                     sha256=sha256,
                     ext=ext
                 )
+                self.stats["images_uploaded"] += 1
             except Exception as e:
                 print(f"[DBWriter] 上传原图失败: {e}")
                 original_key = None
             
-            # 生成并上传缩略图
-            thumb_300_key = None
-            thumb_600_key = None
-            
-            # 生成300px缩略图
-            thumb_300_data = self._generate_thumbnail(image_data, 300)
-            if thumb_300_data:
+            # 生成并上传缩略图（只生成 thumbnail_sizes 中配置的尺寸）
+            thumb_keys = {}
+            for size in self.thumbnail_sizes:
+                thumb_data = self._generate_thumbnail(image_data, size)
+                if not thumb_data:
+                    continue
                 try:
-                    thumb_300_key = self.minio_client.upload_thumbnail(
-                        thumbnail_data=thumb_300_data,
+                    thumb_keys[size] = self.minio_client.upload_thumbnail(
+                        thumbnail_data=thumb_data,
                         sha256=sha256,
-                        size=300
+                        size=size
                     )
                 except Exception as e:
-                    print(f"[DBWriter] 上传300px缩略图失败: {e}")
+                    print(f"[DBWriter] 上传{size}px缩略图失败: {e}")
             
-            # 生成600px缩略图
-            thumb_600_data = self._generate_thumbnail(image_data, 600)
-            if thumb_600_data:
-                try:
-                    thumb_600_key = self.minio_client.upload_thumbnail(
-                        thumbnail_data=thumb_600_data,
-                        sha256=sha256,
-                        size=600
-                    )
-                except Exception as e:
-                    print(f"[DBWriter] 上传600px缩略图失败: {e}")
+            if phash and original_key and self._phash_index is not None:
+                self._phash_index.add(
+                    phash, (sha256, original_key, thumb_keys.get(300), thumb_keys.get(600))
+                )
             
-            return original_key, thumb_300_key, thumb_600_key, sha256
+            return original_key, thumb_keys.get(300), thumb_keys.get(600), sha256, phash
             
         except Exception as e:
             print(f"[DBWriter] 处理图片失败: {e}")
             import traceback
             traceback.print_exc()
-            return None, None, None, None
+            return None, None, None, None, None
     
     def _normalize_item_data(self, item: Dict[str, Any], site: str) -> Dict[str, Any]:
         """
@@ -393,149 +474,377 @@ class DBWriter:
             "raw_item": item  # 保留原始item数据用于raw_json
         }
     
-    def write_record(self, record: Record, site: Optional[str] = None, run_id: int = -1) -> int:
+    def _prepare_item(self, item: Dict[str, Any], site: str) -> Tuple[Dict[str, Any], str, str]:
         """
-        写入单条记录到数据库
+        规范化 item 并计算 raw_json / raw_hash（不涉及图片处理）
         
         Args:
-            record: Record对象
-            site: 站点名称，如果为None则从record.url提取
-            run_id: 关联一次crawl run，手动调用时默认为-1
+            item: item 数据字典
+            site: 站点名称
             
         Returns:
-            成功写入的记录数
+            (normalized, raw_json, raw_hash)
         """
-        if not record:
-            return 0
+        # 规范化数据
+        normalized = self._normalize_item_data(item, site)
+        
+        # 构建raw_json（包含原始item数据，但排除图片二进制数据）
+        raw_item = normalized["raw_item"].copy()
+        # 移除图片二进制数据，避免JSON过大
+        if "_image_data" in raw_item:
+            raw_item["_image_data"] = f"<binary data, {len(raw_item['_image_data'])} bytes>"
+        raw_json = json.dumps(raw_item, ensure_ascii=False, default=str)
         
-        # 确定站点名称
-        if site is None:
-            site = self._extract_site_from_url(record.url)
+        # raw_hash: raw_json的SHA256哈希值
+        raw_hash = hashlib.sha256(raw_json.encode('utf-8')).hexdigest()
+        return normalized, raw_json, raw_hash
+    
+    def _build_log_row(
+        self,
+        record: Record,
+        item: Dict[str, Any],
+        site: str,
+        run_id: int,
+        crawl_time: datetime,
+        crawl_date: date,
+        prepared: Optional[Tuple[Dict[str, Any], str, str]] = None
+    ) -> Tuple:
+        """
+        构建一行 crawler_log 数据（包含图片处理）
         
-        # 处理items列表
-        items = []
+        Args:
+            record: item 所属的 Record
+            item: item 数据字典
+            site: 站点名称
+            run_id: 关联的 crawl run
+            crawl_time: 抓取时间
+            crawl_date: 抓取日期
+            prepared: _prepare_item 的结果，为 None 时现场计算
+            
+        Returns:
+            与 CRAWLER_LOG_COLUMNS 顺序一致的元组
+        """
+        normalized, raw_json, raw_hash = prepared or self._prepare_item(item, site)
+        
+        # 处理图片（上传到MinIO）
+        image_started = time.perf_counter()
+        image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256, image_phash = \
+            self._process_image(item)
+        self.stats["image_seconds"] += time.perf_counter() - image_started
+        
+        # source_uid: {site}:{item_id}
+        source_uid = f"{normalized['site']}:{normalized['item_id']}"
+        
+        # status: 默认'success'
+        # 即使 record.errors 不为空也保持success，因为可能只是部分字段提取失败
+        status = CrawlerLogStatus.SUCCESS.value
+        error = None
+        
+        return (
+            normalized["category"],
+            normalized["site"],
+            normalized["item_id"],
+            raw_json,
+            normalized["brand_name"],
+            normalized["model_name"],
+            normalized["model_no"],
+            normalized["currency"],
+            normalized["price"],
+            image_original_key,
+            image_thumb_300_key,
+            image_thumb_600_key,
+            image_sha256,
+            image_phash,
+            source_uid,
+            raw_hash,
+            status,
+            error,
+            record.status_code,  # http_status
+            record.url,  # fetch_url: 实际抓取的URL
+            normalized["product_url"],
+            run_id,
+            crawl_time,
+            crawl_date
+        )
+    
+    def _record_items(self, record: Record) -> List[Dict[str, Any]]:
+        """获取 Record 中的 items 列表（没有 items 时将整个 data 作为一个 item）"""
         if "items" in record.data:
-            items = record.data["items"]
-        else:
-            # 如果没有items，将整个data作为一个item处理
-            items = [record.data]
+            return record.data["items"] or []
+        return [record.data]
+    
+    def _item_source_uid(self, normalized: Dict[str, Any]) -> Optional[str]:
+        """生成 crawler_item 的 source_uid（{site}:{category}:{item_id}），字段缺失时返回 None"""
+        # 只有精简模式需要 item_extract 的 source_uid 规则，导入 storage 时不加载它
+        from item_extract.source_uid_generator import generate_source_uid
+
+        try:
+            return generate_source_uid(normalized["site"], normalized["category"], normalized["item_id"])
+        except ValueError:
+            return None
+    
+    def _get_raw_hash_map(self, site: str) -> Dict[str, str]:
+        """
+        获取站点 active 商品的 crawler_item.source_uid -> last_raw_hash 映射（每个站点首次使用时加载一次）
         
-        if not items:
-            print(f"[DBWriter] 警告: 记录中没有items数据，跳过写入")
-            return 0
+        Args:
+            site: 站点名称
+            
+        Returns:
+            source_uid -> last_raw_hash 字典，加载失败返回空字典（所有 item 按有变化处理）
+        """
+        if site in self._raw_hash_maps:
+            return self._raw_hash_maps[site]
         
+        raw_hash_map = {}
         conn = None
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT source_uid, last_raw_hash
+                FROM crawler_item
+                WHERE site = %s AND last_raw_hash IS NOT NULL AND status = 'active'
+                """,
+                (site,)
+            )
+            raw_hash_map = dict(cursor.fetchall())
+            cursor.close()
+            print(f"[DBWriter] 已加载站点 {site} 的 raw_hash: {len(raw_hash_map)} 个商品")
+        except Exception as e:
+            print(f"[DBWriter] 加载 raw_hash 失败: {e}，本站点不使用精简模式")
+        finally:
+            if conn:
+                self._return_connection(conn)
+        
+        self._raw_hash_maps[site] = raw_hash_map
+        return raw_hash_map
+    
+    def _bump_sightings(self, sightings: List[Tuple]) -> set:
+        """
+        内容未变化的 item 只刷新 crawler_item 的最后发现时间，不写 crawler_log
+        
+        每个商品每天最多写一次（last_seen_dt 已是当天的行不重写），不更新 updated_at；
+        返回 last_raw_hash 仍然一致且仍为 active 的 source_uid（当天已刷新过的也算）；
+        其余的（商品尚未提取、内容已被其他写入更新、或已售 / 下架）由调用方回退为写入完整日志行，
+        已售商品由同步循环读到日志后恢复为 active
+        
+        Args:
+            sightings: [(item_source_uid, raw_hash, crawl_date, crawl_time), ...]
             
-            inserted_count = 0
-            crawl_time = datetime.now()
-            crawl_date = date.today()
+        Returns:
+            已刷新的 source_uid 集合
+        """
+        conn = None
+        cursor = None
+        started = time.perf_counter()
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            updated = execute_values(
+                cursor,
+                """
+                WITH v(source_uid, raw_hash, dt, crawl_time) AS (VALUES %s),
+                bumped AS (
+                    UPDATE crawler_item AS ci
+                    SET last_seen_dt = v.dt,
+                        last_crawl_time = GREATEST(ci.last_crawl_time, v.crawl_time)
+                    FROM v
+                    WHERE ci.source_uid = v.source_uid
+                      AND ci.last_raw_hash = v.raw_hash
+                      AND ci.status = 'active'
+                      AND ci.last_seen_dt < v.dt
+                )
+                SELECT ci.source_uid
+                FROM crawler_item AS ci
+                JOIN v ON ci.source_uid = v.source_uid AND ci.last_raw_hash = v.raw_hash
+                WHERE ci.status = 'active'
+                """,
+                sightings,
+                template="(%s, %s, %s::date, %s::timestamptz)",
+                page_size=len(sightings),
+                fetch=True
+            )
+            conn.commit()
+            return {row[0] for row in updated}
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"[DBWriter] 刷新未变化商品失败: {e}，回退为写入完整日志行")
+            return set()
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                self._return_connection(conn)
+            self.stats["db_seconds"] += time.perf_counter() - started
+    
+    def _sync_items_inline(self, conn, rows: List[Tuple], log_ids: List[int]) -> None:
+        """
+        inline 模式：把刚写入的日志行直接交给批量 upsert（同一事务，不提交）
+        
+        行已经过 _normalize_item_data 规范化，不再从 crawler_log 读回。全部应用成功且同步游标恰好在本批之前时
+        把游标推进过本批连续的 id（advance_sync_cursor），同步循环不再读回这些行；否则同步循环读到时按 last_log_id 跳过。
+        失败时回滚到保存点，日志行仍随本批提交，由 item_extract 同步循环稍后处理
+        
+        Args:
+            conn: 写入 crawler_log 的连接（事务未提交）
+            rows: 与 CRAWLER_LOG_COLUMNS 顺序一致的行
+            log_ids: INSERT ... RETURNING 返回的 id（与 rows 顺序一致）
+        """
+        # 只有 inline 模式才需要 item_extract，导入 storage 时不加载它
+        from item_extract.batch_upserter import apply_log_records
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SAVEPOINT inline_items")
+            log_records = [
+                {**dict(zip(CRAWLER_LOG_COLUMNS, row)), "id": log_id}
+                for row, log_id in zip(rows, log_ids)
+            ]
+            results = apply_log_records(conn, log_records)
+            if not results["failed"] and advance_sync_cursor(conn, log_ids) is not None:
+                self.stats["cursor_advanced"] += 1
+            cursor.execute("RELEASE SAVEPOINT inline_items")
+            self.stats["items_inline"] += results["success"]
+            if results["failed"]:
+                print(f"[DBWriter] inline 同步 {results['success']}/{results['total']} 条")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT inline_items")
+            print(f"[DBWriter] inline 同步失败: {e}，日志行由 item_extract 同步循环处理")
+        finally:
+            cursor.close()
+    
+    def _record_crawl_time(self, record: Record, default: datetime) -> Tuple[datetime, date]:
+        """
+        记录的抓取时间和日期：设置了 record.fetched_at（页面缓存记录/回放）时使用原始抓取时间
+        
+        Args:
+            record: Record对象
+            default: 未设置 fetched_at 时使用的时间（本批次写入时间）
+            
+        Returns:
+            (crawl_time, crawl_date)，crawl_date 为本地时区的日期
+        """
+        if record.fetched_at is None:
+            return default, default.date()
+        return record.fetched_at, record.fetched_at.astimezone().date()
+    
+    def write_batch(
+        self,
+        entries: List[Tuple[Record, Optional[str]]],
+        run_id: int = -1
+    ) -> int:
+        """
+        批量写入多条记录：所有 item 组装成行后，用一次 execute_values 写入，一次提交
+        
+        精简模式（compact_sightings）下，raw_hash 与 crawler_item.last_raw_hash 一致的 item
+        只刷新 crawler_item 的 last_seen_dt / last_crawl_time（每天最多一次），不再写入完整的 crawler_log 行
+        
+        record.fetched_at 不为空时（从页面缓存回放），crawl_time / dt 使用原始抓取时间
+        
+        inline 模式（inline_items）下，写入的日志行在同一事务中同步到 crawler_item（见 _sync_items_inline）
+        
+        Args:
+            entries: [(record, site), ...]，site 为 None 时从 record.url 提取
+            run_id: 关联一次crawl run，手动调用时默认为-1
+            
+        Returns:
+            处理的 item 数（写入的日志行 + 精简模式下刷新的未变化商品）
+        """
+        batch_time = datetime.now()
+        
+        started = time.perf_counter()
+        rows = []
+        # 精简模式候选：item_source_uid -> (record, item, site, prepared)
+        unchanged = {}
+        for record, site in entries:
+            if not record:
+                continue
+            
+            # 确定站点名称
+            if site is None:
+                site = self._extract_site_from_url(record.url)
+            
+            items = self._record_items(record)
+            if not items:
+                print(f"[DBWriter] 警告: 记录中没有items数据，跳过写入")
+                continue
+            crawl_time, crawl_date = self._record_crawl_time(record, batch_time)
             
             for item in items:
-                # 规范化数据
-                normalized = self._normalize_item_data(item, site)
-                
-                # 处理图片（上传到MinIO）
-                image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256 = \
-                    self._process_image(item)
-                
-                # 构建raw_json（包含原始item数据，但排除图片二进制数据）
-                raw_item = normalized["raw_item"].copy()
-                # 移除图片二进制数据，避免JSON过大
-                if "_image_data" in raw_item:
-                    raw_item["_image_data"] = f"<binary data, {len(raw_item['_image_data'])} bytes>"
-                raw_json = json.dumps(raw_item, ensure_ascii=False, default=str)
-                
-                # 生成新字段
-                # source_uid: {site}:{item_id}
-                source_uid = f"{normalized['site']}:{normalized['item_id']}"
-                
-                # raw_hash: raw_json的SHA256哈希值
-                raw_hash = hashlib.sha256(raw_json.encode('utf-8')).hexdigest()
-                
-                # status: 默认'success'，如果有错误可以设置为'failed'
-                # 添加项目根目录到路径（如果还未添加）
-                import sys
-                from pathlib import Path
-                if not any('enums' in str(p) or Path(str(p)).name == 'GoodsHunter' for p in sys.path):
-                    current_file = Path(__file__)
-                    possible_roots = [
-                        current_file.parent.parent.parent.parent,  # 从 storage/output/db_writer.py 向上4级
-                        Path("/app/..").resolve(),  # Docker 容器中的项目根目录
-                        Path("/app").parent,  # Docker 容器中，/app 的父目录
-                    ]
-                    for root in possible_roots:
-                        enums_path = root / "enums"
-                        if enums_path.exists() and enums_path.is_dir():
-                            sys.path.insert(0, str(root))
-                            break
-                
-                from enums.business.crawler_status import CrawlerLogStatus
-                status = CrawlerLogStatus.SUCCESS.value
-                error = None
-                if record.errors:
-                    # 如果有错误，可以设置为failed（但这里先保持success，因为可能只是部分字段提取失败）
-                    # 如果需要更严格的错误处理，可以根据业务逻辑调整
-                    pass
-                
-                # http_status: 从record.status_code获取
-                http_status = record.status_code
-                
-                # fetch_url: 实际抓取的URL
-                fetch_url = record.url
-                
-                # 插入数据
-                insert_sql = """
-                    INSERT INTO crawler_log (
-                        category, site, item_id, raw_json,
-                        brand_name, model_name, model_no,
-                        currency, price,
-                        image_original_key, image_thumb_300_key, image_thumb_600_key, image_sha256,
-                        source_uid, raw_hash, status, error, http_status, fetch_url, product_url, run_id,
-                        crawl_time, dt
-                    ) VALUES (
-                        %s, %s, %s, %s::jsonb,
-                        %s, %s, %s,
-                        %s, %s,
-                        %s, %s, %s, %s,
-                        %s, %s, %s, %s, %s, %s, %s, %s,
-                        %s, %s
-                    )
-                """
-                
-                cursor.execute(insert_sql, (
-                    normalized["category"],
-                    normalized["site"],
-                    normalized["item_id"],
-                    raw_json,
-                    normalized["brand_name"],
-                    normalized["model_name"],
-                    normalized["model_no"],
-                    normalized["currency"],
-                    normalized["price"],
-                    image_original_key,
-                    image_thumb_300_key,
-                    image_thumb_600_key,
-                    image_sha256,
-                    source_uid,
-                    raw_hash,
-                    status,
-                    error,
-                    http_status,
-                    fetch_url,
-                    normalized["product_url"],
-                    run_id,
-                    crawl_time,
-                    crawl_date
+                prepared = self._prepare_item(item, site)
+                if self.compact_sightings:
+                    item_uid = self._item_source_uid(prepared[0])
+                    if item_uid and self._get_raw_hash_map(site).get(item_uid) == prepared[2]:
+                        unchanged[item_uid] = (record, item, site, prepared, crawl_time, crawl_date)
+                        continue
+                rows.append(self._build_log_row(
+                    record, item, site, run_id, crawl_time, crawl_date, prepared=prepared
                 ))
-                
-                inserted_count += 1
+        
+        sighted = 0
+        if unchanged:
+            bumped = self._bump_sightings([
+                (uid, prepared[2], crawl_date, crawl_time)
+                for uid, (_, _, _, prepared, crawl_time, crawl_date) in unchanged.items()
+            ])
+            sighted = len(bumped)
+            for uid, (record, item, site, prepared, crawl_time, crawl_date) in unchanged.items():
+                if uid not in bumped:
+                    rows.append(self._build_log_row(
+                        record, item, site, run_id, crawl_time, crawl_date, prepared=prepared
+                    ))
+            self.stats["sightings"] += sighted
+        
+        if not rows:
+            if sighted:
+                print(f"[DBWriter] {sighted} 个商品内容未变化，仅刷新最后发现时间")
+            return sighted
+        prepared_at = time.perf_counter()
+        
+        conn = None
+        cursor = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
             
+            # 一次往返写入所有行（page_size 覆盖整批，避免被拆成多条语句）
+            if self.inline_items:
+                inserted = execute_values(
+                    cursor,
+                    _CRAWLER_LOG_INSERT_SQL + " RETURNING id",
+                    rows,
+                    template=_CRAWLER_LOG_ROW_TEMPLATE,
+                    page_size=len(rows),
+                    fetch=True
+                )
+                self._sync_items_inline(conn, rows, [row[0] for row in inserted])
+            else:
+                execute_values(
+                    cursor,
+                    _CRAWLER_LOG_INSERT_SQL,
+                    rows,
+                    template=_CRAWLER_LOG_ROW_TEMPLATE,
+                    page_size=len(rows)
+                )
+            if self.notify_channel:
+                # 负载为本批行数；通知随事务提交投递，回滚时不会发出
+                cursor.execute("SELECT pg_notify(%s, %s)", (self.notify_channel, str(len(rows))))
             conn.commit()
-            print(f"[DBWriter] 成功写入 {inserted_count} 条记录到数据库")
-            return inserted_count
+            self.stats["log_rows"] += len(rows)
+            
+            finished = time.perf_counter()
+            db_seconds = finished - prepared_at
+            self.stats["db_seconds"] += db_seconds
+            rows_per_sec = len(rows) / db_seconds if db_seconds > 0 else float("inf")
+            print(
+                f"[DBWriter] 成功写入 {len(rows)} 条记录到数据库"
+                f"（准备 {prepared_at - started:.3f}s，写入 {db_seconds:.3f}s，{rows_per_sec:.0f} rows/s）"
+                + (f"，{sighted} 个未变化商品仅刷新最后发现时间" if sighted else "")
+            )
+            return len(rows) + sighted
             
         except Exception as e:
             if conn:
@@ -543,13 +852,30 @@ class DBWriter:
             print(f"[DBWriter] 写入数据库失败: {str(e)}")
             raise
         finally:
-            if conn:
+            if cursor:
                 cursor.close()
+            if conn:
                 self._return_connection(conn)
     
+    def write_record(self, record: Record, site: Optional[str] = None, run_id: int = -1) -> int:
+        """
+        写入单条记录到数据库（record 中的所有 item 一次写入）
+        
+        Args:
+            record: Record对象
+            site: 站点名称，如果为None则从record.url提取
+            run_id: 关联一次crawl run，手动调用时默认为-1
+            
+        Returns:
+            成功写入的记录数
+        """
+        if not record:
+            return 0
+        return self.write_batch([(record, site)], run_id)
+    
     def write_records(self, records: List[Record], site: Optional[str] = None, run_id: int = -1) -> int:
         """
-        批量写入记录到数据库
+        批量写入记录到数据库（所有 record 的 item 一次写入）
         
         Args:
             records: Record对象列表
@@ -559,16 +885,12 @@ class DBWriter:
         Returns:
             成功写入的记录总数
         """
-        total_count = 0
-        for record in records:
-            count = self.write_record(record, site, run_id)
-            total_count += count
-        return total_count
+        return self.write_batch([(record, site) for record in records], run_id)
     
     def close(self):
-        """关闭连接池"""
+        """释放连接池引用（共享连接池由其他使用者继续复用，进程退出时统一关闭）"""
         if self._pool:
-            self._pool.closeall()
+            print(f"[DBWriter] 连接池统计: {self._pool.stats()}")
             self._pool = None
     
     def __enter__(self):
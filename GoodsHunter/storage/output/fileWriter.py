@@ -1,14 +1,24 @@
 """文件写入器：保存图片和文本内容到本地文件"""
 import re
 import time
+import hashlib
+import tarfile
+import zipfile
 import requests
 import yaml
 import json
+from datetime import datetime
+from io import BytesIO
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from urllib.parse import urlparse
 
 from crawler.core.types import Record
+from storage.output.writer import JSONLWriter
+
+
+# 分片格式（一页一个分片文件）
+SHARD_FORMATS = ("tar", "zip")
 
 
 class FileWriter:
@@ -153,6 +163,101 @@ class FileWriter:
             print(f"[FileWriter] 保存图片失败: {item_id}, 错误: {str(e)}")
             return None
     
+    @staticmethod
+    def _format_text(text_data: Dict[str, Any]) -> str:
+        """格式化文本内容（每个字段一行，多行值另起一行）"""
+        lines = []
+        for key, value in text_data.items():
+            if value is not None:
+                # 将值转换为字符串
+                value_str = str(value)
+                # 如果值包含换行符，进行格式化
+                if '\n' in value_str:
+                    lines.append(f"{key}:\n{value_str}\n")
+                else:
+                    lines.append(f"{key}: {value_str}\n")
+        return "".join(lines)
+
+    @staticmethod
+    def _text_fields(item: Dict[str, Any]) -> Dict[str, Any]:
+        """提取要保存为文本的字段（排除图片数据、内部字段和空值）"""
+        return {
+            key: value for key, value in item.items()
+            if not key.startswith("_") and key != "image" and value is not None
+        }
+
+    @staticmethod
+    def save_shard(record: Record, site: str, fmt: str = "tar", base_dir: Optional[str] = None) -> Optional[str]:
+        """
+        把一页（一个 record）中所有 item 的图片和文本写入一个 tar/zip 分片文件
+
+        分片内路径为 image/{item_id}.{ext} 和 text/{item_id}.txt，
+        分片文件为 {base_dir}/{站点目录}/{YYYYMMDD}/{HHMMSS}-{url哈希}.{fmt}。
+
+        Args:
+            record: Record对象（列表页）
+            site: 站点名称，用作目录名
+            fmt: 分片格式（tar / zip）
+            base_dir: 分片基础目录，如果为None则使用配置中的 shard.base_dir（默认与图片目录同级的 shard 目录）
+
+        Returns:
+            分片文件路径，没有可保存的内容或失败时返回None
+        """
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"不支持的分片格式: {fmt}")
+        items = record.data.get("items") or []
+
+        # 收集分片成员：(分片内路径, 二进制内容)
+        members = []
+        for item in items:
+            item_id = item.get("item_id")
+            if not item_id:
+                continue
+            safe_item_id = FileWriter._sanitize_filename(str(item_id))
+            image_data = item.get("_image_data")
+            if image_data:
+                image_url = item.get("_image_url") or item.get("image", "")
+                ext = FileWriter._get_image_extension(image_url, image_data)
+                members.append((f"image/{safe_item_id}.{ext}", image_data))
+            text_fields = FileWriter._text_fields(item)
+            if text_fields:
+                members.append((f"text/{safe_item_id}.txt", FileWriter._format_text(text_fields).encode("utf-8")))
+        if not members:
+            return None
+
+        try:
+            config = FileWriter._load_config()
+            if base_dir is None:
+                image_base_dir = config.get("image", {}).get("base_dir", "/Users/xushuda/WorkSpace/GoodsHunter/storage/file_storage/image")
+                base_dir = config.get("shard", {}).get("base_dir") or str(Path(image_base_dir).parent / "shard")
+
+            now = datetime.now()
+            shard_dir = Path(base_dir) / FileWriter._get_site_dir_name(site) / now.strftime("%Y%m%d")
+            shard_dir.mkdir(parents=True, exist_ok=True)
+            url_hash = hashlib.sha1(record.url.encode("utf-8")).hexdigest()[:10]
+            file_path = shard_dir / f"{now.strftime('%H%M%S')}-{url_hash}.{fmt}"
+
+            mtime = time.time()
+            if fmt == "tar":
+                with tarfile.open(file_path, "w") as tar:
+                    for name, data in members:
+                        info = tarfile.TarInfo(name)
+                        info.size = len(data)
+                        info.mtime = mtime
+                        tar.addfile(info, BytesIO(data))
+            else:
+                # 图片本身已压缩，使用 ZIP_STORED 避免重复压缩
+                with zipfile.ZipFile(file_path, "w", compression=zipfile.ZIP_STORED) as zf:
+                    for name, data in members:
+                        zf.writestr(name, data)
+
+            print(f"[FileWriter] 分片已保存: {file_path}（{len(members)} 个文件）")
+            return str(file_path)
+
+        except Exception as e:
+            print(f"[FileWriter] 保存分片失败: {record.url}, 错误: {str(e)}")
+            return None
+
     @staticmethod
     def save_text(text_data: Dict[str, Any], item_id: str, site: str, base_dir: Optional[str] = None) -> Optional[str]:
         """
@@ -188,21 +293,9 @@ class FileWriter:
             filename = f"{safe_item_id}.txt"
             file_path = site_dir / filename
             
-            # 格式化文本内容
-            lines = []
-            for key, value in text_data.items():
-                if value is not None:
-                    # 将值转换为字符串
-                    value_str = str(value)
-                    # 如果值包含换行符，进行格式化
-                    if '\n' in value_str:
-                        lines.append(f"{key}:\n{value_str}\n")
-                    else:
-                        lines.append(f"{key}: {value_str}\n")
-            
             # 保存文件
             with open(file_path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
+                f.write(FileWriter._format_text(text_data))
             
             print(f"[FileWriter] 文本已保存: {file_path}")
             return str(file_path)
@@ -212,93 +305,95 @@ class FileWriter:
             return None
     
     @staticmethod
-    def save_record(record: Record, site: Optional[str] = None, output_path: Optional[str] = None) -> Dict[str, int]:
+    def save_record(
+        record: Record,
+        site: Optional[str] = None,
+        output_path: Optional[str] = None,
+        jsonl_writer: Optional[JSONLWriter] = None,
+        shard_format: Optional[str] = None
+    ) -> Dict[str, int]:
         """
         保存记录：包括JSONL格式的数据和图片/文本文件
         
         Args:
             record: Record对象
             site: 站点名称，如果提供则保存图片和文本文件
-            output_path: JSONL输出文件路径，如果为None则不保存JSONL
+            output_path: JSONL输出文件路径，如果为None则不保存JSONL（每次调用打开一次文件，
+                         批量运行时请使用 jsonl_writer）
+            jsonl_writer: 长期持有的 JSONLWriter（带缓冲、可轮转/压缩），提供时忽略 output_path
+            shard_format: 分片格式（tar / zip），提供时一页的图片和文本写入一个分片文件，
+                          为None时每个 item 单独保存图片和文本文件
             
         Returns:
-            保存统计信息字典，包含 saved_images, saved_texts, saved_jsonl
+            保存统计信息字典，包含 saved_images, saved_texts, saved_jsonl, saved_shards
         """
         stats = {
             "saved_images": 0,
             "saved_texts": 0,
-            "saved_jsonl": 0
+            "saved_jsonl": 0,
+            "saved_shards": 0
         }
         
         # 保存JSONL格式数据
-        if output_path:
+        if jsonl_writer is not None:
+            try:
+                jsonl_writer.write_record(record)
+                stats["saved_jsonl"] = 1
+            except Exception as e:
+                print(f"[FileWriter] 保存JSONL失败: {str(e)}")
+        elif output_path:
             try:
-                output_file = Path(output_path)
-                output_file.parent.mkdir(parents=True, exist_ok=True)
-                
-                # 将Record转换为可序列化的字典
-                record_dict = {
-                    "url": record.url,
-                    "data": record.data,
-                    "errors": [
-                        {
-                            "field": err.field,
-                            "error": err.error,
-                            "strategy": err.strategy,
-                        }
-                        for err in record.errors
-                    ],
-                }
-                
-                # 追加写入JSONL格式（每行一个JSON对象）
-                with open(output_file, "a", encoding="utf-8") as f:
-                    json.dump(record_dict, f, ensure_ascii=False)
-                    f.write("\n")
-                
+                with JSONLWriter(output_path) as writer:
+                    writer.write_record(record)
                 stats["saved_jsonl"] = 1
                 print(f"[FileWriter] JSONL已保存: {output_path}")
             except Exception as e:
                 print(f"[FileWriter] 保存JSONL失败: {str(e)}")
         
         # 保存图片和文本文件（如果存在）
-        if site:
-            if "items" in record.data:
-                items = record.data["items"]
-                print(f"[FileWriter] 开始保存图片和文本文件...")
-                
-                for item in items:
-                    item_id = item.get("item_id")
-                    if item_id:
-                        # 保存图片
-                        image_data = item.get("_image_data")
-                        image_url = item.get("_image_url") or item.get("image", "")
-                        if image_data:
-                            saved_path = FileWriter.save_image(
-                                image_data=image_data,
-                                item_id=item_id,
-                                site=site,
-                                image_url=image_url
-                            )
-                            if saved_path:
-                                stats["saved_images"] += 1
-                        
-                        # 保存文本（排除图片相关字段和内部字段）
-                        text_fields = {}
-                        for key, value in item.items():
-                            # 排除图片数据、内部字段和空值
-                            if not key.startswith("_") and key != "image" and value is not None:
-                                text_fields[key] = value
-                        
-                        if text_fields:
-                            saved_path = FileWriter.save_text(
-                                text_data=text_fields,
-                                item_id=item_id,
-                                site=site
-                            )
-                            if saved_path:
-                                stats["saved_texts"] += 1
-                
-                print(f"[FileWriter] 文件保存完成: {stats['saved_images']} 个图片, {stats['saved_texts']} 个文本文件")
+        if site and "items" in record.data:
+            items = record.data["items"]
+
+            if shard_format:
+                if FileWriter.save_shard(record, site, fmt=shard_format):
+                    stats["saved_shards"] = 1
+                    stats["saved_images"] = sum(
+                        1 for item in items if item.get("item_id") and item.get("_image_data")
+                    )
+                    stats["saved_texts"] = sum(
+                        1 for item in items if item.get("item_id") and FileWriter._text_fields(item)
+                    )
+                return stats
+
+            print(f"[FileWriter] 开始保存图片和文本文件...")
+            
+            for item in items:
+                item_id = item.get("item_id")
+                if item_id:
+                    # 保存图片
+                    image_data = item.get("_image_data")
+                    image_url = item.get("_image_url") or item.get("image", "")
+                    if image_data:
+                        saved_path = FileWriter.save_image(
+                            image_data=image_data,
+                            item_id=item_id,
+                            site=site,
+                            image_url=image_url
+                        )
+                        if saved_path:
+                            stats["saved_images"] += 1
+                    
+                    # 保存文本（排除图片相关字段和内部字段）
+                    text_fields = FileWriter._text_fields(item)
+                    if text_fields:
+                        saved_path = FileWriter.save_text(
+                            text_data=text_fields,
+                            item_id=item_id,
+                            site=site
+                        )
+                        if saved_path:
+                            stats["saved_texts"] += 1
+            
+            print(f"[FileWriter] 文件保存完成: {stats['saved_images']} 个图片, {stats['saved_texts']} 个文本文件")
         
         return stats
-
@@ -0,0 +1,259 @@
+"""异步写后（write-behind）数据库写入：有界队列 + 按批次/时间刷新 + 背压 + 关闭时排空"""
+import asyncio
+import base64
+import json
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from crawler.core.types import FieldError, Record
+
+
+# 队列结束标记
+_CLOSE = object()
+
+
+class DroppedRecordsError(RuntimeError):
+    """关闭时仍有记录既未写入数据库也未写入死信文件（未配置死信文件或死信文件写入失败）"""
+
+    def __init__(self, dropped: int):
+        super().__init__(f"{dropped} 条记录写入失败且未能保存到死信文件，已丢失")
+        self.dropped = dropped
+
+
+def _json_default(value: Any):
+    """JSON 序列化：bytes 用 base64 保存，便于死信重放时还原图片数据"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_object_hook(obj: Dict[str, Any]):
+    """JSON 反序列化：还原 base64 保存的 bytes"""
+    if set(obj.keys()) == {"__bytes__"}:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def load_dead_letters(path: str) -> List[Tuple[Record, Optional[str], int]]:
+    """
+    读取死信文件，用于重放写入失败的记录
+
+    Args:
+        path: 死信 JSONL 文件路径
+
+    Returns:
+        [(record, site, run_id), ...]，可直接传给 DBWriter.write_batch（按 run_id 分组）
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line, object_hook=_json_object_hook)
+            rec = data["record"]
+            record = Record(
+                url=rec["url"],
+                data=rec.get("data") or {},
+                errors=[FieldError(**e) for e in rec.get("errors") or []],
+                status_code=rec.get("status_code", 200),
+                fetched_at=datetime.fromisoformat(rec["fetched_at"]) if rec.get("fetched_at") else None,
+            )
+            entries.append((record, data.get("site"), data.get("run_id", -1)))
+    return entries
+
+
+class WriteBehindDBWriter:
+    """
+    异步写后数据库写入器
+
+    抓取协程只负责把 record 放入有界队列，后台写入任务按批次大小或时间间隔
+    调用 DBWriter.write_batch（在线程池中执行，不阻塞事件循环）：
+    - 队列满时 put() 会等待，形成背压，避免内存无限增长
+    - 写入失败按指数退避重试，最终失败的批次写入死信文件，不会丢失
+    - close() 会排空队列，保证已提交的记录全部写入（或进入死信文件）；
+      有记录既未写入也未进入死信文件时（未配置死信文件、死信文件写入失败）close() 抛出 DroppedRecordsError
+    """
+
+    def __init__(
+        self,
+        db_writer,
+        max_queue_size: int = 100,
+        batch_size: int = 20,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        dead_letter_path: Optional[str] = None
+    ):
+        """
+        初始化写后写入器
+
+        Args:
+            db_writer: DBWriter 实例（需要提供 write_batch 方法）
+            max_queue_size: 队列容量（record 数），满时 put() 等待
+            batch_size: 每批最多写入的 record 数
+            flush_interval: 批次最长等待时间（秒），未满一批也会写入
+            max_retries: 写入失败的最大重试次数
+            retry_backoff: 首次重试等待时间（秒），之后每次翻倍
+            dead_letter_path: 死信 JSONL 文件路径，为 None 时最终失败的批次无处保存，close() 抛出 DroppedRecordsError
+        """
+        self.db_writer = db_writer
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.dead_letter_path = dead_letter_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {
+            "queued": 0,
+            "written_records": 0,
+            "written_rows": 0,
+            "batches": 0,
+            "retries": 0,
+            "dead_letter_records": 0,
+            "dropped_records": 0,
+            "backpressure_waits": 0,
+        }
+
+    async def start(self):
+        """启动后台写入任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, record: Record, site: Optional[str] = None, run_id: int = -1):
+        """
+        提交一条记录（队列满时等待，形成背压）
+
+        Args:
+            record: Record对象
+            site: 站点名称
+            run_id: 关联一次crawl run
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindDBWriter 已关闭")
+        if self._task is None:
+            await self.start()
+        if self._queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self._queue.put((record, site, run_id))
+        self.stats["queued"] += 1
+
+    async def close(self):
+        """
+        停止接收新记录，排空队列并等待写入完成
+
+        Raises:
+            DroppedRecordsError: 有记录写入失败且未能保存到死信文件
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is None:
+            return
+        await self._queue.put(_CLOSE)
+        await self._task
+        self._task = None
+        print(f"[WriteBehindDBWriter] 已排空并关闭: {self.stats}")
+        if self.stats["dropped_records"]:
+            raise DroppedRecordsError(self.stats["dropped_records"])
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _next_batch(self) -> Tuple[List[Tuple[Record, Optional[str], int]], bool]:
+        """
+        收集一批记录：等到第一条后，继续收集直到达到批次大小或超过时间间隔
+
+        Returns:
+            (batch, closing)，closing 为 True 表示收到了结束标记
+        """
+        first = await self._queue.get()
+        if first is _CLOSE:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+            if entry is _CLOSE:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    async def _run(self):
+        """后台写入循环"""
+        closing = False
+        while not closing:
+            batch, closing = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Record, Optional[str], int]]):
+        """写入一批记录（按 run_id 分组，每组一次 write_batch）"""
+        groups: Dict[int, List[Tuple[Record, Optional[str]]]] = {}
+        for record, site, run_id in batch:
+            groups.setdefault(run_id, []).append((record, site))
+
+        for run_id, entries in groups.items():
+            delay = self.retry_backoff
+            for attempt in range(self.max_retries + 1):
+                try:
+                    rows = await asyncio.to_thread(self.db_writer.write_batch, entries, run_id)
+                    self.stats["batches"] += 1
+                    self.stats["written_records"] += len(entries)
+                    self.stats["written_rows"] += rows
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        print(f"[WriteBehindDBWriter] 批次写入失败（已重试 {attempt} 次）: {e}")
+                        self._write_dead_letters(entries, run_id, e)
+                        break
+                    self.stats["retries"] += 1
+                    print(f"[WriteBehindDBWriter] 批次写入失败，{delay:.1f}s 后重试: {e}")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    def _write_dead_letters(self, entries: List[Tuple[Record, Optional[str]]], run_id: int, error: Exception):
+        """把最终写入失败的记录追加到死信文件（无法保存时计入 dropped_records，close() 时报错）"""
+        if not self.dead_letter_path:
+            self.stats["dropped_records"] += len(entries)
+            print(f"[WriteBehindDBWriter] 未配置死信文件，{len(entries)} 条记录无法保存")
+            return
+
+        path = Path(self.dead_letter_path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lines = [
+                json.dumps({
+                    "site": site,
+                    "run_id": run_id,
+                    "error": str(error),
+                    "record": asdict(record),
+                }, ensure_ascii=False, default=_json_default) + "\n"
+                for record, site in entries
+            ]
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        except Exception as e:
+            self.stats["dropped_records"] += len(entries)
+            print(f"[WriteBehindDBWriter] 写入死信文件失败 {path}: {e}，{len(entries)} 条记录无法保存")
+            return
+        self.stats["dead_letter_records"] += len(entries)
+        print(f"[WriteBehindDBWriter] {len(entries)} 条记录已写入死信文件: {path}")
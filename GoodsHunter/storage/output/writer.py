@@ -1,57 +1,225 @@
 """JSONL输出写入器"""
+import gzip
 import json
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from crawler.core.types import Record, FieldError
 
 
+# 压缩方式 -> 文件后缀
+COMPRESSION_SUFFIXES = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def _json_default(value: Any):
+    """JSON 序列化兜底：bytes（如 _image_data）只记录长度，其余转为字符串"""
+    if isinstance(value, (bytes, bytearray)):
+        return f"<binary data, {len(value)} bytes>"
+    return str(value)
+
+
+def record_to_dict(record: Record) -> Dict[str, Any]:
+    """
+    将Record转换为可序列化的字典
+
+    Args:
+        record: Record对象
+
+    Returns:
+        字典（url / data / errors）
+    """
+    return {
+        "url": record.url,
+        "data": record.data,
+        "errors": [
+            {
+                "field": err.field,
+                "error": err.error,
+                "strategy": err.strategy,
+            }
+            for err in record.errors
+        ],
+    }
+
+
+def encode_json_line(obj: Dict[str, Any]) -> bytes:
+    """
+    编码为一行 JSON（UTF-8，带换行）；安装了 orjson 时使用 orjson
+
+    Args:
+        obj: 要编码的对象
+
+    Returns:
+        编码后的字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_json_default, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+        )
+    return (json.dumps(obj, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+
 class JSONLWriter:
-    """JSONL格式输出写入器"""
+    """
+    JSONL格式输出写入器
 
-    def __init__(self, output_path: str):
+    长期持有一个带缓冲的文件句柄，不再每条记录打开/关闭一次文件：
+    - 可选 gzip / zstd 压缩
+    - 按大小（max_bytes，未压缩字节数）或时间（max_seconds）轮转
+    - 启用压缩或轮转时，文件名为 {stem}.{打开时间}.{序号}.jsonl[.gz|.zst]；否则直接写入 output_path
+    使用完毕需要调用 close()（或使用 with 语句），否则缓冲区中的数据不会落盘
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        compression: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        buffer_size: int = 1024 * 1024
+    ):
         """
         初始化写入器
-        
+
         Args:
             output_path: 输出文件路径
+            compression: 压缩方式（None / gzip / zstd）
+            max_bytes: 单个文件写入的最大字节数（未压缩），超过后轮转
+            max_seconds: 单个文件的最长写入时间（秒），超过后轮转
+            buffer_size: 文件缓冲区大小（字节）
         """
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstandard 未安装。请运行: pip install zstandard")
+
         self.output_path = Path(output_path)
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.buffer_size = buffer_size
+
+        self._raw = None
+        self._stream = None
+        self._opened_at = 0.0
+        self._bytes_written = 0
+        self._sequence = 0
+        self.current_path: Optional[Path] = None
+        self.paths: List[Path] = []
+        self.records_written = 0
+
+    def _next_path(self) -> Path:
+        """生成下一个输出文件路径"""
+        if not self.compression and not self.max_bytes and not self.max_seconds:
+            return self.output_path
+        self._sequence += 1
+        stem = self.output_path.name
+        for suffix in (".gz", ".zst", ".jsonl"):
+            if stem.endswith(suffix):
+                stem = stem[:-len(suffix)]
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = f"{stem}.{timestamp}.{self._sequence:04d}.jsonl{COMPRESSION_SUFFIXES[self.compression]}"
+        return self.output_path.with_name(name)
+
+    def _open(self):
+        """打开新的输出文件"""
+        path = self._next_path()
+        self._raw = open(path, "ab", buffering=self.buffer_size)
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="ab", compresslevel=6)
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._opened_at = time.monotonic()
+        self._bytes_written = 0
+        self.current_path = path
+        self.paths.append(path)
+
+    def _close_current(self):
+        """关闭当前输出文件（写出压缩尾部并落盘）"""
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._stream = None
+        self._raw = None
+
+    def _should_rotate(self) -> bool:
+        """判断当前文件是否需要轮转"""
+        if self.max_bytes and self._bytes_written >= self.max_bytes:
+            return True
+        if self.max_seconds and time.monotonic() - self._opened_at >= self.max_seconds:
+            return True
+        return False
 
     def write_record(self, record: Record):
         """
         写入单条记录
-        
+
         Args:
             record: Record对象
         """
-        # 将Record转换为可序列化的字典
-        record_dict = {
-            "url": record.url,
-            "data": record.data,
-            "errors": [
-                {
-                    "field": err.field,
-                    "error": err.error,
-                    "strategy": err.strategy,
-                }
-                for err in record.errors
-            ],
-        }
-
-        # 追加写入JSONL格式（每行一个JSON对象）
-        with open(self.output_path, "a", encoding="utf-8") as f:
-            json.dump(record_dict, f, ensure_ascii=False)
-            f.write("\n")
+        self.write_dict(record_to_dict(record))
+
+    def write_dict(self, obj: Dict[str, Any]):
+        """
+        写入一个字典为一行 JSON
+
+        Args:
+            obj: 可序列化的字典
+        """
+        if self._stream is not None and self._should_rotate():
+            self._close_current()
+        if self._stream is None:
+            self._open()
+        line = encode_json_line(obj)
+        self._stream.write(line)
+        self._bytes_written += len(line)
+        self.records_written += 1
 
     def write_records(self, records: List[Record]):
         """
         批量写入记录
-        
+
         Args:
             records: Record对象列表
         """
         for record in records:
             self.write_record(record)
 
+    def flush(self):
+        """把缓冲区写入文件（压缩流会先输出一个完整的块）"""
+        if self._stream is None:
+            return
+        self._stream.flush()
+        if self._stream is not self._raw:
+            self._raw.flush()
+
+    def close(self):
+        """关闭写入器"""
+        self._close_current()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
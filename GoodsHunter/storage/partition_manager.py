@@ -0,0 +1,215 @@
+"""crawler_log 分区维护：预先创建按天分区、按保留期分离/删除旧分区
+
+建议每天定时执行一次（例如 cron）：
+    python -m storage.partition_manager --days-ahead 14 --retention-days 90
+
+分离（detach）后的分区仍是独立的表，可先导出归档，再加 --drop 删除。
+默认分区中的行（写入时对应日期的分区尚未创建）会在每次运行时搬入按天分区，
+之后随保留期一起分离，不会滞留在默认分区中。
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+from storage.db_pool import get_pool
+
+
+class CrawlerLogPartitionManager:
+    """crawler_log 按天分区管理器（调用 init.sql 中定义的分区维护函数）"""
+
+    def __init__(self, database_url: Optional[str] = None):
+        """
+        初始化分区管理器
+
+        Args:
+            database_url: 数据库连接URL，如果为None则从环境变量DATABASE_URL读取
+        """
+        if psycopg2 is None:
+            raise ImportError(
+                "psycopg2 未安装。请运行: pip install psycopg2-binary"
+            )
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        if not self.database_url:
+            raise ValueError("未提供database_url且环境变量DATABASE_URL未设置")
+
+    def _get_connection(self):
+        """从共享连接池获取数据库连接（conn.close() 即归还）"""
+        return get_pool(self.database_url).getconn()
+
+    def ensure_partitions(self, days_ahead: int = 14, start: Optional[date] = None) -> int:
+        """
+        创建从 start（默认今天）开始 days_ahead 天内缺失的分区
+
+        Args:
+            days_ahead: 预先创建的天数
+            start: 起始日期
+
+        Returns:
+            新创建的分区数
+        """
+        start = start or date.today()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT crawler_log_create_partitions(%s, %s)", (start, days_ahead))
+            created = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            print(f"[PartitionManager] 已确保 {start} 起 {days_ahead} 天的分区，新建 {created} 个")
+            return created
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def default_partition_rows(self) -> Dict[date, int]:
+        """
+        统计默认分区中每天的行数（正常情况下应为空）
+
+        Returns:
+            {dt: 行数}，按日期升序
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT dt, COUNT(*) FROM crawler_log_default GROUP BY dt ORDER BY dt")
+            rows = {dt: count for dt, count in cursor.fetchall()}
+            cursor.close()
+            return rows
+        finally:
+            conn.close()
+
+    def relocate_default_rows(self) -> int:
+        """
+        为默认分区中出现的每个日期创建按天分区，并把这些行搬入新分区
+
+        搬入后这些行与其他按天分区一样受保留期管理（detach_old_partitions）。
+        某天的同名分区表已被分离但尚未归档/删除时，该天搬入失败并打印错误（需先归档该表），其余日期照常处理
+
+        Returns:
+            搬出默认分区的行数
+        """
+        days = self.default_partition_rows()
+        if not days:
+            return 0
+        print(f"[PartitionManager] 默认分区中有 {sum(days.values())} 行（{len(days)} 天），搬入按天分区")
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            moved = 0
+            for day in days:
+                try:
+                    cursor.execute("SELECT crawler_log_create_partition(%s)", (day,))
+                    moved += cursor.fetchone()[0]
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    print(f"[PartitionManager] 错误: 无法搬入 {day} 的 {days[day]} 行: {str(e).strip()}")
+            cursor.close()
+        finally:
+            conn.close()
+        remaining = self.default_partition_rows()
+        if remaining:
+            print(f"[PartitionManager] 警告: 默认分区仍有 {sum(remaining.values())} 行: {remaining}")
+        print(f"[PartitionManager] 已从默认分区搬出 {moved} 行")
+        return moved
+
+    def detach_old_partitions(self, retention_days: int, drop: bool = False) -> List[str]:
+        """
+        分离 dt 早于保留期的分区
+
+        Args:
+            retention_days: 保留天数，早于 today - retention_days 的分区会被分离
+            drop: 分离后是否直接删除（未归档的数据会丢失）
+
+        Returns:
+            被分离（或删除）的分区表名列表
+        """
+        before = date.today() - timedelta(days=retention_days)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM crawler_log_detach_partitions(%s, %s)", (before, drop))
+            names = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            cursor.close()
+            action = "删除" if drop else "分离"
+            print(f"[PartitionManager] {action} {before} 之前的分区 {len(names)} 个: {names}")
+            return names
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def list_partitions(self) -> List[Dict]:
+        """
+        列出 crawler_log 当前挂载的分区及其行数估计
+
+        Returns:
+            [{"name": 分区表名, "bound": 分区范围, "estimated_rows": 估计行数}, ...]
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::BIGINT
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'crawler_log'::regclass
+                ORDER BY c.relname
+                """
+            )
+            partitions = [
+                {"name": name, "bound": bound, "estimated_rows": max(rows, 0)}
+                for name, bound, rows in cursor.fetchall()
+            ]
+            cursor.close()
+            return partitions
+        finally:
+            conn.close()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="crawler_log 分区维护")
+    parser.add_argument("--database-url", default=None, help="数据库连接URL（默认读取 DATABASE_URL）")
+    parser.add_argument("--days-ahead", type=int, default=14, help="预先创建的分区天数（默认: 14）")
+    parser.add_argument("--retention-days", type=int, default=None, help="保留天数，超过的分区会被分离（默认不分离）")
+    parser.add_argument("--drop", action="store_true", help="分离后直接删除旧分区（请先归档）")
+    parser.add_argument("--list", action="store_true", help="列出当前分区")
+    args = parser.parse_args()
+
+    manager = CrawlerLogPartitionManager(database_url=args.database_url)
+    manager.relocate_default_rows()
+    manager.ensure_partitions(days_ahead=args.days_ahead)
+    if args.retention_days is not None:
+        manager.detach_old_partitions(args.retention_days, drop=args.drop)
+    if args.list:
+        for part in manager.list_partitions():
+            print(f"{part['name']:<28} {part['bound']:<60} ~{part['estimated_rows']} rows")
+        for day, count in manager.default_partition_rows().items():
+            print(f"{'crawler_log_default':<28} {'dt = ' + str(day):<60} {count} rows")
+
+
+if __name__ == "__main__":
+    # 作为脚本直接运行时，确保项目根目录在路径中并加载 .env
+    _project_root = Path(__file__).resolve().parent.parent
+    if str(_project_root) not in sys.path:
+        sys.path.insert(0, str(_project_root))
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(_project_root / ".env")
+    except ImportError:
+        pass
+    main()
@@ -0,0 +1,142 @@
+"""图片感知哈希索引：基于 BK 树的汉明距离近邻检索（进程内）"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """计算两个整数哈希的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+def phash_to_int(phash: str) -> int:
+    """十六进制感知哈希转换为整数"""
+    return int(phash, 16)
+
+
+class BKTree:
+    """
+    BK 树（Burkhard-Keller Tree）
+
+    按汉明距离组织哈希，查询时利用三角不等式剪枝，
+    只需访问距离在 [d - threshold, d + threshold] 范围内的子树。
+    """
+
+    def __init__(self):
+        """初始化空树"""
+        # 节点结构：[hash, values, children]，children 为 {distance: node}
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, hash_value: int, value: Any = None) -> None:
+        """
+        添加哈希
+
+        Args:
+            hash_value: 整数哈希
+            value: 关联的值（相同哈希的多个值会合并在同一节点）
+        """
+        self._size += 1
+        if self._root is None:
+            self._root = [hash_value, [value], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [value], {}]
+                return
+            node = child
+
+    def search(self, hash_value: int, threshold: int) -> List[Tuple[int, int, Any]]:
+        """
+        查询汉明距离不超过 threshold 的所有哈希
+
+        Args:
+            hash_value: 查询的整数哈希
+            threshold: 最大汉明距离
+
+        Returns:
+            [(distance, hash, value), ...]，按距离升序
+        """
+        if self._root is None:
+            return []
+
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= threshold:
+                for value in node[1]:
+                    results.append((distance, node[0], value))
+            low, high = distance - threshold, distance + threshold
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+
+        results.sort(key=lambda r: r[0])
+        return results
+
+
+class PHashIndex:
+    """
+    图片感知哈希索引
+
+    封装 BKTree，接受十六进制哈希字符串，用于查找近似重复的图片。
+    """
+
+    def __init__(self, entries: Optional[Iterable[Tuple[str, Any]]] = None):
+        """
+        初始化索引
+
+        Args:
+            entries: 初始数据 [(phash, value), ...]
+        """
+        self._tree = BKTree()
+        self._seen: Dict[Tuple[str, Any], bool] = {}
+        if entries:
+            for phash, value in entries:
+                self.add(phash, value)
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def add(self, phash: Optional[str], value: Any = None) -> None:
+        """添加哈希（空哈希和重复的 (phash, value) 会被忽略）"""
+        if not phash:
+            return
+        key = (phash, value)
+        if key in self._seen:
+            return
+        self._seen[key] = True
+        self._tree.add(phash_to_int(phash), value)
+
+    def search(self, phash: Optional[str], max_distance: int) -> List[Tuple[int, Any]]:
+        """
+        查找近似重复
+
+        Args:
+            phash: 十六进制哈希
+            max_distance: 最大汉明距离（64 位 dHash 一般取 4~10）
+
+        Returns:
+            [(distance, value), ...]，按距离升序
+        """
+        if not phash:
+            return []
+        return [
+            (distance, value)
+            for distance, _, value in self._tree.search(phash_to_int(phash), max_distance)
+        ]
+
+    def nearest(self, phash: Optional[str], max_distance: int) -> Optional[Tuple[int, Any]]:
+        """查找最近的一个近似重复，没有返回 None"""
+        matches = self.search(phash, max_distance)
+        return matches[0] if matches else None
@@ -0,0 +1,239 @@
+"""item 同步状态：item_extract 同步循环、storage 侧（crawler_log 归档、DBWriter inline 模式）和管理端 API 共用
+
+包含 pipeline_state 中的游标键和指标键、游标延迟查询、同步状态读取和 Prometheus 文本渲染；
+只依赖标准库，各方传入自己的 DB-API 连接（API 中为 SQLAlchemy 会话底层的 psycopg2 连接）
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# item_extract 同步循环的全局游标（pipeline_state.key），值为已应用到 crawler_item 的最大 crawler_log.id
+CURSOR_KEY_LAST_LOG_ID = "items_sync_last_log_id"
+
+# 同步指标（pipeline_state.key），值为 JSON 快照：updated_at、last_run、last_failure、totals
+METRICS_KEY = "items_sync_metrics"
+
+# 每批计时的阶段（顺序即展示顺序）：读取日志 / 写入 crawler_item / 写入价格历史和每日聚合 / 提交
+SYNC_STAGES = ("fetch", "upsert", "history", "commit")
+
+# 累计计数（Prometheus counter）
+TOTAL_FIELDS = ("runs", "run_failures", "batches", "rows", "success", "failed", "batch_fallbacks")
+
+# crawler_log 当前最大 id（主键索引上取 MAX，代替 COUNT(*)）
+MAX_LOG_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM crawler_log"
+
+# 游标之后最早一条待处理（success）日志的抓取时间距今秒数（按 id 取第一条，走各分区的主键索引）；
+# 失败的日志不会被同步，不计入延迟，否则游标之后的一条旧失败记录会让延迟持续偏大
+LAG_SECONDS_SQL = """
+    SELECT GREATEST(EXTRACT(EPOCH FROM now() - crawl_time), 0)
+    FROM crawler_log
+    WHERE id > %s
+        AND status = 'success'
+    ORDER BY id
+    LIMIT 1
+"""
+
+
+def read_sync_cursor(conn) -> int:
+    """
+    读取同步游标（psycopg2 连接，不提交）
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        游标值，不存在或无法解析时返回 0（视为尚未同步任何日志）
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT value FROM pipeline_state WHERE key = %s", (CURSOR_KEY_LAST_LOG_ID,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    try:
+        return int(row[0]) if row else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def advance_sync_cursor(conn, log_ids: List[int]) -> Optional[int]:
+    """
+    DBWriter inline 模式：本事务写入并已应用的日志行紧接在同步游标之后时，把游标推进过这些行（不提交）
+
+    只有游标恰好等于本批最小 id - 1 时才推进，且只推进到从最小 id 开始连续的最后一个 id：
+    游标之前的行已由同步循环处理，连续区间内的 id 都属于本事务；区间中的空缺可能是并发写入方
+    尚未提交的行，不能越过。条件 UPDATE 在行锁下重新检查游标值，行锁持有到本事务提交，
+    与同步循环的游标更新互斥
+
+    Args:
+        conn: 写入 crawler_log 的连接（事务未提交）
+        log_ids: 本事务写入的 crawler_log.id
+
+    Returns:
+        推进后的游标；游标不紧邻本批（同步循环落后或有并发写入）时返回 None，由同步循环读取并跳过这些行
+    """
+    ids = sorted(log_ids)
+    if not ids:
+        return None
+    end = ids[0]
+    for log_id in ids[1:]:
+        if log_id != end + 1:
+            break
+        end = log_id
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE pipeline_state
+            SET value = %s, updated_at = now()
+            WHERE key = %s AND value = %s
+            """,
+            (str(end), CURSOR_KEY_LAST_LOG_ID, str(ids[0] - 1))
+        )
+        return end if cursor.rowcount == 1 else None
+    finally:
+        cursor.close()
+
+
+def empty_totals() -> Dict:
+    """累计计数的初始值"""
+    totals = {field: 0 for field in TOTAL_FIELDS}
+    totals['stage_seconds'] = {stage: 0.0 for stage in SYNC_STAGES}
+    totals['errors_by_type'] = {}
+    return totals
+
+
+def read_max_log_id(conn) -> int:
+    """
+    读取 crawler_log 当前最大 id（不提交）
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        最大 id，表为空时返回 0
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(MAX_LOG_ID_SQL)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def read_lag_seconds(conn, last_log_id: int) -> float:
+    """
+    读取同步延迟秒数（见 LAG_SECONDS_SQL，不提交）
+
+    Args:
+        conn: 数据库连接对象
+        last_log_id: 游标
+
+    Returns:
+        延迟秒数，没有待处理日志时返回 0
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LAG_SECONDS_SQL, (last_log_id,))
+        row = cursor.fetchone()
+        return round(float(row[0]), 3) if row else 0.0
+    finally:
+        cursor.close()
+
+
+def read_sync_status(conn) -> Dict:
+    """
+    读取持久化的同步指标，并实时计算当前游标延迟（同步进程停止时延迟继续增长，不提交）
+
+    Args:
+        conn: 数据库连接对象
+
+    Returns:
+        {cursor, max_log_id, lag_rows, lag_seconds, updated_at, last_run, last_failure, totals}
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT value FROM pipeline_state WHERE key = %s", (METRICS_KEY,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    try:
+        snapshot = json.loads(row[0]) if row and row[0] else {}
+    except ValueError:
+        snapshot = {}
+    cursor_value = read_sync_cursor(conn)
+    max_log_id = read_max_log_id(conn)
+    totals = empty_totals()
+    totals.update(snapshot.get('totals') or {})
+    return {
+        'cursor': cursor_value,
+        'max_log_id': max_log_id,
+        'lag_rows': max(max_log_id - cursor_value, 0),
+        'lag_seconds': read_lag_seconds(conn, cursor_value),
+        'updated_at': snapshot.get('updated_at'),
+        'last_run': snapshot.get('last_run'),
+        'last_failure': snapshot.get('last_failure'),
+        'totals': totals,
+    }
+
+
+def _label_value(value) -> str:
+    """转义 Prometheus 标签值"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_prometheus(status: Dict, prefix: str = "goodshunter_item_sync") -> str:
+    """
+    把 read_sync_status 的结果渲染为 Prometheus 文本格式
+
+    延迟为 gauge（告警示例：goodshunter_item_sync_lag_seconds > 600），累计计数为 counter
+
+    Args:
+        status: read_sync_status 的结果
+        prefix: 指标名前缀
+
+    Returns:
+        Prometheus 文本（以换行结尾）
+    """
+    lines: List[str] = []
+
+    def metric(name: str, metric_type: str, help_text: str, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+    totals = {**empty_totals(), **(status.get('totals') or {})}
+    last_run = status.get('last_run') or {}
+
+    metric("cursor", "gauge", "Last crawler_log id applied to crawler_item",
+           [({}, status.get('cursor'))])
+    metric("lag_rows", "gauge", "crawler_log rows not yet applied (max id minus cursor)",
+           [({}, status.get('lag_rows'))])
+    metric("lag_seconds", "gauge", "Age of the oldest crawler_log row not yet applied",
+           [({}, status.get('lag_seconds'))])
+    if last_run.get('finished_at'):
+        finished_at = datetime.fromisoformat(last_run['finished_at']).timestamp()
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last successful sync run finished",
+               [({}, round(finished_at, 3))])
+    metric("last_run_duration_seconds", "gauge", "Wall time of the last sync run",
+           [({}, last_run.get('duration_seconds'))])
+    metric("last_run_rows_per_second", "gauge", "Throughput of the last sync run",
+           [({}, last_run.get('rows_per_second'))])
+    metric("last_run_slowest_batch_seconds", "gauge", "Slowest batch of the last sync run",
+           [({}, last_run.get('slowest_batch_seconds'))])
+    metric("runs_total", "counter", "Completed sync runs", [({}, totals['runs'])])
+    metric("run_failures_total", "counter", "Sync runs that raised", [({}, totals['run_failures'])])
+    metric("batches_total", "counter", "Processed batches", [({}, totals['batches'])])
+    metric("rows_total", "counter", "Processed crawler_log rows", [({}, totals['rows'])])
+    metric("rows_failed_total", "counter", "crawler_log rows that failed to apply", [({}, totals['failed'])])
+    metric("batch_fallbacks_total", "counter", "Batches that fell back to row-by-row processing",
+           [({}, totals['batch_fallbacks'])])
+    metric("stage_seconds_total", "counter", "Time spent per sync stage",
+           [({'stage': stage}, round(seconds, 6)) for stage, seconds in totals['stage_seconds'].items()])
+    metric("failures_total", "counter", "Failures by error class",
+           [({'error_type': error_type}, count) for error_type, count in sorted(totals['errors_by_type'].items())])
+    return "\n".join(lines) + "\n"
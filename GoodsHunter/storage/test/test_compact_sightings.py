@@ -0,0 +1,86 @@
+"""DBWriter 精简模式（compact_sightings）测试（需要数据库，未配置 DATABASE_URL 时跳过）"""
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from crawler.core.types import Record
+from storage.output.db_writer import DBWriter
+
+
+@pytest.fixture
+def site():
+    """独立的测试站点，测试结束后删除其 crawler_item / crawler_log 行"""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        pytest.skip("未设置 DATABASE_URL")
+    try:
+        conn = psycopg2.connect(database_url)
+    except Exception as e:
+        pytest.skip(f"数据库连接失败，跳过测试: {e}")
+    name = f"compact-test-{uuid.uuid4().hex[:8]}"
+    yield conn, name
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM crawler_log WHERE site = %s", (name,))
+    cursor.execute("DELETE FROM crawler_item WHERE site = %s", (name,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def _insert_item(conn, writer: DBWriter, site: str, item: dict, status: str, last_seen: date):
+    """插入一个 last_raw_hash 与 item 当前内容一致的 crawler_item 行"""
+    normalized, _, raw_hash = writer._prepare_item(item, site)
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO crawler_item (
+            source_uid, site, category, item_id, price, status,
+            first_seen_dt, last_seen_dt, last_crawl_time, last_raw_hash
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            writer._item_source_uid(normalized), site, normalized["category"], normalized["item_id"],
+            normalized["price"], status, last_seen, last_seen, datetime.now() - timedelta(days=1), raw_hash,
+        )
+    )
+    conn.commit()
+    cursor.close()
+
+
+def test_unchanged_sold_item_falls_back_to_log_row(site):
+    """内容未变化的 active 商品只刷新最后发现时间；已售商品不刷新，写入完整日志行交给同步循环恢复"""
+    conn, name = site
+    writer = DBWriter(enable_image_upload=False, compact_sightings=True)
+    yesterday = date.today() - timedelta(days=1)
+    active = {"item_id": "A1", "price": 1000}
+    sold = {"item_id": "S1", "price": 2000}
+    _insert_item(conn, writer, name, active, "active", yesterday)
+    _insert_item(conn, writer, name, sold, "sold", yesterday)
+
+    try:
+        written = writer.write_batch([(Record(url=f"https://{name}/list", data={"items": [active, sold]}), name)])
+    finally:
+        writer.close()
+
+    assert written == 2
+    assert writer.stats["sightings"] == 1
+    assert writer.stats["log_rows"] == 1
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT item_id FROM crawler_log WHERE site = %s", (name,))
+    assert [row[0] for row in cursor.fetchall()] == ["S1"]
+    cursor.execute("SELECT item_id, status, last_seen_dt FROM crawler_item WHERE site = %s ORDER BY item_id", (name,))
+    assert cursor.fetchall() == [("A1", "active", date.today()), ("S1", "sold", yesterday)]
+    cursor.close()
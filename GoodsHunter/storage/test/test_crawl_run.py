@@ -0,0 +1,44 @@
+"""抓取运行台账汇总测试（不依赖数据库）"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from storage.crawl_run import CrawlRunRecorder, bottleneck_stage
+
+
+def test_pages_and_writer_stats_roll_up_into_run():
+    """页面阶段计时和 DBWriter.stats 增量汇总到运行上，瓶颈取累计耗时最长的阶段"""
+    writer_stats = {"log_rows": 5, "images_fetched": 2, "image_seconds": 1.0, "db_seconds": 0.5}
+    recorder = CrawlRunRecorder(database_url=None, command="test")
+    recorder.start(urls_planned=3)
+    recorder.attach_writer_stats(writer_stats)
+
+    fast = recorder.page("https://example.com/a")
+    fast.seconds.update({"fetch": 2.0, "extract": 0.1, "file": 0.2})
+    recorder.finish_page(fast, "succeeded", items=10)
+    slow = recorder.page("https://example.com/b")
+    slow.seconds.update({"fetch": 5.0, "extract": 0.2})
+    recorder.finish_page(slow, "failed")
+    recorder.finish_page(recorder.page("https://example.com/c"), "skipped")
+
+    writer_stats.update({"log_rows": 15, "images_fetched": 7, "image_seconds": 4.0, "db_seconds": 1.5})
+    stages = recorder.stage_seconds()
+
+    assert recorder.run_id == -1
+    assert recorder.counters["urls_succeeded"] == 1
+    assert recorder.counters["urls_failed"] == 1
+    assert recorder.counters["urls_skipped"] == 1
+    assert recorder.counters["items_extracted"] == 10
+    assert recorder.counters["log_rows_written"] == 10
+    assert recorder.counters["images_fetched"] == 5
+    assert recorder.counters["slowest_page_url"] == "https://example.com/b"
+    assert stages == pytest.approx({"fetch": 7.0, "extract": 0.3, "file": 0.2, "image": 3.0, "db": 1.0})
+    assert bottleneck_stage(stages) == "fetch"
+    assert bottleneck_stage({"fetch": 0.0, "db": 0.0}) is None
@@ -0,0 +1,40 @@
+"""crawler_log 归档编码/解码测试（不依赖数据库和 MinIO）"""
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from storage.log_archive import decode_rows, encode_rows
+
+
+def _row(row_id, site, source_uid):
+    return {
+        "id": row_id, "category": "watch", "site": site, "item_id": str(row_id),
+        "raw_json": {"name": "テスト", "price": "100,000"},
+        "brand_name": "ROLEX", "model_name": None, "model_no": None,
+        "currency": "JPY", "price": 100000,
+        "image_original_key": None, "image_thumb_300_key": None, "image_thumb_600_key": None,
+        "image_sha256": None, "image_phash": None,
+        "source_uid": source_uid, "raw_hash": "h", "status": "success", "error": None,
+        "http_status": 200, "fetch_url": None, "product_url": None, "run_id": None,
+        "crawl_time": datetime(2025, 12, 31, 8, 0, tzinfo=timezone.utc), "dt": date(2025, 12, 31),
+    }
+
+
+def test_jsonl_gz_roundtrip_restores_types():
+    """jsonl.gz 编码后解码，crawl_time / dt / raw_json 还原为原类型"""
+    rows = [_row(1, "a.jp", "a.jp:1"), _row(2, "a.jp", "a.jp:2")]
+    decoded = decode_rows(encode_rows(rows, "jsonl.gz"), "jsonl.gz")
+    assert decoded == rows
+
+
+def test_decode_filters_source_uid():
+    """解码时按 source_uid 过滤"""
+    rows = [_row(1, "a.jp", "a.jp:1"), _row(2, "a.jp", "a.jp:2")]
+    decoded = decode_rows(encode_rows(rows, "jsonl.gz"), "jsonl.gz", source_uids=["a.jp:2"])
+    assert [r["id"] for r in decoded] == [2]
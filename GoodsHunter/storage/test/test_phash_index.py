@@ -0,0 +1,50 @@
+"""测试感知哈希索引（BK 树汉明距离检索）"""
+import random
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from storage.phash_index import BKTree, PHashIndex, hamming_distance
+
+
+def test_hamming_distance():
+    """汉明距离计算"""
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(0, (1 << 64) - 1) == 64
+
+
+def test_bk_tree_matches_brute_force():
+    """BK 树检索结果与暴力扫描一致"""
+    rng = random.Random(42)
+    hashes = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+
+    query = hashes[17] ^ 0b101  # 与第17个哈希距离为2
+    for threshold in (0, 2, 20):
+        expected = sorted(
+            i for i, h in enumerate(hashes) if hamming_distance(query, h) <= threshold
+        )
+        actual = sorted(value for _, _, value in tree.search(query, threshold))
+        assert actual == expected
+
+
+def test_phash_index_nearest():
+    """十六进制哈希的近似重复检索"""
+    index = PHashIndex([
+        ("ffffffffffffffff", "a"),
+        ("0000000000000000", "b"),
+    ])
+    index.add("ffffffffffffffff", "a")  # 重复添加被忽略
+    assert len(index) == 2
+
+    assert index.nearest("fffffffffffffff0", 4) == (4, "a")
+    assert index.nearest("00000000000000ff", 4) is None
+    assert index.search(None, 10) == []
@@ -0,0 +1,127 @@
+"""同步游标推进、同步状态读取和 Prometheus 渲染测试（不依赖数据库）"""
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from storage.sync_state import (
+    CURSOR_KEY_LAST_LOG_ID,
+    LAG_SECONDS_SQL,
+    MAX_LOG_ID_SQL,
+    METRICS_KEY,
+    advance_sync_cursor,
+    read_sync_cursor,
+    read_sync_status,
+    render_prometheus,
+)
+
+
+class _FakeCursor:
+    """只支持读取和条件更新 pipeline_state、读取 crawler_log 最大 id 和延迟的游标替身"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.state = conn.state
+        self.rowcount = 0
+        self._row = None
+
+    def execute(self, sql, params=None):
+        if sql == MAX_LOG_ID_SQL:
+            self._row = (self.conn.max_log_id,)
+            return
+        if sql == LAG_SECONDS_SQL:
+            self.conn.lag_queries.append(params[0])
+            self._row = (self.conn.lag_seconds,) if self.conn.lag_seconds is not None else None
+            return
+        if sql.strip().startswith("SELECT"):
+            value = self.state.get(params[0])
+            self._row = (value,) if value is not None else None
+            return
+        value, key, expected = params
+        self.rowcount = 0
+        if self.state.get(key) == expected:
+            self.state[key] = value
+            self.rowcount = 1
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    def __init__(self, cursor_value=None):
+        self.state = {} if cursor_value is None else {CURSOR_KEY_LAST_LOG_ID: str(cursor_value)}
+        self.max_log_id = 0
+        self.lag_seconds = None
+        self.lag_queries = []
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+def test_advances_when_batch_follows_cursor():
+    """游标紧邻本批时推进到本批最后一个 id（与 id 顺序无关）"""
+    conn = _FakeConnection(cursor_value=99)
+    assert advance_sync_cursor(conn, [102, 100, 101]) == 102
+    assert read_sync_cursor(conn) == 102
+
+
+def test_stops_at_gap_in_batch_ids():
+    """本批 id 有空缺（可能是并发写入方未提交的行）时只推进到空缺之前"""
+    conn = _FakeConnection(cursor_value=99)
+    assert advance_sync_cursor(conn, [100, 101, 103]) == 101
+    assert read_sync_cursor(conn) == 101
+
+
+def test_does_not_advance_when_cursor_behind_or_missing():
+    """游标与本批之间还有其他行，或游标不存在时不推进"""
+    conn = _FakeConnection(cursor_value=90)
+    assert advance_sync_cursor(conn, [100, 101]) is None
+    assert read_sync_cursor(conn) == 90
+    assert advance_sync_cursor(_FakeConnection(), [1, 2]) is None
+
+
+def test_read_sync_status_and_render_prometheus():
+    """同步状态：游标、最大 id 之差和游标之后的延迟实时计算，缺失的累计计数补零后渲染为 Prometheus 文本"""
+    conn = _FakeConnection(cursor_value=120)
+    conn.max_log_id = 150
+    conn.lag_seconds = 42.1234
+    conn.state[METRICS_KEY] = json.dumps({
+        "updated_at": "2026-03-01T09:00:00+00:00",
+        "last_run": {"finished_at": "2026-03-01T09:00:00+00:00", "duration_seconds": 3.5},
+        "totals": {"runs": 7, "errors_by_type": {"KeyError": 2}},
+    })
+
+    status = read_sync_status(conn)
+
+    assert conn.lag_queries == [120]
+    assert status["cursor"] == 120
+    assert status["max_log_id"] == 150
+    assert status["lag_rows"] == 30
+    assert status["lag_seconds"] == 42.123
+    assert status["totals"]["runs"] == 7 and status["totals"]["batches"] == 0
+
+    text = render_prometheus(status)
+    assert "goodshunter_item_sync_lag_rows 30\n" in text
+    assert "goodshunter_item_sync_lag_seconds 42.123\n" in text
+    assert "goodshunter_item_sync_runs_total 7\n" in text
+    assert 'goodshunter_item_sync_failures_total{error_type="KeyError"} 2\n' in text
+    assert 'goodshunter_item_sync_stage_seconds_total{stage="fetch"} 0.0\n' in text
+
+
+def test_read_sync_status_without_metrics_or_pending_logs():
+    """尚未运行过同步、没有待处理日志时延迟为 0，累计计数为初始值"""
+    status = read_sync_status(_FakeConnection())
+
+    assert status["cursor"] == 0
+    assert status["lag_rows"] == 0
+    assert status["lag_seconds"] == 0.0
+    assert status["last_run"] is None
+    assert status["totals"]["run_failures"] == 0
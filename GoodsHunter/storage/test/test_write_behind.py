@@ -0,0 +1,49 @@
+"""写后写入器死信测试（不依赖数据库）"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+_current_file = Path(__file__).resolve()
+_project_root = _current_file.parent.parent.parent
+if str(_project_root) not in sys.path:
+    sys.path.insert(0, str(_project_root))
+
+from crawler.core.types import Record
+from storage.output.write_behind import DroppedRecordsError, WriteBehindDBWriter, load_dead_letters
+
+
+class _FailingWriter:
+    """write_batch 总是失败的 DBWriter 替身"""
+
+    def write_batch(self, entries, run_id=-1):
+        raise RuntimeError("db down")
+
+
+async def _write_and_close(writer: WriteBehindDBWriter, count: int):
+    async with writer:
+        for i in range(count):
+            await writer.put(Record(url=f"https://example.com/{i}", data={"i": i}), site="example.com", run_id=7)
+
+
+def test_failed_batches_go_to_dead_letter_file(tmp_path):
+    """重试后仍失败的记录写入死信文件，可读回重放，close() 不报错"""
+    path = tmp_path / "dead" / "db.jsonl"
+    writer = WriteBehindDBWriter(_FailingWriter(), max_retries=1, retry_backoff=0.0, dead_letter_path=str(path))
+    asyncio.run(_write_and_close(writer, 3))
+
+    entries = load_dead_letters(str(path))
+    assert [record.data["i"] for record, _, _ in entries] == [0, 1, 2]
+    assert all(site == "example.com" and run_id == 7 for _, site, run_id in entries)
+    assert writer.stats["dead_letter_records"] == 3
+    assert writer.stats["dropped_records"] == 0
+
+
+def test_close_raises_when_records_cannot_be_saved():
+    """未配置死信文件时，最终失败的记录无处保存，close() 抛出 DroppedRecordsError"""
+    writer = WriteBehindDBWriter(_FailingWriter(), max_retries=0, dead_letter_path=None)
+    with pytest.raises(DroppedRecordsError) as excinfo:
+        asyncio.run(_write_and_close(writer, 2))
+    assert excinfo.value.dropped == 2